@@ -0,0 +1,225 @@
+"""
+Local HTTP analysis service.
+
+Exposes the decode -> features -> model pipeline of `SoundAnalyzer` to other tools on the
+same machine (an EHR bridge, a research workstation), without the fullscreen GUI.
+
+    python analysis_service.py [--host 127.0.0.1] [--port 8765]
+
+Endpoints:
+    GET  /health   model name/version and batching settings (503 if no model is loaded)
+    POST /analyze  body is a WAV file (Content-Type: audio/wav), or raw interleaved PCM
+                   (Content-Type: application/octet-stream) described by the query string
+                   ?rate=48000&channels=1&width=3
+
+The response is JSON with one result per channel (label, probability, BPM, model version)
+and per-request latency metrics. Requests that arrive within BATCH_WINDOW_S of each other are
+micro-batched: their features are extracted on a worker pool and each model scores the whole
+batch in one call. Without a production model the service does not start, and a server built
+around an analyzer without one answers 503.
+
+Only the standard library is used on top of the analysis dependencies, and the service binds
+to localhost by default.
+"""
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # The GUI module imports Qt; no display is needed
+
+import io
+import sys
+import json
+import time
+import wave
+import queue
+import argparse
+import threading
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import audio_with_spectogram as app
+
+# --- Service Configuration ---
+SERVICE_HOST = "127.0.0.1" # Localhost only
+SERVICE_PORT = 8765
+BATCH_WINDOW_S = 0.02 # How long the batcher waits for more requests after the first one
+MAX_BATCH_SIZE = 8 # Maximum number of channels scored together
+FEATURE_WORKERS = os.cpu_count() or 1 # Threads for the per-recording feature stage
+MAX_UPLOAD_BYTES = 256 * 1024 * 1024 # Reject larger request bodies
+
+
+class MicroBatcher:
+    """
+    Collects analysis jobs from concurrent requests and runs them through
+    `SoundAnalyzer.analyze_batch` together.
+    """
+    def __init__(self, analyzer, window_s=BATCH_WINDOW_S, max_batch=MAX_BATCH_SIZE, workers=FEATURE_WORKERS):
+        self.analyzer = analyzer
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="MicroBatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, y, sr):
+        """
+        Queues one channel for analysis. Returns a Future resolving to (result, batch_metrics).
+        """
+        future = Future()
+        self._queue.put((y, sr, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            timings = {}
+            try:
+                results = self.analyzer.analyze_batch([(y, sr) for y, sr, _, _ in batch], self.workers, timings)
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future, queued), result in zip(batch, results):
+                future.set_result((result, {"queue_ms": (started - queued) * 1000,
+                                            "features_ms": timings.get("features_s", 0) * 1000,
+                                            "scoring_ms": timings.get("scoring_s", 0) * 1000,
+                                            "batch_size": len(batch)}))
+
+
+def decode_request(body, content_type, query, controller):
+    """
+    Turns a request body into a (channels, n) or (n,) float32 waveform. Returns (y, sr).
+    """
+    if content_type.startswith("audio/") or body[:4] == b"RIFF":
+        with wave.open(io.BytesIO(body), 'rb') as rd:
+            channels, width, sr = rd.getnchannels(), rd.getsampwidth(), rd.getframerate()
+            frames = [rd.readframes(rd.getnframes())]
+    else:
+        try:
+            sr = int(query["rate"][0])
+            channels = int(query.get("channels", ["1"])[0])
+            width = int(query.get("width", [str(app.WIDTH_SAMPLE)])[0])
+        except (KeyError, ValueError):
+            raise ValueError("Raw PCM needs ?rate=<Hz>[&channels=<n>&width=<bytes>]")
+        frames = [body]
+    if width not in (2, 3, 4):
+        raise ValueError(f"Unsupported sample width: {width} bytes")
+    y = controller.split_channels(controller.decode_frames(frames, width), channels)
+    return y, sr
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles /health and /analyze. The batcher and controller are set on the server object.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            self._send_json(404, {"error": "not found"})
+            return
+        analyzer = self.server.batcher.analyzer
+        production = analyzer.production_model or {}
+        self._send_json(200 if production else 503, {"status": "ok" if production else "no model loaded",
+                              "model": production.get("name"), "model_version": production.get("version"),
+                              "shadow_models": [f"{m['name']} v{m['version']}" for m in analyzer.shadow_models],
+                              "batch_window_s": self.server.batcher.window_s, "max_batch_size": self.server.batcher.max_batch})
+
+    def do_POST(self):
+        request_start = time.perf_counter()
+        url = urlparse(self.path)
+        if url.path != "/analyze":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        if length <= 0 or length > MAX_UPLOAD_BYTES:
+            self.close_connection = True # The body is not read
+            self._send_json(413 if length > 0 else 400, {"error": f"body must be 1..{MAX_UPLOAD_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+        if not self.server.batcher.analyzer.production_model:
+            self._send_json(503, {"error": f"no production model loaded from {app.LOGREG_MODEL_PATH}"})
+            return
+
+        try:
+            decode_start = time.perf_counter()
+            y, sr = decode_request(body, self.headers.get("Content-Type", ""), parse_qs(url.query), self.server.controller)
+            decode_ms = (time.perf_counter() - decode_start) * 1000
+        except (ValueError, wave.Error, EOFError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        channels = [y] if y.ndim == 1 else list(y)
+        futures = [self.server.batcher.submit(channel, sr) for channel in channels]
+        try:
+            outcomes = [future.result() for future in futures]
+        except Exception as e:
+            self._send_json(500, {"error": f"analysis failed: {e}"})
+            return
+
+        results = []
+        for result, metrics in outcomes:
+            results.append({"label": result["result"], "sound_detected": result["sound_detected"],
+                            "probability": result["probability"], "bpm": result["bpm"],
+                            "model": result["model"], "model_version": result["model_version"],
+                            "shadow": result["shadow"], "metrics": metrics})
+        self._send_json(200, {"sample_rate": sr, "channels": results,
+                              "latency_ms": {"decode": decode_ms, "total": (time.perf_counter() - request_start) * 1000}})
+
+    def log_message(self, format, *args):
+        print(f"[analysis_service] {self.address_string()} {format % args}")
+
+
+def make_server(host=SERVICE_HOST, port=SERVICE_PORT, analyzer=None):
+    """
+    Builds the HTTP server (not yet serving). Pass `analyzer` to reuse an existing SoundAnalyzer.
+    """
+    server = ThreadingHTTPServer((host, port), AnalysisRequestHandler)
+    server.daemon_threads = True
+    server.batcher = MicroBatcher(analyzer or app.SoundAnalyzer())
+    server.controller = app.AudioController(probe_devices=False)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service for objective tinnitus analysis.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args(argv)
+
+    analyzer = app.SoundAnalyzer()
+    if not analyzer.production_model:
+        print(f"No production model loaded from {app.LOGREG_MODEL_PATH}; the service needs one.")
+        return 1
+    server = make_server(args.host, args.port, analyzer)
+    print(f"Analysis service listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,15 @@
 import sys
 import os
 import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from scipy import signal 
 from scipy.signal import find_peaks
 from scipy.io import wavfile
 import matplotlib
-matplotlib.use('Qt5Agg') # Use Qt5Agg for Matplotlib backend
+matplotlib.use('Qt5Agg', force=False) # Use Qt5Agg for Matplotlib backend (headless tools importing this module keep their own)
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure # Import Figure for embedding
@@ -18,33 +21,131 @@ import librosa.display # For displaying Mel spectrogram axis correctly
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QProgressBar, QStackedWidget, QFrame,
-    QFileDialog, QMessageBox, QSpinBox, QSizePolicy 
+    QFileDialog, QMessageBox, QSpinBox, QSizePolicy, QComboBox,
+    QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView
 )
-from PyQt5.QtCore import QThread, pyqtSignal, Qt, QTimer
+from PyQt5.QtCore import QThread, pyqtSignal, Qt, QTimer, QFileSystemWatcher, QObject, QEvent
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import QLabel
 from PyQt5.QtCore import pyqtSignal
 import joblib
+from recording_journal import RecordingJournal, recover_journals
+from capture_process import CaptureProcess
+from quality_governor import QualityGovernor
+from virtual_audio import VirtualPyAudio
+from report_export import ReportExporter, build_report_data, report_path_for, draw_waveform, draw_spectrogram
+from similarity_index import SimilarityIndex, compose_vector
+from session_history import SessionHistory
+from memory_budget import MemoryBudget, SpillBuffer, frames_nbytes
+from live_broadcast import Broadcaster
+from sync_agent import SyncAgent, open_store
+from recording_catalog import RecordingCatalog, device_token
+from noise_profile import NoiseProfile, NoiseProfileStore
+from plot_pyramid import build_pyramids, ZoomableAnalysisPlot
 
 # --- Configuration ---
 TARGET_SAMPLE_RATE = 48000 #48000
-TARGET_CHANNELS = 1 
+TARGET_CHANNELS = 1 # 1 = mono, 2 = binaural (left and right ear canals captured in one stream)
+EAR_LABELS = ["L", "R"] # Display labels for the channels of a binaural recording
 TARGET_FORMAT = pyaudio.paInt24 #pyaudio.paInt16 , pyaudio.paInt24
 CHUNK_SIZE = 2**15 # Size of each audio chunk to read from the stream
 DEFAULT_OUTPUT_DIR = "OBJTIN Recording" # Folder name for saving recordings
 FIXED_RECORDING_DURATION_SECONDS = 30 # Duration of each recording in seconds
 os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
+JOURNAL_DIR = os.path.join(DEFAULT_OUTPUT_DIR, ".journal") # Write-through journal of the recording in progress (same filesystem, so SAVE is a hard link)
+JOURNAL_FSYNC_INTERVAL_S = 1.0 # Maximum time between fsyncs of the journal while recording
+CAPTURE_MODE = "process" # "process" = PortAudio in its own process with a shared-memory ring, "thread" = AudioWorker in the GUI process
+CAPTURE_RT_PRIORITY = 70 # SCHED_FIFO priority requested by the capture process (needs rtprio permission)
+CAPTURE_POLL_INTERVAL_S = 0.05 # How often the GUI process collects new audio from the ring
+AUDIO_BACKEND = "pyaudio" # "pyaudio" = real hardware, "virtual" = virtual_audio.VirtualPyAudio (headless testing)
+# Virtual input devices: source is "pulsatile", "non_pulsatile", "noise", "intermittent" or a WAV path; speed is relative to real time (None = unpaced);
+# devices is the number of identical virtual sound cards (stations)
+VIRTUAL_AUDIO = {"source": "pulsatile", "speed": 1.0, "overflow_rate": 0.0, "jitter_s": 0.0, "seed": 0, "bpm": 72, "devices": 1}
 
 #select format based on TARGET_FORMAT
 PCM_FORMAT = {pyaudio.paInt24: "PCM_24", pyaudio.paInt16: "PCM_16", pyaudio.paInt32: "PCM_32"}[TARGET_FORMAT]
 WIDTH_SAMPLE = {pyaudio.paInt24: 3, pyaudio.paInt16: 2, pyaudio.paInt32: 4}[TARGET_FORMAT] #24bits = 3bytes
 
+# --- Report Export ---
+EXPORT_REPORT_ON_SAVE = False # SAVE also renders a report image (report_export.REPORT_FORMAT) next to the WAV, in the background.
+# Off by default: the report process re-imports this script (PyQt5, librosa) under spawn; on the Pi prefer the batch command of report_export.py
+REPORT_EXPORT_WORKERS = 1 # Report processes started by the GUI (keep the other cores for capture and analysis)
+
+# --- Similarity Search ---
+SIMILARITY_INDEX_DIR = os.path.join(DEFAULT_OUTPUT_DIR, ".similarity") # Index of the saved recordings (see similarity_index.py)
+SIMILARITY_MEL_BANDS = 8 # Bands of the Mel-envelope embedding appended to the features (0 = features only)
+# The embedding has its own fixed Mel settings, so vectors do not depend on the display tier or ANALYSIS_SAMPLE_RATE
+SIMILARITY_MEL_SR = 8000 # Rate the embedding's spectrogram is computed at
+SIMILARITY_MEL_N_FFT = 1024
+SIMILARITY_MEL_HOP_LENGTH = 256
+SIMILARITY_MEL_N_MELS = 64
+SIMILARITY_TOP_K = 5 # Similar recordings shown when the result box is tapped
+
+# --- Session History ---
+SESSION_HISTORY_SIZE = 10 # Recent sessions that can be reopened instantly from the history selector
+SESSION_HISTORY_MEMORY_MB = 128 # Memory budget of the history (frames, plot data and rendered plots)
+SESSION_HISTORY_SPILL_MB = 1 # Items at least this large are spilled to disk when the budget is exceeded
+SESSION_HISTORY_DIR = os.path.join(DEFAULT_OUTPUT_DIR, ".history") # Spilled items (deleted when the app closes)
+
+# --- Memory Budget ---
+MEMORY_BUDGET_MB = 512 # Capture buffer, decoded audio, plot data and history held in RAM; beyond it they spill to disk (None = no limit)
+MEMORY_SPILL_DIR = os.path.join(DEFAULT_OUTPUT_DIR, ".spill") # Memory-mapped spill files (deleted with their data and when the app closes)
+MEMORY_BLOCK_MB = 4 # Recordings are decoded, saved and turned into a spectrogram this much at a time
+MEMORY_ANALYSIS_WHOLE_MAX_S = 60 # Longer recordings are analyzed in windows (~80 bytes per sample and channel in one piece). By duration only, so the verdict never depends on the memory in use
+MEMORY_ANALYSIS_WINDOW_S = 30 # Length the windows of a longer recording are about
+MEMORY_CAPTURE_RING_S = 60 # Audio the capture process's ring holds within a budget (else the whole recording); drained every poll
+
+# --- Live Broadcast ---
+BROADCAST_ENABLED = False # Publish the live envelope, waveform, Mel columns and verdicts to remote viewers (live_broadcast.py)
+BROADCAST_HOST = "127.0.0.1" # Use "0.0.0.0" to accept viewers from other machines
+BROADCAST_PORT = 8766
+BROADCAST_CLIENT_QUEUE_KB = 1024 # Per-viewer send queue; a slower viewer loses its oldest live frames
+
+# --- Archive Sync ---
+SYNC_TARGET = None # Central archive for saved recordings (sync_agent.py): a folder (e.g. a mounted share) or an http:// URL. None = no sync
+SYNC_STATE_DIR = os.path.join(DEFAULT_OUTPUT_DIR, ".sync") # Persistent queue of recordings still to ship
+SYNC_BANDWIDTH_KBPS = 0 # Rate limit while idle, in kB/s (0 = unlimited)
+SYNC_RECORDING_BANDWIDTH_KBPS = None # Rate limit while a recording is in progress (None = pause syncing)
+
+# --- Recording Catalog ---
+CATALOG_DB = os.path.join(DEFAULT_OUTPUT_DIR, ".catalog.sqlite3") # SQLite index of the recordings (see recording_catalog.py); OPEN browses it
+CATALOG_PAGE_SIZE = 500 # Recordings listed by the catalog page (in the chosen sort order)
+CATALOG_WATCH_DELAY_MS = 2000 # Wait for the recordings folder to settle before cataloging new or removed files
+
+# --- Noise Profile ---
+NOISE_PROFILE_ENABLED = False # Apply the calibrated noise profile of the device during analysis (see noise_profile.py); off until benchmark.py --noise-report shows no loss, as the model was trained on raw audio
+NOISE_PROFILE_DIR = os.path.join(DEFAULT_OUTPUT_DIR, ".noise_profiles") # One profile per device name and configuration
+NOISE_CALIBRATION_SECONDS = 5 # Length of the silent reference recorded by CALIBRATE NOISE
+NOISE_FLOOR_PERCENTILE = 50 # STFT bins are attenuated down to this percentile of the device's noise spectrum
+NOISE_MAX_ATTENUATION_DB = 12 # Largest attenuation of a single bin
+
+# --- Model Training ---
+TRAINING_STORE_DIR = os.path.join(DEFAULT_OUTPUT_DIR, ".training") # Cached features and labels for retraining (see model_training.py)
+
+# --- Zoom and Pan ---
+ZOOM_MIN_VIEW_S = 0.05 # Shortest time range the analysis plots zoom in to
+ZOOM_FRAME_INTERVAL_MS = 33 # Gestures redraw the zoomed plots at most this often (about 30 frames per second)
+ZOOM_WHEEL_STEP = 1.25 # Zoom factor of one mouse wheel step
+
 # --- Spectrogram Parameters ---
 SPEC_N_FFT = 4096 #8192         
 SPEC_HOP_LENGTH = 1024 #2048    
 SPEC_N_MELS = 128         
 SPEC_WINDOW = 'hamming'   
 
+# --- Display Quality Governor ---
+# Display-only tiers picked by QualityGovernor from CPU temperature, throttling and measured latency.
+# The clinical analysis configuration is never changed by these tiers.
+DISPLAY_TIERS = [
+    {"name": "full", "hop_length": SPEC_HOP_LENGTH, "n_mels": SPEC_N_MELS, "waveform_points": 11025, "live_refresh_s": 0.05},
+    {"name": "reduced", "hop_length": SPEC_HOP_LENGTH * 2, "n_mels": 96, "waveform_points": 4000, "live_refresh_s": 0.1},
+    {"name": "low", "hop_length": SPEC_HOP_LENGTH * 4, "n_mels": 64, "waveform_points": 1500, "live_refresh_s": 0.25},
+]
+DISPLAY_LATENCY_BUDGET_S = 1.5 # Target time to compute and draw the analysis plots
+GOVERNOR_SYSFS_ROOT = "/" # Root of the sysfs tree the governor reads (point at a fake tree for testing)
+GOVERNOR_HOT_TEMP_C = 75.0 # Step down a tier at or above this CPU temperature (the Pi 5 throttles at 85C)
+GOVERNOR_COOL_TEMP_C = 65.0 # Allow stepping back up at or below this temperature
+
 # --- Sound Detection Parameters ---
 WINDOW_DURATION_MS = 50 # Duration of each window in milliseconds
 RELATIVE_THRESHOLD = 0.5 # Relative RMS threshold for sound detection
@@ -52,18 +153,81 @@ DISTANCE = 7  # Minimum d  istance between peaks in samples (35ms apart) where 1
 # Pulsatile BPM detection thresholds
 PULSATILE_BPM_MIN = 40
 PULSATILE_BPM_MAX = 180
+# Inter-ear comparison (binaural recordings only)
+MAX_INTER_EAR_LAG_MS = 5 # Largest left/right delay searched by the cross-correlation
+# Beat-synchronous averaging (faint pulsatile sounds under the noise floor)
+ENSEMBLE_ENABLED = True # Average the envelope over the beats found by autocorrelation; reported as the result's "ensemble"
+ENSEMBLE_OVERRIDE = False # A consistent average beat turns "No Sound" or "Non-Pulsatile" into "Pulsatile"
+# Off until `benchmark.py --ensemble-labeled-report` shows few false positives on real labeled recordings (only checked on synthetic noise so far)
+ENSEMBLE_MIN_CONSISTENCY = 0.3 # Mean correlation of each beat with the average of the others needed to call it pulsatile (noise stays below ~0.2)
+ENSEMBLE_MIN_BEATS = 8 # Fewer beats do not make a reliable average
+ENSEMBLE_BEAT_TOLERANCE = 0.2 # Each beat may move this fraction of the period off the grid (beat-to-beat heart rate variation)
+ENSEMBLE_ENVELOPE_MS = 10 # Resolution of the averaged beat envelope
+ENSEMBLE_PRE_BEAT = 0.3 # Fraction of the period kept before each beat
+
+# --- Analysis Rate Parameters ---
+ANALYSIS_SAMPLE_RATE = None # Decimate to this rate (Hz) before analysis and the Mel display, e.g. 8000. None = recording rate
+# Features still computed at the recording rate when ANALYSIS_SAMPLE_RATE is set. Every feature shifts once the band above
+# the analysis rate is removed (see the per-feature drift of benchmark.py --decimation-report), so a model scoring decimated
+# features must be trained at that rate; the feature recipe signature records the rate (see recipe_signature)
+FULL_BANDWIDTH_FEATURES = {
+    "rms_ratio": False,
+    "mfcc": False,
+    "spectral": False, # Spectral centroid & bandwidth
+    "zcr": False,
+}
+
+# --- Batch Feature Extraction ---
+FEATURE_BATCH_MEMORY_MB = 64 # Working memory of one chunk of SoundAnalyzer.extract_features_batch() (a 30s recording at 48kHz needs ~45MB)
+
+# --- Signal Helpers ---
+def analysis_rate(sr):
+    """
+    Returns the rate analysis and display run at for a recording made at `sr`.
+    """
+    return ANALYSIS_SAMPLE_RATE if ANALYSIS_SAMPLE_RATE and ANALYSIS_SAMPLE_RATE < sr else sr
+
+def decimate_to_rate(y, sr, target_sr):
+    """
+    Anti-aliased polyphase decimation of `y` (along the last axis) from `sr` to `target_sr`.
+    Returns a new float32 array, or `y` unchanged if no decimation is needed.
+    """
+    if target_sr >= sr:
+        return y
+    g = np.gcd(int(sr), int(target_sr))
+    return signal.resample_poly(y, int(target_sr) // g, int(sr) // g, axis=-1).astype(np.float32, copy=False)
+
+def virtual_audio_settings():
+    """
+    Keyword arguments of the VirtualPyAudio used when AUDIO_BACKEND is "virtual", else None.
+    """
+    return dict(rate=TARGET_SAMPLE_RATE, **VIRTUAL_AUDIO) if AUDIO_BACKEND == "virtual" else None
+
+def create_audio_backend():
+    """
+    Returns a new PyAudio instance, or a VirtualPyAudio one when AUDIO_BACKEND is "virtual".
+    """
+    settings = virtual_audio_settings()
+    return VirtualPyAudio(**settings) if settings else pyaudio.PyAudio()
 
 # --- Backend Logic Class (AudioController) ---
 class AudioController:
     """
     Handles audio input device initialization, recording, and analysis.
     """
-    def __init__(self):
+    STFT_BYTES_PER_BIN = 16 # complex64 STFT bin plus its float32 magnitude and power (peak of librosa's melspectrogram)
+    def __init__(self, probe_devices=True):
         """
         Initializes the audio controller and attempts to find a suitable audio input device.
+        Pass `probe_devices=False` to skip PyAudio entirely (headless analysis, benchmarks);
+        `device_params` can then be assigned directly.
         """
         self.device_params = None
         self.pyaudio_instance = None
+        self.memory_budget = None # MemoryBudget for decoded audio and spectrograms (None = no limit, always in memory)
+        self._analysis_waveform = None # (y, y decimated to the analysis rate) of the last recording, see analysis_waveform()
+        if not probe_devices:
+            return
         self.initialize_pyaudio()
         if self.pyaudio_instance:
             self._find_and_verify_workable_device() # Changed from Pisound specific
@@ -74,7 +238,7 @@ class AudioController:
         Initializes the PyAudio instance for audio input/output.
         """
         try:
-            self.pyaudio_instance = pyaudio.PyAudio()
+            self.pyaudio_instance = create_audio_backend()
         except Exception as e:
             print(f"Failed to initialize PyAudio: {e}")
             self.pyaudio_instance = None
@@ -115,6 +279,23 @@ class AudioController:
 
         # If default device fails, iterate through all devices
         print("Checking all available devices...")
+        devices = self.find_workable_devices()
+        if devices:
+            self.device_params = devices[0]
+            print(f"Found suitable device: '{devices[0]['name']}' (Index {devices[0]['index']}) supports the target configuration.")
+            return
+        
+        print(f"Error: No suitable audio input device found supporting {TARGET_SAMPLE_RATE}Hz.")
+        self.device_params = None
+
+    def find_workable_devices(self):
+        """
+        Returns the device parameters of every input device that supports the target configuration,
+        in device index order (multi_station.py uses all of them; the GUI uses one).
+        """
+        devices = []
+        if not self.pyaudio_instance:
+            return devices
         num_devices = self.pyaudio_instance.get_device_count()
         for i in range(num_devices):
             try:
@@ -123,18 +304,14 @@ class AudioController:
                     if self.pyaudio_instance.is_format_supported(
                             TARGET_SAMPLE_RATE, input_device=i,
                             input_channels=TARGET_CHANNELS, input_format=TARGET_FORMAT):
-                        self.device_params = {
+                        devices.append({
                             'index': i, 'name': info['name'], 'rate': TARGET_SAMPLE_RATE,
                             'channels': TARGET_CHANNELS, 'format': TARGET_FORMAT,
                             'max_input_channels': info.get('maxInputChannels')
-                        }
-                        print(f"Found suitable device: '{info['name']}' (Index {i}) supports the target configuration.")
-                        return
+                        })
             except Exception as e:
                 continue # Skip any devices that fail the check
-        
-        print(f"Error: No suitable audio input device found supporting {TARGET_SAMPLE_RATE}Hz.")
-        self.device_params = None
+        return devices
 
 # --- Audio Handling ---
     def is_ready(self):
@@ -151,10 +328,11 @@ class AudioController:
         print(f"\nSaving audio to: {filepath}")
         try:
             with wave.open(filepath, 'wb') as wf:
-                wf.setnchannels(1) #mono
+                wf.setnchannels(self.device_params['channels']) #mono or interleaved binaural
                 wf.setsampwidth(WIDTH_SAMPLE)
                 wf.setframerate(self.device_params['rate'])
-                wf.writeframes(b''.join(frames))
+                for block in self.pcm_blocks(frames, MEMORY_BLOCK_MB * 1024 * 1024):
+                    wf.writeframesraw(block) # The header is completed once, on close
 
             print("Audio saved successfully.")
             return True
@@ -163,28 +341,24 @@ class AudioController:
             return False
 
 # --- Audio Analysis ---
-    def compute_audio_analysis_data(self, frames):
-        """
-        Computes the Log-Mel spectrogram and other audio analysis data from the recorded frames.
-        """
-        if not self.device_params or not frames:
-            return None, None, None
-        
-        try:
-            print("\nComputing analysis data from recorded frames...")
-
-            if WIDTH_SAMPLE == 4 :
-                y = np.frombuffer(b''.join(frames), dtype=np.int32).astype(np.float32) #32bit
-            elif WIDTH_SAMPLE == 3:
-                #Join list of bytes
-                buffer = b''.join(frames)
-                nframes = len(buffer) // WIDTH_SAMPLE
-
-                #truncate data that isnt in multiple of frame_size
-                buffer = buffer[:nframes*WIDTH_SAMPLE]
-
+    def decode_frames(self, frames, sample_width=WIDTH_SAMPLE):
+        """
+        Converts the raw recorded byte frames into a float32 waveform (`y`).
+        `sample_width` is the size of one sample in bytes (defaults to the recording format).
+        The frames are decoded MEMORY_BLOCK_MB at a time into one preallocated array (a memory-mapped
+        spill file if it does not fit the memory budget), so the recording is never joined into one copy.
+        """
+        n = frames_nbytes(frames) // sample_width
+        y = self.memory_budget.empty("decoded", n) if self.memory_budget else np.empty(n, dtype=np.float32)
+        position = 0
+        for block in self.pcm_blocks(frames, MEMORY_BLOCK_MB * 1024 * 1024, sample_width):
+            count = len(block) // sample_width
+            out = y[position:position + count]
+            if sample_width == 4 :
+                out[:] = np.frombuffer(block, dtype=np.int32) #32bit
+            elif sample_width == 3:
                 #convert each byte to an 8-bit integer and reshape for flattening by 3bytes
-                u8 = np.frombuffer(buffer,dtype=np.uint8).reshape(-1,3)
+                u8 = np.frombuffer(block, dtype=np.uint8).reshape(-1,3)
 
                 #flattening to int32
                 int32 = (u8[..., 0].astype(np.int32) | (u8[..., 1].astype(np.int32) << 8) | (u8[..., 2].astype(np.int32) << 16))
@@ -192,19 +366,127 @@ class AudioController:
 
                 # Extend signed bit from original to 32-bit signed:
                 # If value >= 2^23 (3bytes), subtract 2^24 to get negative range
-                y = int32.astype(np.float32) / (1 << 23)
+                out[:] = int32
+                out /= (1 << 23) # In place, in the output array
 
             else:
-                y = np.frombuffer(b''.join(frames), dtype=np.int16).astype(np.float32) #16bit
+                out[:] = np.frombuffer(block, dtype=np.int16) #16bit
+            position += count
+        return y
+
+    @staticmethod
+    def pcm_blocks(frames, block_bytes, sample_width=1):
+        """
+        Yields the frames joined into blocks of about `block_bytes` of whole samples (data that
+        isn't a multiple of the sample width is dropped at the end). Only one block is joined at a time.
+        """
+        pending, size = [], 0
+        for chunk in frames:
+            pending.append(chunk)
+            size += len(chunk)
+            if size >= block_bytes:
+                buffer = b''.join(pending)
+                usable = len(buffer) - len(buffer) % sample_width
+                yield memoryview(buffer)[:usable]
+                pending, size = [buffer[usable:]], len(buffer) - usable
+        buffer = b''.join(pending)
+        if len(buffer) >= sample_width:
+            yield memoryview(buffer)[:len(buffer) - len(buffer) % sample_width]
+
+    @staticmethod
+    def split_channels(samples, channels):
+        """
+        De-interleaves decoded samples into a (channels, n) array of strided views (no copy).
+        Mono recordings are returned unchanged as a 1-D array.
+        """
+        if channels == 1:
+            return samples
+        n = len(samples) // channels
+        return samples[:n * channels].reshape(n, channels).T
+
+    def analysis_waveform(self, y, sr):
+        """
+        `y` decimated to `analysis_rate(sr)` (or `y` itself when no decimation is configured).
+        The last result is kept, so the display and the analysis of a recording share one decimation
+        (pass it to SoundAnalyzer.analyze_channels as `y_low`).
+        """
+        if self._analysis_waveform is not None and self._analysis_waveform[0] is y:
+            return self._analysis_waveform[1]
+        y_low = decimate_to_rate(y, sr, analysis_rate(sr))
+        self._analysis_waveform = (y, y_low) if y_low is not y else None
+        return y_low
+
+    def compute_mel_spectrogram(self, y, sr, hop_length=SPEC_HOP_LENGTH, n_mels=SPEC_N_MELS):
+        """
+        Generates the Log-Mel spectrogram (`S_mel_db`) of the waveform for display.
+        For a (channels, n) waveform the result has shape (channels, n_mels, frames).
+        The spectrogram is computed at `analysis_rate(sr)`.
+        """
+        mel_sr = analysis_rate(sr)
+        y = self.analysis_waveform(y, sr)
+        if self.memory_budget:
+            stft_bytes = y.size // y.shape[-1] * (1 + SPEC_N_FFT // 2) * (1 + y.shape[-1] // hop_length) * self.STFT_BYTES_PER_BIN
+            if not self.memory_budget.fits(stft_bytes):
+                return self.compute_mel_spectrogram_blockwise(y, mel_sr, hop_length, n_mels)
+        S_mel = librosa.feature.melspectrogram(
+            y=y, sr=mel_sr, n_fft=SPEC_N_FFT, hop_length=hop_length,
+            n_mels=n_mels, window=SPEC_WINDOW
+        )
+        S_mel_db = librosa.power_to_db(S_mel, ref=np.max)
+        if self.memory_budget:
+            self.memory_budget.set("display", S_mel_db.nbytes)
+        return S_mel_db
+
+    def compute_mel_spectrogram_blockwise(self, y, mel_sr, hop_length, n_mels):
+        """
+        Same result as compute_mel_spectrogram() (centered, zero-padded frames, dB relative to the
+        maximum), computed MEMORY_BLOCK_MB of STFT at a time into an array from the memory budget.
+        For recordings whose full STFT does not fit the budget.
+        """
+        n = y.shape[-1]
+        n_frames = 1 + n // hop_length
+        pad = SPEC_N_FFT // 2
+        mel_basis = librosa.filters.mel(sr=mel_sr, n_fft=SPEC_N_FFT, n_mels=n_mels)
+        bytes_per_frame = y.size // n * (1 + SPEC_N_FFT // 2) * self.STFT_BYTES_PER_BIN
+        block_frames = max(1, MEMORY_BLOCK_MB * 1024 * 1024 // bytes_per_frame)
+        blocks = [(start, min(n_frames, start + block_frames)) for start in range(0, n_frames, block_frames)]
+        S_mel_db = self.memory_budget.empty("display", y.shape[:-1] + (n_mels, n_frames))
+        for start, stop in blocks:
+            # Samples under the block's frames, with the zero padding of the centered STFT at both ends
+            first, last = start * hop_length - pad, (stop - 1) * hop_length - pad + SPEC_N_FFT
+            segment = np.zeros(y.shape[:-1] + (last - first,), dtype=np.float32)
+            segment[..., max(0, -first):min(n, last) - first] = y[..., max(0, first):min(n, last)]
+            power = np.abs(librosa.stft(segment, n_fft=SPEC_N_FFT, hop_length=hop_length, window=SPEC_WINDOW, center=False)) ** 2
+            S_mel_db[..., start:stop] = np.einsum("...ft,mf->...mt", power, mel_basis, optimize=True)
+
+        # librosa.power_to_db(ref=np.max) (amin 1e-10, top_db 80), in place block by block
+        ref_db = 10.0 * np.log10(np.maximum(1e-10, max(S_mel_db[..., start:stop].max() for start, stop in blocks)))
+        for start, stop in blocks:
+            block = S_mel_db[..., start:stop]
+            np.maximum(block, 1e-10, out=block)
+            np.log10(block, out=block)
+            block *= 10.0
+            block -= ref_db
+        floor = max(S_mel_db[..., start:stop].max() for start, stop in blocks) - 80.0
+        for start, stop in blocks:
+            np.maximum(S_mel_db[..., start:stop], floor, out=S_mel_db[..., start:stop])
+        return S_mel_db
+
+    def compute_audio_analysis_data(self, frames, display_tier=None):
+        """
+        Computes the Log-Mel spectrogram and other audio analysis data from the recorded frames.
+        `display_tier` (one of DISPLAY_TIERS) sets the spectrogram resolution; the default is full quality.
+        """
+        if not self.device_params or not frames:
+            return None, None, None
+        
+        try:
+            print("\nComputing analysis data from recorded frames...")
 
+            y = self.split_channels(self.decode_frames(frames), self.device_params['channels'])
             sr = self.device_params['rate']
-            
-            S_mel = [0]
-            S_mel = librosa.feature.melspectrogram(
-                y=y, sr=sr, n_fft=SPEC_N_FFT, hop_length=SPEC_HOP_LENGTH,
-                n_mels=SPEC_N_MELS, window=SPEC_WINDOW
-            )
-            S_mel_db = librosa.power_to_db(S_mel, ref=np.max)
+            tier = display_tier or DISPLAY_TIERS[0]
+            S_mel_db = self.compute_mel_spectrogram(y, sr, tier["hop_length"], tier["n_mels"])
             print("Analysis data computed successfully.")
             return y, sr, S_mel_db
         except Exception as e:
@@ -229,16 +511,24 @@ class AudioWorker(QThread):
     """
     progress_updated = pyqtSignal(int, int)  # Signal for progress bar update (elapsed time, remaining time)
     status_updated = pyqtSignal(str)  # Signal for updating the status label
-    recording_finished = pyqtSignal(list)  # Signal when recording is finished (with audio frames)
+    recording_finished = pyqtSignal(object)  # Signal when recording is finished (with audio frames: a list, or a SpillBuffer read from disk)
     recording_error = pyqtSignal(str)  # Signal when an error occurs during recording
 
-    def __init__(self, device_params, duration):
+    def __init__(self, device_params, duration, journal=None, broadcaster=None, memory_budget=None):
         """
         Initializes the audio worker with device parameters and recording duration.
+        If a `RecordingJournal` is given, every chunk is also streamed to disk as it is recorded.
+        If a `Broadcaster` is given, every chunk is also handed to it for the live viewers.
+        If a `MemoryBudget` is given, the frames are collected in a SpillBuffer, which spills the
+        oldest ones to disk while the budget is exceeded.
         """
         super().__init__()
         self.device_params = device_params
         self.total_duration = duration 
+        self.journal = journal
+        self.broadcaster = broadcaster
+        self.memory_budget = memory_budget
+        self.poll_interval = CAPTURE_POLL_INTERVAL_S # Collection/progress interval of ProcessAudioWorker
         self._is_running = True
         self.start_time = 0
 
@@ -246,9 +536,9 @@ class AudioWorker(QThread):
         """
         Starts the recording process and updates the UI during the recording.
         """
-        p_record = pyaudio.PyAudio() # Create a new PyAudio instance for recording
+        p_record = create_audio_backend() # Create a new PyAudio instance for recording
         stream = None
-        frames = [] # List to store the recorded audio frames
+        frames = self.new_frame_buffer() # List to store the recorded audio frames
         self.status_updated.emit(f"Opening stream on {self.device_params['name']}...")
         try:
             stream = p_record.open(format=self.device_params['format'],
@@ -259,12 +549,17 @@ class AudioWorker(QThread):
                                    input_device_index=self.device_params['index'])
             self.status_updated.emit(f"Recording for {self.total_duration}s...")
             self.start_time = time.time() # Record the start time
+            frames_read = 0
             # Loop to record audio while the worker is running
             while self._is_running:
-                elapsed_seconds = time.time() - self.start_time # Calculate elapsed time
+                # Elapsed time is measured in captured audio, so a sped-up virtual device records the same length
+                elapsed_seconds = frames_read / self.device_params['rate']
                 if elapsed_seconds >= self.total_duration: break 
                 data = stream.read(CHUNK_SIZE, exception_on_overflow=False)
+                frames_read += CHUNK_SIZE
                 frames.append(data)
+                if self.journal: self.journal.append(data) # Queued; written by the journal's own thread
+                if self.broadcaster: self.broadcaster.feed(data) # Queued (or dropped); never blocks capture
 
                 # Calculate remaining time and update progress bar
                 remaining_seconds = max(0, int(self.total_duration - elapsed_seconds))
@@ -276,11 +571,15 @@ class AudioWorker(QThread):
                  self.progress_updated.emit(self.total_duration, 0) 
         except Exception as e:
             self.recording_error.emit(f"Error during recording: {e}")
-            frames = [] 
+            frames = self.discard_frame_buffer(frames)
         finally:
             if stream: stream.stop_stream(); stream.close()
             p_record.terminate()
-        self.recording_finished.emit(frames) 
+        if self.journal:
+            # Finalize off the GUI thread so SAVE only has to link the finished file
+            if frames: self.journal.finalize()
+            else: self.journal.discard()
+        self.recording_finished.emit(frames.finish() if isinstance(frames, SpillBuffer) else frames) 
 
     def stop(self):
         """
@@ -288,6 +587,95 @@ class AudioWorker(QThread):
         """
         self._is_running = False
 
+    def new_frame_buffer(self):
+        """
+        The container the frames are appended to: a SpillBuffer within the memory budget, or a plain list.
+        """
+        return SpillBuffer(self.memory_budget) if self.memory_budget else []
+
+    @staticmethod
+    def discard_frame_buffer(frames):
+        """
+        Drops the frames of a failed recording (and their spill file). Returns the empty list to emit.
+        """
+        if isinstance(frames, SpillBuffer):
+            frames.discard()
+        return []
+
+class ProcessAudioWorker(AudioWorker):
+    """
+    Same interface and signals as AudioWorker, but the stream is read by a separate capture
+    process (capture_process.py). This thread only collects new audio from the shared ring,
+    so GUI redraws and analysis cannot delay `stream.read`.
+    """
+    def run(self):
+        """
+        Starts the capture process and collects its audio until it finishes.
+        """
+        frame_size = self.device_params['channels'] * WIDTH_SAMPLE
+        bytes_per_second = self.device_params['rate'] * frame_size
+        # Ring holds the whole recording plus a second of slack, so the collector can never be lapped
+        # (within a memory budget it holds MEMORY_CAPTURE_RING_S, far more than the collector's poll interval)
+        ring_seconds = min(self.total_duration + 1, MEMORY_CAPTURE_RING_S) if self.memory_budget else self.total_duration + 1
+        capacity = int(ring_seconds * bytes_per_second)
+        frames = self.new_frame_buffer() # List to store the recorded audio frames
+        read_cursor = 0
+        capture = None
+        self.status_updated.emit(f"Opening stream on {self.device_params['name']}...")
+        try:
+            capture = CaptureProcess(self.device_params, CHUNK_SIZE, self.total_duration, capacity, CAPTURE_RT_PRIORITY,
+                                     virtual_audio_settings()) # The virtual device is created in the capture process too
+            if self.memory_budget: self.memory_budget.set("capture_ring", capacity)
+            capture.start()
+            finished = False
+            while not finished:
+                status = capture.poll_status()
+                if status:
+                    kind, detail = status
+                    if kind == "recording":
+                        self.status_updated.emit(f"Recording for {self.total_duration}s... (capture process: {detail})")
+                    elif kind == "error":
+                        raise RuntimeError(detail)
+                    elif kind == "finished":
+                        finished = True
+                elif not capture.is_alive():
+                    raise RuntimeError("Capture process exited unexpectedly.")
+                if not self._is_running:
+                    capture.stop()
+
+                # Collect everything written since the last poll (zero-copy views, copied once into frames)
+                write_cursor = capture.ring.write_cursor
+                if write_cursor > read_cursor:
+                    for view in capture.ring.views(read_cursor, write_cursor):
+                        data = bytes(view)
+                        view.release()
+                        frames.append(data)
+                        if self.journal: self.journal.append(data)
+                        if self.broadcaster: self.broadcaster.feed(data)
+                    read_cursor = write_cursor
+
+                    elapsed_seconds = read_cursor / bytes_per_second
+                    remaining_seconds = max(0, int(self.total_duration - elapsed_seconds))
+                    self.progress_updated.emit(int(elapsed_seconds), remaining_seconds)
+                if not finished:
+                    time.sleep(self.poll_interval)
+
+            if capture.ring.input_overflows:
+                print(f"Capture process reported {capture.ring.input_overflows} input overflow(s).")
+            if self._is_running:
+                self.status_updated.emit("Recording finished.")
+                self.progress_updated.emit(self.total_duration, 0)
+        except Exception as e:
+            self.recording_error.emit(f"Error during recording: {e}")
+            frames = self.discard_frame_buffer(frames)
+        finally:
+            if capture: capture.close()
+            if self.memory_budget: self.memory_budget.release("capture_ring")
+        if self.journal:
+            if frames: self.journal.finalize()
+            else: self.journal.discard()
+        self.recording_finished.emit(frames.finish() if isinstance(frames, SpillBuffer) else frames)
+
 class AudioPlayer(QThread):
     """
     Player thread responsible for playing audio in the background.
@@ -301,7 +689,7 @@ class AudioPlayer(QThread):
         self._is_running = True
     
     def run(self):
-        p_play = pyaudio.PyAudio() # Create a new PyAudio instance for recording
+        p_play = create_audio_backend() # Create a new PyAudio instance for playback
         self.status_updated.emit(f"Playing stream on {self.device_params['name']}...")
         try:
             stream = p_play.open(format=self.device_params['format'],
@@ -327,6 +715,54 @@ class AudioPlayer(QThread):
         """
         self._is_running = False
 
+# --- Similarity Search Helpers ---
+def open_similarity_index(recipe, index_dir=SIMILARITY_INDEX_DIR, background_training=False):
+    """
+    Opens (or creates) the similarity index for vectors of `recipe` plus the Mel embedding.
+    With `background_training` the IVF quantizer is retrained on a background thread.
+    """
+    dim = sum(FEATURE_EXTRACTORS[name]["size"] for name in recipe) + SIMILARITY_MEL_BANDS
+    signature = recipe_signature(recipe)
+    if SIMILARITY_MEL_BANDS:
+        signature += f"+mel{SIMILARITY_MEL_BANDS}@{SIMILARITY_MEL_SR}Hz/{SIMILARITY_MEL_N_FFT}/{SIMILARITY_MEL_HOP_LENGTH}/{SIMILARITY_MEL_N_MELS}"
+    return SimilarityIndex(index_dir, dim, signature, background_training)
+
+def similarity_mel_db(y, sr):
+    """
+    Log-Mel spectrogram the similarity embedding is computed from: always SIMILARITY_MEL_SR and
+    the SIMILARITY_MEL_* settings, whatever the display tier or ANALYSIS_SAMPLE_RATE, so the GUI
+    and similarity_index.py produce the same vectors. Shape (channels, n_mels, frames) for a
+    (channels, n) waveform.
+    """
+    y = np.asarray(y, dtype=np.float32)
+    if sr != SIMILARITY_MEL_SR:
+        g = np.gcd(int(sr), SIMILARITY_MEL_SR)
+        y = signal.resample_poly(y, SIMILARITY_MEL_SR // g, int(sr) // g, axis=-1).astype(np.float32, copy=False)
+    S_mel = librosa.feature.melspectrogram(
+        y=y, sr=SIMILARITY_MEL_SR, n_fft=SIMILARITY_MEL_N_FFT, hop_length=SIMILARITY_MEL_HOP_LENGTH,
+        n_mels=SIMILARITY_MEL_N_MELS, window=SPEC_WINDOW
+    )
+    return librosa.power_to_db(S_mel, ref=np.max)
+
+def similarity_vectors(path, analysis, y, sr):
+    """
+    Index keys and vectors of one recording: one per channel ("<path> [L]" / "<path> [R]" for
+    binaural recordings). Channels whose analysis failed are skipped, and so are channels
+    analyzed with a noise profile: the index holds features of raw audio only.
+    """
+    keys, vectors = [], []
+    analysis = [result if result.get("noise_profile") is None else dict(result, features=None) for result in analysis]
+    if not any(result.get("features") is not None for result in analysis):
+        return keys, vectors
+    S_mel_db = similarity_mel_db(y, sr) if SIMILARITY_MEL_BANDS else None
+    spectrograms = list(S_mel_db) if S_mel_db is not None and S_mel_db.ndim == 3 else [S_mel_db] * len(analysis)
+    for i, (result, channel_mel_db) in enumerate(zip(analysis, spectrograms)):
+        if result.get("features") is None:
+            continue
+        keys.append(path if len(analysis) == 1 else f"{path} [{EAR_LABELS[i]}]")
+        vectors.append(compose_vector(result["features"], channel_mel_db, SIMILARITY_MEL_BANDS))
+    return keys, vectors
+
 # --- Clickable Label for PyQt5 ---
 class ClickableLabel(QLabel):
     clicked = pyqtSignal()
@@ -334,25 +770,407 @@ class ClickableLabel(QLabel):
     def mousePressEvent(self, event):
         self.clicked.emit()
 
+# --- Zoom and Pan Gestures for the Analysis Plots ---
+class ZoomPanFilter(QObject):
+    """
+    Event filter turning gestures on a plot canvas into zoom and pan requests: pinch (or the
+    mouse wheel) zooms around the fingers, a one-finger drag pans and a double tap resets.
+    Positions are passed on as fractions of the canvas width.
+    """
+    def __init__(self, window, parent=None):
+        super().__init__(parent)
+        self.window = window
+        self.drag_x = None # Last x of a drag in progress
+        self.pinching = False
+
+    def install(self, widget):
+        widget.setAttribute(Qt.WA_AcceptTouchEvents)
+        widget.grabGesture(Qt.PinchGesture)
+        widget.installEventFilter(self)
+
+    def eventFilter(self, widget, event):
+        width = max(widget.width(), 1)
+        kind = event.type()
+        if kind == QEvent.Gesture:
+            pinch = event.gesture(Qt.PinchGesture)
+            if pinch:
+                self.pinching = pinch.state() in (Qt.GestureStarted, Qt.GestureUpdated)
+                self.drag_x = None
+                center = widget.mapFromGlobal(pinch.centerPoint().toPoint())
+                self.window.zoom_analysis(center.x() / width, pinch.scaleFactor())
+                return True
+        elif kind == QEvent.MouseButtonDblClick:
+            self.window.reset_analysis_zoom()
+            return True
+        elif kind == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            self.drag_x = event.x()
+        elif kind == QEvent.MouseMove and self.drag_x is not None and not self.pinching:
+            self.window.pan_analysis((event.x() - self.drag_x) / width)
+            self.drag_x = event.x()
+        elif kind == QEvent.MouseButtonRelease:
+            self.drag_x = None
+        elif kind == QEvent.Wheel:
+            steps = event.angleDelta().y() / 120
+            self.window.zoom_analysis(event.x() / width, ZOOM_WHEEL_STEP ** steps)
+            return True
+        return False
+
+# --- Analysis Plugin Registry ---
+# Feature extractors and classifier models are registered here. Each model declares the
+# feature recipe (ordered extractor names) it was trained on; SoundAnalyzer computes the
+# union of all recipes once per recording and scores every model on it.
+FEATURE_EXTRACTORS = {} # name -> {"fn", "version", "size", "requires", "batch_fn"}
+ANALYZER_MODELS = [] # Registered models, see register_analyzer_model()
+FEATURE_INPUTS = ("waveform", "envelope", "spectrum") # Inputs an extractor can require from prepare_inputs()
+
+def register_feature_extractor(name, version, size, requires):
+    """
+    Decorator registering `fn(inputs) -> list of floats` as feature extractor `name`.
+    `size` is the number of values it returns and `requires` the inputs it reads.
+    """
+    unknown = set(requires) - set(FEATURE_INPUTS)
+    if unknown:
+        raise ValueError(f"Feature extractor '{name}' requires unknown inputs: {sorted(unknown)}")
+    def decorator(fn):
+        FEATURE_EXTRACTORS[name] = {"fn": fn, "version": version, "size": size, "requires": tuple(requires), "batch_fn": None}
+        return fn
+    return decorator
+
+def register_batch_feature_extractor(name):
+    """
+    Decorator registering `fn(inputs) -> (recordings, size) array` as the vectorized form of
+    extractor `name`, used by SoundAnalyzer.extract_features_batch(). Its inputs hold one row per
+    recording, and each row must get the values the per-recording extractor returns.
+    """
+    if name not in FEATURE_EXTRACTORS:
+        raise ValueError(f"No feature extractor '{name}' to vectorize")
+    def decorator(fn):
+        FEATURE_EXTRACTORS[name]["batch_fn"] = fn
+        return fn
+    return decorator
+
+def register_analyzer_model(name, version, path, recipe, role="production"):
+    """
+    Registers a `{"model", "threshold"}` joblib bundle. Exactly one model should have the
+    "production" role; "shadow" models are scored alongside it and only logged.
+    """
+    missing = [feature for feature in recipe if feature not in FEATURE_EXTRACTORS]
+    if missing:
+        raise ValueError(f"Model '{name}' uses unregistered feature extractors: {missing}")
+    if role not in ("production", "shadow"):
+        raise ValueError(f"Unknown model role: {role}")
+    ANALYZER_MODELS.append({"name": name, "version": str(version), "path": path, "recipe": list(recipe), "role": role})
+
+def recipe_signature(recipe):
+    """
+    Identifies a feature recipe together with its extractor versions, e.g. "rms_ratio@1+mfcc@1".
+    Features computed at ANALYSIS_SAMPLE_RATE carry the rate, e.g. "mfcc@1/8000Hz", so features
+    made at different rates are never mixed in a feature store or an index.
+    """
+    def rate(name):
+        return f"/{ANALYSIS_SAMPLE_RATE}Hz" if ANALYSIS_SAMPLE_RATE and not FULL_BANDWIDTH_FEATURES.get(name, True) else ""
+    return "+".join(f"{name}@{FEATURE_EXTRACTORS[name]['version']}{rate(name)}" for name in recipe)
+
+def select_feature_input(inputs, feature):
+    """
+    Picks the (y_norm, rms, sr) input a feature is computed from, following FULL_BANDWIDTH_FEATURES.
+    """
+    if inputs["low"] is None or (FULL_BANDWIDTH_FEATURES.get(feature, True) and inputs["full"] is not None):
+        return inputs["full"]
+    return inputs["low"]
+
+def feature_spectrum(inputs, feature):
+    """
+    STFT magnitude (librosa defaults) of the input a feature is computed from. Computed once per
+    recording and shared by the spectral features; with a noise profile it is the denoised STFT.
+    """
+    which = "full" if select_feature_input(inputs, feature) is inputs["full"] else "low"
+    spectra = inputs["spectra"]
+    if which not in spectra:
+        spectra[which] = np.abs(librosa.stft(inputs[which][0]))
+    return spectra[which]
+
+def spectral_moments(S, sr):
+    """
+    Per-frame spectral centroid and bandwidth of STFT magnitudes `S` (..., bins, frames), from two
+    frequency-weighted sums per frame instead of librosa's (bins x frames) deviation matrix. Same
+    values as librosa.feature.spectral_centroid/spectral_bandwidth up to float64 rounding.
+    """
+    freq = librosa.fft_frequencies(sr=sr, n_fft=2 * (S.shape[-2] - 1))
+    total = S.sum(axis=-2, dtype=np.float64)
+    total[total < np.finfo(S.dtype).tiny] = 1.0 # Silent frames are left unnormalized, as in librosa
+    centroid = np.einsum('f,...ft->...t', freq, S) / total
+    second_moment = np.einsum('f,...ft->...t', freq ** 2, S) / total
+    bandwidth = np.sqrt(np.maximum(second_moment - centroid ** 2, 0))
+    return centroid, bandwidth
+
+def frame_zero_crossing_rate(y, frame_length=2048, hop_length=512, threshold=1e-10):
+    """
+    librosa.feature.zero_crossing_rate (centered, edge padding) of `y` (..., n) without framing
+    the signal: the crossings in a frame are the difference of a running count of sign changes.
+    Returns (..., frames).
+    """
+    pad = frame_length // 2
+    padded = np.pad(y, [(0, 0)] * (y.ndim - 1) + [(pad, pad)], mode="edge")
+    negative = padded < -threshold # Sign once |y| <= threshold is clipped to 0 (0 counts as positive)
+    counts = np.zeros(padded.shape, dtype=np.int32) # Sign changes up to each sample
+    np.cumsum(negative[..., 1:] != negative[..., :-1], axis=-1, out=counts[..., 1:])
+    starts = np.arange(1 + (padded.shape[-1] - frame_length) // hop_length) * hop_length
+    return (counts[..., starts + frame_length - 1] - counts[..., starts]) / frame_length
+
+@register_feature_extractor("rms_ratio", version="1", size=1, requires=("envelope",))
+def rms_ratio_feature(inputs):
+    """
+    RMS relative ratio (std / mean of the 50ms RMS envelope).
+    """
+    _, rms, _ = select_feature_input(inputs, "rms_ratio")
+    rr = 0
+    if len(rms) > 0:
+        mean_rms = np.mean(rms)
+        rr = np.std(rms) / mean_rms if mean_rms > 0 else 0
+    return [rr]
+
+@register_feature_extractor("mfcc", version="1", size=13, requires=("spectrum",))
+def mfcc_feature(inputs):
+    """
+    MFCCs mean (13). Same values as librosa.feature.mfcc(y=...), from the shared STFT.
+    """
+    _, _, sr = select_feature_input(inputs, "mfcc")
+    S = feature_spectrum(inputs, "mfcc")
+    mfcc = librosa.feature.mfcc(S=librosa.power_to_db(librosa.feature.melspectrogram(S=S ** 2, sr=sr)), n_mfcc=13)
+    return list(np.mean(mfcc, axis=1))
+
+@register_feature_extractor("spectral", version="1", size=2, requires=("spectrum",))
+def spectral_feature(inputs):
+    """
+    Spectral centroid & bandwidth mean.
+    """
+    _, _, sr = select_feature_input(inputs, "spectral")
+    S = feature_spectrum(inputs, "spectral")
+    sc = librosa.feature.spectral_centroid(S=S, sr=sr)
+    sbw = librosa.feature.spectral_bandwidth(S=S, sr=sr)
+    return [np.mean(sc), np.mean(sbw)]
+
+@register_feature_extractor("zcr", version="1", size=1, requires=("waveform",))
+def zcr_feature(inputs):
+    """
+    Zero crossing rate mean.
+    """
+    y_norm, _, _ = select_feature_input(inputs, "zcr")
+    zcr = librosa.feature.zero_crossing_rate(y=y_norm)
+    return [np.mean(zcr)]
+
+# Vectorized forms of the extractors above (one row per recording), see extract_features_batch()
+@register_batch_feature_extractor("rms_ratio")
+def rms_ratio_batch(inputs):
+    _, rms, _ = select_feature_input(inputs, "rms_ratio")
+    if rms.shape[-1] == 0:
+        return np.zeros((len(rms), 1))
+    mean_rms = np.mean(rms, axis=-1)
+    rr = np.divide(np.std(rms, axis=-1), mean_rms, out=np.zeros_like(mean_rms), where=mean_rms > 0)
+    return rr[:, None]
+
+@register_batch_feature_extractor("mfcc")
+def mfcc_batch(inputs):
+    _, _, sr = select_feature_input(inputs, "mfcc")
+    S = feature_spectrum(inputs, "mfcc")
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S ** 2, sr=sr), top_db=None)
+    np.maximum(mel_db, mel_db.max(axis=(-2, -1), keepdims=True) - 80.0, out=mel_db) # top_db per recording, not over the batch
+    return np.mean(librosa.feature.mfcc(S=mel_db, n_mfcc=13), axis=-1)
+
+@register_batch_feature_extractor("spectral")
+def spectral_batch(inputs):
+    _, _, sr = select_feature_input(inputs, "spectral")
+    centroid, bandwidth = spectral_moments(feature_spectrum(inputs, "spectral"), sr)
+    return np.stack([np.mean(centroid, axis=-1), np.mean(bandwidth, axis=-1)], axis=-1)
+
+@register_batch_feature_extractor("zcr")
+def zcr_batch(inputs):
+    y_norm, _, _ = select_feature_input(inputs, "zcr")
+    return np.mean(frame_zero_crossing_rate(y_norm), axis=-1)[:, None]
+
+DEFAULT_FEATURE_RECIPE = ["rms_ratio", "mfcc", "spectral", "zcr"] # The 17-feature recipe used in training
+LOGREG_MODEL_PATH = "Experiment_recordings/logreg_pipeline6.pkl"  # Path to the trained logistic regression model
+register_analyzer_model("logreg_pipeline", version="6", path=LOGREG_MODEL_PATH, recipe=DEFAULT_FEATURE_RECIPE)
+# Example shadow model, scored next to production and logged only:
+# register_analyzer_model("logreg_pipeline", version="7", path="Experiment_recordings/logreg_pipeline7.pkl", recipe=DEFAULT_FEATURE_RECIPE, role="shadow")
+
+# --- Beat-Synchronous Averaging ---
+def envelope_beat_period(rms_values, window_s, bpm_min=PULSATILE_BPM_MIN, bpm_max=PULSATILE_BPM_MAX):
+    """
+    Beat period of an RMS envelope (chunks of `window_s`) from its autocorrelation, searched
+    between `bpm_min` and `bpm_max` and refined between chunks by parabolic interpolation.
+    Returns (period_s, normalized autocorrelation at that lag), or (None, 0.0) if it has no peak there.
+    """
+    shortest = max(1, int(60 / bpm_max / window_s))
+    longest = min(int(np.ceil(60 / bpm_min / window_s)), len(rms_values) // 2)
+    if longest <= shortest:
+        return None, 0.0
+    x = np.asarray(rms_values, dtype=np.float64)
+    x = x - x.mean()
+    spectrum = np.fft.rfft(x, 2 * len(x)) # Zero-padded: linear, not circular, correlation
+    acf = np.fft.irfft(spectrum * np.conj(spectrum))[:longest + 2]
+    if acf[0] <= 0:
+        return None, 0.0
+    acf /= acf[0]
+    lag = shortest + int(np.argmax(acf[shortest:longest + 1]))
+    before, peak, after = acf[lag - 1], acf[lag], acf[lag + 1]
+    if peak <= 0 or before >= peak or after >= peak: # Edge of the range: no beat rate inside it
+        return None, 0.0
+    period_s = (lag + 0.5 * (before - after) / (before - 2 * peak + after)) * window_s
+    if not 60 / bpm_max <= period_s <= 60 / bpm_min:
+        return None, 0.0
+    return period_s, float(peak)
+
+def envelope_beat_times(rms_values, window_s, period_s, tolerance=ENSEMBLE_BEAT_TOLERANCE):
+    """
+    Beat times (seconds, chunk centers) on a grid of `period_s`: the grid phase collecting the most
+    envelope, then every beat moved to the envelope maximum within `tolerance` periods of its grid point.
+    """
+    n = len(rms_values)
+    period = period_s / window_s # In chunks
+    grid = np.arange(int(n / period) + 1) * period
+    phases = np.arange(int(np.ceil(period)))
+    candidates = np.round(phases[:, None] + grid[None, :]).astype(int)
+    candidates[candidates >= n] = n - 1
+    centers = np.round(phases[np.argmax(rms_values[candidates].sum(axis=1))] + grid).astype(int)
+    centers = centers[centers < n]
+    reach = max(1, int(round(tolerance * period)))
+    padded = np.pad(rms_values, reach, constant_values=-np.inf)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * reach + 1) # Window i is centered on chunk i
+    beats = centers - reach + np.argmax(windows[centers], axis=1)
+    return (np.unique(beats) + 0.5) * window_s
+
+def beat_ensemble(y, sr, beat_times, period_s, envelope_ms=ENSEMBLE_ENVELOPE_MS, pre_beat=ENSEMBLE_PRE_BEAT):
+    """
+    Beat-synchronous average of `y`: one period around each beat (starting `pre_beat` periods before
+    it), as the RMS envelope in `envelope_ms` chunks. The segments are rows of a strided view of the
+    chunked waveform, so only the chunks of the beats are read, once. Returns a dict with beats (used),
+    beat_times, consistency (mean correlation of each beat with the average of the others: ~0 for
+    noise, towards 1 for a repeatable beat), snr_db (of the average, None if no beat stands out),
+    beat_envelope (the representative beat, float32) and beat_step_s; None if fewer than 3 beats fit.
+    """
+    step = max(1, int(sr * envelope_ms / 1000))
+    length = max(2, int(round(period_s * sr / step))) # Chunks per segment
+    chunks = y[:len(y) // step * step].reshape(-1, step)
+    beat_times = np.asarray(beat_times)
+    first = np.round((beat_times - pre_beat * period_s) * sr / step).astype(int)
+    fits = (first >= 0) & (first + length <= len(chunks))
+    first, beat_times = first[fits], beat_times[fits]
+    if len(first) < 3:
+        return None
+    segments = np.lib.stride_tricks.sliding_window_view(chunks, length, axis=0)[first] # (beats, step, length)
+    envelopes = np.sqrt(np.einsum('kjt,kjt->kt', segments, segments, dtype=np.float64) / step)
+
+    beats = len(envelopes)
+    average = envelopes.mean(axis=0)
+    others = (envelopes.sum(axis=0) - envelopes) / (beats - 1) # Leave-one-out averages
+    centered = envelopes - envelopes.mean(axis=1, keepdims=True)
+    others -= others.mean(axis=1, keepdims=True)
+    norms = np.sqrt(np.einsum('kt,kt->k', centered, centered) * np.einsum('kt,kt->k', others, others))
+    correlations = np.einsum('kt,kt->k', centered, others) / np.where(norms > 0, norms, 1)
+
+    noise_var = envelopes.var(axis=0).mean() / beats # Beat-to-beat variance left in the average
+    beat_var = average.var() - noise_var
+    return {"beats": beats, "beat_times": beat_times.tolist(), "consistency": float(correlations.mean()),
+            "snr_db": float(10 * np.log10(beat_var / noise_var)) if beat_var > 0 and noise_var > 0 else None,
+            "beat_envelope": average.astype(np.float32), "beat_step_s": step / sr}
+
 # --- Algorithm Class for Sound Analysis ---
 class SoundAnalyzer:
     """
     Provides methods for analyzing audio data to detect sound events
     and classify them as pulsatile or non-pulsatile.
     """
-    LOGREG_MODEL_PATH = "Experiment_recordings/logreg_pipeline6.pkl"  # Path to the trained logistic regression model
+    FEATURE_WINDOW_DURATION_MS = 50 # RMS window used by the training feature recipe (must match training)
+    FEATURE_BATCH_BYTES_PER_SAMPLE = 42 # Peak working memory of extract_features_batch() per input sample, ~30 without a noise profile (see benchmark.py --batch-report)
     def __init__(self):
+        # Per-thread scratch buffer reused between calls for the normalized float32 waveform
+        # (per thread so that channels can be analyzed in parallel)
+        self._local = threading.local()
+
         # ----------------------------
-        # Load logistic regression model 
+        # Load registered models (production + shadows)
         # ----------------------------
-        try:
-            bundle = joblib.load(self.LOGREG_MODEL_PATH)
-            self.clf = bundle["model"]
-            self.THRESHOLD = bundle["threshold"]
-            print("Model loaded successfully")
-            print("Current working directory:", os.getcwd())
-        except Exception as e:
-            print(f"Failed to load model: {e}")
+        self.production_model = None # Registry entry of the production model
+        self.noise_profile = None # NoiseProfile of the recording device, applied in prepare_inputs (see set_noise_profile)
+        self.shadow_models = [] # Registry entries with the loaded "model" and "threshold"
+        for entry in ANALYZER_MODELS:
+            try:
+                bundle = joblib.load(entry["path"])
+            except Exception as e:
+                print(f"Failed to load model {entry['name']} v{entry['version']}: {e}")
+                continue
+            if entry["role"] == "production":
+                self.production_model = entry
+                self.clf = bundle["model"]
+                self.THRESHOLD = bundle["threshold"]
+            else:
+                self.shadow_models.append(dict(entry, model=bundle["model"], threshold=bundle["threshold"]))
+            print(f"Model {entry['name']} v{entry['version']} ({entry['role']}) loaded successfully")
+        print("Current working directory:", os.getcwd())
+
+    @property
+    def feature_recipe(self):
+        """
+        Feature recipe of the production model (the default recipe if none is loaded).
+        """
+        return self.production_model["recipe"] if self.production_model else DEFAULT_FEATURE_RECIPE
+
+    def set_noise_profile(self, profile):
+        """
+        Uses `profile` (a NoiseProfile, or None for raw audio) for recordings at its sample rate.
+        """
+        self.noise_profile = profile
+
+    # ----------------------------
+    # Shared normalization and envelope stage
+    # ----------------------------
+    def _scratch(self, n):
+        """
+        Returns a float32 scratch view of length `n`, growing the reused buffer only when needed.
+        """
+        buffer = getattr(self._local, 'norm_buffer', None)
+        if buffer is None or len(buffer) < n:
+            buffer = self._local.norm_buffer = np.empty(n, dtype=np.float32)
+        return buffer[:n]
+
+    @staticmethod
+    def _rms_envelope(y_norm, chunk_size):
+        """
+        RMS of consecutive `chunk_size` chunks (along the last axis), computed with einsum so no
+        squared copy is made.
+        """
+        n_chunks = y_norm.shape[-1] // chunk_size if chunk_size > 0 else 0
+        if n_chunks == 0:
+            return np.zeros(y_norm.shape[:-1] + (0,), dtype=np.float32)
+        chunks = y_norm[..., :n_chunks * chunk_size].reshape(y_norm.shape[:-1] + (n_chunks, chunk_size))
+        rms = np.einsum('...ij,...ij->...i', chunks, chunks)
+        rms /= chunk_size
+        return np.sqrt(rms, out=rms)
+
+    def prepare_signal(self, y, sr, window_ms=FEATURE_WINDOW_DURATION_MS, in_place=False):
+        """
+        Normalizes the waveform to [-1, 1] and computes its RMS envelope in `window_ms` chunks.
+        Returns (y_norm, rms_values). `y_norm` is float32 and lives in a scratch buffer that is
+        reused by the next call, so callers must not keep it. The input `y` is never modified,
+        unless `in_place` is set for a float32 array the caller owns (e.g. a decimated copy).
+        """
+        if in_place:
+            y_norm = y
+        else:
+            y_norm = self._scratch(len(y))
+            np.copyto(y_norm, y, casting='unsafe') # Convert to float32 without an intermediate copy
+
+        # Envelope on the raw copy first: RMS scales linearly, so it can be rescaled with the peak
+        chunk_size = int(sr * (window_ms / 1000))
+        rms_values = self._rms_envelope(y_norm, chunk_size)
+
+        peak = max(float(y_norm.max()), -float(y_norm.min())) # Peak of |y| without an abs() copy
+        if peak > 0:
+            y_norm /= peak
+            rms_values /= peak
+        return y_norm, rms_values
 
     # ----------------------------
     # Feature extraction function (same as training)
@@ -365,41 +1183,126 @@ class SoundAnalyzer:
         - Spectral centroid & bandwidth mean
         - Zero crossing rate
         """
-        features = []
-
         if y is None or len(y) == 0:
-            features.append(0)
-            return features
+            return [0]
 
         # === Match Pi preprocessing ===
-        y = y.astype(np.float32)
-        if np.max(np.abs(y)) > 0:
-            y /= np.max(np.abs(y))
-        abs_waveform = np.abs(y)
-
-        chunk_size = int(0.05 * sr) # window duration 50ms
-        n_chunks = len(abs_waveform) // chunk_size
-        rr = 0
-        if n_chunks > 0:
-            y_chunks = abs_waveform[:n_chunks * chunk_size].reshape(n_chunks, chunk_size)
-            rms = np.sqrt(np.mean(y_chunks**2, axis=1))
-            rr = np.std(rms) / np.mean(rms) if np.mean(rms) > 0 else 0
-        features.append(rr)
-
-        # MFCCs (13)
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        features.extend(np.mean(mfcc, axis=1))
-
-        # Spectral centroid & bandwidth
-        sc = librosa.feature.spectral_centroid(y=y, sr=sr)
-        sbw = librosa.feature.spectral_bandwidth(y=y, sr=sr)
-        features.append(np.mean(sc))
-        features.append(np.mean(sbw))
-
-        # Zero crossing rate
-        zcr = librosa.feature.zero_crossing_rate(y=y)
-        features.append(np.mean(zcr))
+        return self.compute_features(self.prepare_inputs(y, sr), self.feature_recipe)
+
+    def prepare_inputs(self, y, sr, y_low=None):
+        """
+        Runs the shared normalization/envelope stage at the rates the features need.
+        Returns {"full": (y_norm, rms, sr), "low": (y_norm, rms, sr), "spectra": {}}; "full" is None when no
+        feature needs the recording rate and "low" is None when no decimation is configured.
+        "spectra" caches the STFT magnitude per input (see feature_spectrum).
+        `y_low` is `y` already decimated to `analysis_rate(sr)` (e.g. for the display), which saves decimating again.
+        With a noise profile for `sr`, everything is computed from the denoised waveform.
+        """
+        low_sr = analysis_rate(sr)
+        inputs = {"full": None, "low": None, "spectra": {}}
+        if self.noise_profile is not None and self.noise_profile.rate == sr:
+            y, magnitude = self.noise_profile.apply(y) # The gained STFT is reused by the spectral features
+            peak = max(float(y.max()), -float(y.min()))
+            inputs["spectra"]["full"] = magnitude / peak if peak > 0 else magnitude # Scaled like y_norm
+            y_low = None # Decimated from the denoised waveform instead
+        if low_sr == sr or any(FULL_BANDWIDTH_FEATURES.values()):
+            inputs["full"] = self.prepare_signal(y, sr) + (sr,)
+        if low_sr != sr:
+            # Our own float32 copy either way: it is normalized in place, next to the scratch buffer "full" uses
+            y_low = decimate_to_rate(y, sr, low_sr) if y_low is None else np.array(y_low, dtype=np.float32)
+            inputs["low"] = self.prepare_signal(y_low, low_sr, in_place=True) + (low_sr,)
+        return inputs
+
+    # ----------------------------
+    # Batched feature extraction (many equal-length recordings)
+    # ----------------------------
+    def extract_features_batch(self, recordings, sr, recipe=None, max_memory_mb=FEATURE_BATCH_MEMORY_MB):
+        """
+        Feature vectors of many equal-length recordings at rate `sr`, e.g. fixed-duration captures
+        for retraining or threshold sweeps. `recordings` is a (recordings, n) array or a list of 1-D
+        arrays. They are stacked in chunks that fit `max_memory_mb` and every chunk is computed in
+        matrix form by the batch extractors (row by row for extractors without one).
+        Returns a (recordings, features) array; row i matches extract_features(recordings[i], sr).
+        """
+        recipe = recipe or self.feature_recipe
+        lengths = {len(y) for y in recordings}
+        if len(lengths) > 1:
+            raise ValueError(f"Batched recordings must have the same length, got {sorted(lengths)} samples")
+        n = lengths.pop() if lengths else 0
+        if n == 0:
+            return np.zeros((len(recordings), sum(FEATURE_EXTRACTORS[name]["size"] for name in recipe)))
+        rows = max(1, int(max_memory_mb * 2**20 // (self.FEATURE_BATCH_BYTES_PER_SAMPLE * n)))
+        features = []
+        for start in range(0, len(recordings), rows):
+            y = np.array(recordings[start:start + rows], dtype=np.float32) # Our own copy, normalized in place
+            features.append(self.compute_batch_features(self.prepare_batch_inputs(y, sr), recipe))
+        return np.vstack(features)
+
+    def prepare_batch_inputs(self, y, sr):
+        """
+        prepare_inputs() for a (recordings, n) float32 array owned by the caller, which is
+        normalized in place. Every input holds one row per recording.
+        """
+        low_sr = analysis_rate(sr)
+        inputs = {"full": None, "low": None, "spectra": {}}
+        if self.noise_profile is not None and self.noise_profile.rate == sr:
+            y, magnitude = self.noise_profile.apply(y)
+            peak = np.maximum(y.max(axis=-1), -y.min(axis=-1))
+            inputs["spectra"]["full"] = magnitude / np.where(peak > 0, peak, 1)[:, None, None] # Scaled like y_norm
+        y_low = decimate_to_rate(y, sr, low_sr) if low_sr != sr else None # From the raw rows, as prepare_inputs()
+        if low_sr == sr or any(FULL_BANDWIDTH_FEATURES.values()):
+            inputs["full"] = self._normalize_rows(y, sr) + (sr,)
+        if y_low is not None:
+            inputs["low"] = self._normalize_rows(y_low, low_sr) + (low_sr,)
+        return inputs
+
+    def _normalize_rows(self, y, sr, window_ms=FEATURE_WINDOW_DURATION_MS):
+        """
+        prepare_signal(in_place=True) of every row of `y`. Returns (y_norm, rms_values).
+        """
+        rms_values = self._rms_envelope(y, int(sr * (window_ms / 1000)))
+        peak = np.maximum(y.max(axis=-1), -y.min(axis=-1))
+        scale = np.where(peak > 0, peak, 1)[:, None]
+        y /= scale
+        rms_values /= scale
+        return y, rms_values
+
+    def compute_batch_features(self, inputs, recipe):
+        """
+        compute_features() for the output of prepare_batch_inputs(). Returns (recordings, features).
+        """
+        n_rows = len((inputs["full"] or inputs["low"])[0])
+        columns = []
+        for name in recipe:
+            extractor = FEATURE_EXTRACTORS[name]
+            if extractor["batch_fn"]:
+                values = extractor["batch_fn"](inputs)
+            else:
+                values = [extractor["fn"](self._batch_row(inputs, i)) for i in range(n_rows)]
+            columns.append(np.asarray(values, dtype=np.float64).reshape(n_rows, extractor["size"]))
+        return np.hstack(columns)
 
+    @staticmethod
+    def _batch_row(inputs, i):
+        """
+        The per-recording inputs of row `i` of batched inputs.
+        """
+        row = {which: None if inputs[which] is None else (inputs[which][0][i], inputs[which][1][i], inputs[which][2])
+               for which in ("full", "low")}
+        row["spectra"] = {which: spectrum[i] for which, spectrum in inputs["spectra"].items()}
+        return row
+
+    def compute_features(self, inputs, recipe, cache=None):
+        """
+        Builds the feature vector for `recipe` from the output of `prepare_inputs`.
+        Extractor outputs are memoized in `cache` so several recipes share one computation.
+        """
+        cache = {} if cache is None else cache
+        features = []
+        for name in recipe:
+            if name not in cache:
+                cache[name] = FEATURE_EXTRACTORS[name]["fn"](inputs)
+            features.extend(cache[name])
         return np.array(features)
 
     # ----------------------------
@@ -410,39 +1313,141 @@ class SoundAnalyzer:
         Analyze audio to detect sound presence and classify it as pulsatile or non-pulsatile.
         Returns a tuple: (sound_detected, pulsatile_result).
         """
+        result = self.analyze(y, sample_rate)
+        return result["sound_detected"], result["result"]
+
+    def analyze(self, y, sample_rate, y_low=None):
+        """
+        Analyze audio with the production model (and any shadow models) and return a dict:
+        sound_detected, result ("No Sound", "Pulsatile", "Non-Pulsatile" or "Error"), probability,
+        bpm (None if not computed), peak_times (seconds of the detected peaks), features (the
+        production feature vector), model, model_version, feature_recipe, noise_profile (key of the
+        noise profile applied, or None), shadow (list of {model, model_version, probability, sound_detected} for
+        each shadow model) and ensemble (the beat-synchronous average, see _ensemble_pulsatility, or None).
+        `y_low` is `y` already decimated to `analysis_rate(sample_rate)`, if the caller has it.
+        """
+        return self.analyze_batch([(y, sample_rate, y_low)])[0]
+
+    def analyze_batch(self, signals, max_workers=None, timings=None):
+        """
+        Analyze several (y, sample_rate) recordings at once: the per-recording feature stage runs
+        on a thread pool and every model scores the whole batch in a single predict_proba call.
+        An entry may be (y, sample_rate, y_low) with the decimated waveform (see prepare_inputs).
+        Returns one `analyze()` result dict per recording. If `timings` is a dict, the wall time of
+        the "features_s" and "scoring_s" stages is stored in it.
+        """
+        production = self.production_model or {"name": None, "version": None}
+        results = [{"sound_detected": False, "result": "Error", "probability": None, "bpm": None, "peak_times": [], "features": None,
+                    "model": production["name"], "model_version": production["version"],
+                    "feature_recipe": recipe_signature(self.feature_recipe), "shadow": [], "ensemble": None,
+                    "noise_profile": self.noise_profile.key if self.noise_profile and self.noise_profile.rate == sr else None}
+                   for _, sr, *_ in signals]
+        valid = [i for i, (y, *_) in enumerate(signals) if y is not None and len(y) > 0]  # "Error" if no audio data is available
+        if not valid:
+            return results
+
+        # === Per-recording stage: shared normalization + envelope, features of every model, pulsatility ===
+        stage_start = time.perf_counter()
+        jobs = [signals[i] for i in valid]
+        if len(jobs) == 1:
+            per_recording = [self._analyze_recording(*jobs[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers or min(len(jobs), os.cpu_count() or 1)) as pool:
+                per_recording = list(pool.map(lambda job: self._analyze_recording(*job), jobs))
+        scoring_start = time.perf_counter()
+
+        # === Sound Detection using Logistic Regression (one call for the whole batch) ===
+        features = np.vstack([features for features, _, _, _ in per_recording])  # n samples, 17 features
+        y_probs = self.clf.predict_proba(features)[:, 1]  # Probability of "sound"
+
+        # === Shadow models: scored on the same features, logged but never shown ===
+        shadow_probs = [shadow["model"].predict_proba(np.vstack([shadows[j] for _, shadows, _, _ in per_recording]))[:, 1]
+                        for j, shadow in enumerate(self.shadow_models)]
+
+        for k, i in enumerate(valid):
+            result = results[i]
+            sound_detected = y_probs[k] > self.THRESHOLD # optimized by the model
+            result["probability"] = float(y_probs[k])
+            result["features"] = features[k].tolist()
+            result["sound_detected"] = bool(sound_detected)
+            for shadow, probs in zip(self.shadow_models, shadow_probs):
+                result["shadow"].append({"model": shadow["name"], "model_version": shadow["version"],
+                                         "probability": float(probs[k]), "sound_detected": bool(probs[k] > shadow["threshold"])})
+                print(f"Shadow model {shadow['name']} v{shadow['version']}: p={probs[k]:.3f} (production p={y_probs[k]:.3f})")
+
+            # If sound is not detected, the verdict is "No Sound"; otherwise use the pulsatility classification
+            if sound_detected:
+                result["result"], result["bpm"], result["peak_times"] = per_recording[k][2]
+            else:
+                result["result"] = "No Sound"
+
+            # A consistent beat-synchronous average reveals a pulsatile sound the envelope peaks missed
+            ensemble = result["ensemble"] = per_recording[k][3]
+            if ensemble and ensemble["pulsatile"] and result["result"] != "Pulsatile":
+                print(f"Beat-synchronous average: {ensemble['beats']} beats at {ensemble['bpm']:.0f} BPM, "
+                      f"consistency {ensemble['consistency']:.2f} ({result['result']} -> Pulsatile"
+                      f"{'' if ENSEMBLE_OVERRIDE else ', report only'})")
+                if ENSEMBLE_OVERRIDE:
+                    ensemble["replaced"] = result["result"]
+                    result["sound_detected"] = True
+                    result["result"], result["bpm"], result["peak_times"] = "Pulsatile", ensemble["bpm"], ensemble["beat_times"]
+
+        if timings is not None:
+            timings["features_s"] = scoring_start - stage_start
+            timings["scoring_s"] = time.perf_counter() - scoring_start
+        return results
+
+    def _analyze_recording(self, y, sample_rate, y_low=None):
+        """
+        Per-recording part of the analysis. Returns (production features, shadow features,
+        (pulsatile_result, bpm, peak_times), ensemble); the pulsatility only counts once the model detects sound.
+        Everything that reads the scratch buffer happens here, on the calling thread.
+        """
+        inputs = self.prepare_inputs(y, sample_rate, y_low)
+        feature_cache = {} # The union of all recipes' features, each computed once
+        features = self.compute_features(inputs, self.feature_recipe, feature_cache)
+        shadows = [self.compute_features(inputs, shadow["recipe"], feature_cache) for shadow in self.shadow_models]
+        envelope = self._pulsatility_envelope(inputs)
+        ensemble = self._ensemble_pulsatility(*envelope) if ENSEMBLE_ENABLED else None
+        return features, shadows, self._classify_pulsatility(envelope[1]), ensemble
+
+    def _pulsatility_envelope(self, inputs):
+        """
+        (y_norm, rms_values, env_sr) the pulsatility stages work on: the decimated input when available,
+        and the feature envelope reused when the window durations match.
+        """
+        y_norm, rms_values, env_sr = inputs["low"] or inputs["full"]
+        if WINDOW_DURATION_MS != self.FEATURE_WINDOW_DURATION_MS:
+            rms_values = self._rms_envelope(y_norm, int(env_sr * (WINDOW_DURATION_MS / 1000)))
+        return y_norm, rms_values, env_sr
+
+    def _ensemble_pulsatility(self, y_norm, rms_values, env_sr):
+        """
+        Beat-synchronous averaging: beat times from the envelope's autocorrelation period, then the
+        average beat and its consistency (see beat_ensemble). Averaging K beats raises the SNR of the
+        beat by ~10*log10(K) dB, so beats too faint for the peak detection still add up. Returns the
+        beat_ensemble() dict plus bpm, periodicity (autocorrelation at the period), pulsatile
+        (consistent enough to call pulsatile) and replaced (the verdict it overrode, if any), or None.
+        """
+        window_s = WINDOW_DURATION_MS / 1000
+        period_s, periodicity = envelope_beat_period(rms_values, window_s)
+        if period_s is None:
+            return None
+        ensemble = beat_ensemble(y_norm, env_sr, envelope_beat_times(rms_values, window_s, period_s), period_s)
+        if ensemble is None:
+            return None
+        ensemble.update(bpm=60 / period_s, periodicity=periodicity, replaced=None,
+                        pulsatile=ensemble["beats"] >= ENSEMBLE_MIN_BEATS and ensemble["consistency"] >= ENSEMBLE_MIN_CONSISTENCY)
+        return ensemble
+
+    def _classify_pulsatility(self, rms_values):
+        """
+        Peak detection on the thresholded RMS envelope (see _pulsatility_envelope).
+        Returns (pulsatile_result, bpm, peak_times).
+        """
+        if len(rms_values) < 2:
+            return "Non-Pulsatile", None, []  # Not enough chunks to analyze pulsatility
 
-        # === Feature extraction for logistic regression ===
-        features = self.extract_features(y, sample_rate).reshape(1, -1)  # 1 sample, 17 features
-
-        # === Sound Detection using Logistic Regression ===
-        y_prob = self.clf.predict_proba(features)[0][1]  # Probability of "sound"
-        sound_detected = y_prob > self.THRESHOLD # optimized by the model
-
-        # If sound is not detected, return early with "No Sound"
-        if not sound_detected:
-            return False, "No Sound"  # No sound detected, return "No Sound"
-
-        # === Preparing for pulsatile analysis ===
-        if y is None or len(y) == 0:
-            return False, "Error"  # Return "Error" if no audio data is available
-
-        # Normalize the waveform
-        y = y.astype(np.float32)
-        if np.max(np.abs(y)) > 0:
-            y /= np.max(np.abs(y))  # Normalize the audio signal to [-1, 1]
-        abs_waveform = np.abs(y)
-
-        # === Chunking ===
-        chunk_size = int(sample_rate * (WINDOW_DURATION_MS / 1000))
-        num_chunks = len(abs_waveform) // chunk_size
-        if num_chunks < 2:
-            return True, "Non-Pulsatile"  # Not enough chunks to analyze pulsatility
-
-        usable_waveform = abs_waveform[:num_chunks * chunk_size]
-        chunks = usable_waveform.reshape(num_chunks, chunk_size)
-
-        # === RMS computation ===
-        rms_values = np.sqrt(np.mean(chunks**2, axis=1))
         mean_rms = np.mean(rms_values)
         std_rms = np.std(rms_values)
 
@@ -460,7 +1465,7 @@ class SoundAnalyzer:
 
         # Calculate the intervals between consecutive peaks (in seconds)
         if len(peak_times) < 2:
-            return True, "Non-Pulsatile"  # Not enough peaks to compute BPM
+            return "Non-Pulsatile", None, peak_times.tolist()  # Not enough peaks to compute BPM
 
         peak_intervals = np.diff(peak_times)
 
@@ -473,7 +1478,120 @@ class SoundAnalyzer:
         # === Pulsatile vs Non-Pulsatile Classification ===
         pulsatile_result = "Pulsatile" if PULSATILE_BPM_MIN <= bpm <= PULSATILE_BPM_MAX else "Non-Pulsatile"
 
-        return True, pulsatile_result  # Return sound detection status and pulsatile classification
+        return pulsatile_result, float(bpm), peak_times.tolist()  # Return pulsatile classification and the BPM (and peaks) it is based on
+
+    # ----------------------------
+    # Windowed analysis of long recordings
+    # ----------------------------
+    def analysis_windows(self, n, sample_rate):
+        """
+        (start, end) sample ranges the analysis of an `n`-sample recording runs on: the whole
+        recording up to MEMORY_ANALYSIS_WHOLE_MAX_S, otherwise windows of nearly equal length
+        around MEMORY_ANALYSIS_WINDOW_S. Only the duration decides, never the memory budget, so
+        a recording always gets the same verdict.
+        """
+        if n <= MEMORY_ANALYSIS_WHOLE_MAX_S * sample_rate:
+            return [(0, n)]
+        count = max(1, round(n / (MEMORY_ANALYSIS_WINDOW_S * sample_rate)))
+        bounds = np.linspace(0, n, count + 1).astype(int).tolist()
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def analyze_windows(self, y, sample_rate, windows, y_low=None):
+        """
+        Analyzes a 1-D recording one window at a time (each window is copied out of `y`, which may
+        be a memory-mapped spill file) and combines the windows into one `analyze()` result.
+        This is not the whole-recording analysis: the features, the model and the pulsatility see
+        one window each, and the recording is judged by its windows. It counts as having sound if
+        any window does, and its verdict is the strongest one any window reached (Pulsatile, then
+        Non-Pulsatile, then No Sound), so a pulsatile episode anywhere in a long recording makes it
+        Pulsatile. The BPM is averaged and the peak times collected over the windows that reached
+        the verdict. The probability, features and shadow scores are those of the most probable
+        window, the ensemble that of the most consistent one. "windows" lists every window's
+        start_s, end_s, result, probability and bpm. `y_low` is `y` decimated to the analysis rate,
+        if the caller has it.
+        """
+        results = []
+        ratio = analysis_rate(sample_rate) / sample_rate
+        for start, end in windows:
+            window_low = None if y_low is None else y_low[int(start * ratio):int(end * ratio)]
+            result = self.analyze(np.array(y[start:end]), sample_rate, window_low)
+            offset = start / sample_rate
+            result["peak_times"] = [t + offset for t in result["peak_times"]]
+            if result["ensemble"]:
+                result["ensemble"]["beat_times"] = [t + offset for t in result["ensemble"]["beat_times"]]
+            result["window"] = (offset, end / sample_rate)
+            results.append(result)
+
+        combined = dict(max(results, key=lambda r: -1 if r["probability"] is None else r["probability"]))
+        verdicts = [r["result"] for r in results]
+        combined["result"] = next((v for v in ("Pulsatile", "Non-Pulsatile", "No Sound") if v in verdicts), "Error")
+        agreeing = [r for r in results if r["result"] == combined["result"]]
+        bpms = [r["bpm"] for r in agreeing if r["bpm"] is not None]
+        combined["bpm"] = float(np.mean(bpms)) if bpms else None
+        combined["peak_times"] = [t for r in agreeing for t in r["peak_times"]]
+        combined["sound_detected"] = any(r["sound_detected"] for r in results)
+        ensembles = [r["ensemble"] for r in results if r["ensemble"]]
+        combined["ensemble"] = max(ensembles, key=lambda e: e["consistency"]) if ensembles else None
+        del combined["window"]
+        combined["windows"] = [{"start_s": r["window"][0], "end_s": r["window"][1], "result": r["result"],
+                                "probability": r["probability"], "bpm": r["bpm"]} for r in results]
+        print(f"Analyzed {len(results)} windows of ~{MEMORY_ANALYSIS_WINDOW_S}s: {', '.join(verdicts)}")
+        return combined
+
+    # ----------------------------
+    # Multi-channel (binaural) analysis
+    # ----------------------------
+    def analyze_channels(self, y, sample_rate, y_low=None):
+        """
+        Analyze each channel of a (channels, n) waveform in parallel.
+        Returns a list of `analyze()` result dicts, one per channel.
+        A 1-D waveform is treated as a single channel. `y_low` is `y` decimated to the analysis
+        rate, if the caller has it (see AudioController.analysis_waveform).
+        Recordings longer than MEMORY_ANALYSIS_WHOLE_MAX_S are analyzed in windows (see
+        analyze_windows for how their verdicts combine), one channel after the other.
+        """
+        if y is None:
+            return [self.analyze(y, sample_rate)]
+        channels = [y] if y.ndim == 1 else list(y)
+        lows = [None] * len(channels) if y_low is None else ([y_low] if y.ndim == 1 else list(y_low))
+        windows = self.analysis_windows(y.shape[-1], sample_rate)
+        if len(windows) > 1:
+            return [self.analyze_windows(channel, sample_rate, windows, low) for channel, low in zip(channels, lows)]
+        if y.ndim == 1:
+            return [self.analyze(y, sample_rate, y_low)]
+        with ThreadPoolExecutor(max_workers=len(y)) as pool:
+            return list(pool.map(lambda job: self.analyze(job[0], sample_rate, job[1]), zip(channels, lows)))
+
+    def inter_ear_relation(self, y, sample_rate):
+        """
+        Normalized cross-correlation between the first two channels within +/- MAX_INTER_EAR_LAG_MS.
+        Returns (correlation, lag_ms); a positive lag means the right ear lags the left ear.
+        Returns (None, None) for mono recordings.
+        """
+        if y is None or y.ndim == 1 or len(y) < 2:
+            return None, None
+        max_lag = int(sample_rate * MAX_INTER_EAR_LAG_MS / 1000)
+        means = np.mean(y[0]), np.mean(y[1])
+        xcorr = np.zeros(2 * max_lag + 1) # At lags -max_lag..max_lag, summed over the analysis windows
+        left_energy = right_energy = 0.0
+        # Windows miss the few products across their borders, which is negligible at lags of a millisecond
+        for start, end in self.analysis_windows(y.shape[-1], sample_rate):
+            left = y[0, start:end] - means[0]
+            right = y[1, start:end] - means[1]
+            left_energy += float(np.dot(left, left))
+            right_energy += float(np.dot(right, right))
+            window_xcorr = signal.correlate(right, left, mode='full', method='fft')
+            lags = signal.correlation_lags(len(right), len(left), mode='full')
+            window = np.abs(lags) <= max_lag
+            xcorr[lags[window] + max_lag] += window_xcorr[window]
+        energy = np.sqrt(left_energy * right_energy)
+        if energy == 0:
+            return 0.0, 0.0
+
+        best = np.argmax(np.abs(xcorr))
+        correlation = float(np.clip(xcorr[best] / energy, -1, 1)) # Clip float32 FFT round-off
+        lag_ms = float((best - max_lag) * 1000 / sample_rate)
+        return correlation, lag_ms
 
 class MainWindow(QMainWindow):
     """
@@ -483,6 +1601,10 @@ class MainWindow(QMainWindow):
     PAGE_IDLE = 0
     PAGE_RECORDING = 1
     PAGE_ANALYSIS = 2
+    PAGE_CATALOG = 3
+    report_exported = pyqtSignal(str) # Status message from a finished background report export
+    catalog_synced = pyqtSignal() # A background sync of the recordings folder finished
+    pyramids_ready = pyqtSignal(object, object) # (plot data, pyramids) of a background pyramid build
 
     def __init__(self):
         """
@@ -492,11 +1614,36 @@ class MainWindow(QMainWindow):
         # Initialize the audio controller, sound analyzer, and worker thread
         self.audio_controller = AudioController()
         self.sound_analyzer = SoundAnalyzer()
+        self.quality_governor = QualityGovernor(DISPLAY_TIERS, DISPLAY_LATENCY_BUDGET_S, GOVERNOR_SYSFS_ROOT,
+                                                GOVERNOR_HOT_TEMP_C, GOVERNOR_COOL_TEMP_C)
+        self.display_tier = DISPLAY_TIERS[0]
         self.worker_thread = None
         self.player_thread = None
         self.recorded_frames = None
         self.current_audio_filepath = None
+        self.last_analysis = None # Per-channel SoundAnalyzer.analyze() results of the current recording
+        self.journal = None # RecordingJournal of the current recording (None for opened files)
+        self.last_plot_data = None # (y, sr, S_mel_db, display tier) on screen, for the report export
+        self.plot_pyramids = None # Zoom pyramids of last_plot_data, built in the background
+        self.zoom_plot = None # ZoomableAnalysisPlot on the canvases once the user zoomed or panned
+        self.report_exporter = None # ReportExporter process pool, started on the first export
+        self.similarity_index = None # SimilarityIndex of the saved recordings, opened on first use
+        self.session_history = SessionHistory(SESSION_HISTORY_SIZE, SESSION_HISTORY_MEMORY_MB * 1024 * 1024,
+                                              SESSION_HISTORY_DIR, SESSION_HISTORY_SPILL_MB * 1024 * 1024)
+        self.history_key = None # Key of the session on screen in session_history
+        self.memory_budget = MemoryBudget(MEMORY_BUDGET_MB * 1024 * 1024, MEMORY_SPILL_DIR) if MEMORY_BUDGET_MB else None
+        self.audio_controller.memory_budget = self.memory_budget
+        self.broadcaster = self.start_broadcaster() if BROADCAST_ENABLED else None
+        self.sync_agent = self.start_sync_agent() if SYNC_TARGET else None
+        self.catalog = self.open_catalog()
+        self.noise_profiles = NoiseProfileStore(NOISE_PROFILE_DIR)
+        self.catalog_sync_lock = threading.Lock() # One folder sync at a time
+        self.page_before_catalog = self.PAGE_IDLE # Page the catalog's BACK button returns to
+        self.report_exported.connect(self.update_status_bar_text)
+        self.pyramids_ready.connect(self.handle_pyramids_ready)
         self.initUI()  # Initialize the UI components
+        self.start_catalog_watch()  # Catalog recordings that appear in (or disappear from) the recordings folder
+        self.recover_interrupted_recordings()  # Recover recordings left by a crash or power loss
         self.check_audio_device_status()  # Check the audio device status when the window starts
 
 # --- UI Initialization and Setup ---
@@ -515,11 +1662,14 @@ class MainWindow(QMainWindow):
         self.setup_recording_ui()
         self.analysis_page = QWidget()
         self.setup_analysis_page()
+        self.catalog_page = QWidget()
+        self.setup_catalog_page()
 
         # Add pages to stacked widget
         self.stacked_widget.addWidget(self.idle_widget)
         self.stacked_widget.addWidget(self.recording_widget)
         self.stacked_widget.addWidget(self.analysis_page)
+        self.stacked_widget.addWidget(self.catalog_page)
 
         # Setup control frame with buttons for starting, saving, and resetting recording
         self.control_frame = QFrame()
@@ -618,6 +1768,13 @@ class MainWindow(QMainWindow):
             }
         """)
 
+        # --- Session History Selector ---
+        self.history_combo = QComboBox()
+        self.history_combo.activated.connect(self.handle_history_selected)
+        self.history_combo.setFixedHeight(button_height); self.history_combo.setMinimumWidth(button_width)
+        self.history_combo.setEnabled(False)
+        self.history_combo.setStyleSheet("font-size: 14px;")
+
         # --- Layout for Control Frame ---
         control_layout.addStretch(1)
         control_layout.addWidget(self.start_stop_button)
@@ -625,6 +1782,7 @@ class MainWindow(QMainWindow):
         control_layout.addWidget(self.save_as_button)
         control_layout.addWidget(self.finish_reset_button)
         control_layout.addWidget(self.play_button)
+        control_layout.addWidget(self.history_combo)
         # control_layout.addWidget(self.true_exit_button)
         control_layout.addStretch(1)
         self.control_frame.setLayout(control_layout)
@@ -681,6 +1839,18 @@ class MainWindow(QMainWindow):
         start_instruction_label.setAlignment(Qt.AlignCenter)
         start_instruction_label.setStyleSheet("font-size: 18px; color: #333; font-weight: bold;")
         layout.addWidget(start_instruction_label)
+
+        # Noise profile of the device: status and calibration
+        self.noise_profile_label = QLabel("")
+        self.noise_profile_label.setAlignment(Qt.AlignCenter)
+        self.noise_profile_label.setStyleSheet("font-size: 14px; color: #555; margin-top: 30px;")
+        layout.addWidget(self.noise_profile_label)
+        self.calibrate_button = QPushButton("CALIBRATE NOISE")
+        self.calibrate_button.clicked.connect(self.handle_calibrate_noise)
+        self.calibrate_button.setFixedHeight(40); self.calibrate_button.setFixedWidth(190)
+        self.calibrate_button.setStyleSheet("font-size: 14px; font-weight: bold;")
+        self.calibrate_button.setEnabled(False)
+        layout.addWidget(self.calibrate_button, alignment=Qt.AlignCenter)
         layout.addStretch()
 
     def setup_recording_ui(self):
@@ -736,6 +1906,7 @@ class MainWindow(QMainWindow):
         """)
         self.result_label.setAlignment(Qt.AlignCenter)
         self.result_label.hide()  # Initially hidden
+        self.result_label.clicked.connect(self.show_similar_recordings)  # Tap the verdict to find similar past recordings
         result_layout.addWidget(self.result_label)
         layout.addWidget(self.result_frame)  # Add the result display box to the vertical layout
 
@@ -748,6 +1919,65 @@ class MainWindow(QMainWindow):
         spectrogram_layout.addWidget(self.analysis_canvas_2)
         layout.addWidget(self.frame_spectrogram)  # Add the spectrogram frame to the vertical layout
 
+        # Pinch/wheel zoom and drag pan on both plots, redrawn at most every ZOOM_FRAME_INTERVAL_MS
+        self.zoom_filter = ZoomPanFilter(self, self.analysis_page)
+        self.zoom_filter.install(self.analysis_canvas_1)
+        self.zoom_filter.install(self.analysis_canvas_2)
+        self.zoom_render_timer = QTimer(self)
+        self.zoom_render_timer.setSingleShot(True)
+        self.zoom_render_timer.setInterval(ZOOM_FRAME_INTERVAL_MS)
+        self.zoom_render_timer.timeout.connect(self.render_zoomed_plots)
+
+    def setup_catalog_page(self):
+        """
+        Sets up the recording catalog page: filters, the matching recordings and buttons to open one.
+        """
+        layout = QVBoxLayout(self.catalog_page)
+        filter_layout = QHBoxLayout()
+        self.catalog_verdict_combo = QComboBox()
+        for label, value in [("All verdicts", None), ("Pulsatile", "Pulsatile"), ("Non-Pulsatile", "Non-Pulsatile"),
+                             ("No Sound", "No Sound"), ("Not analyzed", False)]:
+            self.catalog_verdict_combo.addItem(label, value)
+        self.catalog_period_combo = QComboBox()
+        for label, days in [("Any time", None), ("Last 24 hours", 1), ("Last 7 days", 7), ("Last 30 days", 30), ("Last year", 365)]:
+            self.catalog_period_combo.addItem(label, days)
+        self.catalog_device_combo = QComboBox()
+        self.catalog_device_combo.addItem("All devices", None)
+        self.catalog_sort_combo = QComboBox()
+        for label, order in [("Newest first", ("recorded_at", True)), ("Oldest first", ("recorded_at", False)),
+                             ("Highest BPM", ("bpm", True)), ("Longest", ("duration", True)), ("Device", ("device", False))]:
+            self.catalog_sort_combo.addItem(label, order)
+        for combo in (self.catalog_verdict_combo, self.catalog_period_combo, self.catalog_device_combo, self.catalog_sort_combo):
+            combo.setStyleSheet("font-size: 14px;")
+            combo.activated.connect(self.refresh_catalog_page)
+            filter_layout.addWidget(combo)
+        filter_layout.addStretch(1)
+        layout.addLayout(filter_layout)
+
+        self.catalog_table = QTableWidget(0, 8)
+        self.catalog_table.setHorizontalHeaderLabels(["Recorded", "Device", "Verdict", "BPM", "Duration", "Rate", "Bits", "Model"])
+        self.catalog_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.catalog_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.catalog_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.catalog_table.verticalHeader().setVisible(False)
+        self.catalog_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.catalog_table.itemDoubleClicked.connect(self.handle_catalog_open)
+        layout.addWidget(self.catalog_table)
+
+        button_layout = QHBoxLayout()
+        self.catalog_count_label = QLabel("")
+        self.catalog_count_label.setStyleSheet("font-size: 14px; color: #555;")
+        button_layout.addWidget(self.catalog_count_label)
+        button_layout.addStretch(1)
+        for text, handler in [("Open", self.handle_catalog_open), ("Other file...", self.browse_for_recording),
+                              ("Back", self.handle_catalog_back)]:
+            button = QPushButton(text)
+            button.setFixedHeight(40); button.setMinimumWidth(120)
+            button.setStyleSheet("font-size: 14px;")
+            button.clicked.connect(handler)
+            button_layout.addWidget(button)
+        layout.addLayout(button_layout)
+
 # --- Event Handlers ---
     def handle_start_stop(self):
         """
@@ -769,6 +1999,13 @@ class MainWindow(QMainWindow):
             # Prepare for a new recording
             self.recorded_frames = []  # ✅ Needed for live MB tracking
             self.current_audio_filepath = None
+            self.start_memory_session()
+            self.discard_journal()
+            params = self.audio_controller.device_params
+            try:
+                self.journal = RecordingJournal(JOURNAL_DIR, params['channels'], WIDTH_SAMPLE, params['rate'], JOURNAL_FSYNC_INTERVAL_S)
+            except OSError as e:
+                print(f"Recording journal unavailable, recording to memory only: {e}")
             self.stacked_widget.setCurrentIndex(self.PAGE_RECORDING)
             self.recording_progress_bar.setValue(0)
             self.recording_progress_bar.setFormat(f"{FIXED_RECORDING_DURATION_SECONDS}s remaining")
@@ -782,9 +2019,19 @@ class MainWindow(QMainWindow):
             self.play_button.setEnabled(False)
             self.finish_reset_button.setEnabled(False)
             self.open_button.setEnabled(False)
+            self.history_combo.setEnabled(False)
+            if self.sync_agent:
+                self.sync_agent.set_recording(True)  # Keep the CPU and network for the recording
 
             # Start the background recording thread
-            self.worker_thread = AudioWorker(self.audio_controller.device_params, FIXED_RECORDING_DURATION_SECONDS)
+            worker_class = ProcessAudioWorker if CAPTURE_MODE == "process" else AudioWorker
+            self.worker_thread = worker_class(self.audio_controller.device_params, FIXED_RECORDING_DURATION_SECONDS, self.journal, self.broadcaster,
+                                              self.memory_budget)
+            if self.broadcaster:
+                self.broadcaster.start_session(params['rate'], params['channels'], WIDTH_SAMPLE, device=params['name'],
+                                               duration=FIXED_RECORDING_DURATION_SECONDS, labels=EAR_LABELS[:params['channels']])
+            self.display_tier = self.quality_governor.select_tier()
+            self.worker_thread.poll_interval = self.display_tier["live_refresh_s"]
             # Connect signals from the worker thread to handler methods (slots) in this MainWindow class.
             self.worker_thread.progress_updated.connect(self.update_recording_progress)
             self.worker_thread.status_updated.connect(self.update_status_bar_text)
@@ -793,9 +2040,75 @@ class MainWindow(QMainWindow):
             self.worker_thread.finished.connect(self.on_worker_thread_actually_finished)
             self.worker_thread.start()
 
+    def handle_calibrate_noise(self):
+        """
+        Handles clicks on the "CALIBRATE NOISE" button. Records NOISE_CALIBRATION_SECONDS of silence
+        on the device and stores its noise profile.
+        """
+        if not self.audio_controller.is_ready() or (self.worker_thread and self.worker_thread.isRunning()):
+            return
+        self.update_status_bar_text(f"Calibrating: keep the room quiet for {NOISE_CALIBRATION_SECONDS}s...")
+        self.start_stop_button.setEnabled(False)
+        self.open_button.setEnabled(False)
+        self.calibrate_button.setEnabled(False)
+        worker_class = ProcessAudioWorker if CAPTURE_MODE == "process" else AudioWorker
+        self.worker_thread = worker_class(self.audio_controller.device_params, NOISE_CALIBRATION_SECONDS)
+        self.worker_thread.recording_finished.connect(self.handle_calibration_completion)
+        self.worker_thread.recording_error.connect(self.on_recording_error_and_reset)
+        self.worker_thread.finished.connect(self.on_worker_thread_actually_finished)
+        self.worker_thread.start()
+
+    def handle_calibration_completion(self, frames):
+        """
+        Computes the noise profile of the silent reference, stores it and uses it from now on.
+        """
+        self.open_button.setEnabled(True)
+        self.calibrate_button.setEnabled(True)
+        if not frames:
+            self.update_status_bar_text("Noise calibration failed: no audio captured.")
+            return
+        params = self.audio_controller.device_params
+        y = self.audio_controller.split_channels(self.audio_controller.decode_frames(frames), params['channels'])
+        profile = NoiseProfile.from_recording(y, params['rate'], params['name'], 8 * WIDTH_SAMPLE,
+                                              NOISE_FLOOR_PERCENTILE, NOISE_MAX_ATTENUATION_DB)
+        try:
+            self.noise_profiles.put(profile)
+        except OSError as e:
+            print(f"Could not store the noise profile: {e}")
+            QMessageBox.warning(self, "Noise Calibration", f"The noise profile could not be saved:\n{e}")
+        self.sound_analyzer.set_noise_profile(profile if NOISE_PROFILE_ENABLED else None)
+        self.show_noise_profile_status(profile)
+        print(f"Noise profile {profile.key}: {profile.summary()}")
+        self.update_status_bar_text("Noise profile calibrated.")
+
     def handle_open_file(self):
         """
-        Handles clicks on the "Open" button. This loads an audio file for analysis.
+        Handles clicks on the "Open" button. This shows the recording catalog (or a file dialog if there is no catalog).
+        """
+        if not self.catalog:
+            self.browse_for_recording()
+            return
+        if self.stacked_widget.currentIndex() != self.PAGE_CATALOG:
+            self.page_before_catalog = self.stacked_widget.currentIndex()
+        self.refresh_catalog_page()
+        self.stacked_widget.setCurrentIndex(self.PAGE_CATALOG)
+
+    def handle_catalog_open(self, *_):
+        """
+        Handles a double click on a catalog row and the catalog's "Open" button.
+        """
+        row = self.catalog_table.currentRow()
+        if row < 0:
+            self.update_status_bar_text("Select a recording to open.")
+            return
+        self.open_recording_file(self.catalog_table.item(row, 0).data(Qt.UserRole))
+
+    def handle_catalog_back(self):
+        self.stacked_widget.setCurrentIndex(self.page_before_catalog)
+
+    def browse_for_recording(self):
+        """
+        Lets the user pick any WAV file to analyze.
         """
         # Open folder to let user select a WAV file
         filepath, _ = QFileDialog.getOpenFileName(
@@ -804,13 +2117,21 @@ class MainWindow(QMainWindow):
             DEFAULT_OUTPUT_DIR,
             "WAV files (*.wav)"
         )
+        self.open_recording_file(filepath)
 
+    def open_recording_file(self, filepath):
+        """
+        Loads an audio file and analyzes it.
+        """
         frame_size = self.audio_controller.device_params['channels'] * WIDTH_SAMPLE
         frames_per_buffer = max(1,CHUNK_SIZE // frame_size)
         bytes_per_chunk = frames_per_buffer * frame_size
         formatted_frames = []
         # Check if filepath exists
         if filepath:
+            self.start_memory_session()
+            if self.memory_budget:
+                formatted_frames = SpillBuffer(self.memory_budget)  # A long file is read like a long capture
             try:
                 # Read the selected WAV file
                 with wave.open(filepath,'rb') as rd:
@@ -829,13 +2150,20 @@ class MainWindow(QMainWindow):
                         if not data:
                             break
                         formatted_frames.append(data)
+                if isinstance(formatted_frames, SpillBuffer):
+                    formatted_frames = formatted_frames.finish()
 
                 self.update_status_bar_text("Recording loaded.")
                 QApplication.processEvents()
-                
+                self.discard_journal()  # The previous recording's journal no longer matches the frames on screen
+                self.display_tier = self.quality_governor.select_tier()  # Once per session, as START does
+
                 # Analyze the audio from the loaded file
                 self.handle_recording_completion(formatted_frames)
 
+                self.set_session_file(filepath, keep_filepath=False)  # Name the history entry after the file
+                self.catalog_recording(filepath)  # Store (or refresh) its verdicts in the catalog
+
                 # Update status bar
                 self.update_status_bar_text("Recording analyzed.")
                 QApplication.processEvents()
@@ -858,7 +2186,7 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "No Data", "Unable to play audio")
                 return
         
-        if len(b''.join(self.recorded_frames)) % CHUNK_SIZE != 0:
+        if frames_nbytes(self.recorded_frames) % CHUNK_SIZE != 0:
             self.update_status_bar_text("Audio data length is not a multiple of {WIDTH_SAMPLE}.")
             QMessageBox.information(self, "Sample bitrate mismatch detected.", "Audio file does not match bitrate. Please select a correct audio file recorded using this device to analyze.")
             QApplication.processEvents()
@@ -880,6 +2208,7 @@ class MainWindow(QMainWindow):
             self.open_button.setEnabled(False)
             self.save_as_button.setEnabled(False)
             self.finish_reset_button.setEnabled(False)
+            self.history_combo.setEnabled(False)
 
             # Start the background playing thread
             self.player_thread = AudioPlayer(self.audio_controller.device_params, self.recorded_frames)
@@ -898,7 +2227,7 @@ class MainWindow(QMainWindow):
 
         # Generate a default filename based on the current time and device info.
         timestamp = time.strftime("%Y%m%d_%H%M%S")
-        dev_name = self.audio_controller.device_params.get('name', 'AudioDevice').replace(" ", "_")[:15]
+        dev_name = device_token(self.audio_controller.device_params.get('name', 'AudioDevice'))
         rate = self.audio_controller.device_params.get('rate', TARGET_SAMPLE_RATE)
         ch = self.audio_controller.device_params.get('channels', TARGET_CHANNELS)
         default_filename = f"rec_{dev_name}_{rate}Hz_{ch}ch_{timestamp}.wav"
@@ -912,8 +2241,21 @@ class MainWindow(QMainWindow):
             self.update_status_bar_text(f"Saving to {os.path.basename(filepath)}...")
             QApplication.processEvents()
 
-            if self.audio_controller.save_audio_to_file(self.recorded_frames, filepath):
+            # A finished journal is already on disk: link it instead of rewriting the frames
+            if self.journal and self.journal.path and self.journal.export(filepath):
+                saved = True
+            else:
+                saved = self.audio_controller.save_audio_to_file(self.recorded_frames, filepath)
+
+            if saved:
                 self.update_status_bar_text(f"Audio successfully saved to {os.path.basename(filepath)}")
+                self.set_session_file(filepath)
+                if EXPORT_REPORT_ON_SAVE:
+                    self.export_report(report_path_for(filepath))
+                self.index_recording(filepath)
+                self.catalog_recording(filepath, device=self.audio_controller.device_params.get('name'))
+                if self.sync_agent:
+                    self.sync_agent.enqueue(filepath, self.last_analysis)
                 QMessageBox.information(self, "Save Successful", f"Audio saved to:\n{filepath}")
             else:
                 self.update_status_bar_text("Save failed.")
@@ -935,6 +2277,11 @@ class MainWindow(QMainWindow):
         This function will start the analysis of the live recording or the loaded audio file.
         """
         self.recorded_frames = frames
+        self.history_key = None  # Set by remember_session once the new session is analyzed
+        if self.broadcaster:
+            self.broadcaster.end_session()
+        if self.sync_agent:
+            self.sync_agent.set_recording(False)
 
         # Reset the start/stop button to its "START" state.
         self.start_stop_button.setText("START")
@@ -947,18 +2294,25 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "No Data", "No audio data was captured.")
             self.stacked_widget.setCurrentIndex(self.PAGE_IDLE)
             self.finish_reset_button.setEnabled(True)
+            self.history_combo.setEnabled(len(self.session_history) > 0)
             return
 
         self.update_status_bar_text("Generating plots...")
         QApplication.processEvents()
 
-        # Ask the audio controller to compute the waveform and spectrogram data.
-        y, sr, S_mel_db = self.audio_controller.compute_audio_analysis_data(self.recorded_frames)
+        # Ask the audio controller to compute the waveform and spectrogram data (at the display tier chosen when the session started).
+        display_start = time.perf_counter()
+        y, sr, S_mel_db = self.audio_controller.compute_audio_analysis_data(self.recorded_frames, self.display_tier)
 
         if y is not None:
-            self.update_analysis_plots(y, sr, S_mel_db)
+            self.update_analysis_plots(y, sr, S_mel_db, self.display_tier)
+            self.last_plot_data = (y, sr, S_mel_db, self.display_tier)
+            self.start_plot_pyramids()
+            self.quality_governor.record_latency("display", time.perf_counter() - display_start)
+            print(f"Display governor: {self.quality_governor.snapshot()}")
             self.run_sound_check() #Start analyzing audio for presence of sound and if so, update "Pulsatile" or "Non-Pulsatile" result
-            self.update_status_bar_text("Plot displayed. Ready to save.")
+            self.remember_session()
+            self.update_status_bar_text("Plot displayed. Ready to save." + self.report_memory_session())
             self.save_as_button.setEnabled(True)
             self.open_button.setEnabled(True)
             self.play_button.setEnabled(True)
@@ -1002,6 +2356,7 @@ class MainWindow(QMainWindow):
             self.play_button.setEnabled(True)
             self.save_as_button.setEnabled(True)
             self.finish_reset_button.setEnabled(True)
+            self.history_combo.setEnabled(len(self.session_history) > 0)
 
     def resizeEvent(self, event):
         """
@@ -1012,6 +2367,8 @@ class MainWindow(QMainWindow):
         self.update_overlay_positions()
         self.analysis_canvas_1.updateGeometry()
         self.analysis_canvas_2.updateGeometry()
+        if self.zoom_plot:
+            self.zoom_render_timer.start()  # The number of columns follows the canvas width
 
     def closeEvent(self, event):
         """
@@ -1022,12 +2379,382 @@ class MainWindow(QMainWindow):
         if self.worker_thread and self.worker_thread.isRunning():
             self.worker_thread.stop()
             self.worker_thread.wait(1000)
+        self.discard_journal()  # Closing without SAVE discards the recording, as before
+        if self.report_exporter:
+            self.report_exporter.shutdown()  # Finish reports that are still rendering
+        if self.broadcaster:
+            self.broadcaster.close()
+        if self.sync_agent:
+            self.sync_agent.stop()  # Unfinished transfers resume from the queue on the next start
+        if self.catalog:
+            self.catalog.close()
+        self.session_history.clear()  # Spilled recordings are not kept after the app closes
+        if self.memory_budget:
+            self.memory_budget.clear()
         if self.audio_controller:
             self.audio_controller.close()
         print("Application closed.")
         super().closeEvent(event)
 
 # --- Audio and Analysis Methods ---
+    def recover_interrupted_recordings(self):
+        """
+        Moves journal files left by an interrupted session into DEFAULT_OUTPUT_DIR and tells the user.
+        """
+        recovered = recover_journals(JOURNAL_DIR, DEFAULT_OUTPUT_DIR)
+        if recovered:
+            names = "\n".join(os.path.basename(path) for path in recovered)
+            QMessageBox.information(self, "Recordings Recovered",
+                f"{len(recovered)} recording(s) from an interrupted session were recovered to '{DEFAULT_OUTPUT_DIR}':\n{names}")
+
+    def discard_journal(self):
+        """
+        Deletes the journal of the current recording (files already saved from it are kept).
+        """
+        if self.journal:
+            self.journal.discard()
+            self.journal = None
+
+    def export_report(self, path):
+        """
+        Renders the report of the recording on screen to `path` in a background process.
+        The status bar is updated through `report_exported` when it is done.
+        """
+        if not self.last_plot_data:
+            return
+        y, sr, S_mel_db, tier = self.last_plot_data
+        data = build_report_data(y, sr, S_mel_db, analysis_rate(sr), tier["hop_length"], self.last_analysis,
+                                 os.path.basename(path), EAR_LABELS, tier["waveform_points"])
+        if self.report_exporter is None:
+            self.report_exporter = ReportExporter(REPORT_EXPORT_WORKERS)
+        future = self.report_exporter.submit_render(data, path)
+
+        def done(future):
+            # Runs on an executor thread; the signal delivers the message on the GUI thread
+            try:
+                self.report_exported.emit(f"Report saved to {os.path.basename(future.result())}")
+            except Exception as e:
+                print(f"Report export failed: {e}")
+                self.report_exported.emit("Report export failed.")
+        future.add_done_callback(done)
+
+    def get_similarity_index(self):
+        """
+        Opens the similarity index on first use. Returns None if it cannot be opened.
+        """
+        if self.similarity_index is None:
+            try:
+                self.similarity_index = open_similarity_index(self.sound_analyzer.feature_recipe, background_training=True)
+            except (OSError, ValueError) as e:
+                print(f"Similarity index unavailable: {e}")
+        return self.similarity_index
+
+    def index_recording(self, path):
+        """
+        Adds the recording on screen, saved as `path`, to the similarity index.
+        """
+        index = self.get_similarity_index()
+        if index is None or not self.last_analysis or not self.last_plot_data:
+            return
+        keys, vectors = similarity_vectors(path, self.last_analysis, *self.last_plot_data[:2])
+        if keys:
+            try:
+                index.add_many(keys, vectors)
+            except OSError as e:
+                print(f"Could not add {path} to the similarity index: {e}")
+
+    def show_similar_recordings(self):
+        """
+        Lists the saved recordings most similar to the one on screen (per channel).
+        """
+        index = self.get_similarity_index()
+        if index is None or not self.last_analysis or not self.last_plot_data:
+            return
+        if not len(index):
+            QMessageBox.information(self, "Similar Recordings", "No recordings have been indexed yet. Saved recordings are added automatically.")
+            return
+        if any(result.get("noise_profile") for result in self.last_analysis):
+            QMessageBox.information(self, "Similar Recordings", "This recording was analyzed with a noise profile; the index only compares raw-audio features.")
+            return
+        keys, vectors = similarity_vectors(self.current_audio_filepath or "this recording", self.last_analysis, *self.last_plot_data[:2])
+        lines = []
+        for key, vector in zip(keys, vectors):
+            start = time.perf_counter()
+            matches = index.query(vector, SIMILARITY_TOP_K, exclude=set(keys))
+            print(f"Similarity query over {len(index)} vectors took {(time.perf_counter() - start) * 1000:.1f} ms")
+            if len(keys) > 1:
+                lines.append(key.rsplit(" ", 1)[-1])
+            lines += [f"{os.path.basename(match)}   (distance {distance:.2f})" for match, distance in matches]
+        QMessageBox.information(self, "Similar Recordings", "\n".join(lines) or "No similar recordings found.")
+
+    def start_broadcaster(self):
+        """
+        Starts the live broadcast server. Returns None (and the app runs without it) if the port is unavailable.
+        """
+        try:
+            broadcaster = Broadcaster(BROADCAST_HOST, BROADCAST_PORT, BROADCAST_CLIENT_QUEUE_KB * 1024)
+        except OSError as e:
+            print(f"Live broadcast unavailable on {BROADCAST_HOST}:{BROADCAST_PORT}: {e}")
+            return None
+        print(f"Live broadcast on {broadcaster.address[0]}:{broadcaster.address[1]}")
+        return broadcaster
+
+    def start_sync_agent(self):
+        """
+        Starts shipping saved recordings to SYNC_TARGET. Returns None if the archive or the queue cannot be opened.
+        """
+        try:
+            agent = SyncAgent(open_store(SYNC_TARGET), SYNC_STATE_DIR, SYNC_BANDWIDTH_KBPS * 1000,
+                              None if SYNC_RECORDING_BANDWIDTH_KBPS is None else SYNC_RECORDING_BANDWIDTH_KBPS * 1000)
+        except OSError as e:
+            print(f"Archive sync unavailable ({SYNC_TARGET}): {e}")
+            return None
+        agent.start()
+        print(f"Archive sync to {SYNC_TARGET}: {len(agent.queue.pending())} recording(s) queued")
+        return agent
+
+    def load_noise_profile(self):
+        """
+        Applies the stored noise profile of the current device, if it was calibrated.
+        """
+        params = self.audio_controller.device_params
+        profile = self.noise_profiles.get(params['name'], params['rate'], params['channels'], 8 * WIDTH_SAMPLE)
+        self.sound_analyzer.set_noise_profile(profile if NOISE_PROFILE_ENABLED else None)
+        self.show_noise_profile_status(profile)
+        self.calibrate_button.setEnabled(True)
+
+    def show_noise_profile_status(self, profile):
+        if profile is None:
+            text = f"No noise profile for this device. CALIBRATE NOISE records {NOISE_CALIBRATION_SECONDS}s of silence."
+        else:
+            text = f"Noise profile calibrated {time.strftime('%Y-%m-%d %H:%M', time.localtime(profile.created))}"
+            if not NOISE_PROFILE_ENABLED:
+                text += " (not applied: NOISE_PROFILE_ENABLED is off)"
+        self.noise_profile_label.setText(text)
+
+    def open_catalog(self):
+        """
+        Opens the recording catalog. Returns None (OPEN falls back to a file dialog) if it cannot be opened.
+        """
+        try:
+            return RecordingCatalog(CATALOG_DB)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Recording catalog unavailable ({CATALOG_DB}): {e}")
+            return None
+
+    def start_catalog_watch(self):
+        """
+        Catalogs the recordings folder in the background now and whenever its content changes.
+        """
+        if not self.catalog:
+            return
+        self.catalog_synced.connect(self.handle_catalog_synced)
+        self.catalog_sync_timer = QTimer(self)
+        self.catalog_sync_timer.setSingleShot(True)
+        self.catalog_sync_timer.setInterval(CATALOG_WATCH_DELAY_MS)
+        self.catalog_sync_timer.timeout.connect(self.sync_catalog)
+        self.catalog_watcher = QFileSystemWatcher([DEFAULT_OUTPUT_DIR], self)
+        self.catalog_watcher.directoryChanged.connect(lambda _: self.catalog_sync_timer.start())
+        self.sync_catalog(rescan=True)
+
+    def sync_catalog(self, rescan=False):
+        """
+        Brings the catalog in line with the recordings folder on a background thread. Only new
+        file names are read; `rescan` (at startup) also re-reads cataloged files that changed.
+        """
+        def run():
+            with self.catalog_sync_lock:
+                try:
+                    start = time.perf_counter()
+                    added, removed = self.catalog.sync_folder(DEFAULT_OUTPUT_DIR, rescan)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Could not catalog {DEFAULT_OUTPUT_DIR}: {e}")
+                    return
+            if added or removed:
+                print(f"Catalog: {added} recording(s) added or updated, {removed} removed in {time.perf_counter() - start:.2f}s")
+                self.catalog_synced.emit()
+        threading.Thread(target=run, name="CatalogSync", daemon=True).start()
+
+    def handle_catalog_synced(self):
+        if self.stacked_widget.currentIndex() == self.PAGE_CATALOG:
+            self.refresh_catalog_page()
+
+    def catalog_recording(self, path, device=None):
+        """
+        Adds the recording on screen, saved or opened as `path`, to the catalog with its verdicts.
+        """
+        if not self.catalog:
+            return
+        try:
+            self.catalog.add_file(path, self.last_analysis, device=device)
+        except (OSError, EOFError, wave.Error, sqlite3.Error) as e:
+            print(f"Could not add {path} to the catalog: {e}")
+
+    def refresh_catalog_page(self):
+        """
+        Lists the cataloged recordings matching the filters of the catalog page.
+        """
+        device = self.catalog_device_combo.currentData()
+        self.catalog_device_combo.blockSignals(True)
+        self.catalog_device_combo.clear()
+        self.catalog_device_combo.addItem("All devices", None)
+        for name in self.catalog.devices():
+            self.catalog_device_combo.addItem(name, name)
+        self.catalog_device_combo.setCurrentIndex(max(0, self.catalog_device_combo.findData(device)))
+        self.catalog_device_combo.blockSignals(False)
+
+        verdict = self.catalog_verdict_combo.currentData()
+        days = self.catalog_period_combo.currentData()
+        order_by, descending = self.catalog_sort_combo.currentData()
+        filters = {"verdict": verdict or None, "analyzed": False if verdict is False else None,
+                   "since": time.time() - days * 86400 if days else None, "device": self.catalog_device_combo.currentData()}
+        start = time.perf_counter()
+        try:
+            rows = self.catalog.query(order_by=order_by, descending=descending, limit=CATALOG_PAGE_SIZE, **filters)
+            total = self.catalog.count(**filters)
+        except sqlite3.Error as e:
+            print(f"Catalog query failed: {e}")
+            self.update_status_bar_text("The recording catalog could not be read.")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.catalog_table.setUpdatesEnabled(False)
+        self.catalog_table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            channels = row["channel_results"]
+            verdicts = " / ".join(c["verdict"] or "-" for c in channels) or "Not analyzed"
+            bpms = " / ".join(f"{c['bpm']:.0f}" if c["bpm"] is not None else "-" for c in channels)
+            model = f"{row['model']} v{row['model_version']}" if row["model"] else ""
+            cells = [time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["recorded_at"])), row["device"] or "",
+                     verdicts, bpms, f"{row['duration_s']:.1f}s", f"{row['rate']}Hz", str(row["bit_depth"]), model]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                item.setToolTip(row["path"])
+                self.catalog_table.setItem(i, column, item)
+            self.catalog_table.item(i, 0).setData(Qt.UserRole, row["path"])
+        self.catalog_table.setUpdatesEnabled(True)
+        self.catalog_count_label.setText(f"{total} recording(s)" + (f", first {len(rows)} shown" if total > len(rows) else "")
+                                         + f"  ({elapsed_ms:.0f} ms)")
+
+    def remember_session(self):
+        """
+        Adds the session on screen (frames, analysis, plot data and the rendered plots) to the history.
+        """
+        if not self.last_plot_data:
+            return
+        y, sr, S_mel_db, tier = self.last_plot_data
+        result_text = self.result_label.text()
+        self.history_key = self.session_history.add(
+            f"{time.strftime('%H:%M:%S')}  {result_text}",
+            frames=self.recorded_frames, filepath=self.current_audio_filepath, analysis=self.last_analysis,
+            y=y, sr=sr, S_mel_db=S_mel_db, tier=tier, result_text=result_text, stats_text=self.data_stats_label.text(),
+            waveform_image=self.canvas_image(self.analysis_canvas_1), spectrogram_image=self.canvas_image(self.analysis_canvas_2))
+        self.update_history_memory()
+        self.refresh_history_selector()
+        print(f"Session history: {len(self.session_history)} session(s), {self.session_history.memory_bytes() / 1e6:.1f} MB in memory, "
+              f"{self.session_history.spilled_bytes() / 1e6:.1f} MB on disk")
+
+    def update_history_memory(self):
+        """
+        Counts the history in the memory budget. The session on screen is part of the history, so
+        its capture, decoded and display accounts are released (they would be counted twice).
+        """
+        if self.memory_budget:
+            self.memory_budget.release("capture", "decoded", "display")
+            self.memory_budget.set("history", self.session_history.memory_bytes())
+
+    def start_memory_session(self):
+        """
+        Starts measuring the memory of a new recording or opened file (see report_memory_session).
+        """
+        if self.memory_budget:
+            self.memory_budget.release("capture", "decoded", "display")  # Left by a recording that was not analyzed
+            self.memory_budget.start_session()
+
+    def report_memory_session(self):
+        """
+        Prints the memory the session took (peak RSS, budget accounts and spill files). Returns a note
+        for the status bar when data was spilled to disk, else "".
+        """
+        if not self.memory_budget:
+            return ""
+        report = self.memory_budget.session_report()
+        print(f"Memory: peak RSS {report['peak_rss_mb']} MB ({report['peak_rss_scope']}), now {report['rss_mb']} MB "
+              f"({report['rss_anon_mb']} MB anonymous); "
+              f"budget {report['held_mb']} MB held (peak {report['peak_held_mb']} of {report['limit_mb']} MB) {report['accounts']}, "
+              f"{report['spilled_mb']} MB spilled")
+        return f" ({report['spilled_mb']:.0f} MB spilled to disk)" if report["spilled_mb"] else ""
+
+    def set_session_file(self, filepath, keep_filepath=True):
+        """
+        Names the history entry of the session on screen after its file (and keeps the path for SAVE/OPEN).
+        """
+        if self.history_key not in self.session_history:
+            return
+        label = f"{time.strftime('%H:%M:%S')}  {os.path.basename(filepath)}"
+        if keep_filepath:
+            self.session_history.update(self.history_key, label=label, filepath=filepath)
+        else:
+            self.session_history.update(self.history_key, label=label)
+        self.refresh_history_selector()
+
+    def refresh_history_selector(self):
+        """
+        Lists the history, most recent first, with the session on screen selected.
+        """
+        self.history_combo.blockSignals(True)
+        self.history_combo.clear()
+        for key, label, _ in self.session_history.entries():
+            self.history_combo.addItem(label, key)
+        self.history_combo.setCurrentIndex(self.history_combo.findData(self.history_key))
+        self.history_combo.blockSignals(False)
+        self.history_combo.setEnabled(len(self.session_history) > 0)
+
+    def handle_history_selected(self, index):
+        """
+        Reopens the session picked in the history selector.
+        """
+        key = self.history_combo.itemData(index)
+        if key is None or key not in self.session_history:
+            return
+        if key == self.history_key and self.stacked_widget.currentIndex() == self.PAGE_ANALYSIS:
+            return
+        self.restore_session(key)
+
+    def restore_session(self, key):
+        """
+        Puts a session from the history back on the analysis page, without decoding, analyzing or
+        re-rendering it (the plots are redrawn only if the canvases changed size since).
+        """
+        start = time.perf_counter()
+        items = self.session_history.open(key)
+        self.update_history_memory()  # Spilled items were read back
+        self.discard_journal()  # The journal belongs to the recording that is being replaced
+        self.history_key = key
+        self.recorded_frames = items["frames"]
+        self.current_audio_filepath = items["filepath"]
+        self.last_analysis = items["analysis"]
+        self.display_tier = items["tier"]
+        self.last_plot_data = (items["y"], items["sr"], items["S_mel_db"], items["tier"])
+        self.start_plot_pyramids()
+
+        if not (self.show_canvas_image(self.analysis_canvas_1, items["waveform_image"]) and
+                self.show_canvas_image(self.analysis_canvas_2, items["spectrogram_image"])):
+            self.update_analysis_plots(items["y"], items["sr"], items["S_mel_db"], items["tier"])
+            self.session_history.update(key, waveform_image=self.canvas_image(self.analysis_canvas_1),
+                                        spectrogram_image=self.canvas_image(self.analysis_canvas_2))
+        self.result_label.setText(items["result_text"])
+        self.result_label.show()
+        self.data_stats_label.setText(items["stats_text"])
+
+        self.save_as_button.setEnabled(True)
+        self.open_button.setEnabled(True)
+        self.play_button.setEnabled(True)
+        self.finish_reset_button.setEnabled(True)
+        self.stacked_widget.setCurrentIndex(self.PAGE_ANALYSIS)
+        self.refresh_history_selector()
+        self.update_status_bar_text(f"Session {items['result_text']} reopened in {(time.perf_counter() - start) * 1000:.0f} ms.")
+
     def check_audio_device_status(self):
         """
         Updates the status of the audio device and notifies the user if a valid device is found.
@@ -1038,6 +2765,7 @@ class MainWindow(QMainWindow):
         # Ensure audio controller is initialized
         if not self.audio_controller.is_ready():
             self.audio_controller = AudioController()
+            self.audio_controller.memory_budget = self.memory_budget
 
         if self.audio_controller.is_ready():
             dev_name = self.audio_controller.device_params['name']
@@ -1047,6 +2775,12 @@ class MainWindow(QMainWindow):
             self.start_stop_button.setEnabled(True)
             if hasattr(self, 'device_status_label_idle'):
                 self.device_status_label_idle.setText(msg)
+            if self.catalog:
+                try:
+                    self.catalog.register_device(dev_name) # Files found on disk under this device's token get its full name
+                except sqlite3.Error as e:
+                    print(f"Could not register {dev_name} in the catalog: {e}")
+            self.load_noise_profile()
         else:
             msg = f"No input device found supporting {TARGET_SAMPLE_RATE}Hz. Check console."
             self.update_status_bar_text(msg)
@@ -1062,12 +2796,28 @@ class MainWindow(QMainWindow):
         if not self.recorded_frames:  # Direct check for 'recorded_frames' (no need for hasattr)
             return
 
-        y, sr, _ = self.audio_controller.compute_audio_analysis_data(self.recorded_frames)
+        if self.last_plot_data:
+            y, sr = self.last_plot_data[:2]  # Decoded for the display already
+        else:
+            y, sr, _ = self.audio_controller.compute_audio_analysis_data(self.recorded_frames)
         if y is None:
             return
 
-        # Analyze the audio: Detect sound presence and classify as Pulsatile or Non-Pulsatile
-        sound_detected, result_text = self.sound_analyzer.analyze_audio(y, sr)
+        # Analyze the audio (each ear in parallel for binaural recordings): Detect sound presence and classify as Pulsatile or Non-Pulsatile
+        # The display decimated it to the analysis rate already
+        channel_results = self.sound_analyzer.analyze_channels(y, sr, self.audio_controller.analysis_waveform(y, sr))
+        self.last_analysis = channel_results # Kept with the verdict so the model version that produced it is known
+        if self.broadcaster:
+            self.broadcaster.publish_verdict(channel_results, EAR_LABELS)
+        print(f"Verdict by model {channel_results[0]['model']} v{channel_results[0]['model_version']}")
+        sound_detected = any(result["sound_detected"] for result in channel_results)
+        if len(channel_results) == 1:
+            result_text = channel_results[0]["result"]
+        else:
+            result_text = " | ".join(f"{label}: {result['result']}" for label, result in zip(EAR_LABELS, channel_results))
+            correlation, lag_ms = self.sound_analyzer.inter_ear_relation(y, sr)
+            print(f"Inter-ear correlation {correlation:.2f}, lag {lag_ms:+.2f} ms")
+            self.data_stats_label.setText(f"Inter-ear: r={correlation:.2f}, lag {lag_ms:+.2f} ms")
 
         # If sound is detected, you could log or perform additional checks
         if sound_detected:
@@ -1080,47 +2830,112 @@ class MainWindow(QMainWindow):
             self.result_label.setText(result_text)  # Display the result (Pulsatile, Non-Pulsatile, or No Sound)
             self.result_label.show()  # Ensure the result label is visible
 
+# --- Zoom and Pan ---
+    def start_plot_pyramids(self):
+        """
+        Builds the zoom pyramids of the plots on screen in the background. Until they are ready
+        (and after a reset) the plots show the whole recording and gestures are ignored.
+        """
+        self.plot_pyramids = None
+        self.zoom_plot = None
+        plot_data = self.last_plot_data
+        y, sr, S_mel_db, tier = plot_data
+
+        def build():
+            try:
+                pyramids = build_pyramids(y, sr, S_mel_db, analysis_rate(sr), tier["hop_length"])
+            except (ValueError, MemoryError) as e:
+                print(f"Zoom pyramids unavailable: {e}")
+                return
+            self.pyramids_ready.emit(plot_data, pyramids)
+        threading.Thread(target=build, daemon=True).start()
+
+    def handle_pyramids_ready(self, plot_data, pyramids):
+        """
+        Keeps the pyramids of a finished build, unless another recording was shown meanwhile.
+        """
+        if plot_data is self.last_plot_data:
+            self.plot_pyramids = pyramids
+
+    def zoom_analysis(self, fraction, factor):
+        """
+        Zooms both plots by `factor` (>1 zooms in) around `fraction` of their width.
+        """
+        if self.ensure_zoom_plot():
+            self.zoom_plot.zoom(fraction, factor)
+            self.schedule_zoom_render()
+
+    def pan_analysis(self, fraction):
+        """
+        Moves both plots by `fraction` of their width (positive: the content follows a drag to the right).
+        """
+        if self.ensure_zoom_plot():
+            self.zoom_plot.pan(fraction)
+            self.schedule_zoom_render()
+
+    def reset_analysis_zoom(self):
+        """
+        Shows the whole recording again.
+        """
+        if self.zoom_plot:
+            self.zoom_plot.set_range(0, self.zoom_plot.duration)
+            self.schedule_zoom_render()
+
+    def ensure_zoom_plot(self):
+        """
+        Replaces the static plots with a ZoomableAnalysisPlot on the first gesture.
+        Returns False while the pyramids are not ready.
+        """
+        if self.zoom_plot:
+            return True
+        if not self.plot_pyramids or self.stacked_widget.currentIndex() != self.PAGE_ANALYSIS:
+            return False
+        self.zoom_plot = ZoomableAnalysisPlot(self.analysis_canvas_1.figure, self.analysis_canvas_2.figure,
+                                              self.plot_pyramids, min_span_s=ZOOM_MIN_VIEW_S)
+        return True
+
+    def schedule_zoom_render(self):
+        if not self.zoom_render_timer.isActive():
+            self.zoom_render_timer.start()
+
+    def render_zoomed_plots(self):
+        """
+        Draws the current zoom range; gestures arriving in between only move the range.
+        """
+        if not self.zoom_plot:
+            return
+        self.zoom_plot.render()
+        self.analysis_canvas_1.draw()
+        self.analysis_canvas_2.draw()
+
 # --- UI Update and Helper Methods ---
-    def update_analysis_plots(self, y, sr, S_mel_db):
+    def update_analysis_plots(self, y, sr, S_mel_db, display_tier=None):
         """
         Clears the existing figure and draws new waveform and spectrogram plots on the canvas.
+        `display_tier` must be the tier `S_mel_db` was computed with (default: full quality).
         """
+        tier = display_tier or DISPLAY_TIERS[0]
 
         # Clear both canvas figures
         self.analysis_canvas_1.figure.clear()  # Clears the waveform canvas
         self.analysis_canvas_2.figure.clear()  # Clears the spectrogram canvas
 
+        # One row per channel (a single row for mono recordings)
+        waveforms = [y] if y.ndim == 1 else list(y)
+        spectrograms = [S_mel_db] if S_mel_db is None or S_mel_db.ndim == 2 else list(S_mel_db)
+
         # --- Plot on the first canvas (Waveform) ---
-        ax_waveform = self.analysis_canvas_1.figure.add_subplot(1, 1, 1)  # Only one subplot for the waveform
-        librosa.display.waveshow(y, sr=sr, ax=ax_waveform, color='darkcyan')
-
-        # Remove axis, labels, and title for the waveform plot
-        ax_waveform.set_xticks([])  # Remove x-axis ticks
-        ax_waveform.set_yticks([])  # Remove y-axis ticks
-        ax_waveform.spines['top'].set_visible(False)  # Hide top spine
-        ax_waveform.spines['right'].set_visible(False)  # Hide right spine
-        ax_waveform.spines['left'].set_visible(False)  # Hide left spine
-        ax_waveform.spines['bottom'].set_visible(False)  # Hide bottom spine
-        ax_waveform.set_title('')  # Remove title
+        for i, channel in enumerate(waveforms):
+            ax_waveform = self.analysis_canvas_1.figure.add_subplot(len(waveforms), 1, i + 1)  # One subplot per channel
+            draw_waveform(ax_waveform, channel, sr, tier["waveform_points"])
 
         # Adjust layout
         self.analysis_canvas_1.figure.subplots_adjust(left=0, right=1, top=1, bottom=0)
 
         # --- Plot on the second canvas (Spectrogram) ---
-        ax_spectrogram = self.analysis_canvas_2.figure.add_subplot(1, 1, 1)  # Only one subplot for the spectrogram
-        if S_mel_db is not None:
-            librosa.display.specshow(S_mel_db, sr=sr, hop_length=SPEC_HOP_LENGTH, x_axis='time', y_axis='mel', ax=ax_spectrogram, fmax=sr/2, cmap='viridis')
-
-        # Remove axis, labels, and title for the spectrogram plot
-        ax_spectrogram.set_xticks([])  # Remove x-axis ticks
-        ax_spectrogram.set_yticks([])  # Remove y-axis ticks
-        ax_spectrogram.set_yticklabels([])  # Remove y-axis labels (Hz)
-        ax_spectrogram.set_ylabel('')  # Explicitly remove the "Hz" label on the y-axis
-        ax_spectrogram.spines['top'].set_visible(False)  # Hide top spine
-        ax_spectrogram.spines['right'].set_visible(False)  # Hide right spine
-        ax_spectrogram.spines['left'].set_visible(False)  # Hide left spine
-        ax_spectrogram.spines['bottom'].set_visible(False)  # Hide bottom spine
-        ax_spectrogram.set_title('')  # Remove title
+        for i, channel_mel_db in enumerate(spectrograms):
+            ax_spectrogram = self.analysis_canvas_2.figure.add_subplot(len(spectrograms), 1, i + 1)  # One subplot per channel
+            draw_spectrogram(ax_spectrogram, channel_mel_db, analysis_rate(sr), tier["hop_length"])  # The Mel spectrogram is computed at the analysis rate
 
         # Adjust layout
         self.analysis_canvas_2.figure.subplots_adjust(left=0, right=1, top=1, bottom=0)
@@ -1138,6 +2953,26 @@ class MainWindow(QMainWindow):
         self.analysis_canvas_2.draw()
         print("Analysis plots updated in the GUI.")
 
+    @staticmethod
+    def canvas_image(canvas):
+        """
+        Copy of the pixels of a drawn canvas (height x width x RGBA).
+        """
+        return np.asarray(canvas.buffer_rgba()).copy()
+
+    @staticmethod
+    def show_canvas_image(canvas, image):
+        """
+        Shows a stored canvas image instead of re-plotting. Returns False if the canvas size changed.
+        """
+        width, height = int(canvas.figure.bbox.width), int(canvas.figure.bbox.height)
+        if image is None or image.shape[:2] != (height, width):
+            return False
+        canvas.figure.clear()
+        canvas.figure.figimage(image, 0, 0, origin='upper')
+        canvas.draw()
+        return True
+
     def update_recording_progress(self, elapsed_seconds, remaining_seconds):
         self.recording_progress_bar.setValue(elapsed_seconds)
         self.recording_progress_bar.setFormat(f"{remaining_seconds}s remaining")
@@ -1215,6 +3050,7 @@ class MainWindow(QMainWindow):
         self.start_stop_button.setText("START")
         self.start_stop_button.setStyleSheet("font-weight: bold; font-size: 16px; background-color: #4CAF50; color: white; border-radius: 6px;")
         self.start_stop_button.setEnabled(self.audio_controller.is_ready())
+        self.calibrate_button.setEnabled(self.audio_controller.is_ready())
         self.save_as_button.setEnabled(False)
         self.play_button.setEnabled(False)
         self.play_button.setText("PLAY")
@@ -1225,6 +3061,15 @@ class MainWindow(QMainWindow):
         self.stacked_widget.setCurrentIndex(self.PAGE_IDLE)
         self.recorded_frames = None
         self.current_audio_filepath = None
+        self.last_analysis = None
+        self.last_plot_data = None
+        self.plot_pyramids = None
+        self.zoom_plot = None
+        self.history_key = None  # The session stays in the history and can be reopened
+        self.refresh_history_selector()
+        if self.broadcaster:
+            self.broadcaster.publish_state("idle")
+        self.discard_journal()
 
         if hasattr(self, 'analysis_figure'):
             self.analysis_figure.clear()
@@ -0,0 +1,674 @@
+"""
+Headless benchmark suite for the Objective Tinnitus analysis pipeline.
+
+Synthesizes deterministic pulsatile / non-pulsatile / noise recordings and times each
+stage of the pipeline separately (PCM decode, Mel spectrogram, feature extraction,
+classification and plot rendering). Results are written to a JSON baseline so that a
+librosa upgrade or a parameter change (e.g. SPEC_N_FFT) can be checked for regressions.
+
+Usage:
+    python benchmark.py --save-baseline          # record a new baseline
+    python benchmark.py                          # compare against the saved baseline
+    python benchmark.py --rates 48000 --repeat 5 # subset / more repeats
+    python benchmark.py --check-allocations      # bound full-length temporaries per analysis
+    python benchmark.py --batch-report           # batched vs per-recording feature extraction
+    python benchmark.py --memory-report --minutes 10 60
+                                                 # peak RSS of long captures without and with a memory budget
+    python benchmark.py --decimation-report labels.csv --analysis-rate 8000
+                                                 # accuracy/speed of decimated analysis on a labeled set
+    python benchmark.py --noise-report labels.csv --noise-profile profile.npz
+                                                 # detection/BPM accuracy without and with a noise profile
+    python benchmark.py --ensemble-labeled-report labels.csv
+                                                 # verdicts the beat-synchronous average would change on a labeled set
+
+No audio hardware is needed: PyAudio is never opened and Qt renders offscreen.
+"""
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Must be set before Qt is imported
+
+import gc
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+import csv
+import argparse
+import resource
+import tracemalloc
+from types import SimpleNamespace
+import numpy as np
+
+import audio_with_spectogram as app
+from noise_profile import NoiseProfile
+from virtual_audio import SyntheticSource, encode_pcm
+from memory_budget import MB, MemoryBudget, SpillBuffer, current_rss_bytes, peak_rss_bytes, reset_peak_rss
+
+# --- Benchmark Configuration ---
+BENCHMARK_RATES = [48000, 192000] # Sample rates to benchmark (Hz)
+BENCHMARK_SIGNALS = ["pulsatile", "non_pulsatile", "noise"]
+BENCHMARK_SEED = 1234 # Seed for the synthetic signals so runs are reproducible
+BENCHMARK_REPEAT = 3 # Number of timed repeats per stage (the median is kept)
+BENCHMARK_BASELINE_PATH = "benchmark_baseline.json"
+REGRESSION_TOLERANCE = 0.25 # Flag a stage when it is >25% slower or allocates >25% more than baseline
+SYNTHETIC_BPM = 72 # Heart rate used for the synthetic pulsatile signal
+DEFAULT_REPORT_ANALYSIS_RATE = 8000 # Analysis rate (Hz) compared against full rate by --decimation-report
+# Upper bound on full-length float32 temporaries alive at once per analysis call (after warm-up)
+MAX_FULL_LENGTH_TEMPORARIES = {
+    "prepare_signal": 0.1, # Shared normalization + envelope must reuse its scratch buffer
+    "extract_features": 17, # Dominated by the STFTs librosa allocates internally (measured 16.05 at 48kHz and 192kHz)
+}
+BATCH_REPORT_RECORDINGS = 24 # Fixed-duration recordings compared by --batch-report
+BATCH_FEATURE_TOLERANCE = 1e-6 # Largest relative difference allowed between batched and per-recording features
+ENSEMBLE_REPORT_AMPLITUDES = [0.8, 0.2, 0.1, 0.05, 0.03, 0.02] # Beat amplitudes (noise floor 0.02 RMS) swept by --ensemble-report
+ENSEMBLE_REPORT_RECORDINGS = 12 # Recordings per signal and amplitude, at heart rates of 50, 72 and 110 BPM
+ENSEMBLE_REPORT_JITTER = 0.05 # Beat-to-beat variation of the period in the --ensemble-report signals
+MEMORY_REPORT_MINUTES = [10] # Capture lengths simulated by --memory-report
+MEMORY_REPORT_BUDGET_MB = 128 # Memory budget compared with no budget by --memory-report
+MEMORY_REPORT_UNBUDGETED_MINUTES = 10 # Longer captures are only run with the budget (without, they need several GB)
+
+
+# --- Synthetic Signals ---
+def synthesize_signal(kind, sr, duration=app.FIXED_RECORDING_DURATION_SECONDS, seed=BENCHMARK_SEED, bpm=SYNTHETIC_BPM,
+                      beat_amplitude=0.8, beat_jitter=0.0):
+    """
+    Generates a deterministic float32 test signal in [-1, 1]: one channel of the signal the virtual
+    audio device plays (virtual_audio.SyntheticSource), normalized to its peak.
+    - "pulsatile": low-frequency heartbeat-like thumps at `bpm` over a faint noise floor (each period
+      varies by `beat_jitter` of itself, standard deviation)
+    - "non_pulsatile": a continuous, slowly modulated tone over the same noise floor
+    - "noise": the noise floor only
+    """
+    source = SyntheticSource(kind, sr, 1, bpm, seed, beat_amplitude, beat_jitter)
+    y = source.read(int(sr * duration))[:, 0]
+    y /= np.max(np.abs(y))
+    return y
+
+
+def encode_pcm_frames(y, width=app.WIDTH_SAMPLE, frames_per_chunk=app.CHUNK_SIZE):
+    """
+    Encodes a float waveform into little-endian PCM byte chunks, the same shape of data
+    that `AudioWorker` collects from `stream.read` (and the virtual device returns).
+    """
+    raw = encode_pcm(y, width)
+    bytes_per_chunk = frames_per_chunk * width
+    return [raw[i:i + bytes_per_chunk] for i in range(0, len(raw), bytes_per_chunk)]
+
+
+# --- Labeled Recordings ---
+def load_labeled_set(csv_path, with_bpm=False):
+    """
+    Reads a labeled set CSV with `path,label` columns, where label is the expected verdict
+    ("No Sound", "Pulsatile" or "Non-Pulsatile"). Relative paths are resolved against the
+    CSV's folder. Returns a list of (path, label), or (path, label, bpm) with `with_bpm`, from
+    an optional `bpm` column (None where it is missing or empty).
+    """
+    root = os.path.dirname(os.path.abspath(csv_path))
+    with open(csv_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    if with_bpm:
+        return [(os.path.join(root, row["path"]), row["label"].strip(), float(row["bpm"]) if (row.get("bpm") or "").strip() else None)
+                for row in rows]
+    return [(os.path.join(root, row["path"]), row["label"].strip()) for row in rows]
+
+
+def load_wav(path):
+    """
+    Loads a WAV file as a mono float32 waveform (channels are averaged, as in the notebooks).
+    Returns (y, sr).
+    """
+    sr, audio = app.wavfile.read(path)
+    if audio.ndim > 1:
+        audio = np.mean(audio, axis=1)
+    return audio.astype(np.float32), sr
+
+
+def decimation_report(csv_path, rate=DEFAULT_REPORT_ANALYSIS_RATE):
+    """
+    Runs `analyze` on every labeled recording at the recording rate and again with
+    ANALYSIS_SAMPLE_RATE = `rate`, and prints accuracy, agreement and analysis time for both, and
+    the drift of every feature (median relative change; 0 for those in FULL_BANDWIDTH_FEATURES).
+    Returns the dict of per-configuration summaries.
+    """
+    analyzer = app.SoundAnalyzer()
+    if not hasattr(analyzer, "clf"):
+        print(f"Model not found at {app.LOGREG_MODEL_PATH}; cannot evaluate.")
+        return {}
+    labeled = [(load_wav(path), label) for path, label in load_labeled_set(csv_path)]
+
+    saved_rate = app.ANALYSIS_SAMPLE_RATE
+    summaries, verdicts, features = {}, {}, {}
+    try:
+        for name, analysis_rate in (("full", None), (f"{rate}Hz", rate)):
+            app.ANALYSIS_SAMPLE_RATE = analysis_rate
+            start = time.perf_counter()
+            results = [analyzer.analyze(y, sr) for (y, sr), _ in labeled]
+            elapsed = time.perf_counter() - start
+            verdicts[name] = [result["result"] for result in results]
+            features[name] = np.array([result["features"] for result in results], dtype=np.float64)
+            correct = sum(v == label for v, (_, label) in zip(verdicts[name], labeled))
+            summaries[name] = {"accuracy": correct / max(1, len(labeled)), "analysis_s": elapsed}
+    finally:
+        app.ANALYSIS_SAMPLE_RATE = saved_rate
+
+    names = list(verdicts)
+    agreement = sum(a == b for a, b in zip(verdicts[names[0]], verdicts[names[1]])) / max(1, len(labeled))
+    print(f"{len(labeled)} labeled recordings, full bandwidth features: "
+          f"{[k for k, v in app.FULL_BANDWIDTH_FEATURES.items() if v]}")
+    for name, summary in summaries.items():
+        print(f"{name:10s} accuracy {summary['accuracy'] * 100:5.1f}%  analysis {summary['analysis_s']:7.2f} s")
+    print(f"Verdict agreement full vs {names[1]}: {agreement * 100:.1f}%")
+    summaries["agreement"] = agreement
+
+    drift = np.abs(features[names[1]] - features["full"]) / np.maximum(np.abs(features["full"]), 1e-12)
+    summaries["feature_drift"] = {}
+    column = 0
+    for feature in analyzer.feature_recipe:
+        size = app.FEATURE_EXTRACTORS[feature]["size"]
+        summaries["feature_drift"][feature] = float(np.median(drift[:, column:column + size])) if len(labeled) else 0.0
+        column += size
+        print(f"{feature:10s} drift at {names[1]}: {summaries['feature_drift'][feature] * 100:6.1f}%")
+    return summaries
+
+
+def noise_profile_report(csv_path, profile_path):
+    """
+    Runs `analyze` on every labeled recording without and with the noise profile at
+    `profile_path`, and prints for both the verdict accuracy, the sound/no-sound detection
+    accuracy, the mean BPM error (recordings with a `bpm` label) and the analysis time.
+    Returns the dict of per-configuration summaries.
+    """
+    analyzer = app.SoundAnalyzer()
+    if not hasattr(analyzer, "clf"):
+        print(f"Model not found at {app.LOGREG_MODEL_PATH}; cannot evaluate.")
+        return {}
+    profile = NoiseProfile.load(profile_path)
+    labeled = [(load_wav(path), label, bpm) for path, label, bpm in load_labeled_set(csv_path, with_bpm=True)]
+    skipped = [sr for (_, sr), _, _ in labeled if sr != profile.rate]
+    if skipped:
+        print(f"{len(skipped)} recording(s) are not at the profile's {profile.rate}Hz; the profile is not applied to them.")
+
+    saved_profile = analyzer.noise_profile
+    summaries, verdicts = {}, {}
+    try:
+        for name, noise_profile in (("raw", None), ("profile", profile)):
+            analyzer.set_noise_profile(noise_profile)
+            start = time.perf_counter()
+            results = [analyzer.analyze(y, sr) for (y, sr), _, _ in labeled]
+            elapsed = time.perf_counter() - start
+            verdicts[name] = [result["result"] for result in results]
+            bpm_errors = [abs(result["bpm"] - bpm) for result, (_, _, bpm) in zip(results, labeled)
+                          if bpm is not None and result["bpm"] is not None]
+            summaries[name] = {
+                "accuracy": sum(v == label for v, (_, label, _) in zip(verdicts[name], labeled)) / max(1, len(labeled)),
+                "detection_accuracy": sum(result["sound_detected"] == (label != "No Sound")
+                                          for result, (_, label, _) in zip(results, labeled)) / max(1, len(labeled)),
+                "bpm_mae": float(np.mean(bpm_errors)) if bpm_errors else None,
+                "bpm_measured": len(bpm_errors),
+                "analysis_s": elapsed,
+            }
+    finally:
+        analyzer.set_noise_profile(saved_profile)
+
+    print(f"{len(labeled)} labeled recordings, noise profile {profile.summary()}")
+    for name, summary in summaries.items():
+        bpm = f"{summary['bpm_mae']:5.1f} BPM over {summary['bpm_measured']}" if summary["bpm_mae"] is not None else "  n/a"
+        print(f"{name:8s} accuracy {summary['accuracy'] * 100:5.1f}%  detection {summary['detection_accuracy'] * 100:5.1f}%  "
+              f"BPM error {bpm}  analysis {summary['analysis_s']:7.2f} s")
+    agreement = sum(a == b for a, b in zip(verdicts["raw"], verdicts["profile"])) / max(1, len(labeled))
+    print(f"Verdict agreement raw vs profile: {agreement * 100:.1f}%")
+    summaries["agreement"] = agreement
+    return summaries
+
+
+# --- Measurement Helpers ---
+def peak_rss_mb():
+    """
+    Returns the process high-water mark of resident memory in MB.
+    """
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024 # bytes on macOS, KB on Linux
+
+
+def measure(fn, repeat):
+    """
+    Runs `fn` `repeat` times for timing, then once more under tracemalloc to measure
+    allocations. Returns (result, metrics).
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    metrics = {
+        "wall_s": float(np.median(timings)),
+        "wall_min_s": float(np.min(timings)),
+        "peak_alloc_mb": peak / (1024 * 1024),
+        "retained_alloc_mb": current / (1024 * 1024),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    return result, metrics
+
+
+def count_full_length_temporaries(fn, n_samples):
+    """
+    Runs `fn` once to warm up reused buffers, then again under tracemalloc, and returns the
+    peak allocation expressed as a number of full-length float32 arrays.
+    """
+    fn()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (n_samples * np.dtype(np.float32).itemsize)
+
+
+def check_allocations(sr=BENCHMARK_RATES[0]):
+    """
+    Verifies that each analysis stage stays within `MAX_FULL_LENGTH_TEMPORARIES`.
+    Returns a list of failure messages (empty if all stages are within bounds).
+    """
+    analyzer = app.SoundAnalyzer()
+    y = synthesize_signal("pulsatile", sr)
+    stages = {
+        "prepare_signal": lambda: analyzer.prepare_signal(y, sr),
+        "extract_features": lambda: analyzer.extract_features(y, sr),
+    }
+    failures = []
+    for stage, fn in stages.items():
+        count = count_full_length_temporaries(fn, len(y))
+        bound = MAX_FULL_LENGTH_TEMPORARIES[stage]
+        print(f"{stage:20s} {count:6.2f} full-length temporaries (bound {bound})")
+        if count > bound:
+            failures.append(f"{stage}: {count:.2f} full-length temporaries exceeds bound {bound}")
+    return failures
+
+
+def batch_report(sr=BENCHMARK_RATES[0], count=BATCH_REPORT_RECORDINGS):
+    """
+    Compares `extract_features_batch` with one `extract_features` call per recording on `count`
+    synthetic fixed-duration recordings: time, largest relative difference per feature and peak
+    memory per input sample. Returns a list of failure messages (empty if the batched features
+    match within BATCH_FEATURE_TOLERANCE and stay within FEATURE_BATCH_BYTES_PER_SAMPLE).
+    """
+    analyzer = app.SoundAnalyzer()
+    recordings = [synthesize_signal(BENCHMARK_SIGNALS[i % len(BENCHMARK_SIGNALS)], sr, seed=BENCHMARK_SEED + i)
+                  for i in range(count)]
+    analyzer.extract_features_batch(recordings[:1], sr) # Warm up librosa's caches for both paths
+
+    start = time.perf_counter()
+    single = np.array([analyzer.extract_features(y, sr) for y in recordings])
+    single_s = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = analyzer.extract_features_batch(recordings, sr)
+    batch_s = time.perf_counter() - start
+    bytes_per_sample = count_full_length_temporaries(lambda: analyzer.extract_features_batch(recordings[:1], sr),
+                                                     len(recordings[0])) * np.dtype(np.float32).itemsize
+
+    difference = np.max(np.abs(batched - single) / np.maximum(np.abs(single), np.finfo(np.float64).tiny), axis=0)
+    print(f"{count} recordings of {app.FIXED_RECORDING_DURATION_SECONDS}s at {sr}Hz: per recording {single_s:6.2f} s, "
+          f"batched {batch_s:6.2f} s ({single_s / batch_s:.1f}x), {bytes_per_sample:.1f} bytes/sample "
+          f"(bound {analyzer.FEATURE_BATCH_BYTES_PER_SAMPLE})")
+    failures = []
+    column = 0
+    for name in analyzer.feature_recipe:
+        size = app.FEATURE_EXTRACTORS[name]["size"]
+        worst = float(difference[column:column + size].max())
+        print(f"{name:20s} max relative difference {worst:.2e}")
+        if worst > BATCH_FEATURE_TOLERANCE:
+            failures.append(f"{name}: batched features differ by {worst:.2e} (tolerance {BATCH_FEATURE_TOLERANCE})")
+        column += size
+    if bytes_per_sample > analyzer.FEATURE_BATCH_BYTES_PER_SAMPLE:
+        failures.append(f"extract_features_batch: {bytes_per_sample:.1f} bytes/sample exceeds "
+                        f"FEATURE_BATCH_BYTES_PER_SAMPLE = {analyzer.FEATURE_BATCH_BYTES_PER_SAMPLE}")
+    return failures
+
+
+def ensemble_report(sr=BENCHMARK_RATES[0], amplitudes=ENSEMBLE_REPORT_AMPLITUDES, count=ENSEMBLE_REPORT_RECORDINGS):
+    """
+    Sweeps the beat amplitude of synthetic pulsatile recordings (with beat-to-beat jitter) and
+    counts "Pulsatile" verdicts before and after the beat-synchronous averaging (with
+    ENSEMBLE_OVERRIDE on), plus the false ones on noise and non-pulsatile recordings. Returns a
+    list of failure messages (empty unless the averaging turned a noise or non-pulsatile
+    recording into "Pulsatile").
+    """
+    analyzer = app.SoundAnalyzer()
+    if not hasattr(analyzer, "clf"):
+        print(f"Model not found at {app.LOGREG_MODEL_PATH}; cannot evaluate.")
+        return []
+    print(f"{count} recordings of {app.FIXED_RECORDING_DURATION_SECONDS}s at {sr}Hz per row, "
+          f"consistency threshold {app.ENSEMBLE_MIN_CONSISTENCY}")
+    failures = []
+    saved_override = app.ENSEMBLE_OVERRIDE
+    app.ENSEMBLE_OVERRIDE = True
+    try:
+        for kind, amplitude in [("noise", None), ("non_pulsatile", None)] + [("pulsatile", a) for a in amplitudes]:
+            before = after = 0
+            consistency, bpm_errors, elapsed = [], [], 0.0
+            for i in range(count):
+                bpm = (50, 72, 110)[i % 3]
+                y = synthesize_signal(kind, sr, seed=BENCHMARK_SEED + i, bpm=bpm, beat_amplitude=amplitude or 0.8,
+                                      beat_jitter=ENSEMBLE_REPORT_JITTER)
+                start = time.perf_counter()
+                result = analyzer.analyze(y, sr)
+                elapsed += time.perf_counter() - start
+                ensemble = result["ensemble"]
+                before += (ensemble["replaced"] if ensemble and ensemble["replaced"] else result["result"]) == "Pulsatile"
+                after += result["result"] == "Pulsatile"
+                if ensemble:
+                    consistency.append(ensemble["consistency"])
+                if result["result"] == "Pulsatile" and result["bpm"]:
+                    bpm_errors.append(abs(result["bpm"] - bpm))
+            label = kind if amplitude is None else f"{kind} {amplitude:g}"
+            spread = f"{min(consistency):.2f}-{max(consistency):.2f}" if consistency else "n/a"
+            bpm = f"{np.mean(bpm_errors):5.1f}" if bpm_errors else "  n/a"
+            print(f"{label:16s} Pulsatile {before:3d} -> {after:3d} of {count}  consistency {spread:9s}  "
+                  f"BPM error {bpm}  analysis {1000 * elapsed / count:6.1f} ms")
+            if kind != "pulsatile" and after > before:
+                failures.append(f"{kind}: beat-synchronous averaging made {after - before} recording(s) Pulsatile")
+    finally:
+        app.ENSEMBLE_OVERRIDE = saved_override
+    return failures
+
+
+def ensemble_labeled_report(csv_path):
+    """
+    Runs `analyze` on every labeled recording and counts the verdicts the beat-synchronous
+    average would turn into "Pulsatile" (ENSEMBLE_OVERRIDE): per label, and the consistency of
+    the average on the recordings it would get wrong. Every change on a recording not labeled
+    "Pulsatile" is a false positive. Returns the dict of per-label counts.
+    """
+    analyzer = app.SoundAnalyzer()
+    if not hasattr(analyzer, "clf"):
+        print(f"Model not found at {app.LOGREG_MODEL_PATH}; cannot evaluate.")
+        return {}
+    labeled = load_labeled_set(csv_path)
+    summary = {}
+    false_consistency = []
+    for path, label in labeled:
+        y, sr = load_wav(path)
+        result = analyzer.analyze(y, sr)
+        ensemble = result["ensemble"]
+        verdict = ensemble["replaced"] if ensemble and ensemble["replaced"] else result["result"]
+        changed = bool(ensemble and ensemble["pulsatile"] and verdict != "Pulsatile")
+        counts = summary.setdefault(label, {"recordings": 0, "changed": 0})
+        counts["recordings"] += 1
+        counts["changed"] += changed
+        if changed and label != "Pulsatile":
+            false_consistency.append(ensemble["consistency"])
+    print(f"{len(labeled)} labeled recordings, consistency threshold {app.ENSEMBLE_MIN_CONSISTENCY}, "
+          f"at least {app.ENSEMBLE_MIN_BEATS} beats")
+    for label, counts in sorted(summary.items()):
+        kind = "recovered" if label == "Pulsatile" else "false positives"
+        print(f"{label:15s} {counts['changed']:4d} of {counts['recordings']:4d} turned Pulsatile ({kind})")
+    negatives = sum(counts["recordings"] for label, counts in summary.items() if label != "Pulsatile")
+    if negatives:
+        print(f"False positive rate {len(false_consistency) / negatives * 100:.1f}%"
+              + (f", consistency {min(false_consistency):.2f}-{max(false_consistency):.2f}" if false_consistency else ""))
+    return summary
+
+
+def memory_report(sr=BENCHMARK_RATES[0], minutes=MEMORY_REPORT_MINUTES, budget_mb=MEMORY_REPORT_BUDGET_MB):
+    """
+    Runs long captures (a synthetic pulsatile recording, repeated) through the capture buffer,
+    decode, Mel spectrogram, analysis, plots and zoom pyramids, without and with a memory
+    budget, and prints the peak RSS of every session with the MB spilled to disk. Returns a
+    list of failure messages (empty if the budgeted sessions got the verdicts and length of
+    the unbudgeted ones).
+    """
+    analyzer = app.SoundAnalyzer()
+    if not hasattr(analyzer, "clf"):
+        print(f"Model not found at {app.LOGREG_MODEL_PATH}; cannot evaluate.")
+        return []
+    plot_target = make_offscreen_plot_target()
+    controller = app.AudioController(probe_devices=False)
+    controller.device_params = {'index': -1, 'name': 'benchmark', 'rate': sr, 'channels': 1,
+                                'format': app.TARGET_FORMAT, 'max_input_channels': 1}
+    chunks = encode_pcm_frames(synthesize_signal("pulsatile", sr))
+    if not reset_peak_rss():
+        print("Peak RSS cannot be reset on this system: every session reports the peak of the process so far.")
+    spill_dir = tempfile.mkdtemp(prefix="memory_report_")
+    failures = []
+    try:
+        for length in minutes:
+            n_chunks = int(np.ceil(length * 60 / app.FIXED_RECORDING_DURATION_SECONDS)) * len(chunks)
+            outcomes = {}
+            for limit_mb in (budget_mb, None): # Budgeted first, so its peak is not measured above the memory the other run left
+                if limit_mb is None and length > MEMORY_REPORT_UNBUDGETED_MINUTES:
+                    continue
+                budget = MemoryBudget(limit_mb * MB, spill_dir) if limit_mb else None
+                controller.memory_budget = budget
+                gc.collect()
+                start_rss = current_rss_bytes()
+                reset_peak_rss()
+                start = time.perf_counter()
+                frames = SpillBuffer(budget) if budget else []
+                for i in range(n_chunks):
+                    frames.append(bytes(bytearray(chunks[i % len(chunks)]))) # A new buffer per chunk, as stream.read returns
+                if budget:
+                    frames = frames.finish()
+                y = controller.split_channels(controller.decode_frames(frames), 1)
+                S_mel_db = controller.compute_mel_spectrogram(y, sr)
+                verdicts = [result["result"] for result in analyzer.analyze_channels(y, sr, controller.analysis_waveform(y, sr))]
+                app.MainWindow.update_analysis_plots(plot_target, y, sr, S_mel_db)
+                app.build_pyramids(y, sr, S_mel_db, app.analysis_rate(sr), app.SPEC_HOP_LENGTH)
+                elapsed = time.perf_counter() - start
+                peak = peak_rss_bytes()
+                spilled = budget.spilled_bytes() if budget else 0
+                label = f"{limit_mb} MB budget" if limit_mb else "no budget"
+                outcomes[label] = (tuple(verdicts), y.shape[-1])
+                print(f"{length:4d} min at {sr}Hz, {label:>14s}: peak RSS {peak / MB:7.0f} MB "
+                      f"(+{(peak - start_rss) / MB:5.0f} MB), {spilled / MB:6.0f} MB spilled, {elapsed:6.1f} s  {', '.join(verdicts)}")
+                del frames, y, S_mel_db
+            if len(outcomes) == 2 and len(set(outcomes.values())) > 1:
+                failures.append(f"{length} min: {outcomes}")
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    return failures
+
+
+def make_offscreen_plot_target():
+    """
+    Builds the minimum set of widgets `MainWindow.update_analysis_plots` draws into,
+    without constructing a full `MainWindow` (which would probe for audio devices).
+    """
+    from PyQt5.QtWidgets import QApplication, QFrame
+    qt_app = QApplication.instance() or QApplication([])
+    target = SimpleNamespace(
+        analysis_canvas_1=app.FigureCanvas(app.Figure(figsize=(8, 6), dpi=100)),
+        analysis_canvas_2=app.FigureCanvas(app.Figure(figsize=(8, 6), dpi=100)),
+        result_label=None,
+        result_frame=QFrame(),
+    )
+    target._qt_app = qt_app # Keep the application alive as long as the target
+    return target
+
+
+# --- Benchmark Runner ---
+def run_benchmarks(rates=BENCHMARK_RATES, signals=BENCHMARK_SIGNALS, repeat=BENCHMARK_REPEAT):
+    """
+    Runs every stage for every (rate, signal) pair and returns a dict of results keyed
+    by "<rate>/<signal>/<stage>".
+    """
+    analyzer = app.SoundAnalyzer()
+    model_loaded = hasattr(analyzer, "clf")
+    if not model_loaded:
+        print(f"Model not found at {app.LOGREG_MODEL_PATH}; skipping the analyze_audio stage.")
+    plot_target = make_offscreen_plot_target()
+
+    results = {}
+    for sr in rates:
+        controller = app.AudioController(probe_devices=False)
+        controller.device_params = {'index': -1, 'name': 'benchmark', 'rate': sr,
+                                    'channels': app.TARGET_CHANNELS, 'format': app.TARGET_FORMAT,
+                                    'max_input_channels': app.TARGET_CHANNELS}
+        for kind in signals:
+            frames = encode_pcm_frames(synthesize_signal(kind, sr))
+            stages = []
+
+            y, m = measure(lambda: controller.decode_frames(frames), repeat)
+            stages.append(("decode", m))
+            S_mel_db, m = measure(lambda: controller.compute_mel_spectrogram(y, sr), repeat)
+            stages.append(("mel_spectrogram", m))
+            _, m = measure(lambda: analyzer.extract_features(y, sr), repeat)
+            stages.append(("extract_features", m))
+            if model_loaded:
+                _, m = measure(lambda: analyzer.analyze_audio(y, sr), repeat)
+                stages.append(("analyze_audio", m))
+            _, m = measure(lambda: app.MainWindow.update_analysis_plots(plot_target, y, sr, S_mel_db), repeat)
+            stages.append(("render_plots", m))
+
+            for stage, m in stages:
+                key = f"{sr}/{kind}/{stage}"
+                results[key] = m
+                print(f"{key:45s} {m['wall_s'] * 1000:9.1f} ms  {m['peak_alloc_mb']:8.1f} MB alloc  {m['peak_rss_mb']:8.1f} MB rss")
+    return results
+
+
+def environment_info():
+    """
+    Records the software versions and configuration that the results depend on.
+    """
+    import scipy
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "librosa": app.librosa.__version__,
+        "config": {
+            "SPEC_N_FFT": app.SPEC_N_FFT, "SPEC_HOP_LENGTH": app.SPEC_HOP_LENGTH,
+            "SPEC_N_MELS": app.SPEC_N_MELS, "SPEC_WINDOW": app.SPEC_WINDOW,
+            "WIDTH_SAMPLE": app.WIDTH_SAMPLE, "CHUNK_SIZE": app.CHUNK_SIZE,
+            "FIXED_RECORDING_DURATION_SECONDS": app.FIXED_RECORDING_DURATION_SECONDS,
+        },
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Returns a list of human readable regression messages (empty if none).
+    Only wall time and allocation peaks are compared; RSS is process-wide and informational.
+    """
+    regressions = []
+    for key, m in results.items():
+        base = baseline.get("results", {}).get(key)
+        if not base:
+            continue
+        for metric in ("wall_s", "peak_alloc_mb"):
+            if base[metric] > 0 and m[metric] > base[metric] * (1 + tolerance):
+                change = (m[metric] / base[metric] - 1) * 100
+                regressions.append(f"{key}: {metric} {base[metric]:.4g} -> {m[metric]:.4g} (+{change:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the objective tinnitus analysis pipeline.")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--rates", type=int, nargs="+", default=BENCHMARK_RATES)
+    parser.add_argument("--signals", nargs="+", default=BENCHMARK_SIGNALS, choices=BENCHMARK_SIGNALS)
+    parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT)
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--check-allocations", action="store_true",
+                        help="Only check the number of full-length temporaries per analysis stage")
+    parser.add_argument("--batch-report", action="store_true",
+                        help="Compare batched and per-recording feature extraction (speed, agreement, memory)")
+    parser.add_argument("--ensemble-report", action="store_true",
+                        help="Sweep the beat amplitude and compare verdicts before and after beat-synchronous averaging")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="Compare the peak RSS of long captures without and with a memory budget")
+    parser.add_argument("--minutes", type=int, nargs="+", default=MEMORY_REPORT_MINUTES,
+                        help="Capture lengths used by --memory-report")
+    parser.add_argument("--budget-mb", type=int, default=MEMORY_REPORT_BUDGET_MB, help="Memory budget used by --memory-report")
+    parser.add_argument("--decimation-report", metavar="LABELS_CSV",
+                        help="Compare full-rate and decimated analysis on a labeled set (path,label CSV)")
+    parser.add_argument("--analysis-rate", type=int, default=DEFAULT_REPORT_ANALYSIS_RATE,
+                        help="Analysis rate used by --decimation-report")
+    parser.add_argument("--noise-report", metavar="LABELS_CSV",
+                        help="Compare analysis without and with --noise-profile on a labeled set (path,label[,bpm] CSV)")
+    parser.add_argument("--noise-profile", help="Noise profile (.npz) used by --noise-report")
+    parser.add_argument("--ensemble-labeled-report", metavar="LABELS_CSV",
+                        help="Count the verdicts beat-synchronous averaging would change on a labeled set (path,label CSV)")
+    args = parser.parse_args(argv)
+
+    if args.decimation_report:
+        decimation_report(args.decimation_report, args.analysis_rate)
+        return 0
+
+    if args.noise_report:
+        if not args.noise_profile:
+            parser.error("--noise-report needs --noise-profile")
+        noise_profile_report(args.noise_report, args.noise_profile)
+        return 0
+
+    if args.ensemble_labeled_report:
+        ensemble_labeled_report(args.ensemble_labeled_report)
+        return 0
+
+    if args.check_allocations:
+        failures = check_allocations()
+        for line in failures:
+            print("  " + line)
+        return 1 if failures else 0
+
+    if args.ensemble_report:
+        failures = []
+        for rate in args.rates:
+            failures += ensemble_report(rate)
+        for line in failures:
+            print("  " + line)
+        return 1 if failures else 0
+
+    if args.memory_report:
+        failures = []
+        for rate in args.rates:
+            failures += memory_report(rate, args.minutes, args.budget_mb)
+        for line in failures:
+            print("  " + line)
+        return 1 if failures else 0
+
+    if args.batch_report:
+        failures = []
+        for rate in args.rates:
+            failures += batch_report(rate)
+        for line in failures:
+            print("  " + line)
+        return 1 if failures else 0
+
+    results = run_benchmarks(args.rates, args.signals, args.repeat)
+    report = {"environment": environment_info(), "results": results}
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}. Run with --save-baseline first.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("environment") != report["environment"]:
+        print("\nWarning: baseline was recorded with a different environment/configuration.")
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print("  " + line)
+        return 1
+    print(f"\nNo regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+Audio capture in a dedicated process with a shared-memory ring buffer.
+
+PortAudio is serviced by its own process (started with the "spawn" method, so it does not
+inherit the Qt/Matplotlib state of the GUI) and, where permitted, real-time scheduling.
+The capture process writes raw PCM into a `multiprocessing.shared_memory` ring. Only the
+cursors and counters live in the ring's small header; status messages (opened, error,
+finished) go through a multiprocessing queue. Readers in the GUI process take zero-copy
+memoryviews of the ring, so a slow redraw or a long analysis in the GUI can no longer hold
+the GIL while `stream.read` is due.
+
+With `virtual_audio` settings the capture process reads a virtual_audio.VirtualPyAudio device
+instead of PortAudio, so headless runs exercise this same capture path.
+
+This module deliberately imports nothing from the GUI script.
+"""
+import os
+import queue
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+# Ring header: uint64 slots in front of the data area
+HEADER_SLOTS = 4
+SLOT_WRITE_CURSOR = 0 # Total bytes written since the start (monotonic)
+SLOT_INPUT_OVERFLOWS = 1 # PortAudio input overflows seen by the capture process
+SLOT_STATE = 2 # One of the STATE_* values below
+HEADER_SIZE = HEADER_SLOTS * 8
+
+STATE_STARTING = 0
+STATE_RECORDING = 1
+STATE_FINISHED = 2
+STATE_ERROR = 3
+
+OVERFLOW_TOLERANCE_S = 0.1 # Stream time unaccounted for by the frames read before it counts as an overflow
+
+
+class SharedRingBuffer:
+    """
+    Single-producer ring of raw bytes in shared memory. The write cursor is a monotonic
+    byte count, so each reader keeps its own read cursor and can detect being lapped.
+    """
+    def __init__(self, shm, capacity, owner):
+        self.shm = shm
+        self.capacity = capacity
+        self._owner = owner
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.uint64, buffer=shm.buf[:HEADER_SIZE])
+        self.data = shm.buf[HEADER_SIZE:HEADER_SIZE + capacity]
+
+    @classmethod
+    def create(cls, capacity):
+        """
+        Allocates a new ring holding `capacity` bytes of audio.
+        """
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + capacity)
+        ring = cls(shm, capacity, owner=True)
+        ring.header[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, capacity):
+        """
+        Opens an existing ring by its shared memory name (used by the capture process).
+        """
+        return cls(shared_memory.SharedMemory(name=name), capacity, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def write_cursor(self):
+        return int(self.header[SLOT_WRITE_CURSOR])
+
+    @property
+    def input_overflows(self):
+        return int(self.header[SLOT_INPUT_OVERFLOWS])
+
+    @property
+    def state(self):
+        return int(self.header[SLOT_STATE])
+
+    def write(self, data):
+        """
+        Copies `data` into the ring (wrapping around) and then publishes the new cursor.
+        """
+        n = len(data)
+        if n > self.capacity:
+            data = data[-self.capacity:] # Only the newest bytes can fit
+            self.header[SLOT_WRITE_CURSOR] += n - self.capacity
+            n = self.capacity
+        cursor = self.write_cursor
+        pos = cursor % self.capacity
+        first = min(n, self.capacity - pos)
+        self.data[pos:pos + first] = data[:first]
+        if first < n:
+            self.data[:n - first] = data[first:]
+        self.header[SLOT_WRITE_CURSOR] = cursor + n # Publish only after the data is in place
+
+    def views(self, start, end):
+        """
+        Zero-copy memoryviews of the bytes in [start, end) (one or two segments when the range
+        wraps). The caller must release the views before the ring is closed.
+        Raises ValueError if the range has already been overwritten.
+        """
+        if self.write_cursor - start > self.capacity:
+            raise ValueError(f"Ring overrun: {self.write_cursor - start - self.capacity} bytes lost")
+        pos, n = start % self.capacity, end - start
+        first = min(n, self.capacity - pos)
+        views = [self.data[pos:pos + first]]
+        if first < n:
+            views.append(self.data[:n - first])
+        return views
+
+    def close(self):
+        """
+        Detaches from the shared memory (and frees it if this process created it).
+        """
+        del self.header
+        self.data.release()
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+class OverflowCounter:
+    """
+    Counts input overflows of a stream read with `exception_on_overflow=False`, so every buffer
+    PortAudio delivers is kept. The stream clock (`get_time()`) advances with the audio the
+    device captured; whatever it is ahead of the frames read plus the frames waiting in the
+    stream (`get_read_available()`) was lost to an overflow.
+    """
+    def __init__(self, stream, rate, tolerance_s=OVERFLOW_TOLERANCE_S):
+        self.stream = stream
+        self.rate = rate
+        self.tolerance = (tolerance_s + stream.get_input_latency()) * rate
+        self.started_at = stream.get_time()
+        self.frames_read = 0
+        self.frames_lost = 0
+        self.overflows = 0
+
+    def read(self, frames):
+        """
+        Records `frames` more frames read from the stream. Returns True if audio was lost
+        before them.
+        """
+        self.frames_read += frames
+        captured = (self.stream.get_time() - self.started_at) * self.rate
+        lost = captured - self.frames_read - self.stream.get_read_available() - self.frames_lost
+        if lost <= self.tolerance:
+            return False
+        self.frames_lost += int(lost)
+        self.overflows += 1
+        return True
+
+
+def _enable_realtime_scheduling(priority):
+    """
+    Requests SCHED_FIFO for the capture process, falling back to a higher nice level.
+    Both need privileges (e.g. `rtprio`/`nice` limits in /etc/security/limits.conf).
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        return "SCHED_FIFO"
+    except (AttributeError, PermissionError, OSError):
+        pass
+    try:
+        os.nice(-10)
+        return "nice -10"
+    except (AttributeError, PermissionError, OSError):
+        return "default"
+
+
+def _capture_main(ring_name, capacity, device_params, chunk_size, duration, rt_priority, stop_event, status_queue,
+                  virtual_audio=None):
+    """
+    Entry point of the capture process: reads the input stream into the ring until
+    `duration` seconds of audio were captured or `stop_event` is set.
+    """
+    ring = SharedRingBuffer.attach(ring_name, capacity)
+    p_record = None
+    stream = None
+    try:
+        scheduling = _enable_realtime_scheduling(rt_priority)
+        if virtual_audio is None:
+            import pyaudio # Imported here so only the capture process loads PortAudio
+            p_record = pyaudio.PyAudio()
+        else:
+            from virtual_audio import VirtualPyAudio
+            p_record = VirtualPyAudio(**virtual_audio)
+        stream = p_record.open(format=device_params['format'],
+                               channels=device_params['channels'],
+                               rate=device_params['rate'],
+                               input=True,
+                               frames_per_buffer=chunk_size,
+                               input_device_index=device_params['index'])
+        overflows = OverflowCounter(stream, device_params['rate'])
+        ring.header[SLOT_STATE] = STATE_RECORDING
+        status_queue.put(("recording", scheduling))
+        # Measured in captured audio (as AudioWorker does), so a sped-up virtual device records the same length
+        while not stop_event.is_set() and overflows.frames_read < duration * device_params['rate']:
+            data = stream.read(chunk_size, exception_on_overflow=False) # Never drop a buffer that was delivered
+            ring.write(data)
+            if overflows.read(chunk_size):
+                ring.header[SLOT_INPUT_OVERFLOWS] += 1
+        ring.header[SLOT_STATE] = STATE_FINISHED
+        status_queue.put(("finished", None))
+    except Exception as e:
+        ring.header[SLOT_STATE] = STATE_ERROR
+        status_queue.put(("error", str(e)))
+    finally:
+        if stream: stream.stop_stream(); stream.close()
+        if p_record: p_record.terminate()
+        ring.close()
+
+
+class CaptureProcess:
+    """
+    Owns the capture process, its ring buffer and its status channel. `virtual_audio` are the
+    keyword arguments of a VirtualPyAudio to capture from instead of PortAudio.
+    """
+    def __init__(self, device_params, chunk_size, duration, ring_capacity, rt_priority=70, virtual_audio=None):
+        self._ctx = mp.get_context("spawn") # Never fork the Qt process
+        self.ring = SharedRingBuffer.create(ring_capacity)
+        self._stop_event = self._ctx.Event()
+        self._status_queue = self._ctx.Queue()
+        self._process = self._ctx.Process(
+            target=_capture_main, name="AudioCapture", daemon=True,
+            args=(self.ring.name, ring_capacity, dict(device_params), chunk_size, duration,
+                  rt_priority, self._stop_event, self._status_queue, virtual_audio))
+
+    def start(self):
+        self._process.start()
+
+    def stop(self):
+        """
+        Asks the capture process to finish after the current buffer.
+        """
+        self._stop_event.set()
+
+    def poll_status(self):
+        """
+        Returns the next (kind, detail) status message, or None if there is none.
+        """
+        try:
+            return self._status_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def is_alive(self):
+        return self._process.is_alive()
+
+    def close(self, timeout=2.0):
+        """
+        Stops and joins the process, then frees the shared memory.
+        """
+        self.stop()
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self.ring.close()
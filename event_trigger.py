@@ -0,0 +1,159 @@
+"""
+Event-triggered capture: keep only the parts of a continuous stream that have activity.
+
+`ActivityTrigger` looks at every capture block (one `stream.read`) and decides whether it
+has activity, from two cheap statistics computed per channel:
+- energy: the block RMS is more than `relative_threshold` above the tracked noise floor
+  (the floor follows quiet blocks down at once and drifts up slowly, so a new steady
+  background becomes the floor after a while; it starts at `noise_floor`, or at the first
+  block, so a steady sound present from the start counts as background);
+- variation: the RMS of its `window_ms` windows varies by more than `variation_threshold`
+  (standard deviation over mean), which catches pulses that barely change the block energy.
+Both are computed on the decoded block with one einsum, so the trigger costs a small
+fraction of the `SoundAnalyzer` pipeline.
+
+`EventSegmenter` keeps the last `pre_roll_s` of audio in a ring of blocks. When a block
+triggers, a segment starts with that pre-roll, continues while blocks keep triggering and
+ends once `post_roll_s` passed without activity (or at `max_segment_s`). Only finished
+segments leave the segmenter, so analysis and storage scale with the time that had activity.
+
+This module deliberately imports nothing from the GUI script.
+"""
+from collections import deque
+import numpy as np
+
+from live_broadcast import decode_pcm
+
+
+class ActivityTrigger:
+    """
+    Per-block activity decision with an adaptive noise floor (one per channel).
+    """
+    def __init__(self, rate, channels, width, relative_threshold=0.5, variation_threshold=0.3, window_ms=50,
+                 floor_rise_per_s=0.02, noise_floor=None, min_floor=1e-5):
+        self.rate = rate
+        self.channels = channels
+        self.width = width
+        self.relative_threshold = relative_threshold
+        self.variation_threshold = variation_threshold
+        self.window = max(1, int(rate * window_ms / 1000))
+        self.floor_rise_per_s = floor_rise_per_s
+        self.min_floor = min_floor
+        self.floor = None if noise_floor is None else np.full(channels, max(noise_floor, min_floor)) # Noise floor RMS per channel
+
+    def is_active(self, data):
+        """
+        True if the raw PCM block `data` has activity on any channel.
+        """
+        y = decode_pcm(data, self.width, self.channels)
+        n_windows = len(y) // self.window
+        if n_windows == 0:
+            return False
+        windows = y[:n_windows * self.window].reshape(n_windows, self.window, self.channels)
+        energy = np.einsum('ijk,ijk->ik', windows, windows) / self.window # Mean square per window and channel
+        window_rms = np.sqrt(energy)
+        block_rms = np.sqrt(energy.mean(axis=0))
+        mean_rms = window_rms.mean(axis=0)
+        variation = np.divide(window_rms.std(axis=0), mean_rms, out=np.zeros_like(mean_rms), where=mean_rms > 0)
+
+        if self.floor is None:
+            self.floor = np.maximum(block_rms, self.min_floor)
+        active = (block_rms > self.floor * (1 + self.relative_threshold)) | (variation > self.variation_threshold)
+        # Minimum tracking: down at once, up by floor_rise_per_s (per second of audio)
+        rise = (1 + self.floor_rise_per_s) ** (len(y) / self.rate)
+        self.floor = np.maximum(np.minimum(block_rms, self.floor * rise), self.min_floor)
+        return bool(active.any())
+
+
+class Segment:
+    """
+    A finished segment: its raw blocks and where it sits in the stream (seconds since the start).
+    """
+    def __init__(self, blocks, start_s, duration_s):
+        self.blocks = blocks
+        self.start_s = start_s
+        self.duration_s = duration_s
+
+
+class EventSegmenter:
+    """
+    Cuts a stream of raw PCM blocks into triggered segments with pre- and post-roll.
+    """
+    def __init__(self, trigger, frame_size, pre_roll_s=2.0, post_roll_s=3.0, max_segment_s=60.0):
+        self.trigger = trigger
+        self.frame_size = frame_size
+        bytes_per_s = trigger.rate * frame_size
+        self.pre_roll_bytes = int(pre_roll_s * trigger.rate) * frame_size
+        self.post_roll_bytes = int(post_roll_s * bytes_per_s)
+        self.max_segment_bytes = int(max_segment_s * bytes_per_s)
+        self._ring = deque() # Recent blocks, kept while they are within the pre-roll
+        self._ring_bytes = 0
+        self._segment = None # Blocks of the segment in progress
+        self._segment_bytes = 0
+        self._segment_start = 0 # Stream offset (bytes) of the segment in progress
+        self._quiet_bytes = 0 # Audio since the last active block of the segment in progress
+        self._position = 0 # Bytes seen so far
+        self.stats = {"blocks": 0, "active_blocks": 0, "bytes_in": 0, "bytes_out": 0, "segments": 0}
+
+    def feed(self, data):
+        """
+        Takes the next block and returns the list of segments it finishes (usually empty).
+        """
+        active = self.trigger.is_active(data)
+        self.stats["blocks"] += 1
+        self.stats["active_blocks"] += active
+        self.stats["bytes_in"] += len(data)
+        finished = []
+        if self._segment is None and active:
+            self._start_segment()
+        if self._segment is not None:
+            self._segment.append(data)
+            self._segment_bytes += len(data)
+            self._quiet_bytes = 0 if active else self._quiet_bytes + len(data)
+            if self._quiet_bytes >= self.post_roll_bytes:
+                finished.append(self._finish_segment())
+            elif self._segment_bytes >= self.max_segment_bytes:
+                finished.append(self._finish_segment())
+                if active:
+                    self._start_segment(pre_roll=False) # Activity goes on: continue in a new segment
+        else:
+            self._ring.append(data)
+            self._ring_bytes += len(data)
+            while self._ring and self._ring_bytes - len(self._ring[0]) >= self.pre_roll_bytes:
+                self._ring_bytes -= len(self._ring.popleft())
+        self._position += len(data)
+        return finished
+
+    def flush(self):
+        """
+        Ends the stream: returns the segment in progress (None if there is none).
+        """
+        return self._finish_segment() if self._segment is not None else None
+
+    def _start_segment(self, pre_roll=True):
+        blocks = list(self._ring) if pre_roll else []
+        if blocks:
+            excess = self._ring_bytes - self.pre_roll_bytes # Trim the oldest block to exactly the pre-roll
+            if excess > 0:
+                blocks[0] = blocks[0][excess - excess % self.frame_size:]
+        self._segment = blocks
+        self._segment_bytes = sum(len(block) for block in blocks)
+        self._segment_start = self._position - self._segment_bytes
+        self._quiet_bytes = 0
+        self._ring.clear()
+        self._ring_bytes = 0
+
+    def _finish_segment(self):
+        bytes_per_s = self.trigger.rate * self.frame_size
+        segment = Segment(self._segment, self._segment_start / bytes_per_s, self._segment_bytes / bytes_per_s)
+        self.stats["segments"] += 1
+        self.stats["bytes_out"] += self._segment_bytes
+        self._segment = None
+        self._segment_bytes = 0
+        return segment
+
+    def kept_fraction(self):
+        """
+        Share of the audio seen so far that left in segments.
+        """
+        return self.stats["bytes_out"] / self.stats["bytes_in"] if self.stats["bytes_in"] else 0.0
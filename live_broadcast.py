@@ -0,0 +1,496 @@
+"""
+Live broadcast of the recording to remote viewers.
+
+While a recording runs, the `Broadcaster` publishes over TCP:
+- the RMS envelope (one value per channel every ENVELOPE_WINDOW_MS),
+- a decimated waveform (min/max pairs, WAVEFORM_PAIRS_PER_S per second),
+- Mel spectrogram columns (MEL_BANDS bands, quantized to 8 bits),
+- state changes and the final `SoundAnalyzer` verdict.
+
+The capture path only calls `feed()`, which queues the raw chunk and returns; decoding and
+the envelope/waveform/Mel computations run on the broadcaster's own thread. If that thread
+falls behind, chunks are dropped instead of blocking. Every client has its own send queue
+with a byte limit: when a slow viewer fills it, its oldest live frames are dropped (state and
+verdict frames are always kept), so one viewer can never stall capture or the other viewers.
+
+Framing: every message is a 20-byte little-endian header (magic b"OT", version, message
+type, sequence number, timestamp, payload length) followed by the payload. HELLO, STATE and
+VERDICT payloads are UTF-8 JSON; ENVELOPE, WAVEFORM and MEL payloads are a small struct
+header followed by a numpy array (see the encode_* functions).
+
+    python live_broadcast.py view --host 192.168.1.20        # text viewer
+    python live_broadcast.py demo --port 8766                 # loopback stand-in fed with a virtual device
+
+This module deliberately imports nothing from the GUI script.
+"""
+import sys
+import json
+import time
+import queue
+import socket
+import struct
+import argparse
+import threading
+from collections import deque
+import numpy as np
+
+# --- Broadcast Configuration ---
+BROADCAST_HOST = "127.0.0.1"
+BROADCAST_PORT = 8766
+CLIENT_QUEUE_BYTES = 1024 * 1024 # Per-client send queue; oldest live frames are dropped beyond this
+MAX_PENDING_CHUNKS = 64 # Captured chunks waiting for the broadcaster thread; newer chunks are dropped beyond this
+SEND_TIMEOUT_S = 5.0 # A client that accepts nothing for this long is disconnected
+ENVELOPE_WINDOW_MS = 50 # Same window as the sound detection
+WAVEFORM_PAIRS_PER_S = 200
+MEL_N_FFT = 2048
+MEL_HOP = 2048
+MEL_BANDS = 64
+MEL_DB_FLOOR = -100.0 # dB (re. a full-scale sine) mapped to 0; 0 dB is mapped to 255
+
+# --- Framing ---
+MAGIC = b"OT"
+VERSION = 1
+HEADER = struct.Struct("<2sBBIdI") # magic, version, type, sequence, timestamp, payload length
+MSG_HELLO, MSG_STATE, MSG_ENVELOPE, MSG_WAVEFORM, MSG_MEL, MSG_VERDICT = range(1, 7)
+MSG_NAMES = {MSG_HELLO: "hello", MSG_STATE: "state", MSG_ENVELOPE: "envelope", MSG_WAVEFORM: "waveform",
+             MSG_MEL: "mel", MSG_VERDICT: "verdict"}
+LIVE_MESSAGES = {MSG_ENVELOPE, MSG_WAVEFORM, MSG_MEL} # May be dropped for a slow client
+ENVELOPE_HEADER = struct.Struct("<HI") # channels, index of the first window
+WAVEFORM_HEADER = struct.Struct("<HIH") # channels, index of the first pair, samples per pair
+MEL_HEADER = struct.Struct("<HHI") # channels, bands, index of the first column
+
+
+def encode_frame(msg_type, seq, payload, timestamp=None):
+    return HEADER.pack(MAGIC, VERSION, msg_type, seq, time.time() if timestamp is None else timestamp, len(payload)) + payload
+
+
+def encode_json(obj):
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def encode_envelope(rms, first):
+    """
+    `rms` is (windows, channels) in [0, 1]; sent as float16.
+    """
+    return ENVELOPE_HEADER.pack(rms.shape[1], first) + rms.astype('<f2').tobytes()
+
+
+def encode_waveform(minmax, first, block):
+    """
+    `minmax` is (pairs, channels, 2) in [-1, 1]; sent as int16.
+    """
+    return WAVEFORM_HEADER.pack(minmax.shape[1], first, block) + np.round(minmax * 32767).astype('<i2').tobytes()
+
+
+def encode_mel(mel_db, first):
+    """
+    `mel_db` is (columns, channels, bands) in dB re. a full-scale sine; sent as uint8.
+    """
+    scaled = np.clip((mel_db - MEL_DB_FLOOR) / -MEL_DB_FLOOR, 0, 1) * 255
+    return MEL_HEADER.pack(mel_db.shape[1], mel_db.shape[2], first) + np.round(scaled).astype(np.uint8).tobytes()
+
+
+def decode_payload(msg_type, payload):
+    """
+    Inverse of the encode_* functions: JSON messages give a dict/list, live messages give
+    (first index, array) (plus the samples per pair for the waveform).
+    """
+    if msg_type == MSG_ENVELOPE:
+        channels, first = ENVELOPE_HEADER.unpack_from(payload)
+        return first, np.frombuffer(payload, '<f2', offset=ENVELOPE_HEADER.size).astype(np.float32).reshape(-1, channels)
+    if msg_type == MSG_WAVEFORM:
+        channels, first, block = WAVEFORM_HEADER.unpack_from(payload)
+        values = np.frombuffer(payload, '<i2', offset=WAVEFORM_HEADER.size).astype(np.float32) / 32767
+        return first, values.reshape(-1, channels, 2), block
+    if msg_type == MSG_MEL:
+        channels, bands, first = MEL_HEADER.unpack_from(payload)
+        values = np.frombuffer(payload, np.uint8, offset=MEL_HEADER.size).astype(np.float32)
+        return first, (values / 255 * -MEL_DB_FLOOR + MEL_DB_FLOOR).reshape(-1, channels, bands)
+    return json.loads(payload.decode("utf-8"))
+
+
+def read_frame(sock):
+    """
+    Reads one message from a socket. Returns (type, seq, timestamp, payload) or None at EOF.
+    """
+    header = _read_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    magic, version, msg_type, seq, timestamp, length = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a live broadcast stream (magic {magic!r}, version {version})")
+    payload = _read_exact(sock, length)
+    if payload is None:
+        return None
+    return msg_type, seq, timestamp, payload
+
+
+def _read_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        part = sock.recv(n - len(buf))
+        if not part:
+            return None
+        buf += part
+    return bytes(buf)
+
+
+def decode_pcm(data, width, channels):
+    """
+    Little-endian PCM bytes -> float32 (frames, channels) in [-1, 1].
+    """
+    if width == 3:
+        u8 = np.frombuffer(data, dtype=np.uint8)
+        u8 = u8[:len(u8) - len(u8) % 3].reshape(-1, 3)
+        ints = (u8[:, 0].astype(np.int32) | (u8[:, 1].astype(np.int32) << 8) | (u8[:, 2].astype(np.int32) << 16))
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+    else:
+        dtype = {2: '<i2', 4: '<i4'}[width]
+        ints = np.frombuffer(data, dtype=dtype, count=len(data) // width)
+    y = (ints / float(1 << (8 * width - 1))).astype(np.float32)
+    return y[:len(y) - len(y) % channels].reshape(-1, channels)
+
+
+class LiveAnalyzer:
+    """
+    Incremental envelope, min/max waveform and Mel columns of one recording. `process()`
+    takes any number of frames and returns the complete windows/pairs/columns they finish.
+    """
+    def __init__(self, rate, channels):
+        import librosa # Only needed once a session is broadcast
+        self.rate = rate
+        self.channels = channels
+        self.window = max(1, int(rate * ENVELOPE_WINDOW_MS / 1000))
+        self.block = max(1, rate // WAVEFORM_PAIRS_PER_S)
+        self.fft_window = np.hanning(MEL_N_FFT).astype(np.float32)
+        self.mel_basis = librosa.filters.mel(sr=rate, n_fft=MEL_N_FFT, n_mels=MEL_BANDS).astype(np.float32)
+        t = np.arange(MEL_N_FFT, dtype=np.float32) / rate
+        self.ref_db = 0.0
+        self.ref_db = float(self._mel_db(np.sin(2 * np.pi * 1000 * t)[None, :, None]).max()) # 0 dB = full-scale sine
+        self._pending = {name: np.zeros((0, channels), np.float32) for name in ("envelope", "waveform", "mel")}
+        self.positions = {"envelope": 0, "waveform": 0, "mel": 0} # Index of the next window / pair / column
+
+    def _mel_db(self, frames):
+        """
+        frames: (columns, MEL_N_FFT, channels) -> (columns, channels, bands) in dB.
+        """
+        spectrum = np.fft.rfft(frames * self.fft_window[None, :, None], axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+        mel = np.einsum('mf,cfk->ckm', self.mel_basis, power)
+        return 10 * np.log10(np.maximum(mel, 1e-12)) - self.ref_db
+
+    def _take(self, name, y, size, step):
+        """
+        Appends `y` to the pending samples of `name`; returns the complete frames of `size`
+        samples every `step` samples as (count, size, channels), keeping the rest.
+        """
+        pending = np.concatenate([self._pending[name], y])
+        count = 0 if len(pending) < size else (len(pending) - size) // step + 1
+        frames = np.lib.stride_tricks.sliding_window_view(pending, size, axis=0)[::step][:count]
+        self._pending[name] = pending[count * step:]
+        first = self.positions[name]
+        self.positions[name] += count
+        return first, frames.transpose(0, 2, 1) # (count, size, channels)
+
+    def process(self, y):
+        first_env, windows = self._take("envelope", y, self.window, self.window)
+        first_wave, blocks = self._take("waveform", y, self.block, self.block)
+        first_mel, frames = self._take("mel", y, MEL_N_FFT, MEL_HOP)
+        out = []
+        if len(windows):
+            out.append((MSG_ENVELOPE, encode_envelope(np.sqrt(np.mean(windows ** 2, axis=1)), first_env)))
+        if len(blocks):
+            out.append((MSG_WAVEFORM, encode_waveform(np.stack([blocks.min(axis=1), blocks.max(axis=1)], axis=-1), first_wave, self.block)))
+        if len(frames):
+            out.append((MSG_MEL, encode_mel(self._mel_db(frames), first_mel)))
+        return out
+
+
+class _Client:
+    """
+    One connected viewer: a bounded send queue drained by its own thread.
+    """
+    def __init__(self, sock, address, max_bytes):
+        self.sock = sock
+        self.address = address
+        self.max_bytes = max_bytes
+        self.frames = deque() # (frame bytes, live)
+        self.queued_bytes = 0
+        self.dropped = 0
+        self.sent = 0
+        self.closed = False
+        self._cond = threading.Condition()
+        self.sock.settimeout(SEND_TIMEOUT_S)
+        self._thread = threading.Thread(target=self._send_loop, name="BroadcastClient", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, frame, live):
+        """
+        Never blocks. Live frames are dropped (oldest first) when the queue is over its limit.
+        """
+        with self._cond:
+            if self.closed:
+                return
+            self.frames.append((frame, live))
+            self.queued_bytes += len(frame)
+            if self.queued_bytes > self.max_bytes:
+                kept = deque()
+                for queued, queued_live in self.frames:
+                    if queued_live and self.queued_bytes > self.max_bytes:
+                        self.queued_bytes -= len(queued)
+                        self.dropped += 1
+                    else:
+                        kept.append((queued, queued_live))
+                self.frames = kept
+            self._cond.notify()
+
+    def _send_loop(self):
+        while True:
+            with self._cond:
+                while not self.frames and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    return
+                frame, _ = self.frames.popleft()
+                self.queued_bytes -= len(frame)
+            try:
+                self.sock.sendall(frame)
+                self.sent += 1
+            except OSError:
+                self.close()
+                return
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self.frames.clear()
+            self._cond.notify()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class Broadcaster:
+    """
+    TCP server publishing the live recording and verdicts to any number of viewers.
+    """
+    def __init__(self, host=BROADCAST_HOST, port=BROADCAST_PORT, client_queue_bytes=CLIENT_QUEUE_BYTES,
+                 max_pending_chunks=MAX_PENDING_CHUNKS):
+        self.client_queue_bytes = client_queue_bytes
+        self.max_pending_chunks = max_pending_chunks
+        self.chunks_dropped = 0 # Chunks the broadcaster thread could not keep up with
+        self._server = socket.create_server((host, port))
+        self.address = self._server.getsockname()
+        self._clients = []
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._session = None # HELLO info of the session being broadcast
+        self._last_verdict = None
+        self._feed = queue.Queue()
+        self._running = True
+        self._accept_thread = threading.Thread(target=self._accept_loop, name="BroadcastAccept", daemon=True)
+        self._accept_thread.start()
+        self._worker = threading.Thread(target=self._work_loop, name="Broadcaster", daemon=True)
+        self._worker.start()
+
+    # --- Called from the GUI / capture threads (never block) ---
+    def start_session(self, rate, channels, sample_width, **info):
+        self._feed.put(("start", {"rate": rate, "channels": channels, "sample_width": sample_width, **info}))
+
+    def feed(self, data):
+        """
+        Queues one captured chunk of raw PCM. Drops it if the broadcaster is behind.
+        """
+        if self._feed.qsize() >= self.max_pending_chunks:
+            self.chunks_dropped += 1
+            return
+        self._feed.put(("data", data))
+
+    def end_session(self):
+        self._feed.put(("end", None))
+
+    def publish_state(self, state, **info):
+        self._feed.put(("state", {"state": state, **info}))
+
+    def publish_verdict(self, results, labels=None):
+        """
+        Publishes the per-channel `SoundAnalyzer.analyze()` results (features are not sent).
+        """
+        verdict = []
+        for i, result in enumerate(results):
+            verdict.append({"channel": labels[i] if labels and len(results) > 1 else None,
+                            "result": result.get("result"),
+                            "probability": None if result.get("probability") is None else float(result["probability"]),
+                            "bpm": None if result.get("bpm") is None else float(result["bpm"]),
+                            "model": result.get("model"), "model_version": result.get("model_version")})
+        self._feed.put(("verdict", verdict))
+
+    def stats(self):
+        with self._lock:
+            return {"clients": [{"address": f"{c.address[0]}:{c.address[1]}", "sent": c.sent, "dropped": c.dropped,
+                                 "queued_bytes": c.queued_bytes} for c in self._clients],
+                    "chunks_dropped": self.chunks_dropped}
+
+    def close(self):
+        self._running = False
+        self._feed.put(("stop", None))
+        try:
+            self._server.close()
+        except OSError:
+            pass
+        with self._lock:
+            for client in self._clients:
+                client.close()
+            self._clients = []
+
+    # --- Broadcaster threads ---
+    def _accept_loop(self):
+        while self._running:
+            try:
+                sock, address = self._server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = _Client(sock, address, self.client_queue_bytes)
+            with self._lock:
+                client.enqueue(self._frame(MSG_HELLO, encode_json({"session": self._session})), False)
+                if self._last_verdict is not None:
+                    client.enqueue(self._frame(MSG_VERDICT, encode_json(self._last_verdict)), False)
+                self._clients.append(client)
+
+    def _frame(self, msg_type, payload):
+        self._seq += 1
+        return encode_frame(msg_type, self._seq, payload)
+
+    def _publish(self, msg_type, payload):
+        with self._lock:
+            frame = self._frame(msg_type, payload)
+            self._clients = [c for c in self._clients if not c.closed]
+            for client in self._clients:
+                client.enqueue(frame, msg_type in LIVE_MESSAGES)
+
+    def _work_loop(self):
+        live = None
+        while True:
+            kind, value = self._feed.get()
+            try:
+                if kind == "stop":
+                    return
+                if kind == "start":
+                    live = LiveAnalyzer(value["rate"], value["channels"])
+                    with self._lock:
+                        self._session = value
+                        self._last_verdict = None
+                    self._publish(MSG_STATE, encode_json({"state": "recording", **value}))
+                elif kind == "data" and live is not None:
+                    y = decode_pcm(value, self._session["sample_width"], self._session["channels"])
+                    for msg_type, payload in live.process(y):
+                        self._publish(msg_type, payload)
+                elif kind == "end":
+                    live = None
+                    self._publish(MSG_STATE, encode_json({"state": "analyzing"}))
+                elif kind == "state":
+                    self._publish(MSG_STATE, encode_json(value))
+                elif kind == "verdict":
+                    with self._lock:
+                        self._last_verdict = value
+                    self._publish(MSG_VERDICT, encode_json(value))
+            except Exception as e:
+                print(f"Live broadcast error: {e}") # Never let a broadcast problem reach the recorder
+                live = None
+
+
+# --- Viewer and stand-in ---
+def view(host, port, slow_s=0.0, limit=None):
+    """
+    Minimal text viewer: prints state changes, verdicts and about 4 envelope lines per second.
+    `slow_s` sleeps after every message (to exercise the server's back-pressure).
+    Returns the number of messages received per type.
+    """
+    counts = {}
+    last_print = 0
+    with socket.create_connection((host, port)) as sock:
+        print(f"Connected to {host}:{port}")
+        while limit is None or sum(counts.values()) < limit:
+            frame = read_frame(sock)
+            if frame is None:
+                print("Broadcaster closed the connection.")
+                break
+            msg_type, seq, timestamp, payload = frame
+            name = MSG_NAMES.get(msg_type, str(msg_type))
+            counts[name] = counts.get(name, 0) + 1
+            value = decode_payload(msg_type, payload)
+            if msg_type == MSG_ENVELOPE:
+                if time.monotonic() - last_print >= 0.25:
+                    first, rms = value
+                    level_db = 20 * np.log10(np.maximum(rms[-1], 1e-6))
+                    bars = "  ".join(f"{db:6.1f} dBFS {'#' * int(max(0, db + 60) / 2):<30}" for db in level_db)
+                    print(f"[{seq:>7}] {first * ENVELOPE_WINDOW_MS / 1000:6.1f}s  {bars}  lag {(time.time() - timestamp) * 1000:.0f} ms")
+                    last_print = time.monotonic()
+            elif msg_type in (MSG_HELLO, MSG_STATE, MSG_VERDICT):
+                print(f"[{seq:>7}] {name}: {value}")
+            if slow_s:
+                time.sleep(slow_s)
+    return counts
+
+
+def demo(host, port, source="pulsatile", duration=30, speed=1.0, sessions=None, rate=48000, channels=1):
+    """
+    Loopback stand-in for the recorder: broadcasts sessions captured from a virtual device
+    (virtual_audio.py), with a placeholder verdict naming the source.
+    """
+    from virtual_audio import VirtualPyAudio, PA_INT24
+
+    broadcaster = Broadcaster(host, port)
+    print(f"Broadcasting on {broadcaster.address[0]}:{broadcaster.address[1]} (Ctrl+C to stop)")
+    backend = VirtualPyAudio(source=source, speed=speed or None, rate=rate)
+    chunk = 4096
+    done = 0
+    try:
+        while sessions is None or done < sessions:
+            stream = backend.open(rate=rate, channels=channels, format=PA_INT24, input=True)
+            broadcaster.start_session(rate, channels, 3, device="virtual", source=source)
+            for _ in range(int(duration * rate / chunk)):
+                broadcaster.feed(stream.read(chunk))
+            stream.close()
+            broadcaster.end_session()
+            broadcaster.publish_verdict([{"result": f"demo ({source})", "bpm": backend.bpm if source == "pulsatile" else None}])
+            done += 1
+            print(f"Session {done} broadcast: {broadcaster.stats()}")
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broadcaster.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live broadcast viewer and loopback stand-in.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    view_parser = sub.add_parser("view", help="Connect to a broadcaster and print what it sends")
+    view_parser.add_argument("--host", default=BROADCAST_HOST)
+    view_parser.add_argument("--port", type=int, default=BROADCAST_PORT)
+    view_parser.add_argument("--slow", type=float, default=0.0, help="Sleep after every message (s), to test back-pressure")
+    demo_parser = sub.add_parser("demo", help="Broadcast virtual-device sessions (no GUI, no audio hardware)")
+    demo_parser.add_argument("--host", default=BROADCAST_HOST)
+    demo_parser.add_argument("--port", type=int, default=BROADCAST_PORT)
+    demo_parser.add_argument("--source", default="pulsatile", help="pulsatile, non_pulsatile, noise or a WAV path")
+    demo_parser.add_argument("--duration", type=float, default=30, help="Session length (s)")
+    demo_parser.add_argument("--speed", type=float, default=1.0, help="Replay speed (0 = unpaced)")
+    demo_parser.add_argument("--sessions", type=int, help="Stop after this many sessions")
+    args = parser.parse_args(argv)
+
+    if args.command == "view":
+        try:
+            counts = view(args.host, args.port, args.slow)
+        except KeyboardInterrupt:
+            return 0
+        print(f"Messages received: {counts}")
+    else:
+        demo(args.host, args.port, args.source, args.duration, args.speed, args.sessions)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
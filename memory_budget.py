@@ -0,0 +1,328 @@
+"""
+Memory budget for long captures: one limit for what the app holds, the rest spilled to disk.
+
+`MemoryBudget` keeps the bytes held per account ("capture", "decoded", "display",
+"history", ...) against one limit. Two things spill when it is exceeded:
+- `SpillBuffer`, the capture buffer (the list of raw PCM chunks `stream.read` returns),
+  writes its oldest chunks to a file while the budget is exceeded. This costs one
+  chunk-sized write per new chunk, so it never delays capture. Spilled chunks are read back
+  from the file one at a time.
+- `MemoryBudget.empty()` allocates an array that does not fit as a memory-mapped file
+  (e.g. the decoded waveform or the spectrogram of a long recording).
+Code reading spilled data works on blocks of it, so only the pages in use are resident.
+
+Spill files live in `spill_dir`. They contain patient recordings, so they are deleted with
+the object that owns them and by `clear()`, which the GUI calls when it closes.
+
+`start_session()` resets the peak RSS of the process (Linux: /proc/self/clear_refs, else the
+peak since the process started is reported). `session_report()` returns that peak together
+with the held and spilled bytes. RSS includes the pages of mapped spill files that were
+used, which the kernel reclaims when memory runs short; the anonymous part is reported too.
+
+This module deliberately imports nothing from the GUI script.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import numpy as np
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+MB = 1024 * 1024
+
+
+def _proc_status_kb(field):
+    """
+    A "kB" field of /proc/self/status (e.g. "VmRSS"), or None where there is no procfs.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_bytes(field="VmRSS"):
+    """
+    Resident memory of the process ("RssAnon" for the part not backed by files).
+    """
+    kb = _proc_status_kb(field)
+    return None if kb is None else kb * 1024
+
+
+def peak_rss_bytes():
+    """
+    Peak resident memory of the process: since the last reset_peak_rss() on Linux, since
+    the start of the process elsewhere.
+    """
+    kb = _proc_status_kb("VmHWM")
+    if kb is None and resource is not None:
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # kB on Linux (only macOS reports bytes)
+    return None if kb is None else kb * 1024
+
+
+def reset_peak_rss():
+    """
+    Resets the peak RSS to the current RSS. Returns False where this is not supported.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def frames_nbytes(frames):
+    """
+    Bytes of a capture: a list of chunks or a SpillBuffer (whose spilled chunks are not read to count them).
+    """
+    if isinstance(frames, SpillBuffer):
+        return frames.nbytes
+    return sum(len(chunk) for chunk in frames)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class MemoryBudget:
+    """
+    Bytes held per account against `limit_bytes`. Thread-safe: the capture thread and the
+    GUI thread update their accounts concurrently.
+    """
+    def __init__(self, limit_bytes, spill_dir):
+        self.limit_bytes = limit_bytes
+        self.spill_dir = spill_dir
+        self._accounts = {} # account -> bytes held
+        self._lock = threading.Lock()
+        self.peak_held_bytes = 0 # Since the session started
+        self.peak_rss_resets = False # Whether the peak RSS of session_report() is per session
+        shutil.rmtree(spill_dir, ignore_errors=True) # Leftovers of a session that crashed
+
+    def set(self, account, nbytes):
+        with self._lock:
+            self._accounts[account] = nbytes
+            self.peak_held_bytes = max(self.peak_held_bytes, sum(self._accounts.values()))
+
+    def release(self, *accounts):
+        with self._lock:
+            for account in accounts:
+                self._accounts.pop(account, None)
+
+    def held_bytes(self):
+        with self._lock:
+            return sum(self._accounts.values())
+
+    def available_bytes(self):
+        return max(0, self.limit_bytes - self.held_bytes())
+
+    def fits(self, nbytes):
+        """
+        True if `nbytes` more can be held without exceeding the budget.
+        """
+        return nbytes <= self.available_bytes()
+
+    def exceeded(self):
+        return self.held_bytes() > self.limit_bytes
+
+    def spill_path(self, prefix):
+        """
+        A new, empty spill file in `spill_dir`.
+        """
+        os.makedirs(self.spill_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix=prefix + "_", suffix=".spill", dir=self.spill_dir)
+        os.close(fd)
+        return path
+
+    def empty(self, account, shape, dtype=np.float32):
+        """
+        Like np.empty, held in `account`. If it does not fit, the array is a memory-mapped
+        spill file instead (deleted with the array and all its views) and the account holds 0 bytes.
+        """
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if self.fits(nbytes):
+            self.set(account, nbytes)
+            return np.empty(shape, dtype)
+        self.set(account, 0)
+        path = self.spill_path(account)
+        try:
+            array = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+        except (OSError, ValueError) as e: # No space left, or an empty array (which cannot be mapped)
+            _remove_file(path)
+            if nbytes:
+                print(f"Could not spill {account} ({nbytes / MB:.0f} MB), keeping it in memory: {e}")
+            self.set(account, nbytes)
+            return np.empty(shape, dtype)
+        weakref.finalize(array, _remove_file, path)
+        return array
+
+    def spilled_bytes(self):
+        """
+        Size of the spill files that still exist.
+        """
+        try:
+            return sum(entry.stat().st_size for entry in os.scandir(self.spill_dir) if entry.is_file())
+        except OSError:
+            return 0
+
+    def snapshot(self):
+        """
+        MB held per account.
+        """
+        with self._lock:
+            return {account: round(nbytes / MB, 1) for account, nbytes in self._accounts.items()}
+
+    def start_session(self):
+        """
+        Starts the measurement of a new session (a recording and its analysis): resets the
+        peak of the held bytes and the peak RSS.
+        """
+        with self._lock:
+            self.peak_held_bytes = sum(self._accounts.values())
+        self.peak_rss_resets = reset_peak_rss()
+
+    def session_report(self):
+        """
+        Peak and current RSS (and its anonymous part), held (now and peak) and spilled MB, and the
+        accounts, since start_session().
+        """
+        peak, current, anonymous = peak_rss_bytes(), current_rss_bytes(), current_rss_bytes("RssAnon")
+        return {"peak_rss_mb": None if peak is None else round(peak / MB, 1),
+                "peak_rss_scope": "session" if self.peak_rss_resets else "process",
+                "rss_mb": None if current is None else round(current / MB, 1),
+                "rss_anon_mb": None if anonymous is None else round(anonymous / MB, 1),
+                "held_mb": round(self.held_bytes() / MB, 1), "peak_held_mb": round(self.peak_held_bytes / MB, 1),
+                "limit_mb": round(self.limit_bytes / MB, 1), "spilled_mb": round(self.spilled_bytes() / MB, 1),
+                "accounts": self.snapshot()}
+
+    def clear(self):
+        """
+        Deletes all spill files (arrays still mapped stay readable until they are released).
+        """
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+class SpillBuffer:
+    """
+    The chunks of one capture, in order, held in the `account` of a budget. Works as a drop-in
+    for the list of chunks: append, len, indexing, iteration and truth value. While the budget
+    is exceeded, every append spills the oldest chunks still in memory to the buffer's file.
+    The spilled chunks are always the first ones, so the file is written append-only.
+    """
+    def __init__(self, budget, account="capture"):
+        self.budget = budget
+        self.account = account
+        self.path = None
+        self._chunks = [] # Chunks in memory; None once spilled
+        self._spilled = 0 # Number of spilled chunks (the first ones)
+        self._offsets = [0] # File offset of every spilled chunk, and of the end of the file
+        self._resident_bytes = 0
+        self._file = None
+        self._reader = None # Read handle of the file, opened on the first read
+        self._remove = None # Finalizer deleting the file (on discard(), or once the buffer is collected)
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self._chunks)
+        if not 0 <= index < len(self._chunks):
+            raise IndexError("SpillBuffer index out of range")
+        if index >= self._spilled:
+            return self._chunks[index]
+        if self._file:
+            self._file.flush()
+        if self._reader is None:
+            self._reader = open(self.path, "rb")
+        self._reader.seek(self._offsets[index])
+        return self._reader.read(self._offsets[index + 1] - self._offsets[index])
+
+    def __iter__(self):
+        for index in range(len(self._chunks)):
+            yield self[index]
+
+    @property
+    def nbytes(self):
+        return self._offsets[-1] + self._resident_bytes
+
+    @property
+    def spilled_bytes(self):
+        return self._offsets[-1]
+
+    def append(self, data):
+        self._chunks.append(data)
+        self._resident_bytes += len(data)
+        self.budget.set(self.account, self._resident_bytes)
+        while self._spilled < len(self._chunks) and self.budget.exceeded():
+            if not self._spill_oldest():
+                break
+
+    def finish(self):
+        """
+        Ends the capture. Returns the plain list of chunks if nothing was spilled. Otherwise
+        spills the rest too and returns the buffer, so the whole capture is read from one file
+        and the account holds nothing.
+        """
+        if not self._spilled:
+            return list(self._chunks)
+        while self._spilled < len(self._chunks):
+            if not self._spill_oldest():
+                break
+        if self._file:
+            self._file.close()
+            self._file = None
+        return self
+
+    def discard(self):
+        """
+        Drops the capture (e.g. after a recording error), deletes its spill file and releases the account.
+        """
+        self._chunks = []
+        self._spilled = 0
+        self._offsets = [0]
+        self._resident_bytes = 0
+        for handle in (self._file, self._reader):
+            if handle:
+                handle.close()
+        self._file = self._reader = None
+        if self._remove:
+            self._remove() # Runs once: the finalizer does nothing when the buffer is collected
+        self._remove = None
+        self.path = None
+        self.budget.release(self.account)
+
+    def _spill_oldest(self):
+        """
+        Writes the oldest chunk still in memory to the file. Returns False if it cannot be written
+        (the capture then goes on in memory).
+        """
+        data = self._chunks[self._spilled]
+        try:
+            if self._file is None:
+                if self.path is None:
+                    self.path = self.budget.spill_path(self.account)
+                    self._remove = weakref.finalize(self, _remove_file, self.path)
+                self._file = open(self.path, "ab")
+            self._file.write(data)
+        except OSError as e:
+            print(f"Could not spill the {self.account} buffer, keeping it in memory: {e}")
+            return False
+        self._chunks[self._spilled] = None
+        self._spilled += 1
+        self._offsets.append(self._offsets[-1] + len(data))
+        self._resident_bytes -= len(data)
+        self.budget.set(self.account, self._resident_bytes)
+        return True
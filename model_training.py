@@ -0,0 +1,354 @@
+"""
+Retraining of the sound detection classifier from cached features.
+
+Feature vectors are extracted once per labeled recording (each channel of a binaural one) and
+kept in an append-only store, so a retrain only extracts the recordings labeled since the last
+one and refits on cached vectors. The store lives in a folder, like the similarity index:
+    features.f64    raw float64 rows (the exact values SoundAnalyzer computes)
+    samples.jsonl   one {"key", "label", "added"} line per row
+    meta.json       dimension and feature signature (recipe with extractor versions)
+A store made with another feature signature is refused, so vectors of different extractor
+versions are never mixed. A key added again (e.g. a corrected label) supersedes its older row.
+
+Training fits the same StandardScaler + LogisticRegression pipeline as the shipped model to
+predict "sound" (any label but "No Sound"). Given a previous model, the fit is warm-started:
+its coefficients are re-expressed in the new standardization, so lbfgs starts at the old
+optimum. Stratified cross-validation fits its folds in parallel threads (lbfgs spends its time
+in numpy/scipy, which release the GIL, and no worker process has to start) and its out-of-fold
+probabilities pick the decision threshold (best balanced accuracy) unless one is given. The
+result is exported as the `{"model", "threshold"}` bundle SoundAnalyzer loads, with the
+metrics in a JSON file next to it.
+
+    python model_training.py add labels.csv         # extract and store features of new recordings (path,label CSV)
+    python model_training.py train --out Experiment_recordings/logreg_pipeline7.pkl --warm-start Experiment_recordings/logreg_pipeline6.pkl
+    python model_training.py status
+
+This module deliberately imports nothing from the GUI script (the add command does, to extract features).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import joblib
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+FEATURES_FILE = "features.f64"
+SAMPLES_FILE = "samples.jsonl"
+META_FILE = "meta.json"
+
+CV_FOLDS = 5
+LOGREG_C = 1.0 # Inverse regularization strength (scikit-learn's default, as the shipped model)
+LOGREG_MAX_ITER = 1000
+INGEST_CHUNK_RECORDINGS = 32 # Recordings loaded at once by add_recordings() (grouped by length for batched extraction)
+
+
+def sound_target(label):
+    """
+    Training target of a verdict label: 1 for "Pulsatile"/"Non-Pulsatile", 0 for "No Sound".
+    """
+    return int(label != "No Sound")
+
+
+class FeatureStore:
+    """
+    Append-only store of labeled feature vectors in `store_dir`. `signature` describes how the
+    vectors were made (see recipe_signature); a store built with another signature is refused.
+    """
+    def __init__(self, store_dir, dim, signature=""):
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        self.dim = dim
+        self.signature = signature
+        meta_path = os.path.join(store_dir, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["dim"] != dim or meta["signature"] != signature:
+                raise ValueError(f"Feature store in {store_dir} was built for {meta['signature']} ({meta['dim']} dims), "
+                                 f"not {signature} ({dim} dims); use a new folder")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": dim, "signature": signature}, f)
+
+        features_path = os.path.join(store_dir, FEATURES_FILE)
+        features = np.fromfile(features_path, dtype=np.float64) if os.path.exists(features_path) else np.zeros(0)
+        samples_path = os.path.join(store_dir, SAMPLES_FILE)
+        samples = []
+        if os.path.exists(samples_path):
+            with open(samples_path) as f:
+                for line in f:
+                    try:
+                        samples.append(json.loads(line))
+                    except ValueError:
+                        break # An interrupted append leaves at most one partial line
+        rows = min(len(features) // dim, len(samples))
+        self.features = features[:rows * dim].reshape(rows, dim)
+        self.samples = samples[:rows]
+        if len(features) != rows * dim or len(samples) != rows:
+            self._rewrite()
+        self._latest = {sample["key"]: i for i, sample in enumerate(self.samples)} # key -> row of its newest label
+
+    def count(self):
+        """
+        Number of labeled keys (superseded rows are not counted).
+        """
+        return len(self._latest)
+
+    def __contains__(self, key):
+        return key in self._latest
+
+    def label_of(self, key):
+        return self.samples[self._latest[key]]["label"] if key in self._latest else None
+
+    def _rewrite(self):
+        """
+        Rewrites the row files from memory (only after an interrupted append).
+        """
+        self.features.tofile(os.path.join(self.store_dir, FEATURES_FILE))
+        with open(os.path.join(self.store_dir, SAMPLES_FILE), "w") as f:
+            f.writelines(json.dumps(sample) + "\n" for sample in self.samples)
+
+    def add_many(self, keys, labels, features):
+        """
+        Appends labeled vectors (one write per file). A key that is already stored gets the new row.
+        """
+        features = np.asarray(features, dtype=np.float64).reshape(-1, self.dim)
+        added = time.time()
+        samples = [{"key": key, "label": label, "added": added} for key, label in zip(keys, labels)]
+        with open(os.path.join(self.store_dir, FEATURES_FILE), "ab") as f:
+            features.tofile(f)
+        with open(os.path.join(self.store_dir, SAMPLES_FILE), "a") as f:
+            f.writelines(json.dumps(sample) + "\n" for sample in samples)
+        for sample in samples:
+            self._latest[sample["key"]] = len(self.samples)
+            self.samples.append(sample)
+        self.features = np.vstack([self.features, features])
+
+    def dataset(self):
+        """
+        Training set of the newest row of every key. Returns (X, labels, keys).
+        """
+        rows = sorted(self._latest.values())
+        return self.features[rows], [self.samples[i]["label"] for i in rows], [self.samples[i]["key"] for i in rows]
+
+
+def add_recordings(store, labeled, analyzer, load, channel_key, chunk=INGEST_CHUNK_RECORDINGS):
+    """
+    Extracts and stores the features of the (path, label) recordings whose channels are not in
+    `store` with that label yet. `load(path)` returns (y, sr) with y of shape (n,) or
+    (channels, n) and `channel_key(path, channel, channels)` names a channel's row. Equal-length
+    channels at the same rate are extracted together with `extract_features_batch`.
+    Returns the number of rows added. The store keeps features of raw audio, so `analyzer`
+    must not have a noise profile.
+    """
+    if analyzer.noise_profile is not None:
+        raise ValueError("The feature store keeps features of raw audio; remove the analyzer's noise profile")
+    def stored(path, label): # Mono, or both ears of a binaural recording
+        return store.label_of(channel_key(path, 0, 1)) == label or \
+            all(store.label_of(channel_key(path, i, 2)) == label for i in range(2))
+    pending = [(path, label) for path, label in labeled if not stored(path, label)]
+    added = 0
+    for start in range(0, len(pending), chunk):
+        groups = {} # (sr, n) -> (keys, labels, channels)
+        for path, label in pending[start:start + chunk]:
+            try:
+                y, sr = load(path)
+            except (OSError, EOFError, ValueError) as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            channels = [y] if y.ndim == 1 else list(y)
+            for i, channel in enumerate(channels):
+                key = channel_key(path, i, len(channels))
+                if store.label_of(key) == label or len(channel) == 0:
+                    continue
+                keys, labels, signals = groups.setdefault((sr, len(channel)), ([], [], []))
+                keys.append(key)
+                labels.append(label)
+                signals.append(channel)
+        for (sr, _), (keys, labels, signals) in groups.items():
+            store.add_many(keys, labels, analyzer.extract_features_batch(signals, sr))
+            added += len(keys)
+    return added
+
+
+# --- Training ---
+def new_pipeline(C=LOGREG_C):
+    return make_pipeline(StandardScaler(), LogisticRegression(C=C, max_iter=LOGREG_MAX_ITER))
+
+
+def warm_start_pipeline(previous, X):
+    """
+    Unfitted pipeline whose logistic regression starts from `previous` (a fitted StandardScaler +
+    LogisticRegression pipeline): the previous decision function is rewritten for the
+    standardization of `X`, so the refit starts at the old optimum. Returns None if `previous`
+    does not have that shape or was trained on another number of features.
+    """
+    if not isinstance(previous, Pipeline) or len(previous.steps) != 2:
+        return None
+    old_scaler, old_lr = previous.steps[0][1], previous.steps[1][1]
+    if not isinstance(old_scaler, StandardScaler) or not isinstance(old_lr, LogisticRegression) \
+            or getattr(old_lr, "coef_", np.zeros((0, 0))).shape != (1, X.shape[1]):
+        return None
+    scaler = StandardScaler().fit(X)
+    lr = LogisticRegression(C=old_lr.C, max_iter=LOGREG_MAX_ITER, warm_start=True)
+    # w.(x - m_old)/s_old + b == (w * s_new/s_old).(x - m_new)/s_new + b + w.(m_new - m_old)/s_old
+    lr.coef_ = old_lr.coef_ * (scaler.scale_ / old_scaler.scale_)
+    lr.intercept_ = old_lr.intercept_ + old_lr.coef_ @ ((scaler.mean_ - old_scaler.mean_) / old_scaler.scale_)
+    return make_pipeline(StandardScaler(), lr)
+
+
+def _fit_fold(pipeline, X, target, train, test):
+    """
+    Fits one cross-validation fold (in a worker thread). Returns (test indices, probabilities).
+    """
+    model = clone(pipeline)
+    if pipeline[-1].warm_start: # clone() drops the fitted coefficients; keep the warm start
+        model[-1].coef_, model[-1].intercept_ = pipeline[-1].coef_, pipeline[-1].intercept_
+    model.fit(X[train], target[train])
+    return test, model.predict_proba(X[test])[:, 1]
+
+
+def best_threshold(target, probabilities):
+    """
+    Decision threshold with the best balanced accuracy (ties: the one closest to 0.5). Candidates
+    lie halfway between consecutive probabilities, so the threshold keeps a margin on both sides.
+    """
+    levels = np.unique(probabilities)
+    candidates = np.append((levels[:-1] + levels[1:]) / 2, 0.5)
+    positives, negatives = max(1, target.sum()), max(1, len(target) - target.sum())
+    scores = [((probabilities > t) & (target == 1)).sum() / positives + ((probabilities <= t) & (target == 0)).sum() / negatives
+              for t in candidates]
+    best = np.flatnonzero(np.isclose(scores, max(scores)))
+    return float(candidates[best[np.argmin(np.abs(candidates[best] - 0.5))]])
+
+
+def cross_validate(pipeline, X, target, folds=CV_FOLDS, n_jobs=None, seed=0):
+    """
+    Out-of-fold probabilities of stratified k-fold cross-validation, with the folds fitted in
+    parallel threads. Returns None if a class has fewer than 2 samples.
+    """
+    folds = min(folds, int(np.bincount(target, minlength=2).min()))
+    if folds < 2:
+        return None
+    splits = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X, target)
+    results = joblib.Parallel(n_jobs=n_jobs or min(folds, os.cpu_count() or 1), prefer="threads")(
+        joblib.delayed(_fit_fold)(pipeline, X, target, train, test) for train, test in splits)
+    probabilities = np.empty(len(target))
+    for test, fold_probabilities in results:
+        probabilities[test] = fold_probabilities
+    return probabilities
+
+
+def train(X, labels, previous=None, threshold=None, folds=CV_FOLDS, n_jobs=None, C=LOGREG_C):
+    """
+    Fits the classifier on stored features. `previous` (a fitted pipeline) warm-starts it;
+    `threshold` is tuned on the cross-validation when None. Returns (bundle, metrics) where
+    bundle is the {"model", "threshold"} dict SoundAnalyzer loads.
+    """
+    target = np.array([sound_target(label) for label in labels])
+    if len(np.unique(target)) < 2:
+        raise ValueError("Training needs both sound and \"No Sound\" recordings")
+    start = time.perf_counter()
+    pipeline = warm_start_pipeline(previous, X) if previous is not None else None
+    warm_started = pipeline is not None
+    if previous is not None and not warm_started:
+        print("The previous model is not a fitted scaler + logistic regression on these features; training from scratch.")
+    pipeline = pipeline or new_pipeline(C)
+
+    metrics = {"samples": len(target), "sound_samples": int(target.sum()), "warm_started": warm_started}
+    probabilities = cross_validate(pipeline, X, target, folds, n_jobs)
+    if threshold is None:
+        threshold = best_threshold(target, probabilities) if probabilities is not None else 0.5
+    if probabilities is not None:
+        predicted = probabilities > threshold
+        metrics.update({
+            "cv_folds": min(folds, int(np.bincount(target).min())),
+            "cv_accuracy": float(np.mean(predicted == target)),
+            "cv_balanced_accuracy": float((np.mean(predicted[target == 1]) + np.mean(~predicted[target == 0])) / 2),
+            "cv_roc_auc": float(roc_auc_score(target, probabilities)),
+        })
+    metrics["cv_s"] = time.perf_counter() - start
+
+    pipeline.fit(X, target)
+    pipeline[-1].warm_start = False # Plain LogisticRegression once exported
+    metrics["threshold"] = float(threshold)
+    metrics["train_accuracy"] = float(np.mean((pipeline.predict_proba(X)[:, 1] > threshold) == target))
+    metrics["training_s"] = time.perf_counter() - start
+    return {"model": pipeline, "threshold": float(threshold)}, metrics
+
+
+def export_bundle(bundle, path, metrics=None, signature=""):
+    """
+    Writes the model bundle (atomically) and its metrics as `<path>.json`.
+    """
+    tmp_path = path + ".tmp"
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+    with open(path + ".json", "w") as f:
+        json.dump(dict(metrics or {}, feature_signature=signature, exported=time.time()), f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain the sound detection classifier from cached features.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="Extract and store the features of labeled recordings (path,label CSV)")
+    add.add_argument("labels_csv")
+    fit = sub.add_parser("train", help="Fit on the stored features and export a model bundle")
+    fit.add_argument("--out", required=True, help="Model bundle (.pkl) to write")
+    fit.add_argument("--warm-start", help="Existing bundle to start from (e.g. the production model)")
+    fit.add_argument("--threshold", type=float, help="Fixed decision threshold (default: tuned by cross-validation)")
+    fit.add_argument("--folds", type=int, default=CV_FOLDS)
+    fit.add_argument("--jobs", type=int, help="Parallel cross-validation workers (default: one per fold)")
+    sub.add_parser("status", help="Summarize the stored features")
+    parser.add_argument("--store-dir", help="Feature store folder (default: TRAINING_STORE_DIR of the app)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # The GUI module imports Qt; no window is shown
+    import audio_with_spectogram as app
+    recipe = app.DEFAULT_FEATURE_RECIPE
+    signature = app.recipe_signature(recipe)
+    store = FeatureStore(args.store_dir or app.TRAINING_STORE_DIR,
+                         sum(app.FEATURE_EXTRACTORS[name]["size"] for name in recipe), signature)
+
+    if args.command == "add":
+        from benchmark import load_labeled_set
+        from report_export import load_wav
+        analyzer, controller = app.SoundAnalyzer(), app.AudioController(probe_devices=False)
+        if analyzer.feature_recipe != recipe:
+            print(f"The production model uses {analyzer.feature_recipe}; the store keeps {recipe}.")
+            return 1
+        def channel_key(path, channel, channels):
+            return path if channels == 1 else f"{path} [{app.EAR_LABELS[channel]}]"
+        start = time.perf_counter()
+        added = add_recordings(store, load_labeled_set(args.labels_csv), analyzer,
+                               lambda path: load_wav(path, controller), channel_key)
+        print(f"Added {added} row(s) in {time.perf_counter() - start:.1f} s; the store holds {store.count()} labeled recordings.")
+    elif args.command == "train":
+        X, labels, _ = store.dataset()
+        previous = joblib.load(args.warm_start)["model"] if args.warm_start else None
+        try:
+            bundle, metrics = train(X, labels, previous, args.threshold, args.folds, args.jobs)
+        except ValueError as e:
+            print(e)
+            return 1
+        export_bundle(bundle, args.out, metrics, signature)
+        print(json.dumps(metrics, indent=2))
+        print(f"Saved {args.out}; register it with register_analyzer_model(..., recipe=DEFAULT_FEATURE_RECIPE).")
+    else:
+        _, labels, _ = store.dataset()
+        counts = {label: labels.count(label) for label in sorted(set(labels))}
+        print(f"{store.store_dir}: {store.count()} labeled recordings ({len(store.samples)} rows), {signature}")
+        for label, count in counts.items():
+            print(f"  {label:15s} {count}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
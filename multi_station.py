@@ -0,0 +1,353 @@
+"""
+Multi-station capture: several sound cards served by one process.
+
+Every input device that supports the target configuration becomes a station with its own
+capture pipeline: a capture thread with its own PyAudio instance and stream, a preallocated
+per-session buffer, and a bounded queue of recordings waiting for analysis. A shared pool of
+analysis threads takes work from the station queues round-robin, with at most one
+analysis in flight per station, so a busy station cannot starve the others of CPU.
+
+With --trigger, stations capture continuously but only hand segments with activity to
+analysis and disk (event_trigger.py): a cheap per-block energy/variation trigger decides on
+the capture thread, and each segment carries TRIGGER_PRE_ROLL_S / TRIGGER_POST_ROLL_S of
+context. `--duration` is then the longest segment.
+
+Per-station metrics: sessions captured/analyzed, audio seconds per wall second, input
+overflows (audio the device lost before a read, counted from the stream clock), recordings dropped because the analysis queue
+was full, analysis latency percentiles, analysis CPU time and the share of the captured
+audio that was analyzed (counted when an analysis finishes, so dropped recordings lower it).
+
+Usage:
+    python multi_station.py --sessions 10                         # all real devices, until 10 sessions each
+    python multi_station.py --virtual 4 --speed 10 --sessions 5   # simulate 4 stations at 10x real time
+    python multi_station.py --virtual 8 --speed 0 --overflow-rate 0.01 --json stations.json
+    python multi_station.py --virtual 2 --speed 0 --source intermittent --trigger --audio 600
+"""
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # The GUI module imports Qt; no window is shown
+
+import sys
+import json
+import time
+import argparse
+import threading
+import collections
+import numpy as np
+
+import audio_with_spectogram as app
+from capture_process import OverflowCounter
+from event_trigger import ActivityTrigger, EventSegmenter
+
+# --- Multi-Station Configuration ---
+STATION_QUEUE_SIZE = 2 # Recordings waiting for analysis per station (the oldest is dropped when full)
+ANALYSIS_WORKERS = max(1, (os.cpu_count() or 2) - 1) # Shared analysis threads (capture threads mostly wait on I/O)
+# Event-triggered capture (--trigger); the energy threshold is app.RELATIVE_THRESHOLD above the noise floor
+TRIGGER_PRE_ROLL_S = 2.0 # Audio kept before the first active block of a segment
+TRIGGER_POST_ROLL_S = 3.0 # A segment ends after this much audio without activity
+TRIGGER_VARIATION = 0.3 # Std/mean of the WINDOW_DURATION_MS RMS within a block that counts as activity (pulses)
+TRIGGER_FLOOR_RISE_PER_S = 0.02 # How fast the noise floor follows a louder steady background (fraction per second)
+
+
+class Station:
+    """
+    One sound card: capture thread, session buffer, analysis queue and metrics.
+    """
+    def __init__(self, station_id, device_params, duration, sessions=None, output_dir=None, trigger=False, max_audio_s=None):
+        self.station_id = station_id
+        self.device_params = device_params
+        self.duration = duration
+        self.sessions = sessions # None = until stopped
+        self.output_dir = output_dir
+        self.max_audio_s = max_audio_s # Stop after capturing this much audio (None = no limit)
+        self.frame_size = device_params['channels'] * app.WIDTH_SAMPLE
+        self.session_bytes = int(duration * device_params['rate']) * self.frame_size
+        self.segmenter = None # EventSegmenter in trigger mode: sessions are the segments with activity
+        if trigger:
+            self.segmenter = EventSegmenter(
+                ActivityTrigger(device_params['rate'], device_params['channels'], app.WIDTH_SAMPLE,
+                                app.RELATIVE_THRESHOLD, TRIGGER_VARIATION, app.WINDOW_DURATION_MS, TRIGGER_FLOOR_RISE_PER_S),
+                self.frame_size, TRIGGER_PRE_ROLL_S, TRIGGER_POST_ROLL_S, duration)
+        self.controller = app.AudioController(probe_devices=False)
+        self.controller.device_params = device_params
+
+        self.pending = collections.deque() # Recordings (bytes) waiting for analysis
+        self.in_flight = 0
+        self.capture_done = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._capture_loop, name=f"Station{station_id}Capture", daemon=True)
+        self._scheduler = None
+
+        self.metrics = {"sessions_captured": 0, "sessions_analyzed": 0, "bytes_captured": 0, "bytes_analyzed": 0,
+                        "input_overflows": 0, "queue_drops": 0, "errors": 0}
+        self._metrics_lock = threading.Lock() # Capture and analysis threads both update the metrics
+        self.analysis_cpu_s = 0.0
+        self.analysis_latencies = []
+        self.results = [] # Verdict per analyzed session
+        self.started_at = None
+
+    @property
+    def name(self):
+        return f"station{self.station_id} ({self.device_params['name']})"
+
+    def count(self, **increments):
+        """
+        Adds to the metrics (from any thread).
+        """
+        with self._metrics_lock:
+            for name, value in increments.items():
+                self.metrics[name] += value
+
+    def start(self, scheduler):
+        self._scheduler = scheduler
+        self.started_at = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _capture_loop(self):
+        """
+        Reads the device into a preallocated session buffer; every full session is handed
+        to the scheduler. A read that crosses a session boundary starts the next session with
+        its remainder. In trigger mode the blocks go through the segmenter instead, and only
+        finished segments are handed over.
+        """
+        p_record = app.create_audio_backend()
+        stream = None
+        buffer = bytearray(self.session_bytes)
+        try:
+            stream = p_record.open(format=self.device_params['format'],
+                                   channels=self.device_params['channels'],
+                                   rate=self.device_params['rate'],
+                                   input=True,
+                                   frames_per_buffer=app.CHUNK_SIZE,
+                                   input_device_index=self.device_params['index'])
+            overflows = OverflowCounter(stream, self.device_params['rate'])
+            filled = 0
+            max_bytes = int(self.max_audio_s * self.device_params['rate']) * self.frame_size if self.max_audio_s else None
+            while not self._stop.is_set() and (self.sessions is None or self.metrics["sessions_captured"] < self.sessions):
+                if max_bytes is not None and self.metrics["bytes_captured"] >= max_bytes:
+                    break
+                data = stream.read(app.CHUNK_SIZE, exception_on_overflow=False) # Never drop a buffer that was delivered
+                self.count(bytes_captured=len(data), input_overflows=int(overflows.read(app.CHUNK_SIZE)))
+                if self.segmenter:
+                    for segment in self.segmenter.feed(data):
+                        self._submit(b"".join(segment.blocks))
+                    continue
+                data = memoryview(data)
+                while data:
+                    take = min(len(data), self.session_bytes - filled)
+                    buffer[filled:filled + take] = data[:take]
+                    filled += take
+                    data = data[take:]
+                    if filled == self.session_bytes:
+                        self._submit(bytes(buffer))
+                        filled = 0
+            if self.segmenter:
+                segment = self.segmenter.flush() # Activity still going on when capture stopped
+                if segment:
+                    self._submit(b"".join(segment.blocks))
+        except Exception as e:
+            self.count(errors=1)
+            print(f"{self.name}: capture error: {e}")
+        finally:
+            if stream: stream.stop_stream(); stream.close()
+            p_record.terminate()
+            self.capture_done = True
+            self._scheduler.wake()
+
+    def _submit(self, data):
+        self.count(sessions_captured=1)
+        self._scheduler.submit(self, data)
+
+    def analyze(self, data, queued_at):
+        """
+        Decodes and analyzes one session (runs on a scheduler thread).
+        """
+        cpu_start = time.thread_time()
+        frames = [data]
+        y = self.controller.split_channels(self.controller.decode_frames(frames), self.device_params['channels'])
+        results = self._scheduler.analyzer.analyze_channels(y, self.device_params['rate'])
+        if self.output_dir:
+            os.makedirs(os.path.join(self.output_dir, f"station{self.station_id}"), exist_ok=True)
+            path = os.path.join(self.output_dir, f"station{self.station_id}",
+                                f"rec_station{self.station_id}_{time.strftime('%Y%m%d_%H%M%S')}_{self.metrics['sessions_analyzed']}.wav")
+            self.controller.save_audio_to_file(frames, path)
+        self.analysis_cpu_s += time.thread_time() - cpu_start
+        self.analysis_latencies.append(time.perf_counter() - queued_at)
+        self.results.append([result["result"] for result in results])
+
+    def report(self):
+        wall = time.perf_counter() - self.started_at if self.started_at else 0
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        latencies = np.asarray(self.analysis_latencies) * 1000
+        audio_seconds = metrics["bytes_captured"] / self.frame_size / self.device_params['rate']
+        verdicts = collections.Counter(verdict for session in self.results for verdict in session)
+        return {"station": self.station_id, "device": self.device_params['name'], **metrics,
+                "audio_seconds": audio_seconds, "audio_seconds_per_s": audio_seconds / wall if wall else None,
+                "analyzed_fraction": metrics["bytes_analyzed"] / metrics["bytes_captured"] if metrics["bytes_captured"] else None,
+                "analysis_cpu_s": self.analysis_cpu_s,
+                "analysis_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                "analysis_p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else None,
+                "verdicts": dict(verdicts)}
+
+
+class FairScheduler:
+    """
+    Shared analysis threads serving the station queues round-robin, at most one job per
+    station at a time.
+    """
+    def __init__(self, stations, workers=ANALYSIS_WORKERS, queue_size=STATION_QUEUE_SIZE):
+        self.stations = stations
+        self.queue_size = queue_size
+        self.analyzer = app.SoundAnalyzer()
+        self._cond = threading.Condition()
+        self._next = 0 # Station to consider first (rotates)
+        self._threads = [threading.Thread(target=self._work, name=f"StationAnalysis{i}", daemon=True) for i in range(workers)]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, station, data):
+        """
+        Queues a captured session; drops the station's oldest pending one if its queue is full.
+        """
+        with self._cond:
+            if len(station.pending) >= self.queue_size:
+                station.pending.popleft()
+                station.count(queue_drops=1)
+            station.pending.append((data, time.perf_counter()))
+            self._cond.notify()
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _take(self):
+        """
+        Next (station, job) in round-robin order, skipping stations that already have a job
+        running. Waits while there is nothing to do; returns None when everything is done.
+        """
+        with self._cond:
+            while True:
+                for offset in range(len(self.stations)):
+                    station = self.stations[(self._next + offset) % len(self.stations)]
+                    if station.pending and not station.in_flight:
+                        self._next = (self._next + offset + 1) % len(self.stations)
+                        station.in_flight += 1
+                        return station, station.pending.popleft()
+                if all(s.capture_done and not s.pending for s in self.stations):
+                    return None
+                self._cond.wait(0.5)
+
+    def _work(self):
+        while True:
+            taken = self._take()
+            if taken is None:
+                return
+            station, (data, queued_at) = taken
+            try:
+                station.analyze(data, queued_at)
+                station.count(sessions_analyzed=1, bytes_analyzed=len(data))
+            except Exception as e:
+                station.count(errors=1)
+                print(f"{station.name}: analysis error: {e}")
+            finally:
+                with self._cond:
+                    station.in_flight -= 1
+                    self._cond.notify_all()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def discover_stations(duration, sessions, output_dir, trigger=False, max_audio_s=None):
+    """
+    One Station per workable input device of the configured backend.
+    """
+    controller = app.AudioController(probe_devices=False)
+    controller.initialize_pyaudio()
+    devices = controller.find_workable_devices()
+    controller.close()
+    return [Station(i, params, duration, sessions, output_dir, trigger, max_audio_s) for i, params in enumerate(devices)]
+
+
+def run_stations(stations, workers=ANALYSIS_WORKERS):
+    """
+    Runs all stations until each has captured its sessions (or Ctrl+C) and returns the reports.
+    """
+    scheduler = FairScheduler(stations, workers)
+    scheduler.start()
+    for station in stations:
+        station.start(scheduler)
+    try:
+        for station in stations:
+            while station._thread.is_alive():
+                station.join(0.5)
+        scheduler.join()
+    except KeyboardInterrupt:
+        for station in stations:
+            station.stop()
+        for station in stations:
+            station.join()
+        scheduler.join()
+    return [station.report() for station in stations]
+
+
+def print_report(reports, wall):
+    print(f"\n{len(reports)} station(s) in {wall:.1f}s")
+    for r in reports:
+        p50 = f"{r['analysis_p50_ms']:.0f}" if r['analysis_p50_ms'] is not None else "-"
+        p95 = f"{r['analysis_p95_ms']:.0f}" if r['analysis_p95_ms'] is not None else "-"
+        print(f"  station{r['station']:<3} {r['sessions_captured']:>4} captured {r['sessions_analyzed']:>4} analyzed   "
+              f"{r['audio_seconds_per_s']:.1f} audio-s/s   overflows {r['input_overflows']}   queue drops {r['queue_drops']}   "
+              f"errors {r['errors']}   analysis p50 {p50} ms p95 {p95} ms   {r['verdicts']}")
+        print(f"            analyzed {r['analyzed_fraction'] or 0:.0%} of the captured audio, "
+              f"analysis CPU {r['analysis_cpu_s']:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Capture and analyze on every workable sound card at once.")
+    parser.add_argument("--sessions", type=int, help="Sessions per station (default: until Ctrl+C)")
+    parser.add_argument("--duration", type=int, default=app.FIXED_RECORDING_DURATION_SECONDS, help="Session length (s); longest segment with --trigger")
+    parser.add_argument("--trigger", action="store_true", help="Capture continuously and analyze/save only segments with activity")
+    parser.add_argument("--audio", type=float, metavar="SECONDS", help="Stop each station after this much captured audio")
+    parser.add_argument("--workers", type=int, default=ANALYSIS_WORKERS, help="Shared analysis threads")
+    parser.add_argument("--output-dir", help="Also save every session as a WAV in <dir>/station<N>/")
+    parser.add_argument("--virtual", type=int, metavar="N", help="Simulate N stations with the virtual audio backend")
+    parser.add_argument("--speed", type=float, default=1.0, help="Virtual replay speed (0 = unpaced)")
+    parser.add_argument("--source", default="pulsatile", help="Virtual source: pulsatile, non_pulsatile, noise, intermittent or a WAV path")
+    parser.add_argument("--overflow-rate", type=float, default=0.0, help="Virtual overflow probability per buffer")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Virtual maximum extra delay per buffer (s)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    if args.virtual:
+        app.AUDIO_BACKEND = "virtual"
+        app.VIRTUAL_AUDIO = {**app.VIRTUAL_AUDIO, "source": args.source, "speed": args.speed or None,
+                             "overflow_rate": args.overflow_rate, "jitter_s": args.jitter, "devices": args.virtual}
+    stations = discover_stations(args.duration, args.sessions, args.output_dir, args.trigger, args.audio)
+    if not stations:
+        print(f"No input device supports {app.TARGET_SAMPLE_RATE}Hz with {app.TARGET_CHANNELS} channel(s).")
+        return 1
+    for station in stations:
+        print(f"Starting {station.name}")
+
+    start = time.perf_counter()
+    reports = run_stations(stations, args.workers)
+    print_report(reports, time.perf_counter() - start)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"Report written to {args.json}")
+    return 0 if all(r["errors"] == 0 for r in reports) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
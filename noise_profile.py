@@ -0,0 +1,222 @@
+"""
+Per-device noise profiles for cheap suppression of the stationary noise floor.
+
+A calibration records a few seconds of silence on a device (microphone in place, no sound
+of interest). `NoiseProfile.from_recording()` averages its power spectrum per STFT bin and
+turns it into a fixed per-bin gain: bins at the device's typical noise level
+(`floor_percentile` of the bins) pass unchanged, and bins with more stationary noise (mains
+hum, adapter whine, preamp hiss bands) are attenuated down to that level, by at most
+`max_attenuation_db`. Applying a profile is one multiply per STFT bin; nothing is estimated
+per recording.
+
+Profiles are .npz files in one folder, keyed by device name and configuration (rate,
+channels, bit depth, STFT size). `NoiseProfileStore.get()` returns None for a device that
+has not been calibrated, and analysis then runs on the raw audio as before.
+
+    python noise_profile.py calibrate --seconds 5   # record silence on the configured device
+    python noise_profile.py list
+
+This module deliberately imports nothing from the GUI script (the calibrate command does, to record).
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import numpy as np
+import librosa
+
+N_FFT = 2048 # librosa's default STFT, the one the spectral features use
+HOP_LENGTH = 512
+
+
+def profile_key(device, rate, channels, bit_depth, n_fft=N_FFT):
+    """
+    File-name-safe key of a device configuration, e.g. "pisound_48000Hz_1ch_24bit_fft2048".
+    """
+    name = re.sub(r"[^A-Za-z0-9]+", "_", device or "device").strip("_").lower()
+    return f"{name}_{rate}Hz_{channels}ch_{bit_depth}bit_fft{n_fft}"
+
+
+class NoiseProfile:
+    """
+    Mean noise power and the derived gain per STFT bin for one device configuration.
+    """
+    def __init__(self, device, rate, channels, bit_depth, noise_power, gain, n_fft=N_FFT, hop_length=HOP_LENGTH,
+                 seconds=None, created=None):
+        self.device = device
+        self.rate = rate
+        self.channels = channels
+        self.bit_depth = bit_depth
+        self.noise_power = np.asarray(noise_power, dtype=np.float64)
+        self.gain = np.asarray(gain, dtype=np.float32)
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.seconds = seconds # Length of the calibration recording
+        self.created = created or time.time()
+
+    @property
+    def key(self):
+        return profile_key(self.device, self.rate, self.channels, self.bit_depth, self.n_fft)
+
+    @classmethod
+    def from_recording(cls, y, rate, device, bit_depth, floor_percentile=50, max_attenuation_db=12.0,
+                       n_fft=N_FFT, hop_length=HOP_LENGTH):
+        """
+        Profile of a silent reference `y` (1-D, or (channels, n) for a binaural recording; the
+        channels share one gain, as they come from the same microphone model and preamp).
+        """
+        y = np.atleast_2d(np.asarray(y, dtype=np.float32))
+        power = np.mean([np.mean(np.abs(librosa.stft(channel, n_fft=n_fft, hop_length=hop_length)) ** 2, axis=1)
+                         for channel in y], axis=0)
+        return cls(device, rate, len(y), bit_depth, power, noise_gain(power, floor_percentile, max_attenuation_db),
+                   n_fft, hop_length, seconds=y.shape[1] / rate)
+
+    def apply(self, y):
+        """
+        Denoises a waveform (1-D, or one recording per row). Returns (y_denoised as float32,
+        magnitude of the gained STFT), so callers can reuse the spectrum instead of computing another STFT.
+        """
+        spectrum = librosa.stft(np.asarray(y, dtype=np.float32), n_fft=self.n_fft, hop_length=self.hop_length)
+        spectrum *= self.gain[:, None]
+        y_denoised = librosa.istft(spectrum, hop_length=self.hop_length, n_fft=self.n_fft, length=np.shape(y)[-1])
+        return y_denoised.astype(np.float32, copy=False), np.abs(spectrum)
+
+    def summary(self):
+        attenuated = self.gain < 0.99
+        freqs = librosa.fft_frequencies(sr=self.rate, n_fft=self.n_fft)
+        worst = freqs[np.argsort(self.gain)[:3]]
+        return (f"{self.device} @ {self.rate}Hz/{self.channels}ch/{self.bit_depth}bit, {self.seconds or 0:.1f}s reference, "
+                f"{attenuated.mean():.0%} of bins attenuated (min gain {20 * np.log10(self.gain.min()):.1f} dB "
+                f"at {', '.join(f'{f:.0f}' for f in worst)} Hz)")
+
+    def save(self, path):
+        """
+        Writes the profile atomically (readers never see a partial file).
+        """
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, noise_power=self.noise_power, gain=self.gain,
+                 meta=np.array([self.device, self.rate, self.channels, self.bit_depth, self.n_fft, self.hop_length,
+                                self.seconds or 0, self.created], dtype=object))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=True) as data:
+            device, rate, channels, bit_depth, n_fft, hop_length, seconds, created = data["meta"].tolist()
+            return cls(device, int(rate), int(channels), int(bit_depth), data["noise_power"], data["gain"],
+                       int(n_fft), int(hop_length), seconds, created)
+
+
+def noise_gain(noise_power, floor_percentile=50, max_attenuation_db=12.0):
+    """
+    Per-bin amplitude gain bringing every bin's noise down to the `floor_percentile` level.
+    """
+    reference = np.percentile(noise_power, floor_percentile)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gain = np.sqrt(np.where(noise_power > 0, reference / noise_power, 1.0))
+    return np.clip(gain, 10 ** (-max_attenuation_db / 20), 1.0).astype(np.float32)
+
+
+class NoiseProfileStore:
+    """
+    Folder of profiles, one file per device configuration. Loaded profiles are cached.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self._cache = {} # key -> (mtime, NoiseProfile)
+
+    def path_for(self, key):
+        return os.path.join(self.folder, key + ".npz")
+
+    def get(self, device, rate, channels, bit_depth, n_fft=N_FFT):
+        """
+        The profile of a device configuration, or None if it was never calibrated (or cannot be read).
+        """
+        path = self.path_for(profile_key(device, rate, channels, bit_depth, n_fft))
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        cached = self._cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            profile = NoiseProfile.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not read noise profile {path}: {e}")
+            return None
+        self._cache[path] = (mtime, profile)
+        return profile
+
+    def put(self, profile):
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.path_for(profile.key)
+        profile.save(path)
+        return path
+
+    def remove(self, profile):
+        try:
+            os.remove(self.path_for(profile.key))
+        except OSError:
+            pass
+
+    def profiles(self):
+        if not os.path.isdir(self.folder):
+            return []
+        return [NoiseProfile.load(os.path.join(self.folder, name)) for name in sorted(os.listdir(self.folder))
+                if name.endswith(".npz") and not name.endswith(".tmp.npz")]
+
+
+def record_silence(app, seconds):
+    """
+    Records `seconds` of audio on the device the app would use. Returns (y, device_params).
+    """
+    controller = app.AudioController()
+    if not controller.is_ready():
+        raise RuntimeError(f"No input device supports {app.TARGET_SAMPLE_RATE}Hz with {app.TARGET_CHANNELS} channel(s).")
+    params = controller.device_params
+    p_record = app.create_audio_backend()
+    stream = None
+    frames = []
+    try:
+        stream = p_record.open(format=params['format'], channels=params['channels'], rate=params['rate'], input=True,
+                               frames_per_buffer=app.CHUNK_SIZE, input_device_index=params['index'])
+        for _ in range(int(np.ceil(seconds * params['rate'] / app.CHUNK_SIZE))):
+            frames.append(stream.read(app.CHUNK_SIZE, exception_on_overflow=False))
+    finally:
+        if stream: stream.stop_stream(); stream.close()
+        p_record.terminate()
+    y = controller.split_channels(controller.decode_frames(frames), params['channels'])
+    controller.close()
+    return y, params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate and inspect per-device noise profiles.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    calibrate = sub.add_parser("calibrate", help="Record silence on the configured device and store its profile")
+    calibrate.add_argument("--seconds", type=float, help="Length of the silent reference (default: NOISE_CALIBRATION_SECONDS)")
+    sub.add_parser("list", help="List the stored profiles")
+    parser.add_argument("--dir", help="Profile folder (default: NOISE_PROFILE_DIR of the app)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # The GUI module imports Qt; no window is shown
+    import audio_with_spectogram as app
+    store = NoiseProfileStore(args.dir or app.NOISE_PROFILE_DIR)
+    if args.command == "list":
+        for profile in store.profiles():
+            print(f"{profile.key}: {profile.summary()}")
+        return 0
+
+    seconds = args.seconds or app.NOISE_CALIBRATION_SECONDS
+    print(f"Recording {seconds:g}s of silence; keep the room and the patient quiet...")
+    y, params = record_silence(app, seconds)
+    profile = NoiseProfile.from_recording(y, params['rate'], params['name'], 8 * app.WIDTH_SAMPLE,
+                                          app.NOISE_FLOOR_PERCENTILE, app.NOISE_MAX_ATTENUATION_DB)
+    print(f"Saved {store.put(profile)}\n{profile.summary()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""
+Multi-resolution pyramids for zooming and panning the analysis plots.
+
+Drawing the analysis page with librosa.display goes through every sample and every Mel
+frame, so redrawing it for each step of a pinch or a drag would get slower with the length
+of the recording. Instead, each recording is summarized once (on a background thread):
+- `WaveformPyramid`: the min and max of blocks of WAVEFORM_BASE_BLOCK samples, then of
+  PYRAMID_FACTOR of those blocks, and so on up to a few hundred columns;
+- `MelPyramid`: the Mel spectrogram with PYRAMID_FACTOR frames merged per level (the loudest
+  frame wins, so short thumps stay visible), colored on demand in tiles of MEL_TILE_FRAMES
+  columns that are cached.
+A view of [t0, t1] reads the coarsest level that still has a column per pixel and only the
+tiles it overlaps, so `ZoomableAnalysisPlot.render()` handles at most a few columns per pixel
+of canvas whatever the recording length or zoom.
+
+    python plot_pyramid.py bench --seconds 30 1800   # build and frame times (Agg, offscreen)
+
+This module deliberately imports nothing from the GUI script.
+"""
+import sys
+import time
+import argparse
+from collections import OrderedDict
+import numpy as np
+import matplotlib
+
+WAVEFORM_BASE_BLOCK = 16 # Samples per column of the finest waveform level
+PYRAMID_FACTOR = 4 # Columns merged into one from a level to the next
+PYRAMID_MIN_COLUMNS = 512 # Stop adding levels below this many columns
+MEL_TILE_FRAMES = 256 # Columns per colored Mel tile
+MEL_TILE_CACHE = 256 # Colored tiles kept (LRU); 128 Mel bands x 256 columns is 128 kB per tile
+
+
+def _reduce_columns(values, factor, ufunc):
+    """
+    Merges every `factor` columns (last axis) of `values` with `ufunc` (the last group may be shorter).
+    """
+    return ufunc.reduceat(values, np.arange(0, values.shape[-1], factor), axis=-1)
+
+
+class WaveformPyramid:
+    """
+    Min/max envelope of one channel at several time resolutions.
+    """
+    def __init__(self, y, sr, base_block=WAVEFORM_BASE_BLOCK, factor=PYRAMID_FACTOR, min_columns=PYRAMID_MIN_COLUMNS):
+        self.y = y
+        self.sr = sr
+        self.peak = max(float(np.max(y)), -float(np.min(y))) if len(y) else 0.0
+        self.levels = [] # (samples per column, mins, maxs), finest first
+        block = base_block
+        mins, maxs = _reduce_columns(y, block, np.minimum), _reduce_columns(y, block, np.maximum)
+        self.levels.append((block, mins, maxs))
+        while len(mins) > min_columns * factor:
+            block *= factor
+            mins, maxs = _reduce_columns(mins, factor, np.minimum), _reduce_columns(maxs, factor, np.maximum)
+            self.levels.append((block, mins, maxs))
+
+    @property
+    def duration(self):
+        return len(self.y) / self.sr
+
+    def view(self, t0, t1, max_columns):
+        """
+        Envelope of [t0, t1] in at most about `max_columns` columns. Returns (times, lower, upper);
+        zoomed in far enough, these are the samples themselves (lower == upper).
+        """
+        s0 = max(0, int(np.floor(t0 * self.sr)))
+        s1 = min(len(self.y), int(np.ceil(t1 * self.sr)) + 1)
+        span = max(0, s1 - s0)
+        if span <= max_columns:
+            samples = self.y[s0:s1]
+            return np.arange(s0, s0 + len(samples)) / self.sr, samples, samples
+        block, mins, maxs = next((level for level in self.levels if level[0] * max_columns >= span), self.levels[-1])
+        if block * max_columns > span * PYRAMID_FACTOR and block == self.levels[0][0]:
+            # Between the samples and the finest level: reduce the few visible samples directly
+            block = int(np.ceil(span / max_columns))
+            segment = self.y[s0:s1]
+            starts = np.arange(0, len(segment), block)
+            return (s0 + starts + block / 2) / self.sr, np.minimum.reduceat(segment, starts), np.maximum.reduceat(segment, starts)
+        i0, i1 = s0 // block, min(len(mins), -(-s1 // block))
+        return (np.arange(i0, i1) * block + block / 2) / self.sr, mins[i0:i1], maxs[i0:i1]
+
+
+class MelPyramid:
+    """
+    Mel spectrogram (dB) of one channel at several time resolutions, colored in cached tiles.
+    `frame_s` is the time step of its columns (hop length / Mel rate).
+    """
+    def __init__(self, S_mel_db, frame_s, cmap='viridis', factor=PYRAMID_FACTOR, min_columns=PYRAMID_MIN_COLUMNS,
+                 tile_frames=MEL_TILE_FRAMES, cache_tiles=MEL_TILE_CACHE):
+        S_mel_db = np.asarray(S_mel_db, dtype=np.float32)
+        self.frame_s = frame_s
+        self.n_frames = S_mel_db.shape[1]
+        self.n_mels = S_mel_db.shape[0]
+        self.cmap = matplotlib.colormaps[cmap]
+        self.norm = matplotlib.colors.Normalize(float(S_mel_db.min()), float(S_mel_db.max())) # As specshow: the full data range
+        self.tile_frames = tile_frames
+        self.levels = [(1, S_mel_db)] # (frames per column, dB matrix), finest first
+        while self.levels[-1][1].shape[1] > min_columns * factor:
+            frames, S = self.levels[-1]
+            self.levels.append((frames * factor, _reduce_columns(S, factor, np.maximum)))
+        self._tiles = OrderedDict() # (level, tile) -> RGBA uint8 (n_mels, columns, 4)
+        self.cache_tiles = cache_tiles
+
+    @property
+    def duration(self):
+        return self.n_frames * self.frame_s
+
+    def tile(self, level, index):
+        key = (level, index)
+        image = self._tiles.get(key)
+        if image is None:
+            S = self.levels[level][1][:, index * self.tile_frames:(index + 1) * self.tile_frames]
+            image = self._tiles[key] = self.cmap(self.norm(S), bytes=True)
+            while len(self._tiles) > self.cache_tiles:
+                self._tiles.popitem(last=False)
+        else:
+            self._tiles.move_to_end(key)
+        return image
+
+    def prepare(self):
+        """
+        Colors the tiles of the coarse levels up front (coarsest first, as long as they fit in
+        the cache), so the first zoom steps only read cached tiles.
+        """
+        budget = self.cache_tiles
+        for level in reversed(range(len(self.levels))):
+            count = -(-self.levels[level][1].shape[1] // self.tile_frames)
+            if count > budget:
+                break
+            for index in range(count):
+                self.tile(level, index)
+            budget -= count
+
+    def view(self, t0, t1, max_columns):
+        """
+        Colored image of [t0, t1] with at most about `max_columns` columns. Returns
+        (RGBA image (n_mels, columns, 4), (start time, end time) of its first and last column).
+        """
+        f0 = max(0, int(np.floor(t0 / self.frame_s)))
+        f1 = min(self.n_frames, int(np.ceil(t1 / self.frame_s)))
+        level = next((i for i, (frames, _) in enumerate(self.levels) if (f1 - f0) <= frames * max_columns), len(self.levels) - 1)
+        frames, S = self.levels[level]
+        c0, c1 = f0 // frames, max(f0 // frames + 1, min(S.shape[1], -(-f1 // frames)))
+        first, last = c0 // self.tile_frames, (c1 - 1) // self.tile_frames
+        image = np.concatenate([self.tile(level, i) for i in range(first, last + 1)], axis=1)
+        image = image[:, c0 - first * self.tile_frames:c1 - first * self.tile_frames]
+        return image, (c0 * frames * self.frame_s, min(c1 * frames, self.n_frames) * self.frame_s)
+
+
+def build_pyramids(y, sr, S_mel_db, mel_sr, hop_length):
+    """
+    Pyramids of every channel of a recording: a list of (WaveformPyramid, MelPyramid or None).
+    `y` is (n,) or (channels, n) and `S_mel_db` (n_mels, frames), (channels, n_mels, frames) or None.
+    """
+    waveforms = [y] if y.ndim == 1 else list(y)
+    spectrograms = [S_mel_db] if S_mel_db is None or S_mel_db.ndim == 2 else list(S_mel_db)
+    pyramids = []
+    for waveform, spectrogram in zip(waveforms, spectrograms):
+        mel = None
+        if spectrogram is not None:
+            mel = MelPyramid(spectrogram, hop_length / mel_sr)
+            mel.prepare()
+        pyramids.append((WaveformPyramid(waveform, sr), mel))
+    return pyramids
+
+
+class ZoomableAnalysisPlot:
+    """
+    Draws the waveform and Mel spectrogram axes of a recording for a time range, from its
+    pyramids, in the borderless style of the analysis page (one row of axes per channel).
+    """
+    def __init__(self, waveform_figure, spectrogram_figure, pyramids, color='darkcyan', min_span_s=0.05):
+        self.pyramids = pyramids
+        self.duration = max(max(waveform.duration, mel.duration if mel else 0) for waveform, mel in pyramids)
+        self.min_span_s = min_span_s
+        self.t0, self.t1 = 0.0, self.duration
+        self.waveform_figure, self.spectrogram_figure = waveform_figure, spectrogram_figure
+        self.lines, self.images, self.waveform_axes, self.spectrogram_axes = [], [], [], []
+        for figure in (waveform_figure, spectrogram_figure):
+            figure.clear()
+            figure.subplots_adjust(left=0, right=1, top=1, bottom=0)
+        for i, (waveform, mel) in enumerate(pyramids):
+            ax = waveform_figure.add_subplot(len(pyramids), 1, i + 1)
+            self.lines.append(ax.plot([], [], color=color, linewidth=1, antialiased=False)[0]) # One column per pixel: nothing to smooth
+            ax.set_ylim(-(waveform.peak or 1) * 1.05, (waveform.peak or 1) * 1.05)
+            self.waveform_axes.append(ax)
+            ax = spectrogram_figure.add_subplot(len(pyramids), 1, i + 1)
+            self.images.append(ax.imshow(np.zeros((1, 1, 4), np.uint8), aspect='auto', origin='lower',
+                                         interpolation='nearest', extent=(0, 1, 0, mel.n_mels if mel else 1)) if mel else None)
+            self.spectrogram_axes.append(ax)
+        for ax in self.waveform_axes + self.spectrogram_axes:
+            ax.set_axis_off()
+
+    def set_range(self, t0, t1):
+        """
+        Shows [t0, t1], kept inside the recording and at least `min_span_s` long.
+        """
+        span = min(self.duration, max(self.min_span_s, t1 - t0))
+        t0 = min(max(0.0, t0), self.duration - span)
+        self.t0, self.t1 = t0, t0 + span
+
+    def zoom(self, fraction, factor):
+        """
+        Zooms by `factor` (> 1 zooms in) around the point at `fraction` of the view's width.
+        """
+        anchor = self.t0 + fraction * (self.t1 - self.t0)
+        span = (self.t1 - self.t0) / factor
+        self.set_range(anchor - fraction * span, anchor + (1 - fraction) * span)
+
+    def pan(self, fraction):
+        """
+        Moves the view by `fraction` of its width (positive: content follows a drag to the right).
+        """
+        shift = fraction * (self.t1 - self.t0)
+        self.set_range(self.t0 - shift, self.t1 - shift)
+
+    def render(self):
+        """
+        Updates the artists for the current range; the caller draws the canvases.
+        """
+        for (waveform, mel), line, image, ax_w, ax_s in zip(self.pyramids, self.lines, self.images,
+                                                             self.waveform_axes, self.spectrogram_axes):
+            width = max(1, int(ax_w.bbox.width))
+            times, lower, upper = waveform.view(self.t0, self.t1, width)
+            line.set_data(np.repeat(times, 2), np.column_stack([lower, upper]).ravel()) # Zigzag through min and max: a filled envelope
+            ax_w.set_xlim(self.t0, self.t1)
+            if mel:
+                pixels, (x0, x1) = mel.view(self.t0, self.t1, max(1, int(ax_s.bbox.width)))
+                image.set_data(pixels)
+                image.set_extent((x0, x1, 0, mel.n_mels))
+            ax_s.set_xlim(self.t0, self.t1)
+
+
+def bench(durations, sr=48000, frames=60, width=800, seed=0):
+    """
+    Build time of the pyramids and frame time of random views (any zoom level and position) on an offscreen figure,
+    against redrawing the whole view with librosa.display, for synthetic recordings of each duration.
+    """
+    matplotlib.use("Agg")
+    import librosa.display
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    rng = np.random.default_rng(seed)
+    hop, mel_sr = 1024, sr
+    for seconds in durations:
+        y = (0.05 * rng.standard_normal(int(seconds * sr))).astype(np.float32)
+        y[::sr] += 0.8 # A click per second
+        S_mel_db = rng.uniform(-80, 0, (128, len(y) // hop + 1)).astype(np.float32)
+
+        start = time.perf_counter()
+        pyramids = build_pyramids(y, sr, S_mel_db, mel_sr, hop)
+        build_s = time.perf_counter() - start
+
+        figures = [Figure(figsize=(width / 100, 3), dpi=100) for _ in range(2)]
+        canvases = [FigureCanvasAgg(figure) for figure in figures]
+        start = time.perf_counter()
+        for figure in figures:
+            figure.clear()
+        librosa.display.waveshow(y, sr=sr, ax=figures[0].add_subplot(1, 1, 1), max_points=11025)
+        librosa.display.specshow(S_mel_db, sr=mel_sr, hop_length=hop, ax=figures[1].add_subplot(1, 1, 1))
+        for canvas in canvases:
+            canvas.draw()
+        full_redraw_s = time.perf_counter() - start
+
+        plot = ZoomableAnalysisPlot(figures[0], figures[1], pyramids)
+        frame_times = []
+        for _ in range(frames):
+            span = plot.duration * 10 ** rng.uniform(np.log10(plot.min_span_s / plot.duration), 0) # Any zoom level
+            t0 = rng.uniform(0, plot.duration - span)
+            plot.set_range(t0, t0 + span)
+            start = time.perf_counter()
+            plot.render()
+            for canvas in canvases:
+                canvas.draw()
+            frame_times.append(time.perf_counter() - start)
+        print(f"{seconds:7.0f}s: build {build_s * 1000:7.1f} ms, full redraw {full_redraw_s * 1000:7.1f} ms, "
+              f"zoom/pan frame median {np.median(frame_times) * 1000:5.1f} ms (max {np.max(frame_times) * 1000:5.1f} ms)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zoom/pan pyramids of the analysis plots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="Build and frame times on synthetic recordings")
+    bench_parser.add_argument("--seconds", type=float, nargs="+", default=[30, 300, 1800])
+    bench_parser.add_argument("--frames", type=int, default=60)
+    args = parser.parse_args(argv)
+    bench(args.seconds, frames=args.frames)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Thermal- and load-aware quality governor for the display pipeline.
+
+Reads the CPU temperature and a throttling signal from sysfs, combines them with measured
+display latencies, and picks a display tier
+(spectrogram hop size and Mel bins, waveform decimation, live refresh interval).
+
+Throttling is read from the Raspberry Pi firmware flags, else from the kernel's thermal
+throttle counter (x86), else from the temperature against the thermal zone's passive trip
+point. Without any of them it is unknown and counts as not throttled: a CPU frequency below
+the maximum is not a signal, as ondemand and schedutil lower it whenever the CPU is idle.
+
+Only display settings are governed. The clinical analysis configuration (the features, the
+model and the pulsatile detection parameters) is never changed by this module.
+
+Every sysfs path is resolved under `sysfs_root`, so tests can point it at a fake tree.
+"""
+import os
+
+THERMAL_ZONE_TEMP = "sys/class/thermal/thermal_zone0/temp" # millidegrees Celsius
+THROTTLED_STATE = "sys/devices/platform/soc/soc:firmware/get_throttled" # Raspberry Pi firmware flags (hex)
+THROTTLE_COUNT = "sys/devices/system/cpu/cpu0/thermal_throttle/core_throttle_count" # Throttling events since boot (x86)
+THERMAL_ZONE_TRIP = "sys/class/thermal/thermal_zone0/trip_point_{}_{}" # _temp (millidegrees) and _type of trip point N
+MAX_TRIP_POINTS = 8
+THROTTLED_NOW_MASK = 0xE # Bits 1-3: frequency capped / throttled / soft temperature limit, right now
+
+
+class QualityGovernor:
+    """
+    Chooses a display tier within a latency budget. `tiers` is ordered from the highest to the
+    lowest quality; the governor moves one tier at a time with hysteresis.
+    """
+    def __init__(self, tiers, latency_budget_s, sysfs_root="/", hot_temp_c=75.0, cool_temp_c=65.0,
+                 smoothing=0.3):
+        if not tiers:
+            raise ValueError("QualityGovernor needs at least one tier")
+        self.tiers = tiers
+        self.latency_budget_s = latency_budget_s
+        self.sysfs_root = sysfs_root
+        self.hot_temp_c = hot_temp_c
+        self.cool_temp_c = cool_temp_c
+        self.smoothing = smoothing # Weight of the newest latency sample in the moving average
+        self.tier_index = 0
+        self.latencies = {} # stage -> exponentially weighted latency in seconds
+        self.throttle_count = self._throttle_count() # Counter value at the last tier selection
+
+    # --- sysfs readings ---
+    def _read(self, relative_path):
+        """
+        Returns the stripped content of a sysfs file, or None if it does not exist.
+        """
+        try:
+            with open(os.path.join(self.sysfs_root, relative_path)) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def cpu_temperature_c(self):
+        value = self._read(THERMAL_ZONE_TEMP)
+        return int(value) / 1000 if value else None
+
+    def _throttle_count(self):
+        value = self._read(THROTTLE_COUNT)
+        return int(value) if value else None
+
+    def passive_trip_c(self):
+        """
+        Temperature of the thermal zone's first passive trip point (where the kernel starts
+        throttling), or None. Active trip points only switch fans on.
+        """
+        for index in range(MAX_TRIP_POINTS):
+            kind = self._read(THERMAL_ZONE_TRIP.format(index, "type"))
+            if kind is None:
+                return None
+            if kind == "passive":
+                value = self._read(THERMAL_ZONE_TRIP.format(index, "temp"))
+                return int(value) / 1000 if value else None
+        return None
+
+    def throttled(self):
+        """
+        True if the firmware reports throttling or a capped frequency right now, the throttle
+        counter grew since the last tier selection, or the CPU is at its passive trip point.
+        False when none of these can be read (unknown).
+        """
+        value = self._read(THROTTLED_STATE)
+        if value:
+            return bool(int(value, 16) & THROTTLED_NOW_MASK)
+        count = self._throttle_count()
+        if count is not None:
+            return self.throttle_count is not None and count > self.throttle_count
+        trip, temp = self.passive_trip_c(), self.cpu_temperature_c()
+        return trip is not None and temp is not None and temp >= trip
+
+    def snapshot(self):
+        """
+        Current readings and governor state, for logging.
+        """
+        return {"temp_c": self.cpu_temperature_c(), "throttled": self.throttled(),
+                "latencies": dict(self.latencies), "tier": self.tiers[self.tier_index]["name"]}
+
+    # --- latency tracking ---
+    def record_latency(self, stage, seconds):
+        """
+        Feeds one measured latency (e.g. of "display") into the moving average.
+        """
+        previous = self.latencies.get(stage)
+        self.latencies[stage] = seconds if previous is None else (
+            self.smoothing * seconds + (1 - self.smoothing) * previous)
+
+    # --- tier selection ---
+    def select_tier(self):
+        """
+        Steps down one tier when hot, throttled or over the latency budget; steps back up one
+        tier when cool and comfortably within budget. Returns the selected tier dict.
+        """
+        temp = self.cpu_temperature_c()
+        throttled = self.throttled()
+        latency = max(self.latencies.values(), default=0.0)
+        hot = throttled or (temp is not None and temp >= self.hot_temp_c)
+        cool = not throttled and (temp is None or temp <= self.cool_temp_c)
+
+        if (hot or latency > self.latency_budget_s) and self.tier_index < len(self.tiers) - 1:
+            self.tier_index += 1
+        elif cool and latency < 0.5 * self.latency_budget_s and self.tier_index > 0:
+            self.tier_index -= 1
+        self.throttle_count = self._throttle_count()
+        return self.tiers[self.tier_index]
@@ -0,0 +1,427 @@
+"""
+SQLite catalog of all recordings.
+
+One row per WAV file with the metadata needed to find it again: device, sample rate, bit
+depth, channels, duration, recording time, size, and per channel the verdict, BPM,
+probability and the model (name and version) that produced them. Queries use indexes on the
+recording time, device, model version and verdict, so filters like "all pulsatile recordings
+from the last 30 days" over 50k recordings take milliseconds and never touch the folder.
+
+The catalog is updated incrementally:
+- `add_file()` when the app saves (or opens and analyzes) a recording,
+- `sync_folder()` when files appear in or disappear from the recordings folder: the names in
+  the folder are compared with the catalog and only new files are read (WAV header only).
+  With `rescan` (at startup) cataloged files are also checked for changes.
+The device name is stored as given at SAVE. File names only carry a shortened token of it
+(`device_token()`); the catalog remembers which device every token stands for, so files
+found on disk get the full name of a device the app has used, and none otherwise.
+Files found on disk have no verdict until they are analyzed (`analyze_missing()`, or opening
+them in the app).
+
+    python recording_catalog.py sync "OBJTIN Recording"
+    python recording_catalog.py query --verdict Pulsatile --days 30
+    python recording_catalog.py analyze            # fill in verdicts (imports the GUI script)
+    python recording_catalog.py bench --rows 50000 # query timings on a synthetic catalog
+
+This module deliberately imports nothing from the GUI script (the CLI does, to analyze).
+"""
+import os
+import re
+import sys
+import json
+import time
+import wave
+import sqlite3
+import argparse
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    device TEXT,
+    rate INTEGER,
+    bit_depth INTEGER,
+    channels INTEGER,
+    duration_s REAL,
+    recorded_at REAL NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    model TEXT,
+    model_version TEXT,
+    bpm REAL, -- Highest BPM over the channels (for sorting)
+    analyzed_at REAL
+);
+CREATE TABLE IF NOT EXISTS channel_results (
+    recording_id INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    channel INTEGER NOT NULL,
+    verdict TEXT,
+    bpm REAL,
+    probability REAL,
+    recorded_at REAL NOT NULL, -- Copy of recordings.recorded_at, so verdict + period filters use one index
+    PRIMARY KEY (recording_id, channel)
+);
+CREATE TABLE IF NOT EXISTS device_names (
+    token TEXT PRIMARY KEY, -- Device part of the file names SAVE proposes (device_token())
+    device TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_recorded_at ON recordings(recorded_at);
+CREATE INDEX IF NOT EXISTS recordings_device ON recordings(device, recorded_at);
+CREATE INDEX IF NOT EXISTS recordings_model ON recordings(model_version, recorded_at);
+CREATE INDEX IF NOT EXISTS recordings_folder ON recordings(folder, name);
+CREATE INDEX IF NOT EXISTS recordings_bpm ON recordings(bpm);
+CREATE INDEX IF NOT EXISTS channel_results_verdict ON channel_results(verdict, recorded_at, recording_id);
+CREATE INDEX IF NOT EXISTS channel_results_bpm ON channel_results(bpm, recording_id);
+"""
+
+# rec_{device_token}_{rate}Hz_{ch}ch_{YYYYmmdd_HHMMSS}.wav, as built by MainWindow.handle_save_as
+SAVE_NAME = re.compile(r"^rec_(?P<device>.+)_(?P<rate>\d+)Hz_(?P<channels>\d+)ch_(?P<stamp>\d{8}_\d{6})\.wav$", re.IGNORECASE)
+SORT_COLUMNS = {"recorded_at": "r.recorded_at", "device": "r.device", "duration": "r.duration_s", "rate": "r.rate",
+                "name": "r.name", "bpm": "r.bpm"}
+
+
+def device_token(device):
+    """
+    Device part of the file names SAVE proposes (spaces become underscores, at most 15 characters).
+    """
+    return device.replace(" ", "_")[:15]
+
+
+def wav_metadata(path):
+    """
+    Catalog fields read from the file system and the WAV header (the samples are not read).
+    `device_token` is the device part of an app file name; it is resolved by the catalog.
+    """
+    stat = os.stat(path)
+    with wave.open(path, 'rb') as rd:
+        rate, width, channels, frames = rd.getframerate(), rd.getsampwidth(), rd.getnchannels(), rd.getnframes()
+    meta = {"rate": rate, "bit_depth": 8 * width, "channels": channels, "duration_s": frames / rate if rate else 0,
+            "size": stat.st_size, "mtime": stat.st_mtime, "recorded_at": stat.st_mtime, "device": None, "device_token": None}
+    match = SAVE_NAME.match(os.path.basename(path))
+    if match:
+        meta["device_token"] = match.group("device")
+        try:
+            meta["recorded_at"] = time.mktime(time.strptime(match.group("stamp"), "%Y%m%d_%H%M%S"))
+        except ValueError:
+            pass
+    return meta
+
+
+class RecordingCatalog:
+    """
+    The catalog database. Safe to use from several threads (one connection behind a lock).
+    """
+    def __init__(self, db_path):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- Updates ---
+    def add_file(self, path, analysis=None, device=None, recorded_at=None):
+        """
+        Adds or refreshes one recording from its WAV header. `analysis` is the list of
+        per-channel `SoundAnalyzer.analyze()` results, if known.
+        """
+        meta = wav_metadata(path)
+        if recorded_at:
+            meta["recorded_at"] = recorded_at
+        with self._lock, self._db:
+            if device:
+                meta["device"] = device
+                self._register_device(device)
+            else:
+                meta["device"] = self._device_names().get(meta["device_token"])
+            self._upsert(os.path.abspath(path), meta)
+            if analysis:
+                self._set_analysis(os.path.abspath(path), analysis)
+
+    def register_device(self, device):
+        """
+        Remembers the full name of `device`, so files it records are cataloged under it.
+        """
+        with self._lock, self._db:
+            self._register_device(device)
+
+    def _register_device(self, device):
+        self._db.execute("INSERT OR REPLACE INTO device_names (token, device) VALUES (?, ?)", (device_token(device), device))
+
+    def _device_names(self):
+        return {row["token"]: row["device"] for row in self._db.execute("SELECT token, device FROM device_names")}
+
+    def set_analysis(self, path, analysis):
+        """
+        Stores the verdicts of a recording that is already in the catalog. Returns False if it is not.
+        """
+        with self._lock, self._db:
+            return self._set_analysis(os.path.abspath(path), analysis)
+
+    def _upsert(self, path, meta):
+        self._db.execute(
+            """INSERT INTO recordings (path, folder, name, device, rate, bit_depth, channels, duration_s, recorded_at, size, mtime)
+               VALUES (:path, :folder, :name, :device, :rate, :bit_depth, :channels, :duration_s, :recorded_at, :size, :mtime)
+               ON CONFLICT(path) DO UPDATE SET device = COALESCE(excluded.device, device), rate = excluded.rate,
+                   bit_depth = excluded.bit_depth, channels = excluded.channels, duration_s = excluded.duration_s,
+                   recorded_at = excluded.recorded_at, size = excluded.size, mtime = excluded.mtime""",
+            {**meta, "path": path, "folder": os.path.dirname(path), "name": os.path.basename(path)})
+        self._db.execute("UPDATE channel_results SET recorded_at = ? WHERE recording_id = (SELECT id FROM recordings WHERE path = ?)",
+                         (meta["recorded_at"], path))
+
+    def _set_analysis(self, path, analysis):
+        row = self._db.execute("SELECT id, recorded_at FROM recordings WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return False
+        channels = [(row["id"], channel, result.get("result"),
+                     None if result.get("bpm") is None else float(result["bpm"]),
+                     None if result.get("probability") is None else float(result["probability"]), row["recorded_at"])
+                    for channel, result in enumerate(analysis)]
+        bpms = [channel[3] for channel in channels if channel[3] is not None]
+        self._db.execute("UPDATE recordings SET model = ?, model_version = ?, bpm = ?, analyzed_at = ? WHERE id = ?",
+                         (analysis[0].get("model"), None if analysis[0].get("model_version") is None else str(analysis[0]["model_version"]),
+                          max(bpms) if bpms else None, time.time(), row["id"]))
+        self._db.execute("DELETE FROM channel_results WHERE recording_id = ?", (row["id"],))
+        self._db.executemany(
+            "INSERT INTO channel_results (recording_id, channel, verdict, bpm, probability, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+            channels)
+        return True
+
+    def sync_folder(self, folder, rescan=False):
+        """
+        Brings the catalog in line with the WAV files of `folder` by name: adds new files and
+        removes missing ones, without touching the others. With `rescan`, cataloged files are
+        also stat'ed and re-read if their size or time changed (while the app runs, SAVE
+        updates the files it writes with add_file()). Returns (added, removed).
+        """
+        folder = os.path.abspath(folder)
+        on_disk = {name for name in os.listdir(folder) if name.lower().endswith(".wav")}
+        with self._lock:
+            known = {row["name"]: (row["size"], row["mtime"]) for row in
+                     self._db.execute("SELECT name, size, mtime FROM recordings WHERE folder = ?", (folder,))}
+            devices = self._device_names()
+        removed = [name for name in known if name not in on_disk]
+        added = 0
+        for name in sorted(on_disk):
+            path = os.path.join(folder, name)
+            if name in known:
+                if not rescan:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if known[name] == (stat.st_size, stat.st_mtime):
+                    continue
+            try:
+                meta = wav_metadata(path)
+            except (OSError, EOFError, wave.Error):
+                continue # Still being written, a folder, or not a PCM WAV
+            meta["device"] = devices.get(meta["device_token"])
+            with self._lock, self._db:
+                self._upsert(path, meta)
+            added += 1
+        if removed:
+            with self._lock, self._db:
+                self._db.executemany("DELETE FROM recordings WHERE path = ?", [(os.path.join(folder, name),) for name in removed])
+        return added, len(removed)
+
+    # --- Queries ---
+    def query(self, verdict=None, since=None, until=None, device=None, model_version=None, min_bpm=None, max_bpm=None,
+              name=None, analyzed=None, order_by="recorded_at", descending=True, limit=500, offset=0):
+        """
+        Recordings matching every given filter, as dicts with a `channels` list of per-channel
+        results. `verdict` and the BPM range match if any channel matches.
+        """
+        where, params = self._filters(verdict, since, until, device, model_version, min_bpm, max_bpm, name, analyzed)
+        order = SORT_COLUMNS.get(order_by)
+        if order is None:
+            raise ValueError(f"Cannot sort by {order_by}; use one of {sorted(SORT_COLUMNS)}")
+        sql = (f"SELECT r.* FROM recordings r {where} ORDER BY {order} {'DESC' if descending else 'ASC'}, r.id "
+               f"LIMIT ? OFFSET ?")
+        with self._lock:
+            rows = [dict(row) for row in self._db.execute(sql, params + [limit, offset])]
+            if rows:
+                ids = [row["id"] for row in rows]
+                results = {}
+                for start in range(0, len(ids), 900): # Stay under SQLite's parameter limit
+                    batch = ids[start:start + 900]
+                    for c in self._db.execute(
+                            f"SELECT * FROM channel_results WHERE recording_id IN ({','.join('?' * len(batch))}) ORDER BY channel", batch):
+                        results.setdefault(c["recording_id"], []).append(
+                            {"verdict": c["verdict"], "bpm": c["bpm"], "probability": c["probability"]})
+                for row in rows:
+                    row["channel_results"] = results.get(row["id"], [])
+        return rows
+
+    def count(self, verdict=None, since=None, until=None, device=None, model_version=None, min_bpm=None, max_bpm=None,
+              name=None, analyzed=None):
+        where, params = self._filters(verdict, since, until, device, model_version, min_bpm, max_bpm, name, analyzed)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM recordings r {where}", params).fetchone()[0]
+
+    def devices(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT DISTINCT device FROM recordings WHERE device IS NOT NULL ORDER BY device")]
+
+    @staticmethod
+    def _filters(verdict, since, until, device, model_version, min_bpm, max_bpm, name, analyzed):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("r.recorded_at >= ?"); params.append(since)
+        if until is not None:
+            clauses.append("r.recorded_at < ?"); params.append(until)
+        if device is not None:
+            clauses.append("r.device = ?"); params.append(device)
+        if model_version is not None:
+            clauses.append("r.model_version = ?"); params.append(str(model_version))
+        if name:
+            clauses.append("r.name LIKE ?"); params.append(f"%{name}%")
+        if analyzed is not None:
+            clauses.append("r.analyzed_at IS NOT NULL" if analyzed else "r.analyzed_at IS NULL")
+        channel_clauses, channel_params = [], []
+        if verdict is not None:
+            channel_clauses.append("c.verdict = ?"); channel_params.append(verdict)
+            # Repeat the period on the channel rows, so the (verdict, recorded_at) index does the work
+            if since is not None:
+                channel_clauses.append("c.recorded_at >= ?"); channel_params.append(since)
+            if until is not None:
+                channel_clauses.append("c.recorded_at < ?"); channel_params.append(until)
+        if min_bpm is not None:
+            channel_clauses.append("c.bpm >= ?"); channel_params.append(min_bpm)
+        if max_bpm is not None:
+            channel_clauses.append("c.bpm <= ?"); channel_params.append(max_bpm)
+        if channel_clauses:
+            clauses.append(f"r.id IN (SELECT c.recording_id FROM channel_results c WHERE {' AND '.join(channel_clauses)})")
+            params += channel_params
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def analyze_missing(catalog, limit=None):
+    """
+    Analyzes the cataloged recordings that have no verdict yet (imports the GUI script).
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # The GUI module imports Qt; no window is shown
+    import audio_with_spectogram as app
+    from report_export import load_wav
+    analyzer, controller = app.SoundAnalyzer(), app.AudioController(probe_devices=False)
+    done = 0
+    for row in catalog.query(analyzed=False, limit=limit or 1 << 62):
+        try:
+            y, sr = load_wav(row["path"], controller)
+            catalog.set_analysis(row["path"], analyzer.analyze_channels(y, sr))
+            done += 1
+        except Exception as e:
+            print(f"Skipping {row['path']}: {e}")
+    return done
+
+
+def bench(rows, db_path):
+    """
+    Fills a catalog with `rows` synthetic recordings and times typical queries.
+    """
+    import random
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    catalog = RecordingCatalog(db_path)
+    rng = random.Random(0)
+    now = time.time()
+    verdicts = ["Pulsatile", "Non-Pulsatile", "No Sound"]
+    start = time.perf_counter()
+    with catalog._lock, catalog._db:
+        for i in range(rows):
+            path = f"/bench/rec_Station_{i % 8}_48000Hz_1ch_{i:08d}.wav"
+            catalog._upsert(path, {"device": f"Station {i % 8}", "rate": 48000, "bit_depth": 24, "channels": 1,
+                                   "duration_s": 30.0, "recorded_at": now - rng.uniform(0, 3 * 365 * 86400),
+                                   "size": 4320044, "mtime": now})
+            catalog._set_analysis(path, [{"result": rng.choice(verdicts), "bpm": rng.uniform(40, 180),
+                                          "probability": rng.random(), "model": "logreg_pipeline",
+                                          "model_version": rng.choice(["5", "6"])}])
+    print(f"Inserted {rows} recordings in {time.perf_counter() - start:.1f}s")
+    cases = {
+        "pulsatile, last 30 days": dict(verdict="Pulsatile", since=now - 30 * 86400),
+        "station 3, newest first": dict(device="Station 3"),
+        "model v5, BPM 60-80": dict(model_version="5", min_bpm=60, max_bpm=80),
+        "all, sorted by BPM": dict(order_by="bpm"),
+    }
+    for label, filters in cases.items():
+        start = time.perf_counter()
+        result = catalog.query(limit=500, **filters)
+        total = catalog.count(**{k: v for k, v in filters.items() if k != "order_by"})
+        print(f"  {label:<28} {len(result):>4} shown / {total:>6} matching in {(time.perf_counter() - start) * 1000:6.1f} ms")
+    catalog.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain and query the recording catalog.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="Add new/changed WAV files of a folder and drop missing ones")
+    sync.add_argument("--device", action="append", default=[], help="Full name of a device whose files are in the folder (repeatable)")
+    sync.add_argument("folder")
+    query = sub.add_parser("query", help="List matching recordings")
+    query.add_argument("--verdict", help="Pulsatile, Non-Pulsatile or No Sound")
+    query.add_argument("--days", type=float, help="Only the last N days")
+    query.add_argument("--device")
+    query.add_argument("--model-version")
+    query.add_argument("--min-bpm", type=float)
+    query.add_argument("--max-bpm", type=float)
+    query.add_argument("--sort", default="recorded_at", choices=sorted(SORT_COLUMNS))
+    query.add_argument("--ascending", action="store_true")
+    query.add_argument("--limit", type=int, default=50)
+    query.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    sub.add_parser("analyze", help="Analyze the recordings that have no verdict yet")
+    bench_parser = sub.add_parser("bench", help="Time queries on a synthetic catalog")
+    bench_parser.add_argument("--rows", type=int, default=50000)
+    bench_parser.add_argument("--db", default="catalog_bench.sqlite3")
+    parser.add_argument("--db", dest="catalog_db", help="Catalog file (default: CATALOG_DB of the app)")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        bench(args.rows, args.db)
+        return 0
+    db_path = args.catalog_db
+    if db_path is None:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # The GUI module imports Qt; no window is shown
+        import audio_with_spectogram as app
+        db_path = app.CATALOG_DB
+    catalog = RecordingCatalog(db_path)
+
+    if args.command == "sync":
+        for device in args.device:
+            catalog.register_device(device)
+        start = time.perf_counter()
+        added, removed = catalog.sync_folder(args.folder, rescan=True)
+        print(f"{added} added or updated, {removed} removed in {time.perf_counter() - start:.2f}s; {catalog.count()} recordings cataloged")
+    elif args.command == "analyze":
+        print(f"Analyzed {analyze_missing(catalog)} recording(s).")
+    else:
+        start = time.perf_counter()
+        rows = catalog.query(verdict=args.verdict, since=time.time() - args.days * 86400 if args.days else None,
+                             device=args.device, model_version=args.model_version, min_bpm=args.min_bpm,
+                             max_bpm=args.max_bpm, order_by=args.sort, descending=not args.ascending, limit=args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            for row in rows:
+                verdicts = ", ".join(f"{c['verdict']}" + (f" {c['bpm']:.0f} BPM" if c["bpm"] else "") for c in row["channel_results"]) or "not analyzed"
+                print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(row['recorded_at']))}  {row['device'] or '-':<16} "
+                      f"{row['rate']}Hz/{row['bit_depth']}bit {row['duration_s']:5.1f}s  {verdicts:<32} {row['path']}")
+            print(f"{len(rows)} recording(s) in {elapsed:.1f} ms")
+    catalog.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Crash-safe write-through journal for recordings.
+
+While a recording runs, every chunk read from the stream is appended to a WAV file in the
+journal folder by a background writer thread (batched writes, fsync at most once per
+`fsync_interval` seconds). The WAV header is written up front with placeholder sizes and
+patched on `finalize()`. Saving a finished recording is then a hard link (or copy when the
+destination is on another filesystem) instead of a full rewrite.
+
+If the application crashes or the Pi loses power, the partial journal file is recovered into
+the output folder by `recover_journals()` on the next start.
+"""
+import os
+import time
+import queue
+import shutil
+import struct
+import itertools
+import threading
+
+PARTIAL_SUFFIX = ".wav.part" # Journal still being written (or interrupted)
+FINAL_SUFFIX = ".wav" # Journal finalized but not yet saved/discarded
+WAV_HEADER_SIZE = 44
+_session_counter = itertools.count() # Keeps journal names unique within one process
+
+
+def wav_header(channels, sample_width, rate, data_size):
+    """
+    Builds a 44-byte PCM WAV header (same layout the `wave` module writes).
+    """
+    block_align = channels * sample_width
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+                       b'RIFF', 36 + data_size, b'WAVE',
+                       b'fmt ', 16, 1, channels, rate, rate * block_align, block_align, sample_width * 8,
+                       b'data', data_size)
+
+
+def patch_wav_header(f, channels, sample_width, rate):
+    """
+    Rewrites the RIFF/data sizes of an open journal file from its current length,
+    truncating any trailing partial frame. Returns the number of data bytes.
+    """
+    f.seek(0, os.SEEK_END)
+    data_size = max(0, f.tell() - WAV_HEADER_SIZE)
+    data_size -= data_size % (channels * sample_width)
+    f.truncate(WAV_HEADER_SIZE + data_size)
+    f.seek(0)
+    f.write(wav_header(channels, sample_width, rate, data_size))
+    f.flush()
+    os.fsync(f.fileno())
+    return data_size
+
+
+class RecordingJournal:
+    """
+    Streams the chunks of one recording to disk on a background thread.
+    """
+    def __init__(self, journal_dir, channels, sample_width, rate, fsync_interval=1.0):
+        os.makedirs(journal_dir, exist_ok=True)
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        self.fsync_interval = fsync_interval
+        name = f"session_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{next(_session_counter)}"
+        self.partial_path = os.path.join(journal_dir, name + PARTIAL_SUFFIX)
+        self.path = None # Set to the finalized journal file by finalize()
+        self.bytes_written = 0
+        self.error = None
+
+        self._queue = queue.Queue()
+        self._file = open(self.partial_path, 'wb')
+        self._file.write(wav_header(channels, sample_width, rate, 0))
+        self._writer = threading.Thread(target=self._write_loop, name="RecordingJournalWriter", daemon=True)
+        self._writer.start()
+
+    def append(self, data):
+        """
+        Queues one chunk of raw PCM bytes. Never blocks on disk I/O.
+        """
+        self._queue.put(data)
+
+    def _write_loop(self):
+        """
+        Writes queued chunks in batches and fsyncs at most every `fsync_interval` seconds.
+        A `None` item ends the loop.
+        """
+        last_sync = time.monotonic()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+            try:
+                for data in batch:
+                    self._file.write(data)
+                    self.bytes_written += len(data)
+                if time.monotonic() - last_sync >= self.fsync_interval or not running:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    last_sync = time.monotonic()
+            except OSError as e:
+                self.error = e # Keep draining so capture never blocks; reported by finalize()
+                print(f"Recording journal write error: {e}")
+
+    def _stop_writer(self):
+        """
+        Flushes the remaining chunks and stops the writer thread.
+        """
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def finalize(self):
+        """
+        Flushes everything, patches the WAV header and renames the journal to `.wav`.
+        Returns the finalized path, or None if the journal could not be written.
+        """
+        self._stop_writer()
+        if self._file.closed:
+            return self.path
+        try:
+            patch_wav_header(self._file, self.channels, self.sample_width, self.rate)
+            self._file.close()
+            self.path = self.partial_path[:-len(PARTIAL_SUFFIX)] + FINAL_SUFFIX
+            os.replace(self.partial_path, self.path)
+        except OSError as e:
+            self.error = e
+            print(f"Error finalizing recording journal: {e}")
+            self._file.close()
+            return None
+        return self.path if self.error is None else None
+
+    def export(self, filepath):
+        """
+        Saves the finalized recording to `filepath` with a hard link (instant, same filesystem),
+        falling back to a file copy. Returns True on success.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            os.link(self.path, filepath)
+        except OSError:
+            try:
+                shutil.copyfile(self.path, filepath)
+            except OSError as e:
+                print(f"Error exporting recording journal: {e}")
+                return False
+        return True
+
+    def discard(self):
+        """
+        Stops writing and deletes the journal file (saved copies made by `export` are kept).
+        """
+        self._stop_writer()
+        if not self._file.closed:
+            self._file.close()
+        for path in (self.partial_path, self.path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def recover_journals(journal_dir, output_dir):
+    """
+    Moves journal files left by an interrupted session into `output_dir` as
+    `recovered_<session>.wav`, patching the header of partially written files.
+    Returns the list of recovered file paths.
+    """
+    if not os.path.isdir(journal_dir):
+        return []
+    recovered = []
+    for name in sorted(os.listdir(journal_dir)):
+        path = os.path.join(journal_dir, name)
+        if name.endswith(PARTIAL_SUFFIX):
+            session = name[:-len(PARTIAL_SUFFIX)]
+        elif name.endswith(FINAL_SUFFIX):
+            session = name[:-len(FINAL_SUFFIX)]
+        else:
+            continue
+        try:
+            if name.endswith(PARTIAL_SUFFIX):
+                with open(path, 'r+b') as f:
+                    header = f.read(WAV_HEADER_SIZE)
+                    if len(header) < WAV_HEADER_SIZE:
+                        raise ValueError("journal shorter than a WAV header")
+                    channels, rate = struct.unpack_from('<HI', header, 22)
+                    sample_width = struct.unpack_from('<H', header, 34)[0] // 8
+                    if patch_wav_header(f, channels, sample_width, rate) == 0:
+                        raise ValueError("journal contains no audio")
+            os.makedirs(output_dir, exist_ok=True)
+            target = os.path.join(output_dir, f"recovered_{session}.wav")
+            os.replace(path, target)
+            recovered.append(target)
+            print(f"Recovered interrupted recording: {target}")
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Could not recover journal {name}: {e}")
+            if os.path.exists(path) and os.path.getsize(path) <= WAV_HEADER_SIZE:
+                os.remove(path) # Nothing worth keeping
+    return recovered
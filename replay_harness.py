@@ -0,0 +1,204 @@
+"""
+Headless soak/load harness for the full recording flow.
+
+Drives the real `MainWindow` (Qt offscreen) through START -> capture -> analysis for many
+simulated sessions, with the virtual audio backend (virtual_audio.py) replaying a WAV file
+or a synthetic signal at real time or N times faster, optionally with injected input
+overflows and jitter. Reports throughput, per-stage latency percentiles, verdicts and
+memory growth across the sessions.
+
+Usage:
+    python replay_harness.py --sessions 200 --speed 50                # load test
+    python replay_harness.py --sessions 1000 --speed 0 --duration 5   # unpaced soak
+    python replay_harness.py --source recording.wav --overflow-rate 0.05 --jitter 0.01
+    python replay_harness.py --json report.json                       # machine-readable report
+    python replay_harness.py --capture-mode thread                    # in-process AudioWorker instead of the capture process
+
+No audio hardware is needed. Dialogs are logged and listed in the report instead of
+being shown (they would block the headless event loop).
+"""
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Must be set before Qt is imported
+
+import sys
+import json
+import time
+import argparse
+import resource
+import numpy as np
+
+import audio_with_spectogram as app
+
+# --- Harness Configuration ---
+HARNESS_SESSIONS = 100
+HARNESS_SPEED = 20.0 # Replay speed relative to real time (0 = unpaced)
+HARNESS_SESSION_TIMEOUT_S = 120 # A session taking longer than this counts as hung
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # ru_maxrss is in KiB on Linux
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = np.asarray(values) * 1000
+    return {"p50_ms": float(np.percentile(values, 50)), "p95_ms": float(np.percentile(values, 95)),
+            "max_ms": float(values.max()), "mean_ms": float(values.mean())}
+
+
+class HeadlessDialogs:
+    """
+    Replaces the QMessageBox calls of the app with logging while the harness runs.
+    """
+    def __init__(self):
+        self.messages = []
+
+    def _log(self, kind):
+        def show(parent, title, text, *args, **kwargs):
+            self.messages.append((kind, title, text))
+            return app.QMessageBox.Ok
+        return show
+
+    def install(self):
+        for kind in ("information", "warning", "critical"):
+            setattr(app.QMessageBox, kind, staticmethod(self._log(kind)))
+
+
+def run_session(qt_app, window, timeout_s):
+    """
+    Clicks START, waits for the recording and its analysis, then RESET.
+    Returns the timings and outcome of the session.
+    """
+    completed = {}
+    original = window.handle_recording_completion
+
+    def timed_completion(frames):
+        completed["capture_done"] = time.perf_counter()
+        original(frames)
+        completed["analysis_done"] = time.perf_counter()
+
+    window.handle_recording_completion = timed_completion # Connected to the worker by handle_start_stop
+    start = time.perf_counter()
+    window.handle_start_stop()
+    worker = window.worker_thread
+    if worker is None:
+        window.handle_recording_completion = original
+        return {"ok": False, "error": "recording did not start"}
+
+    deadline = start + timeout_s
+    while window.worker_thread is not None or "analysis_done" not in completed:
+        qt_app.processEvents()
+        if time.perf_counter() > deadline:
+            worker.stop()
+            worker.wait(5000)
+            window.handle_recording_completion = original
+            return {"ok": False, "error": "timeout"}
+        time.sleep(0.002)
+    window.handle_recording_completion = original
+
+    analysis = window.last_analysis or []
+    outcome = {"ok": bool(analysis), "capture_s": completed["capture_done"] - start,
+               "analysis_s": completed["analysis_done"] - completed["capture_done"],
+               "total_s": completed["analysis_done"] - start,
+               "frames": len(window.recorded_frames or []),
+               "results": [channel["result"] for channel in analysis],
+               "bpm": [channel["bpm"] for channel in analysis]}
+    window.handle_finish_reset()
+    qt_app.processEvents()
+    return outcome
+
+
+def run_harness(sessions, speed, source, overflow_rate, jitter_s, seed, duration, channels, timeout_s, capture_mode=None):
+    """
+    Runs `sessions` simulated recordings through one MainWindow and summarizes them.
+    """
+    from PyQt5.QtWidgets import QApplication
+
+    app.AUDIO_BACKEND = "virtual"
+    app.CAPTURE_MODE = capture_mode or app.CAPTURE_MODE
+    app.VIRTUAL_AUDIO = {"source": source, "speed": speed or None, "overflow_rate": overflow_rate,
+                         "jitter_s": jitter_s, "seed": seed, "bpm": app.VIRTUAL_AUDIO.get("bpm", 72)}
+    app.FIXED_RECORDING_DURATION_SECONDS = duration
+    app.TARGET_CHANNELS = channels
+
+    dialogs = HeadlessDialogs()
+    dialogs.install()
+    qt_app = QApplication.instance() or QApplication(sys.argv)
+    window = app.MainWindow()
+    window.show()
+
+    outcomes = []
+    rss_start = peak_rss_mb()
+    wall_start = time.perf_counter()
+    for i in range(sessions):
+        outcome = run_session(qt_app, window, timeout_s)
+        outcomes.append(outcome)
+        if not outcome["ok"]:
+            print(f"Session {i}: FAILED ({outcome.get('error', 'no analysis result')})")
+        elif (i + 1) % max(1, sessions // 10) == 0:
+            print(f"Session {i + 1}/{sessions}: {outcome['results']} in {outcome['total_s']:.2f}s, peak RSS {peak_rss_mb():.0f} MB")
+    wall = time.perf_counter() - wall_start
+    window.close()
+
+    ok = [o for o in outcomes if o["ok"]]
+    verdicts = {}
+    for o in ok:
+        for result in o["results"]:
+            verdicts[result] = verdicts.get(result, 0) + 1
+    return {
+        "sessions": sessions, "succeeded": len(ok), "failed": sessions - len(ok),
+        "source": source, "speed": speed, "overflow_rate": overflow_rate, "jitter_s": jitter_s,
+        "duration_s": duration, "channels": channels, "capture_mode": app.CAPTURE_MODE,
+        "wall_s": wall, "sessions_per_s": sessions / wall if wall else None,
+        "audio_seconds_per_s": len(ok) * duration / wall if wall else None,
+        "capture": percentiles([o["capture_s"] for o in ok]),
+        "analysis": percentiles([o["analysis_s"] for o in ok]),
+        "total": percentiles([o["total_s"] for o in ok]),
+        "verdicts": verdicts,
+        "dialogs": [f"{kind}: {title}" for kind, title, _ in dialogs.messages],
+        "peak_rss_mb": {"start": rss_start, "end": peak_rss_mb()},
+    }
+
+
+def print_report(report):
+    print(f"\n{report['succeeded']}/{report['sessions']} sessions succeeded in {report['wall_s']:.1f}s "
+          f"({report['sessions_per_s']:.2f} sessions/s, {report['audio_seconds_per_s']:.1f} audio-s/s)")
+    for stage in ("capture", "analysis", "total"):
+        p = report[stage]
+        if p:
+            print(f"  {stage:<9} p50 {p['p50_ms']:8.1f} ms   p95 {p['p95_ms']:8.1f} ms   max {p['max_ms']:8.1f} ms")
+    print(f"  verdicts  {report['verdicts']}")
+    print(f"  peak RSS  {report['peak_rss_mb']['start']:.0f} MB -> {report['peak_rss_mb']['end']:.0f} MB")
+    if report["dialogs"]:
+        print(f"  dialogs   {len(report['dialogs'])}: {sorted(set(report['dialogs']))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak/load test the recording flow with a virtual audio device.")
+    parser.add_argument("--sessions", type=int, default=HARNESS_SESSIONS)
+    parser.add_argument("--speed", type=float, default=HARNESS_SPEED, help="Replay speed (1 = real time, 0 = unpaced)")
+    parser.add_argument("--source", default="pulsatile", help="pulsatile, non_pulsatile, noise or a WAV file path")
+    parser.add_argument("--overflow-rate", type=float, default=0.0, help="Probability that a buffer read overflows")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum extra delay per buffer (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duration", type=int, default=app.FIXED_RECORDING_DURATION_SECONDS, help="Recording length (s)")
+    parser.add_argument("--channels", type=int, default=app.TARGET_CHANNELS)
+    parser.add_argument("--capture-mode", choices=["process", "thread"], default=app.CAPTURE_MODE,
+                        help="Capture in the capture process (as the GUI does by default) or in an in-process thread")
+    parser.add_argument("--timeout", type=float, default=HARNESS_SESSION_TIMEOUT_S, help="Per-session timeout (s)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = run_harness(args.sessions, args.speed, args.source, args.overflow_rate, args.jitter, args.seed,
+                         args.duration, args.channels, args.timeout, args.capture_mode)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
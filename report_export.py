@@ -0,0 +1,313 @@
+"""
+Per-session report export (PNG or PDF).
+
+A report shows, for every channel, the waveform with the detected peaks and the Mel
+spectrogram, drawn with the same helpers as the analysis page (`draw_waveform`,
+`draw_spectrogram`), plus a header with the verdict, BPM, probability and model version and
+the representative beat of the beat-synchronous average (`draw_beat`).
+
+Reports are rendered on the Agg backend in a pool of worker processes. Each worker receives
+the precomputed colormap once (pool initializer) and keeps one figure template per channel
+count, which is cleared and redrawn for every report instead of building a new Figure.
+
+From the GUI, `ReportExporter.submit_render()` returns a Future, so SAVE never waits for
+rendering. For archive re-analysis, the batch command analyzes and renders WAV files:
+
+    python report_export.py recordings/*.wav --out reports --format pdf --workers 4
+
+Rendering needs nothing from the GUI script. The workers are started with "spawn", though,
+which runs the imports of the parent's main script again in every worker: started from the
+batch command they only load this module (and the GUI script once they analyze files), but
+started from the GUI each worker also imports PyQt5, librosa and the rest of the GUI script.
+The GUI therefore starts at most REPORT_EXPORT_WORKERS of them once and keeps them, and only
+with EXPORT_REPORT_ON_SAVE, which is off by default.
+"""
+import os
+import sys
+import time
+import wave
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import numpy as np
+import librosa.display
+
+# --- Report Configuration ---
+REPORT_FORMAT = "png" # "png" or "pdf"
+REPORT_SIZE_IN = (11.69, 8.27) # A4 landscape
+REPORT_DPI = 120
+REPORT_CMAP = "viridis" # Same colormap as the analysis page
+REPORT_CMAP_SIZE = 256 # Entries of the precomputed colormap lookup table
+REPORT_WORKERS = max(1, (os.cpu_count() or 2) - 1) # Leave a core for the GUI / capture
+DRAW_MAX_SAMPLES = 2**22 # Longer waveforms are drawn from an envelope computed block by block (waveshow keeps a float64 time per sample)
+DRAW_MAX_FRAMES = 8192 # Longer spectrograms are drawn with frames merged, the loudest winning (as the zoom pyramids do)
+
+_worker = {} # Per-process state set up by _init_worker: colormap, templates, analyzer, controller
+
+
+# --- Plot Helpers (shared with the analysis page of the GUI) ---
+def draw_waveform(ax, y, sr, max_points=11025):
+    """
+    Draws one channel's waveform on `ax` in the borderless style of the analysis page.
+    """
+    if len(y) > DRAW_MAX_SAMPLES:
+        # What waveshow shows zoomed out (the max |y| of every hop, filled around zero), without its per-sample arrays
+        hop = max(1, len(y) // max_points)
+        envelope = np.empty(len(y) // hop, dtype=np.float32)
+        block = max(1, DRAW_MAX_SAMPLES // hop) # Envelope points per block of y
+        for start in range(0, len(envelope), block):
+            frames = np.asarray(y[start * hop:min(start + block, len(envelope)) * hop]).reshape(-1, hop)
+            envelope[start:start + len(frames)] = np.maximum(frames.max(axis=1), -frames.min(axis=1))
+        ax.fill_between(np.arange(len(envelope)) * hop / sr, -envelope, envelope, step='post', color='darkcyan')
+    else:
+        librosa.display.waveshow(y, sr=sr, ax=ax, color='darkcyan', max_points=max_points)
+
+    # Remove axis, labels, and title for the waveform plot
+    ax.set_xticks([])  # Remove x-axis ticks
+    ax.set_yticks([])  # Remove y-axis ticks
+    for spine in ax.spines.values():
+        spine.set_visible(False)  # Hide all spines
+    ax.set_title('')  # Remove title
+
+def draw_spectrogram(ax, S_mel_db, mel_sr, hop_length, cmap='viridis'):
+    """
+    Draws one channel's Mel spectrogram (computed at `mel_sr`) on `ax` in the borderless
+    style of the analysis page. `S_mel_db` may be None (empty axes).
+    """
+    if S_mel_db is not None and S_mel_db.shape[-1] > DRAW_MAX_FRAMES:
+        factor = -(-S_mel_db.shape[-1] // DRAW_MAX_FRAMES)
+        S_mel_db = np.maximum.reduceat(S_mel_db, np.arange(0, S_mel_db.shape[-1], factor), axis=-1)
+        hop_length *= factor
+    if S_mel_db is not None:
+        librosa.display.specshow(S_mel_db, sr=mel_sr, hop_length=hop_length, x_axis='time', y_axis='mel', ax=ax, fmax=mel_sr/2, cmap=cmap)
+
+    # Remove axis, labels, and title for the spectrogram plot
+    ax.set_xticks([])  # Remove x-axis ticks
+    ax.set_yticks([])  # Remove y-axis ticks
+    ax.set_yticklabels([])  # Remove y-axis labels (Hz)
+    ax.set_ylabel('')  # Explicitly remove the "Hz" label on the y-axis
+    for spine in ax.spines.values():
+        spine.set_visible(False)  # Hide all spines
+    ax.set_title('')  # Remove title
+
+
+def draw_beat(ax, ensemble, label=""):
+    """
+    Draws the representative beat of a beat-synchronous average (the "ensemble" of an analysis
+    result): the averaged RMS envelope above the noise floor (its median, subtracted in power),
+    mirrored around zero in the color of the waveform.
+    """
+    envelope = np.asarray(ensemble["beat_envelope"], dtype=np.float64)
+    beat = np.sqrt(np.maximum(envelope ** 2 - np.median(envelope) ** 2, 0))
+    t = np.arange(len(beat)) * ensemble["beat_step_s"]
+    ax.fill_between(t, -beat, beat, color='darkcyan', linewidth=0)
+    ax.set_xlim(0, t[-1])
+    ax.axis('off')
+    ax.set_title(f"{label + ': ' if label else ''}{ensemble['beats']} beats, {ensemble['bpm']:.0f} BPM, "
+                 f"r = {ensemble['consistency']:.2f}", fontsize=8)
+
+
+# --- Report Rendering ---
+def report_colormap(name=REPORT_CMAP, size=REPORT_CMAP_SIZE):
+    """
+    Precomputes the spectrogram colormap as a lookup table (sent to every worker once).
+    """
+    return matplotlib.colormaps[name].resampled(size)
+
+
+def build_report_data(y, sr, S_mel_db, mel_sr, hop_length, analysis, title, labels=("L", "R"),
+                      waveform_points=11025, timestamp=None):
+    """
+    Bundles everything a report needs; this is what is sent to the worker processes.
+    `analysis` is the list of per-channel `SoundAnalyzer.analyze()` results (or None) and
+    `labels` names the channels of a multi-channel recording.
+    """
+    return {"y": y, "sr": sr, "S_mel_db": S_mel_db, "mel_sr": mel_sr, "hop_length": hop_length,
+            "analysis": analysis, "title": title, "labels": list(labels), "waveform_points": waveform_points,
+            "timestamp": time.time() if timestamp is None else timestamp}
+
+
+class ReportTemplate:
+    """
+    A reusable report figure for recordings with `channels` channels: a header (with the average
+    beat of every channel), then a waveform row and a spectrogram row per channel. `render()` only
+    clears and redraws the axes.
+    """
+    def __init__(self, channels, cmap):
+        self.channels = channels
+        self.cmap = cmap
+        self.figure = Figure(figsize=REPORT_SIZE_IN, dpi=REPORT_DPI)
+        self.canvas = FigureCanvasAgg(self.figure)
+        grid = self.figure.add_gridspec(1 + 2 * channels, 1, height_ratios=[0.6] + [1, 1.4] * channels,
+                                        left=0.04, right=0.98, top=0.97, bottom=0.03, hspace=0.25)
+        header_grid = grid[0].subgridspec(1, 1 + channels, width_ratios=[5] + [1] * channels, wspace=0.1)
+        self.header = self.figure.add_subplot(header_grid[0])
+        self.beat_axes = [self.figure.add_subplot(header_grid[1 + i]) for i in range(channels)]
+        self.waveform_axes = [self.figure.add_subplot(grid[1 + 2 * i]) for i in range(channels)]
+        self.spectrogram_axes = [self.figure.add_subplot(grid[2 + 2 * i]) for i in range(channels)]
+
+    def render(self, data, path):
+        """
+        Draws `data` (see build_report_data) and saves it to `path` (format from the extension).
+        """
+        waveforms = [data["y"]] if data["y"].ndim == 1 else list(data["y"])
+        spectrograms = [data["S_mel_db"]] if data["S_mel_db"] is None or data["S_mel_db"].ndim == 2 else list(data["S_mel_db"])
+        analysis = data["analysis"] or [{}] * len(waveforms)
+        labels = data["labels"] if len(waveforms) > 1 else [""]
+
+        self.header.cla()
+        self.header.axis('off')
+        lines = [data["title"], time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(data["timestamp"])) +
+                 f"   {data['sr']} Hz, {len(waveforms[0]) / data['sr']:.1f} s"]
+        for label, result in zip(labels, analysis):
+            line = f"{label + ': ' if label else ''}{result.get('result', 'n/a')}"
+            line += f"   BPM: {result['bpm']:.0f}" if result.get("bpm") else "   BPM: -"
+            if result.get("probability") is not None:
+                line += f"   p(sound) = {result['probability']:.3f}"
+            if result.get("model"):
+                line += f"   model {result['model']} v{result['model_version']}"
+            lines.append(line)
+        self.header.text(0, 1, "\n".join(lines), va='top', ha='left', fontsize=11, family='monospace')
+        for ax, label, result in zip(self.beat_axes, labels, analysis):
+            ax.cla()
+            ax.axis('off')
+            if result.get("ensemble"):
+                draw_beat(ax, result["ensemble"], label)
+
+        for ax, channel, result in zip(self.waveform_axes, waveforms, analysis):
+            ax.cla()
+            draw_waveform(ax, channel, data["sr"], data["waveform_points"])
+            ax.set_xlim(0, len(channel) / data["sr"]) # Line up with the spectrogram below
+            for t in result.get("peak_times", []):
+                ax.axvline(t, color='crimson', linewidth=0.8, alpha=0.8) # Detected peaks
+        for ax, channel_mel_db in zip(self.spectrogram_axes, spectrograms):
+            ax.cla()
+            draw_spectrogram(ax, channel_mel_db, data["mel_sr"], data["hop_length"], cmap=self.cmap)
+
+        self.figure.savefig(path)
+        return path
+
+
+# --- Worker Processes ---
+def _init_worker(cmap, load_analyzer):
+    """
+    Pool initializer: keeps the shared colormap and, for batch exports, one analyzer per worker.
+    """
+    _worker["cmap"] = cmap
+    _worker["templates"] = {}
+    if load_analyzer:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # The GUI module imports Qt; no window is shown
+        import audio_with_spectogram as app
+        _worker["app"] = app
+        _worker["analyzer"] = app.SoundAnalyzer()
+        _worker["controller"] = app.AudioController(probe_devices=False)
+
+
+def render_report(data, path):
+    """
+    Worker task: renders prepared report data to `path` with this worker's template.
+    """
+    channels = 1 if data["y"].ndim == 1 else data["y"].shape[0]
+    template = _worker["templates"].get(channels)
+    if template is None:
+        template = _worker["templates"][channels] = ReportTemplate(channels, _worker["cmap"])
+    return template.render(data, path)
+
+
+def load_wav(path, controller):
+    """
+    Reads a PCM WAV file into a (channels, n) or (n,) float32 waveform. Returns (y, sr).
+    """
+    with wave.open(path, 'rb') as rd:
+        channels, width, sr = rd.getnchannels(), rd.getsampwidth(), rd.getframerate()
+        frames = [rd.readframes(rd.getnframes())]
+    return controller.split_channels(controller.decode_frames(frames, width), channels), sr
+
+
+def analyze_and_render(wav_path, path):
+    """
+    Worker task for batch exports: loads, analyzes and renders one recording.
+    """
+    app, controller, analyzer = _worker["app"], _worker["controller"], _worker["analyzer"]
+    y, sr = load_wav(wav_path, controller)
+    S_mel_db = controller.compute_mel_spectrogram(y, sr)
+    analysis = analyzer.analyze_channels(y, sr, controller.analysis_waveform(y, sr)) # Decimated once, for both
+    data = build_report_data(y, sr, S_mel_db, app.analysis_rate(sr), app.SPEC_HOP_LENGTH, analysis,
+                             os.path.basename(wav_path), app.EAR_LABELS, timestamp=os.path.getmtime(wav_path))
+    return render_report(data, path)
+
+
+class ReportExporter:
+    """
+    Process pool rendering reports in the background. Uses the "spawn" start method, so it is
+    safe to create from the Qt process. Pass `analyze=True` to export reports of WAV files.
+    """
+    def __init__(self, max_workers=REPORT_WORKERS, analyze=False):
+        self.analyze = analyze
+        self._pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn"),
+                                         initializer=_init_worker, initargs=(report_colormap(), analyze))
+
+    def submit_render(self, data, path):
+        """
+        Queues prepared report data (see build_report_data). Returns a Future resolving to `path`.
+        """
+        return self._pool.submit(render_report, data, path)
+
+    def submit_file(self, wav_path, path):
+        """
+        Queues the analysis and report of a WAV file. Returns a Future resolving to `path`.
+        """
+        if not self.analyze:
+            raise ValueError("ReportExporter was created without analyze=True")
+        return self._pool.submit(analyze_and_render, wav_path, path)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def report_path_for(wav_path, out_dir=None, fmt=REPORT_FORMAT):
+    """
+    `<out_dir>/<recording name>_report.<fmt>` (next to the recording when out_dir is None).
+    """
+    name = os.path.splitext(os.path.basename(wav_path))[0] + f"_report.{fmt}"
+    return os.path.join(out_dir or os.path.dirname(wav_path), name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze WAV recordings and export per-session reports.")
+    parser.add_argument("recordings", nargs="+", help="WAV files or folders of WAV files")
+    parser.add_argument("--out", help="Output folder (default: next to each recording)")
+    parser.add_argument("--format", choices=["png", "pdf"], default=REPORT_FORMAT)
+    parser.add_argument("--workers", type=int, default=REPORT_WORKERS)
+    args = parser.parse_args(argv)
+
+    paths = []
+    for entry in args.recordings:
+        if os.path.isdir(entry):
+            paths += sorted(os.path.join(entry, name) for name in os.listdir(entry) if name.lower().endswith(".wav"))
+        else:
+            paths.append(entry)
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    start = time.perf_counter()
+    exporter = ReportExporter(args.workers, analyze=True)
+    futures = {exporter.submit_file(path, report_path_for(path, args.out, args.format)): path for path in paths}
+    failed = 0
+    for done, future in enumerate(as_completed(futures), 1):
+        try:
+            print(f"[{done}/{len(paths)}] {future.result()}")
+        except Exception as e:
+            failed += 1
+            print(f"[{done}/{len(paths)}] Failed: {futures[future]}: {e}")
+    exporter.shutdown()
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths) - failed} report(s) in {elapsed:.1f}s ({len(paths) / elapsed:.2f}/s, {args.workers} workers), {failed} failed")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+In-app history of recent sessions for instant switching on the analysis page.
+
+`SessionHistory` is an LRU of the last sessions: analysis results, the rendered waveform and
+spectrogram images, the plot data and the recorded frames. Every session is a dict of named
+items. The memory used by the arrays and byte buffers of all sessions is kept under a
+budget: when it is exceeded, the large items of the least recently used sessions are spilled
+to files in `spill_dir` (they are read back when the session is opened again), and if that is
+not enough the least recently used sessions are dropped.
+
+Spilled files contain patient recordings: they are deleted with their session and by
+`clear()`, which the GUI calls when it closes.
+
+This module deliberately imports nothing from the GUI script.
+"""
+import os
+import time
+import pickle
+import shutil
+import itertools
+from collections import OrderedDict
+import numpy as np
+
+
+def item_bytes(value):
+    """
+    Approximate memory of a session item: arrays, byte buffers and lists/tuples of them.
+    Everything else (result dicts, labels, SpillBuffers) is small and counted as 0, and so are
+    memory-mapped arrays, which are on disk already.
+    """
+    if isinstance(value, np.memmap):
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(item_bytes(v) for v in value)
+    return 0
+
+
+class SpilledItem:
+    """
+    Placeholder for an item stored in a file. Arrays use .npy, anything else pickle.
+    """
+    def __init__(self, path, nbytes):
+        self.path = path
+        self.nbytes = nbytes
+
+    def load(self):
+        if self.path.endswith(".npy"):
+            return np.load(self.path)
+        with open(self.path, "rb") as f:
+            return pickle.load(f)
+
+
+class SessionHistory:
+    """
+    LRU of the last `max_sessions` sessions within `memory_budget_bytes`. Items of at least
+    `spill_threshold_bytes` may be spilled to `spill_dir`; the most recent session is never
+    spilled (the GUI holds its data anyway).
+    """
+    def __init__(self, max_sessions, memory_budget_bytes, spill_dir, spill_threshold_bytes):
+        self.max_sessions = max_sessions
+        self.memory_budget_bytes = memory_budget_bytes
+        self.spill_dir = spill_dir
+        self.spill_threshold_bytes = spill_threshold_bytes
+        self._sessions = OrderedDict() # key -> {"label", "created", "items"}; most recently used last
+        self._keys = itertools.count(1)
+        shutil.rmtree(spill_dir, ignore_errors=True) # Leftovers of a session that crashed
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, key):
+        return key in self._sessions
+
+    def add(self, label, **items):
+        """
+        Adds a session as the most recent one and returns its key.
+        """
+        key = next(self._keys)
+        self._sessions[key] = {"label": label, "created": time.time(), "items": dict(items)}
+        self._enforce_budget()
+        return key
+
+    def update(self, key, label=None, **items):
+        """
+        Replaces items (and optionally the label) of a session.
+        """
+        session = self._sessions[key]
+        for name in items:
+            self._delete_file(session["items"].get(name))
+        session["items"].update(items)
+        if label is not None:
+            session["label"] = label
+        self._enforce_budget()
+
+    def open(self, key):
+        """
+        Marks a session as the most recent one and returns all its items (spilled ones are read back).
+        """
+        self._sessions.move_to_end(key)
+        items = self._sessions[key]["items"]
+        for name, value in items.items():
+            if isinstance(value, SpilledItem):
+                items[name] = value.load()
+                self._delete_file(value)
+        self._enforce_budget()
+        return dict(items)
+
+    def get(self, key, name, default=None):
+        """
+        One item of a session, without changing the LRU order.
+        """
+        value = self._sessions[key]["items"].get(name, default)
+        return value.load() if isinstance(value, SpilledItem) else value
+
+    def entries(self):
+        """
+        (key, label, created) of every session, most recently used first.
+        """
+        return [(key, s["label"], s["created"]) for key, s in reversed(self._sessions.items())]
+
+    def memory_bytes(self):
+        return sum(item_bytes(value) for s in self._sessions.values() for value in s["items"].values())
+
+    def spilled_bytes(self):
+        return sum(value.nbytes for s in self._sessions.values() for value in s["items"].values()
+                   if isinstance(value, SpilledItem))
+
+    def remove(self, key):
+        session = self._sessions.pop(key)
+        for value in session["items"].values():
+            self._delete_file(value)
+
+    def clear(self):
+        self._sessions.clear()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    # --- Budget ---
+    def _enforce_budget(self):
+        """
+        Drops sessions beyond max_sessions, then spills and finally drops least recently used
+        sessions until the memory budget is met.
+        """
+        while len(self._sessions) > self.max_sessions:
+            self.remove(next(iter(self._sessions)))
+        older = list(self._sessions)[:-1] # Least recently used first; the newest session stays in memory
+        for key in older:
+            if self.memory_bytes() <= self.memory_budget_bytes:
+                return
+            self._spill(key)
+        for key in older:
+            if self.memory_bytes() <= self.memory_budget_bytes:
+                return
+            self.remove(key)
+
+    def _spill(self, key):
+        """
+        Moves the large items of a session to files (largest first). Items that cannot be
+        written stay in memory.
+        """
+        items = self._sessions[key]["items"]
+        large = sorted((name for name, value in items.items() if item_bytes(value) >= self.spill_threshold_bytes),
+                       key=lambda name: item_bytes(items[name]), reverse=True)
+        for name in large:
+            if self.memory_bytes() <= self.memory_budget_bytes:
+                return
+            value = items[name]
+            try:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                if isinstance(value, np.ndarray):
+                    path = os.path.join(self.spill_dir, f"session{key}_{name}.npy")
+                    np.save(path, value)
+                else:
+                    path = os.path.join(self.spill_dir, f"session{key}_{name}.pkl")
+                    with open(path, "wb") as f:
+                        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError as e:
+                print(f"Could not spill {name} of session {key}: {e}")
+                return
+            items[name] = SpilledItem(path, item_bytes(value))
+
+    @staticmethod
+    def _delete_file(value):
+        if isinstance(value, SpilledItem):
+            try:
+                os.remove(value.path)
+            except OSError:
+                pass
@@ -0,0 +1,378 @@
+"""
+Similarity search over the recording archive.
+
+Each recording (each channel of a binaural one) is represented by its feature vector from
+`SoundAnalyzer` (the 17 features of the production recipe), optionally followed by a compact
+Mel-envelope embedding (the time-averaged log-Mel spectrum pooled into a few bands). Vectors
+are compared with the Euclidean distance after standardizing every dimension, so the MFCCs and
+the spectral centroid (Hz) weigh the same.
+
+The index lives in a folder and grows by appending, so inserts are cheap and crash-safe (a key
+saved again replaces its row, which rewrites the files):
+    vectors.f32   raw float32 rows
+    keys.txt      one key (the recording path) per row
+    meta.json     dimension and feature signature
+    ivf.npz       coarse quantizer (centroids + standardization), once the archive is large
+
+Small archives (up to EXACT_SEARCH_LIMIT vectors) are searched exactly with one vectorized
+distance computation. Larger ones use an inverted file index (IVF): the vectors are grouped
+around k-means centroids and a query only scans the IVF_NPROBE closest groups. The GUI retrains
+the quantizer on a background thread (`background_training`); queries use the previous one
+meanwhile.
+
+Batch use (imports the GUI script to analyze the recordings):
+    python similarity_index.py build "OBJTIN Recording"   # index every WAV not indexed yet
+    python similarity_index.py query recording.wav -k 5
+"""
+import os
+import sys
+import json
+import time
+import threading
+import argparse
+import numpy as np
+
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.txt"
+META_FILE = "meta.json"
+IVF_FILE = "ivf.npz"
+
+MEL_EMBEDDING_BANDS = 8 # Bands of the Mel-envelope embedding (0 = features only)
+EXACT_SEARCH_LIMIT = 20000 # Up to this many vectors, queries scan everything
+IVF_NPROBE = 8 # Groups scanned per query once the IVF index is used
+IVF_RETRAIN_GROWTH = 2.0 # Retrain the quantizer when the archive has grown by this factor since training
+KMEANS_ITERATIONS = 15
+KMEANS_SAMPLE = 50000 # Vectors used to train the quantizer
+
+
+def mel_envelope_embedding(S_mel_db, bands=MEL_EMBEDDING_BANDS):
+    """
+    Compact spectral envelope: the log-Mel spectrum averaged over time, pooled into `bands`
+    bands and centred (so the recording level does not matter).
+    """
+    envelope = np.asarray(S_mel_db, dtype=np.float32).mean(axis=-1)
+    pooled = np.array([part.mean() for part in np.array_split(envelope, bands)], dtype=np.float32)
+    return pooled - pooled.mean()
+
+
+def compose_vector(features, S_mel_db=None, bands=MEL_EMBEDDING_BANDS):
+    """
+    Index vector of one channel: its features, plus the Mel-envelope embedding when `bands` > 0.
+    """
+    parts = [np.asarray(features, dtype=np.float32).ravel()]
+    if bands:
+        parts.append(mel_envelope_embedding(S_mel_db, bands))
+    return np.concatenate(parts)
+
+
+def kmeans(x, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    Plain Lloyd's k-means. Returns the (k, dim) centroids.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = nearest_rows(x, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)] # Re-seed empty groups
+    return centroids
+
+
+def nearest_rows(x, centroids):
+    """
+    Index of the closest centroid for every row of `x`.
+    """
+    distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * x @ centroids.T
+    return np.argmin(distances, axis=1)
+
+
+class SimilarityIndex:
+    """
+    k-nearest-neighbor index of recording vectors stored in `index_dir`, one row per key.
+    `signature` describes how the vectors were made (feature recipe, embedding); an index
+    built with another signature is refused, so vectors are never mixed.
+    With `background_training` the IVF quantizer is retrained on a daemon thread instead of
+    inside add_many(); inserts and queries may come from any thread.
+    """
+    def __init__(self, index_dir, dim, signature="", background_training=False):
+        os.makedirs(index_dir, exist_ok=True)
+        self.index_dir = index_dir
+        self.dim = dim
+        self.signature = signature
+        self.background_training = background_training
+        self._lock = threading.Lock() # Guards the rows and the search structures
+        self._training = False # A background retrain is running
+        meta_path = os.path.join(index_dir, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["dim"] != dim or meta["signature"] != signature:
+                raise ValueError(f"Index in {index_dir} was built for {meta['signature']} ({meta['dim']} dims), "
+                                 f"not {signature} ({dim} dims); rebuild it in a new folder")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": dim, "signature": signature}, f)
+
+        vectors = np.fromfile(os.path.join(index_dir, VECTORS_FILE), dtype=np.float32) \
+            if os.path.exists(os.path.join(index_dir, VECTORS_FILE)) else np.zeros(0, np.float32)
+        keys_path = os.path.join(index_dir, KEYS_FILE)
+        keys = open(keys_path).read().splitlines() if os.path.exists(keys_path) else []
+        rows = min(len(vectors) // dim, len(keys)) # An interrupted insert leaves at most one partial row
+        self.vectors = vectors[:rows * dim].reshape(rows, dim)
+        self.keys = keys[:rows]
+        latest = {key: row for row, key in enumerate(self.keys)}
+        if len(latest) < rows: # Indexes written before re-saves replaced their row: keep the last vector per key
+            kept = sorted(latest.values())
+            self.vectors, self.keys = self.vectors[kept], [self.keys[row] for row in kept]
+        if len(vectors) != rows * dim or len(keys) != rows or len(latest) < rows:
+            self._rewrite()
+        self.key_set = set(self.keys)
+
+        self._ivf = None
+        ivf_path = os.path.join(index_dir, IVF_FILE)
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                self._ivf = {name: ivf[name] for name in ivf.files}
+        self._rescale()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.key_set
+
+    # --- Storage ---
+    def _rewrite(self):
+        """
+        Rewrites the row files from memory (after an interrupted insert or a replaced key).
+        """
+        self.vectors.astype(np.float32).tofile(os.path.join(self.index_dir, VECTORS_FILE))
+        with open(os.path.join(self.index_dir, KEYS_FILE), "w") as f:
+            f.writelines(key + "\n" for key in self.keys)
+
+    def add(self, key, vector):
+        """
+        Appends one vector under `key` (e.g. the recording path).
+        """
+        self.add_many([key], np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+    def add_many(self, keys, vectors):
+        """
+        Appends several vectors at once (one write per file). A key that is already indexed
+        (e.g. a recording saved again) has its row replaced instead.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if any("\n" in key for key in keys):
+            raise ValueError("Keys must not contain newlines")
+        with self._lock:
+            if len(set(keys)) < len(keys) or not self.key_set.isdisjoint(keys):
+                self._replace(keys, vectors)
+            else:
+                self._append(keys, vectors)
+        if self._training_due():
+            self._start_training()
+
+    def _append(self, keys, vectors):
+        """
+        Appends new keys' rows to the files and the search structures.
+        """
+        with open(os.path.join(self.index_dir, VECTORS_FILE), "ab") as f:
+            vectors.tofile(f)
+        with open(os.path.join(self.index_dir, KEYS_FILE), "a") as f:
+            f.writelines(key + "\n" for key in keys)
+        self.vectors = np.vstack([self.vectors, vectors])
+        self.keys.extend(keys)
+        self.key_set.update(keys)
+
+        if self._ivf is None:
+            self._rescale() # Exact search: standardize with the statistics of the whole archive
+        else:
+            # The quantizer's standardization is frozen: only the new rows are scaled and assigned
+            scaled = (vectors - self._mean) / self._std
+            self._scaled = np.vstack([self._scaled, scaled])
+            self._norms = np.concatenate([self._norms, (scaled ** 2).sum(axis=1)])
+            self._labels = np.concatenate([self._labels, nearest_rows(scaled, self._ivf["centroids"])])
+            self._lists = None
+
+    def _replace(self, keys, vectors):
+        """
+        Adds rows where some keys are already indexed: their rows are overwritten (the last
+        vector of a key wins) and the files rewritten.
+        """
+        rows = {key: row for row, key in enumerate(self.keys)}
+        updated = self.vectors.copy() # A background retrain may still read the old array
+        new_keys, new_vectors = [], []
+        for key, vector in zip(keys, vectors):
+            if key in rows:
+                updated[rows[key]] = vector
+            elif key in new_keys:
+                new_vectors[new_keys.index(key)] = vector
+            else:
+                new_keys.append(key)
+                new_vectors.append(vector)
+        self.vectors = np.vstack([updated] + [np.asarray(new_vectors).reshape(-1, self.dim)])
+        self.keys.extend(new_keys)
+        self.key_set.update(new_keys)
+        self._rewrite()
+        self._rescale()
+
+    # --- Approximate structure ---
+    def _training_due(self):
+        """
+        True once the archive needs the IVF quantizer, or has outgrown the current one.
+        """
+        return len(self) > EXACT_SEARCH_LIMIT and (self._ivf is None or len(self) >= IVF_RETRAIN_GROWTH * int(self._ivf["trained_count"]))
+
+    def _start_training(self):
+        """
+        Retrains the quantizer, on a daemon thread with `background_training` (one at a time).
+        """
+        if not self.background_training:
+            self.train()
+            return
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+
+        def run():
+            try:
+                self.train()
+            except (OSError, MemoryError) as e:
+                print(f"Similarity index training failed: {e}")
+            finally:
+                self._training = False
+        threading.Thread(target=run, name="SimilarityTraining", daemon=True).start()
+
+    def train(self):
+        """
+        (Re)builds the IVF quantizer: standardization and about sqrt(n) k-means centroids.
+        The k-means runs on a snapshot of the rows without holding the lock; rows added
+        meanwhile are assigned when the new quantizer is installed.
+        """
+        with self._lock:
+            vectors = self.vectors # Never modified in place, only replaced
+        mean, std = vectors.mean(axis=0), vectors.std(axis=0) + 1e-9
+        scaled = (vectors - mean) / std
+        rng = np.random.default_rng(0)
+        sample = scaled[rng.choice(len(scaled), size=min(len(scaled), KMEANS_SAMPLE), replace=False)]
+        centroids = kmeans(sample, max(1, int(np.sqrt(len(vectors)))))
+        ivf = {"centroids": centroids.astype(np.float32), "mean": mean, "std": std,
+               "trained_count": np.array(len(vectors))}
+        np.savez(os.path.join(self.index_dir, IVF_FILE), **ivf)
+        scaled = scaled.astype(np.float32)
+        norms, labels = (scaled ** 2).sum(axis=1), nearest_rows(scaled, ivf["centroids"])
+        with self._lock:
+            self._ivf = ivf
+            if self.vectors is vectors:
+                self._mean, self._std = mean, std
+                self._scaled, self._norms, self._labels, self._lists = scaled, norms, labels, None
+            else:
+                self._rescale() # Rows were added or replaced during the training
+
+    def _rescale(self):
+        """
+        Recomputes the standardized rows (and their IVF groups). The standardization is frozen
+        at training time once the IVF quantizer exists.
+        """
+        if self._ivf is not None:
+            self._mean, self._std = self._ivf["mean"], self._ivf["std"]
+        elif len(self):
+            self._mean, self._std = self.vectors.mean(axis=0), self.vectors.std(axis=0) + 1e-9
+        else:
+            self._mean, self._std = np.zeros(self.dim, np.float32), np.ones(self.dim, np.float32)
+        self._scaled = ((self.vectors - self._mean) / self._std).astype(np.float32)
+        self._norms = (self._scaled ** 2).sum(axis=1)
+        self._labels = nearest_rows(self._scaled, self._ivf["centroids"]) if self._ivf is not None else None
+        self._lists = None
+
+    def _group_lists(self):
+        """
+        Row numbers of every IVF group (rebuilt lazily after inserts).
+        """
+        if self._lists is None:
+            order = np.argsort(self._labels, kind="stable")
+            bounds = np.searchsorted(self._labels[order], np.arange(len(self._ivf["centroids"]) + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+        return self._lists
+
+    # --- Search ---
+    def query(self, vector, k=5, exclude=()):
+        """
+        Returns up to `k` (key, distance) pairs closest to `vector`, nearest first, skipping
+        the keys in `exclude` (e.g. the recording being queried).
+        """
+        with self._lock:
+            return self._query(vector, k, exclude)
+
+    def _query(self, vector, k, exclude):
+        if not len(self):
+            return []
+        q = ((np.asarray(vector, dtype=np.float32).ravel() - self._mean) / self._std).astype(np.float32)
+        if self._ivf is not None and len(self) > EXACT_SEARCH_LIMIT:
+            lists = self._group_lists()
+            centroid_order = np.argsort(((self._ivf["centroids"] - q) ** 2).sum(axis=1))[:IVF_NPROBE]
+            rows = np.concatenate([lists[i] for i in centroid_order])
+        else:
+            rows = np.arange(len(self))
+        distances = self._norms[rows] - 2 * (self._scaled[rows] @ q) + q @ q
+        wanted = min(len(rows), k + len(exclude))
+        best = np.argpartition(distances, wanted - 1)[:wanted] if wanted < len(rows) else np.arange(len(rows))
+        best = best[np.argsort(distances[best])]
+        results = [(self.keys[rows[i]], float(np.sqrt(max(distances[i], 0)))) for i in best if self.keys[rows[i]] not in exclude]
+        return results[:k]
+
+
+# --- Batch command (analyzes recordings with the GUI script's pipeline) ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the recording similarity index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index every WAV file in a folder that is not indexed yet")
+    build.add_argument("folder")
+    query = sub.add_parser("query", help="Find the recordings most similar to a WAV file")
+    query.add_argument("recording")
+    query.add_argument("-k", type=int, default=5)
+    parser.add_argument("--index-dir", help="Index folder (default: SIMILARITY_INDEX_DIR of the app)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # The GUI module imports Qt; no window is shown
+    import audio_with_spectogram as app
+    from report_export import load_wav
+    analyzer, controller = app.SoundAnalyzer(), app.AudioController(probe_devices=False)
+    index = app.open_similarity_index(analyzer.feature_recipe, args.index_dir or app.SIMILARITY_INDEX_DIR)
+
+    def vectors_of(path):
+        y, sr = load_wav(path, controller)
+        return app.similarity_vectors(path, analyzer.analyze_channels(y, sr, controller.analysis_waveform(y, sr)), y, sr)
+
+    if args.command == "build":
+        paths = sorted(os.path.join(args.folder, name) for name in os.listdir(args.folder) if name.lower().endswith(".wav"))
+        added = 0
+        for path in paths:
+            if path in index or f"{path} [{app.EAR_LABELS[0]}]" in index:
+                continue
+            try:
+                keys, vectors = vectors_of(path)
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            index.add_many(keys, vectors)
+            added += len(keys)
+        print(f"Added {added} vector(s); the index holds {len(index)}.")
+    else:
+        keys, vectors = vectors_of(args.recording)
+        for key, vector in zip(keys, vectors):
+            start = time.perf_counter()
+            matches = index.query(vector, args.k, exclude=set(keys))
+            print(f"{key} ({(time.perf_counter() - start) * 1000:.1f} ms):")
+            for match, distance in matches:
+                print(f"  {distance:8.3f}  {match}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
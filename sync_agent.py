@@ -0,0 +1,542 @@
+"""
+Background sync of saved recordings to a central archive.
+
+Every saved WAV is shipped with its analysis results (the per-channel `SoundAnalyzer`
+results at the time of SAVE). Transfers are content-addressed:
+- a file is cut into SYNC_CHUNK_BYTES chunks named by their SHA-256,
+- the archive is asked which chunks it is missing and only those are sent,
+- a manifest (file SHA-256, chunk list, name, device, analysis) is sent last; a recording
+  whose manifest is already in the archive is skipped.
+Identical recordings (or copies under another name) are therefore stored once, and an
+interrupted transfer resumes by asking again which chunks are missing.
+
+The queue of recordings to ship is a JSON file in the state folder, rewritten atomically on
+every change, so it survives crashes and reboots. The agent thread runs at the lowest CPU
+priority and is rate-limited (bytes hashed or sent per second); while a recording is in
+progress it switches to a lower limit, or pauses when that limit is None.
+
+Archives:
+- a directory (`DirectoryStore`), e.g. a mounted network share,
+- an HTTP endpoint (`HttpStore`), e.g. the loopback stand-in of this module:
+
+    python sync_agent.py serve --root /srv/objtin-archive --port 8767    # stand-in archive
+    python sync_agent.py push "OBJTIN Recording" --target http://127.0.0.1:8767
+    python sync_agent.py status
+    python sync_agent.py restore <sha256> out.wav --root /srv/objtin-archive
+
+This module deliberately imports nothing from the GUI script (the CLI does, for its defaults).
+"""
+import os
+import sys
+import json
+import time
+import socket
+import hashlib
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+# --- Sync Configuration ---
+SYNC_CHUNK_BYTES = 1024 * 1024
+SYNC_RETRY_S = 10 # First retry delay after a failed transfer (doubles per attempt)
+SYNC_MAX_RETRY_S = 600
+SYNC_IDLE_POLL_S = 2.0 # How often an idle agent checks the queue
+QUEUE_FILE = "queue.json"
+HASH_PREFIX_LEN = 2 # Chunks are stored as chunks/<first 2 hex digits>/<sha256>
+
+
+def json_default(value):
+    """
+    json.dumps helper for the numpy values in analysis results.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_json_atomic(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f, default=json_default)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class RateLimiter:
+    """
+    Token bucket in bytes per second (0 = unlimited, None = paused: `consume()` waits).
+    """
+    def __init__(self, bytes_per_s=0):
+        self.bytes_per_s = bytes_per_s
+        self._allowance = 0.0
+        self._last = time.monotonic()
+
+    def consume(self, n, stop_event=None):
+        """
+        Waits until `n` bytes may be processed. Returns False if `stop_event` was set meanwhile.
+        """
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            rate = self.bytes_per_s
+            now = time.monotonic()
+            if rate is None: # Paused
+                self._last = now
+                time.sleep(0.2)
+                continue
+            if rate == 0:
+                return True
+            self._allowance = min(rate, self._allowance + (now - self._last) * rate) # At most one second of burst
+            self._last = now
+            if self._allowance >= n or n > rate and self._allowance >= rate:
+                self._allowance -= n
+                return True
+            time.sleep(min(0.2, (min(n, rate) - self._allowance) / rate))
+
+
+# --- Archives ---
+class DirectoryStore:
+    """
+    Archive in a folder: chunks/<aa>/<sha256> and manifests/<sha256>.json, written atomically.
+    """
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, "chunks"), exist_ok=True)
+        os.makedirs(os.path.join(root, "manifests"), exist_ok=True)
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.root, "chunks", digest[:HASH_PREFIX_LEN], digest)
+
+    def _manifest_path(self, digest):
+        return os.path.join(self.root, "manifests", digest + ".json")
+
+    def missing_chunks(self, digests):
+        return [digest for digest in digests if not os.path.exists(self._chunk_path(digest))]
+
+    def put_chunk(self, digest, data):
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Chunk {digest} does not match its content")
+        path = self._chunk_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def get_chunk(self, digest):
+        with open(self._chunk_path(digest), "rb") as f:
+            return f.read()
+
+    def has_manifest(self, digest):
+        return os.path.exists(self._manifest_path(digest))
+
+    def put_manifest(self, digest, manifest):
+        missing = self.missing_chunks(manifest["chunks"])
+        if missing:
+            raise ValueError(f"Manifest {digest} references {len(missing)} missing chunk(s)")
+        write_json_atomic(self._manifest_path(digest), manifest)
+
+    def get_manifest(self, digest):
+        with open(self._manifest_path(digest)) as f:
+            return json.load(f)
+
+    def restore(self, digest, path):
+        """
+        Reassembles a recording from its chunks and checks its SHA-256.
+        """
+        manifest = self.get_manifest(digest)
+        file_hash = hashlib.sha256()
+        with open(path, "wb") as f:
+            for chunk_digest in manifest["chunks"]:
+                data = self.get_chunk(chunk_digest)
+                file_hash.update(data)
+                f.write(data)
+        if file_hash.hexdigest() != digest:
+            raise ValueError(f"Restored file does not match {digest}")
+        return manifest
+
+
+class HttpStore:
+    """
+    Client of an HTTP archive with the endpoints of `ArchiveRequestHandler`.
+    """
+    def __init__(self, base_url, timeout_s=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout_s = timeout_s
+
+    def _request(self, method, path, body=None, content_type="application/octet-stream"):
+        request = urllib.request.Request(self.base_url + path, data=body, method=method,
+                                         headers={"Content-Type": content_type} if body is not None else {})
+        with urllib.request.urlopen(request, timeout=self.timeout_s) as response:
+            return response.read()
+
+    def missing_chunks(self, digests):
+        return json.loads(self._request("POST", "/chunks/missing", json.dumps(digests).encode(), "application/json"))
+
+    def put_chunk(self, digest, data):
+        self._request("PUT", f"/chunks/{digest}", data)
+
+    def has_manifest(self, digest):
+        try:
+            self._request("GET", f"/manifests/{digest}")
+            return True
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return False
+            raise
+
+    def put_manifest(self, digest, manifest):
+        self._request("PUT", f"/manifests/{digest}", json.dumps(manifest, default=json_default).encode(), "application/json")
+
+
+def open_store(target):
+    """
+    HttpStore for an http(s):// URL, DirectoryStore for a folder.
+    """
+    if target.startswith(("http://", "https://")):
+        return HttpStore(target)
+    return DirectoryStore(target)
+
+
+# --- Persistent Queue ---
+class SyncQueue:
+    """
+    Recordings waiting to be shipped, persisted to `<state_dir>/queue.json` on every change.
+    Entries: path, analysis, state ("pending", "done", "failed"), attempts, next_try, last_error.
+    """
+    def __init__(self, state_dir):
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, QUEUE_FILE)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = []
+        except ValueError as e:
+            print(f"Sync queue {self.path} is unreadable, starting a new one: {e}")
+            self.entries = []
+
+    def _save(self):
+        write_json_atomic(self.path, self.entries)
+
+    def add(self, path, analysis=None):
+        with self._lock:
+            path = os.path.abspath(path)
+            for entry in self.entries:
+                if entry["path"] == path and entry["state"] != "done":
+                    entry["analysis"] = analysis if analysis is not None else entry.get("analysis")
+                    break
+            else:
+                self.entries.append({"path": path, "analysis": analysis, "state": "pending", "attempts": 0,
+                                     "next_try": 0, "last_error": None, "queued_at": time.time()})
+            self._save()
+
+    def next_due(self):
+        now = time.time()
+        with self._lock:
+            for entry in self.entries:
+                if entry["state"] == "pending" and entry["next_try"] <= now:
+                    return entry
+        return None
+
+    def update(self, entry, **changes):
+        with self._lock:
+            entry.update(changes)
+            self._save()
+
+    def pending(self):
+        with self._lock:
+            return [entry for entry in self.entries if entry["state"] == "pending"]
+
+    def prune_done(self, keep=1000):
+        """
+        Forgets the oldest finished entries beyond `keep`.
+        """
+        with self._lock:
+            done = [entry for entry in self.entries if entry["state"] == "done"]
+            if len(done) > keep:
+                drop = {id(entry) for entry in done[:len(done) - keep]}
+                self.entries = [entry for entry in self.entries if id(entry) not in drop]
+                self._save()
+
+
+# --- Agent ---
+def file_manifest(path, limiter=None, stop_event=None, chunk_bytes=SYNC_CHUNK_BYTES):
+    """
+    Streams a file once and returns (file SHA-256, chunk SHA-256 list), or None if stopped.
+    """
+    file_hash = hashlib.sha256()
+    chunks = []
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                break
+            if limiter and not limiter.consume(len(data), stop_event):
+                return None
+            file_hash.update(data)
+            chunks.append(hashlib.sha256(data).hexdigest())
+    return file_hash.hexdigest(), chunks
+
+
+class SyncAgent:
+    """
+    Ships the queued recordings to `store` on a background thread.
+    `bandwidth_bps` applies normally and `recording_bandwidth_bps` while `set_recording(True)`
+    (0 = unlimited, None = paused).
+    """
+    def __init__(self, store, state_dir, bandwidth_bps=0, recording_bandwidth_bps=None, device=None,
+                 chunk_bytes=SYNC_CHUNK_BYTES):
+        self.store = store
+        self.queue = SyncQueue(state_dir)
+        self.bandwidth_bps = bandwidth_bps
+        self.recording_bandwidth_bps = recording_bandwidth_bps
+        self.device = device or socket.gethostname()
+        self.chunk_bytes = chunk_bytes
+        self.limiter = RateLimiter(bandwidth_bps)
+        self.stats = {"shipped": 0, "deduplicated": 0, "chunks_sent": 0, "bytes_sent": 0, "chunks_skipped": 0, "errors": 0}
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="SyncAgent", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def enqueue(self, path, analysis=None):
+        self.queue.add(path, analysis)
+        self._wake.set()
+
+    def set_recording(self, recording):
+        """
+        Throttles (or pauses) syncing while a recording is in progress.
+        """
+        self.limiter.bytes_per_s = self.recording_bandwidth_bps if recording else self.bandwidth_bps
+
+    def _run(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19) # Linux: lowest priority for this thread only
+        except (AttributeError, OSError):
+            pass
+        while not self._stop.is_set():
+            if not self.run_once():
+                self._wake.wait(SYNC_IDLE_POLL_S)
+                self._wake.clear()
+
+    def run_once(self):
+        """
+        Ships the next due recording. Returns False if nothing was due.
+        """
+        entry = self.queue.next_due()
+        if entry is None:
+            return False
+        try:
+            result = self.ship(entry)
+            if result is None: # Stopped
+                return False
+            self.queue.update(entry, state="done", result=result, last_error=None, done_at=time.time())
+            self.queue.prune_done()
+        except FileNotFoundError as e:
+            self.stats["errors"] += 1
+            self.queue.update(entry, state="failed", last_error=str(e))
+        except Exception as e:
+            self.stats["errors"] += 1
+            attempts = entry["attempts"] + 1
+            delay = min(SYNC_MAX_RETRY_S, SYNC_RETRY_S * 2 ** (attempts - 1))
+            print(f"Sync of {os.path.basename(entry['path'])} failed (retry in {delay}s): {e}")
+            self.queue.update(entry, attempts=attempts, next_try=time.time() + delay, last_error=str(e))
+        return True
+
+    def ship(self, entry):
+        """
+        Sends the missing chunks, then the manifest, of one queued recording.
+        Returns "shipped" or "deduplicated" (None if the agent was stopped).
+        """
+        path = entry["path"]
+        stat = os.stat(path)
+        cached = entry.get("manifest")
+        if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime:
+            digest, chunks = cached["sha256"], cached["chunks"] # Resuming: the file was already hashed
+        else:
+            hashed = file_manifest(path, self.limiter, self._stop, self.chunk_bytes)
+            if hashed is None:
+                return None
+            digest, chunks = hashed
+            self.queue.update(entry, manifest={"sha256": digest, "chunks": chunks, "size": stat.st_size, "mtime": stat.st_mtime})
+
+        if self.store.has_manifest(digest):
+            self.stats["deduplicated"] += 1
+            return "deduplicated"
+
+        missing = set(self.store.missing_chunks(chunks))
+        self.stats["chunks_skipped"] += len(chunks) - len(missing)
+        with open(path, "rb") as f:
+            for i, chunk_digest in enumerate(chunks):
+                if chunk_digest not in missing:
+                    continue
+                f.seek(i * self.chunk_bytes)
+                data = f.read(self.chunk_bytes)
+                if hashlib.sha256(data).hexdigest() != chunk_digest:
+                    self.queue.update(entry, manifest=None) # Changed since it was hashed: rehash next time
+                    raise ValueError(f"{path} changed while it was being synced")
+                if not self.limiter.consume(len(data), self._stop):
+                    return None
+                self.store.put_chunk(chunk_digest, data)
+                missing.discard(chunk_digest) # A chunk repeated in the file is sent once
+                self.stats["chunks_sent"] += 1
+                self.stats["bytes_sent"] += len(data)
+
+        self.store.put_manifest(digest, {"sha256": digest, "name": os.path.basename(path), "size": stat.st_size,
+                                         "mtime": stat.st_mtime, "chunk_bytes": self.chunk_bytes, "chunks": chunks,
+                                         "device": self.device, "analysis": entry.get("analysis"),
+                                         "synced_at": time.time()})
+        self.stats["shipped"] += 1
+        return "shipped"
+
+
+# --- Loopback Stand-in Archive ---
+class ArchiveRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front of a DirectoryStore (`self.server.store`):
+        POST /chunks/missing    JSON list of digests -> JSON list of the missing ones
+        PUT  /chunks/<sha256>   chunk bytes (rejected if the digest does not match)
+        GET  /manifests/<sha256>
+        PUT  /manifests/<sha256>   JSON manifest (rejected while chunks are missing)
+    """
+    def _reply(self, code, body=b"", content_type="application/json"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _digest(self, prefix):
+        digest = self.path[len(prefix):]
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            self._reply(400, b'{"error": "bad digest"}')
+            return None
+        return digest
+
+    def do_POST(self):
+        if self.path != "/chunks/missing":
+            return self._reply(404)
+        self._reply(200, json.dumps(self.server.store.missing_chunks(json.loads(self._body()))).encode())
+
+    def do_PUT(self):
+        try:
+            if self.path.startswith("/chunks/"):
+                digest = self._digest("/chunks/")
+                if digest:
+                    self.server.store.put_chunk(digest, self._body())
+                    self._reply(204)
+            elif self.path.startswith("/manifests/"):
+                digest = self._digest("/manifests/")
+                if digest:
+                    self.server.store.put_manifest(digest, json.loads(self._body()))
+                    self._reply(204)
+            else:
+                self._reply(404)
+        except ValueError as e:
+            self._reply(409, json.dumps({"error": str(e)}).encode())
+
+    def do_GET(self):
+        if not self.path.startswith("/manifests/"):
+            return self._reply(404)
+        digest = self._digest("/manifests/")
+        if digest:
+            if self.server.store.has_manifest(digest):
+                self._reply(200, json.dumps(self.server.store.get_manifest(digest)).encode())
+            else:
+                self._reply(404)
+
+    def log_message(self, format, *args):
+        pass # Quiet; the agent reports its own progress
+
+
+def make_archive_server(root, host="127.0.0.1", port=8767):
+    server = ThreadingHTTPServer((host, port), ArchiveRequestHandler)
+    server.store = DirectoryStore(root)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ship recordings to a central archive, or serve a stand-in archive.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Run a loopback HTTP archive backed by a folder")
+    serve.add_argument("--root", required=True)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8767)
+    push = sub.add_parser("push", help="Queue every WAV in a folder and ship the queue")
+    push.add_argument("folder")
+    push.add_argument("--target", help="Archive folder or http:// URL (default: SYNC_TARGET of the app)")
+    push.add_argument("--bandwidth-kbps", type=float, default=0, help="Rate limit (0 = unlimited)")
+    sub.add_parser("status", help="Show the sync queue")
+    restore = sub.add_parser("restore", help="Reassemble a recording from a folder archive")
+    restore.add_argument("sha256")
+    restore.add_argument("output")
+    restore.add_argument("--root", required=True)
+    parser.add_argument("--state-dir", help="Queue folder (default: SYNC_STATE_DIR of the app)")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = make_archive_server(args.root, args.host, args.port)
+        print(f"Archive stand-in on http://{args.host}:{server.server_address[1]} (root {args.root})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return 0
+    if args.command == "restore":
+        manifest = DirectoryStore(args.root).restore(args.sha256, args.output)
+        print(f"Restored {manifest['name']} from {manifest['device']} to {args.output}")
+        return 0
+
+    state_dir, target = args.state_dir, getattr(args, "target", None)
+    if state_dir is None or (args.command == "push" and target is None):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # The GUI module imports Qt; no window is shown
+        import audio_with_spectogram as app
+        state_dir, target = state_dir or app.SYNC_STATE_DIR, target or app.SYNC_TARGET
+
+    if args.command == "status":
+        queue = SyncQueue(state_dir)
+        for entry in queue.entries:
+            note = f"  ({entry['last_error']})" if entry.get("last_error") else ""
+            print(f"{entry['state']:<8} {entry['attempts']} attempt(s)  {entry['path']}{note}")
+        print(f"{len(queue.pending())} pending")
+        return 0
+
+    if not target:
+        print("No archive given (--target or SYNC_TARGET).")
+        return 1
+    agent = SyncAgent(open_store(target), state_dir, bandwidth_bps=args.bandwidth_kbps * 1000)
+    for name in sorted(os.listdir(args.folder)):
+        if name.lower().endswith(".wav"):
+            agent.queue.add(os.path.join(args.folder, name))
+    start = time.perf_counter()
+    try:
+        while agent.run_once():
+            pass
+    except KeyboardInterrupt:
+        print("Interrupted; the queue is kept and the next run resumes it.")
+    elapsed = time.perf_counter() - start
+    print(f"{agent.stats} in {elapsed:.1f}s; {len(agent.queue.pending())} still pending")
+    return 0 if not agent.queue.pending() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
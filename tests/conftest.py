@@ -0,0 +1,38 @@
+"""
+Shared setup of the regression tests: the modules under test live in the repository root,
+and the GUI module (imported by some of them) renders offscreen.
+"""
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Must be set before Qt is imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def model_workdir(tmp_path_factory):
+    """
+    A working directory with a production model at LOGREG_MODEL_PATH (the GUI loads it relative to
+    the working directory), trained on a few synthetic recordings: pulsatile and non-pulsatile
+    sounds against the noise floor alone.
+    """
+    import joblib
+    import numpy as np
+    import audio_with_spectogram as app
+    import benchmark
+    from model_training import new_pipeline
+
+    workdir = tmp_path_factory.mktemp("workdir")
+    analyzer = app.SoundAnalyzer()
+    sr = app.TARGET_SAMPLE_RATE
+    X, target = [], []
+    for seed in range(4):
+        for kind, sound in (("pulsatile", 1), ("non_pulsatile", 1), ("noise", 0)):
+            X.append(analyzer.extract_features(benchmark.synthesize_signal(kind, sr, duration=5, seed=seed), sr))
+            target.append(sound)
+    path = workdir / app.LOGREG_MODEL_PATH
+    path.parent.mkdir(parents=True)
+    joblib.dump({"model": new_pipeline().fit(np.array(X), target), "threshold": 0.5}, path)
+    return workdir
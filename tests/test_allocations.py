@@ -0,0 +1,12 @@
+"""
+Full-length temporaries of the shared normalization stage and of feature extraction stay
+within benchmark.MAX_FULL_LENGTH_TEMPORARIES (the same check as benchmark.py --check-allocations).
+"""
+import pytest
+
+import benchmark
+
+
+@pytest.mark.parametrize("sr", benchmark.BENCHMARK_RATES)
+def test_full_length_temporaries_within_bounds(sr):
+    assert benchmark.check_allocations(sr) == []
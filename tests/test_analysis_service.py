@@ -0,0 +1,131 @@
+"""
+Analysis service: the micro-batcher groups requests within its window and resolves each
+request's future, request bodies decode as WAV or raw PCM, oversized bodies are refused, and
+without a production model /health and /analyze answer 503 with a JSON error.
+"""
+import io
+import http.client
+import json
+import threading
+import wave
+
+import numpy as np
+import pytest
+
+import analysis_service
+import audio_with_spectogram as app
+
+RATE = 8000
+
+
+class StubAnalyzer:
+    """
+    Stands in for SoundAnalyzer: labels every channel with its peak amplitude and keeps the
+    size of every batch. Raises `error` if it is set.
+    """
+    def __init__(self, production_model=None, error=None):
+        self.production_model = production_model
+        self.shadow_models = []
+        self.error = error
+        self.batches = []
+
+    def analyze_batch(self, signals, max_workers=None, timings=None):
+        self.batches.append(len(signals))
+        if self.error:
+            raise self.error
+        return [{"result": "Pulsatile", "sound_detected": True, "probability": float(np.max(np.abs(y))), "bpm": None,
+                 "model": "stub", "model_version": "1", "shadow": []} for y, _ in signals]
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def serve(analyzer):
+        server = analysis_service.make_server("127.0.0.1", 0, analyzer)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_port
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def request(port, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request(method, path, body, headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_without_a_model_the_service_answers_503(serve):
+    port = serve(StubAnalyzer())
+    status, health = request(port, "GET", "/health")
+    assert status == 503 and health["status"] == "no model loaded"
+    status, answer = request(port, "POST", "/analyze?rate=8000&width=2", bytes(1600),
+                             {"Content-Type": "application/octet-stream"})
+    assert status == 503 and "no production model" in answer["error"]
+
+
+def test_requests_within_the_window_are_batched():
+    analyzer = StubAnalyzer({"name": "stub", "version": "1"})
+    batcher = analysis_service.MicroBatcher(analyzer, window_s=0.5, max_batch=3)
+    futures = [batcher.submit(np.full(10, amplitude, np.float32), RATE) for amplitude in (0.1, 0.2, 0.3, 0.4)]
+    outcomes = [future.result(10) for future in futures]
+    assert analyzer.batches == [3, 1] # The fourth request waits for the next batch
+    assert [round(result["probability"], 3) for result, _ in outcomes] == [0.1, 0.2, 0.3, 0.4]
+    assert [metrics["batch_size"] for _, metrics in outcomes] == [3, 3, 3, 1]
+
+
+def test_a_failed_batch_fails_each_of_its_requests():
+    batcher = analysis_service.MicroBatcher(StubAnalyzer(error=RuntimeError("model crashed")), window_s=0.5)
+    futures = [batcher.submit(np.zeros(10, np.float32), RATE) for _ in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result(10)
+
+
+def wav_bytes(samples, channels, width=2, rate=RATE):
+    frames = np.asarray(samples).T.astype("<i2").tobytes()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(width)
+        wf.setframerate(rate)
+        wf.writeframes(frames)
+    return buffer.getvalue()
+
+
+def test_wav_and_raw_pcm_decode_to_the_same_waveform():
+    controller = app.AudioController(probe_devices=False)
+    samples = np.stack([np.arange(-50, 50), np.arange(50, -50, -1)]) * 300
+    body = wav_bytes(samples, 2)
+    from_wav, sr = analysis_service.decode_request(body, "audio/wav", {}, controller)
+    assert sr == RATE and from_wav.shape == (2, 100)
+    raw = body[44:] # The PCM frames after the canonical WAV header
+    from_pcm, sr = analysis_service.decode_request(raw, "application/octet-stream",
+                                                   {"rate": [str(RATE)], "channels": ["2"], "width": ["2"]}, controller)
+    assert sr == RATE
+    np.testing.assert_array_equal(from_pcm, from_wav)
+    np.testing.assert_array_equal(from_wav, samples)
+
+
+@pytest.mark.parametrize("query", [{}, {"rate": ["fast"]}, {"rate": [str(RATE)], "channels": ["two"]},
+                                   {"rate": [str(RATE)], "width": ["1"]}])
+def test_raw_pcm_needs_a_valid_description(query):
+    with pytest.raises(ValueError):
+        analysis_service.decode_request(bytes(200), "application/octet-stream", query, app.AudioController(probe_devices=False))
+
+
+def test_bodies_over_the_limit_are_refused(serve, monkeypatch):
+    monkeypatch.setattr(analysis_service, "MAX_UPLOAD_BYTES", 1000)
+    port = serve(StubAnalyzer({"name": "stub", "version": "1"}))
+    headers = {"Content-Type": "application/octet-stream"}
+    status, answer = request(port, "POST", "/analyze?rate=8000&width=2", bytes(2000), headers)
+    assert status == 413 and "1..1000 bytes" in answer["error"]
+    status, answer = request(port, "POST", "/analyze?rate=8000&width=2", bytes(1000), headers)
+    assert status == 200 and len(answer["channels"]) == 1
@@ -0,0 +1,28 @@
+"""
+Batched feature extraction matches one extract_features call per recording, for mono
+recordings and for the channels of a binaural one, with and without ANALYSIS_SAMPLE_RATE.
+"""
+import numpy as np
+import pytest
+
+import audio_with_spectogram as app
+import benchmark
+
+SR = app.TARGET_SAMPLE_RATE
+
+
+@pytest.mark.parametrize("analysis_rate", [None, 8000])
+@pytest.mark.parametrize("layout", ["mono", "binaural"])
+def test_batched_features_match_single_recordings(monkeypatch, analysis_rate, layout):
+    monkeypatch.setattr(app, "ANALYSIS_SAMPLE_RATE", analysis_rate)
+    analyzer = app.SoundAnalyzer()
+    if layout == "mono":
+        recordings = [benchmark.synthesize_signal(kind, SR, duration=5, seed=seed)
+                      for seed, kind in enumerate(("pulsatile", "non_pulsatile", "noise"))]
+    else:
+        recordings = list(np.stack([benchmark.synthesize_signal("pulsatile", SR, duration=5, seed=1),
+                                    benchmark.synthesize_signal("non_pulsatile", SR, duration=5, seed=2)]))
+    batched = analyzer.extract_features_batch(recordings, SR)
+    single = [analyzer.extract_features(y, SR) for y in recordings]
+    assert batched.shape == (len(recordings), 17)
+    assert np.allclose(batched, single)
@@ -0,0 +1,66 @@
+"""
+Capture process: input overflows are counted from the stream clock while every buffer the
+device delivered reaches the ring, and readers of the ring see wrap-around and overruns.
+"""
+import queue
+import threading
+
+import pytest
+
+import capture_process
+from capture_process import STATE_FINISHED, OverflowCounter, SharedRingBuffer, _capture_main
+from virtual_audio import PA_INT16, VirtualPyAudio
+
+RATE = 8000
+CHUNK = 1024
+
+
+def test_overflows_are_counted_without_dropping_reads():
+    stream = VirtualPyAudio(speed=None, overflow_rate=0.3, seed=1).open(RATE, 1, PA_INT16, input=True)
+    counter = OverflowCounter(stream, RATE)
+    detected = 0
+    for _ in range(50):
+        assert len(stream.read(CHUNK, exception_on_overflow=False)) == 2 * CHUNK
+        detected += counter.read(CHUNK)
+    assert stream.overflows > 0
+    assert counter.overflows == detected == stream.overflows
+    assert counter.frames_lost == stream.frames_skipped
+    assert counter.frames_read == 50 * CHUNK
+
+
+def test_capture_keeps_every_delivered_buffer(monkeypatch):
+    monkeypatch.setattr(capture_process, "_enable_realtime_scheduling", lambda priority: "default") # Not for the test process
+    ring = SharedRingBuffer.create(64 * CHUNK * 2)
+    status = queue.Queue()
+    try:
+        device_params = {"format": PA_INT16, "channels": 1, "rate": RATE, "index": 0}
+        _capture_main(ring.name, ring.capacity, device_params, CHUNK, 20 * CHUNK / RATE, 0, threading.Event(), status,
+                      virtual_audio={"speed": None, "overflow_rate": 0.3, "seed": 1})
+        assert status.get_nowait()[0] == "recording" and status.get_nowait() == ("finished", None)
+        assert ring.state == STATE_FINISHED
+        assert ring.write_cursor == 20 * CHUNK * 2 # Overflowed reads still delivered their buffer
+        assert ring.input_overflows > 0
+    finally:
+        ring.close()
+
+
+def test_ring_wraps_around_and_detects_overruns():
+    ring = SharedRingBuffer.create(10)
+    try:
+        ring.write(b"abcdef")
+        ring.write(b"ghijkl") # Wraps: "kl" lands at the start of the data area
+        views = ring.views(6, 12)
+        assert [bytes(v) for v in views] == [b"ghij", b"kl"]
+        for view in views:
+            view.release()
+        assert b"".join(bytes(v) for v in ring.views(2, 12)) == b"cdefghijkl"
+
+        ring.write(b"m")
+        with pytest.raises(ValueError, match="1 bytes lost"): # The reader was lapped
+            ring.views(2, 13)
+
+        ring.write(b"0123456789ABC") # Larger than the ring: only the newest bytes are kept
+        assert ring.write_cursor == 26
+        assert b"".join(bytes(v) for v in ring.views(16, 26)) == b"3456789ABC"
+    finally:
+        ring.close()
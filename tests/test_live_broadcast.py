@@ -0,0 +1,84 @@
+"""
+Broadcast back-pressure: a stalled viewer loses its oldest live frames (never state or verdict
+frames) without blocking the publisher, and the broadcaster drops chunks it cannot keep up with.
+"""
+import queue
+import threading
+import time
+
+from live_broadcast import Broadcaster, _Client
+
+FRAME_BYTES = 100
+
+
+class StalledSocket:
+    """
+    Socket whose sendall() blocks until released, like a viewer that stopped reading.
+    """
+    def __init__(self):
+        self.released = threading.Event()
+        self.sending = threading.Event()
+        self.sent = []
+
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, frame):
+        self.sending.set()
+        self.released.wait()
+        self.sent.append(frame)
+
+    def close(self):
+        self.released.set()
+
+
+def frame(tag):
+    return tag.encode().ljust(FRAME_BYTES, b".")
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_stalled_client_drops_oldest_live_frames():
+    sock = StalledSocket()
+    client = _Client(sock, ("viewer", 1), max_bytes=10 * FRAME_BYTES)
+    client.enqueue(frame("hello"), False)
+    assert sock.sending.wait(5) # The sender thread holds the first frame
+
+    start = time.perf_counter()
+    client.enqueue(frame("state"), False)
+    for i in range(30):
+        client.enqueue(frame(f"live{i}"), True)
+    client.enqueue(frame("verdict"), False)
+    assert time.perf_counter() - start < 1 # enqueue() never waits for the viewer
+
+    queued = [f.rstrip(b".").decode() for f, _ in client.frames]
+    assert client.queued_bytes == len(queued) * FRAME_BYTES <= 10 * FRAME_BYTES
+    assert queued[0] == "state" and queued[-1] == "verdict"
+    assert queued[1:-1] == [f"live{i}" for i in range(22, 30)] # The newest live frames survive
+    assert client.dropped == 22
+
+    sock.released.set()
+    assert wait_for(lambda: client.sent == 1 + len(queued))
+    assert client.sent + client.dropped == 33 # hello, state, 30 live frames and the verdict
+    assert client.queued_bytes == 0
+    client.close()
+
+
+def test_broadcaster_drops_chunks_it_cannot_keep_up_with():
+    broadcaster = Broadcaster("127.0.0.1", 0, max_pending_chunks=4)
+    worker_feed = broadcaster._feed
+    try:
+        broadcaster._feed = queue.Queue() # The worker keeps waiting on the old queue: nothing is consumed
+        for _ in range(10):
+            broadcaster.feed(b"\0" * 64)
+        assert broadcaster._feed.qsize() == 4
+        assert broadcaster.stats()["chunks_dropped"] == 6
+    finally:
+        broadcaster.close()
+        worker_feed.put(("stop", None))
+
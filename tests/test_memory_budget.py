@@ -0,0 +1,37 @@
+"""
+Memory budget: discarded captures leave no spill file. Analysis windows depend on the duration
+of a recording only (the analyzer does not see the budget).
+"""
+import os
+
+import numpy as np
+
+import audio_with_spectogram as app
+from memory_budget import MemoryBudget, SpillBuffer
+
+
+def test_discard_deletes_the_spill_file(tmp_path):
+    budget = MemoryBudget(1024, str(tmp_path))
+    buffer = SpillBuffer(budget)
+    for _ in range(8):
+        buffer.append(bytes(512))
+    assert buffer.spilled_bytes and os.path.exists(buffer.path)
+    path = buffer.path
+    buffer.discard()
+    assert not os.path.exists(path)
+    assert budget.fits(1024)
+
+    buffer.append(bytes(2048)) # Reused after the discard: spills to a new file
+    assert buffer.path and buffer.path != path and os.path.exists(buffer.path)
+    buffer.discard()
+    assert os.listdir(tmp_path) == []
+
+
+def test_analysis_windows_follow_the_duration():
+    analyzer = app.SoundAnalyzer()
+    sr = app.TARGET_SAMPLE_RATE
+    short, long = app.MEMORY_ANALYSIS_WHOLE_MAX_S * sr, 10 * 60 * sr
+    assert analyzer.analysis_windows(short, sr) == [(0, short)]
+    bounds = np.array(analyzer.analysis_windows(long, sr))
+    assert bounds[0, 0] == 0 and bounds[-1, 1] == long and (bounds[1:, 0] == bounds[:-1, 1]).all()
+    assert np.allclose(np.diff(bounds, axis=1) / sr, app.MEMORY_ANALYSIS_WINDOW_S, atol=1)
@@ -0,0 +1,131 @@
+"""
+Station capture and scheduler accounting: sessions are cut from the stream without losing
+audio (also around input overflows), and recordings dropped from a full queue lower the
+analyzed share.
+"""
+import numpy as np
+import pytest
+
+import audio_with_spectogram as app
+from multi_station import FairScheduler, Station
+from virtual_audio import VirtualPyAudio
+
+RATE = app.TARGET_SAMPLE_RATE
+
+
+def device_params():
+    return {"name": "test", "index": 0, "channels": 1, "rate": RATE, "format": app.TARGET_FORMAT}
+
+
+class CountingStream:
+    """
+    Input stream returning consecutive sample counts, so every byte of the stream is unique.
+    """
+    def __init__(self):
+        self.position = 0
+
+    def read(self, frames, exception_on_overflow=True):
+        samples = np.arange(self.position, self.position + frames, dtype="<u4")
+        self.position += frames
+        return samples.view(np.uint8).reshape(-1, 4)[:, :app.WIDTH_SAMPLE].tobytes()
+
+    def get_time(self):
+        return self.position / RATE
+
+    def get_read_available(self):
+        return 0
+
+    def get_input_latency(self):
+        return 0.0
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CountingBackend:
+    def open(self, **kwargs):
+        return CountingStream()
+
+    def terminate(self):
+        pass
+
+
+class RecordingScheduler:
+    """
+    Stands in for FairScheduler: keeps the submitted sessions.
+    """
+    def __init__(self):
+        self.sessions = []
+
+    def submit(self, station, data):
+        self.sessions.append(data)
+
+    def wake(self):
+        pass
+
+
+def test_sessions_keep_the_audio_across_boundaries(monkeypatch):
+    monkeypatch.setattr(app, "create_audio_backend", CountingBackend)
+    duration = 1.1 # Not a whole number of reads
+    station = Station(0, device_params(), duration, sessions=3)
+    assert station.session_bytes % (app.CHUNK_SIZE * app.WIDTH_SAMPLE)
+    scheduler = RecordingScheduler()
+    station.start(scheduler)
+    station.join(30)
+
+    stream = CountingStream().read(3 * int(duration * RATE))
+    assert b"".join(scheduler.sessions) == stream
+    assert station.metrics["bytes_captured"] - len(stream) < app.CHUNK_SIZE * app.WIDTH_SAMPLE
+
+
+def test_overflows_are_counted_without_dropping_buffers(monkeypatch):
+    backend = VirtualPyAudio(speed=None, overflow_rate=0.3, seed=1)
+    streams = []
+    open_stream = backend.open
+    monkeypatch.setattr(backend, "open", lambda **kwargs: streams.append(open_stream(**kwargs)) or streams[-1])
+    monkeypatch.setattr(app, "create_audio_backend", lambda: backend)
+    station = Station(0, device_params(), 1.1, sessions=3)
+    scheduler = RecordingScheduler()
+    station.start(scheduler)
+    station.join(30)
+
+    assert [len(session) for session in scheduler.sessions] == 3 * [station.session_bytes]
+    assert station.metrics["bytes_captured"] == streams[0].frames_read * app.WIDTH_SAMPLE # Overflowed reads too
+    assert station.metrics["input_overflows"] == backend.overflows > 0
+
+
+def analyze_submitted(queue_size, recordings=4):
+    """
+    Submits one-second recordings to a station before the analysis thread starts (so a full
+    queue drops the oldest), then lets the scheduler finish. Returns the station's report.
+    """
+    station = Station(0, device_params(), 1)
+    scheduler = FairScheduler([station], workers=1, queue_size=queue_size)
+    station._scheduler = scheduler
+    data = bytes(RATE * app.WIDTH_SAMPLE)
+    for _ in range(recordings):
+        station.count(bytes_captured=len(data))
+        station._submit(data)
+    station.capture_done = True
+    scheduler.start()
+    scheduler.join(60)
+    return station.report()
+
+
+def test_dropped_recordings_are_not_counted_as_analyzed(model_workdir, monkeypatch):
+    monkeypatch.chdir(model_workdir)
+    report = analyze_submitted(queue_size=2)
+    assert report["sessions_captured"] == 4
+    assert report["queue_drops"] == 2
+    assert report["sessions_analyzed"] == 2
+    assert report["bytes_analyzed"] == 2 * RATE * app.WIDTH_SAMPLE
+    assert report["analyzed_fraction"] == pytest.approx(0.5)
+
+
+def test_drops_lower_the_analyzed_fraction(model_workdir, monkeypatch):
+    monkeypatch.chdir(model_workdir)
+    assert analyze_submitted(queue_size=4)["analyzed_fraction"] == pytest.approx(1.0)
+    assert analyze_submitted(queue_size=1)["analyzed_fraction"] == pytest.approx(0.25)
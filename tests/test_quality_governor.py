@@ -0,0 +1,106 @@
+"""
+QualityGovernor tier stepping against a fake sysfs tree.
+"""
+import os
+
+import pytest
+
+from quality_governor import (QualityGovernor, THERMAL_ZONE_TEMP, THERMAL_ZONE_TRIP, THROTTLED_STATE,
+                              THROTTLE_COUNT)
+
+TIERS = [{"name": "full"}, {"name": "reduced"}, {"name": "low"}]
+BUDGET_S = 1.0
+
+
+def write(root, relative_path, value):
+    path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(f"{value}\n")
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    root = str(tmp_path)
+    write(root, THERMAL_ZONE_TEMP, 50000)
+    return root
+
+
+def names(governor, steps):
+    return [governor.select_tier()["name"] for _ in range(steps)]
+
+
+def test_cool_and_fast_stays_at_full_quality(sysfs):
+    governor = QualityGovernor(TIERS, BUDGET_S, sysfs)
+    governor.record_latency("display", 0.1)
+    assert names(governor, 3) == ["full", "full", "full"]
+
+
+def test_hot_steps_down_one_tier_at_a_time_and_back_up_when_cool(sysfs):
+    governor = QualityGovernor(TIERS, BUDGET_S, sysfs)
+    write(sysfs, THERMAL_ZONE_TEMP, 80000)
+    assert names(governor, 3) == ["reduced", "low", "low"]
+    write(sysfs, THERMAL_ZONE_TEMP, 70000) # Between the cool and hot thresholds: hold
+    assert names(governor, 2) == ["low", "low"]
+    write(sysfs, THERMAL_ZONE_TEMP, 60000)
+    assert names(governor, 3) == ["reduced", "full", "full"]
+
+
+def test_latency_over_budget_steps_down(sysfs):
+    governor = QualityGovernor(TIERS, BUDGET_S, sysfs)
+    governor.record_latency("display", 2 * BUDGET_S)
+    assert names(governor, 1) == ["reduced"]
+    governor.latencies["display"] = 0.7 * BUDGET_S # Within budget, but not comfortably: hold
+    assert names(governor, 1) == ["reduced"]
+    governor.latencies["display"] = 0.1 * BUDGET_S
+    assert names(governor, 1) == ["full"]
+
+
+def test_firmware_throttle_flags(sysfs):
+    governor = QualityGovernor(TIERS, BUDGET_S, sysfs)
+    write(sysfs, THROTTLED_STATE, "0x50000") # Throttled since boot only
+    assert not governor.throttled()
+    write(sysfs, THROTTLED_STATE, "0x4") # Throttled now
+    assert governor.throttled()
+    assert names(governor, 1) == ["reduced"]
+
+
+def test_frequency_below_maximum_is_not_throttling(sysfs):
+    write(sysfs, "sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq", 600000) # Idle under ondemand/schedutil
+    write(sysfs, "sys/devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq", 2400000)
+    governor = QualityGovernor(TIERS, BUDGET_S, sysfs)
+    assert not governor.throttled()
+    assert names(governor, 3) == ["full", "full", "full"]
+
+
+def test_throttle_counter_growth_since_the_last_selection(sysfs):
+    write(sysfs, THROTTLE_COUNT, 12) # Events before the governor started do not count
+    governor = QualityGovernor(TIERS, BUDGET_S, sysfs)
+    assert not governor.throttled()
+    assert names(governor, 1) == ["full"]
+    write(sysfs, THROTTLE_COUNT, 15)
+    assert governor.throttled()
+    assert names(governor, 1) == ["reduced"]
+    assert not governor.throttled() # No new events since that selection
+    assert names(governor, 1) == ["full"]
+
+
+def test_passive_trip_point(sysfs):
+    write(sysfs, THERMAL_ZONE_TRIP.format(0, "type"), "active") # Fan trip: not throttling
+    write(sysfs, THERMAL_ZONE_TRIP.format(0, "temp"), 50000)
+    write(sysfs, THERMAL_ZONE_TRIP.format(1, "type"), "passive")
+    write(sysfs, THERMAL_ZONE_TRIP.format(1, "temp"), 60000)
+    governor = QualityGovernor(TIERS, BUDGET_S, sysfs, hot_temp_c=75.0, cool_temp_c=45.0)
+    write(sysfs, THERMAL_ZONE_TEMP, 55000)
+    assert governor.passive_trip_c() == 60.0
+    assert not governor.throttled()
+    write(sysfs, THERMAL_ZONE_TEMP, 61000)
+    assert governor.throttled()
+    assert names(governor, 1) == ["reduced"]
+
+
+def test_no_sysfs_at_all(tmp_path):
+    governor = QualityGovernor(TIERS, BUDGET_S, str(tmp_path))
+    assert governor.cpu_temperature_c() is None
+    assert not governor.throttled()
+    assert names(governor, 1) == ["full"]
@@ -0,0 +1,84 @@
+"""
+Catalog folder sync: new names are read, unchanged names are not touched unless rescanning,
+and device names come from the devices the catalog knows rather than from the file name.
+"""
+import os
+import wave
+
+import pytest
+
+import recording_catalog
+from recording_catalog import RecordingCatalog, device_token
+
+DEVICE = "USB Audio_Device (hw:1,0)"
+
+
+def write_wav(path, seconds=1, rate=8000):
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(bytes(2 * int(seconds * rate)))
+
+
+def saved_name(device, stamp="20260101_120000"):
+    return f"rec_{device_token(device)}_8000Hz_1ch_{stamp}.wav"
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = RecordingCatalog(str(tmp_path / "catalog.sqlite3"))
+    yield catalog
+    catalog.close()
+
+
+def test_sync_reads_only_new_names(tmp_path, catalog, monkeypatch):
+    folder = tmp_path / "recordings"
+    folder.mkdir()
+    write_wav(folder / "a.wav")
+    assert catalog.sync_folder(str(folder)) == (1, 0)
+
+    read = []
+    real_metadata = recording_catalog.wav_metadata
+    monkeypatch.setattr(recording_catalog, "wav_metadata", lambda path: read.append(os.path.basename(path)) or real_metadata(path))
+    write_wav(folder / "a.wav", seconds=2) # Changed in place
+    write_wav(folder / "b.wav")
+    assert catalog.sync_folder(str(folder)) == (1, 0)
+    assert read == ["b.wav"]
+    assert catalog.query(name="a.wav")[0]["duration_s"] == 1
+
+    assert catalog.sync_folder(str(folder), rescan=True) == (1, 0)
+    assert read == ["b.wav", "a.wav"]
+    assert catalog.query(name="a.wav")[0]["duration_s"] == 2
+
+    os.remove(folder / "b.wav")
+    assert catalog.sync_folder(str(folder)) == (0, 1)
+    assert catalog.count() == 1
+
+
+def test_device_names_are_not_guessed_from_file_names(tmp_path, catalog):
+    folder = tmp_path / "recordings"
+    folder.mkdir()
+    write_wav(folder / saved_name(DEVICE))
+    write_wav(folder / saved_name("Other Card"))
+    catalog.sync_folder(str(folder))
+    assert catalog.devices() == [] # Unknown tokens give no device
+
+    catalog.register_device(DEVICE)
+    write_wav(folder / saved_name(DEVICE, "20260102_120000"))
+    catalog.sync_folder(str(folder))
+    assert catalog.devices() == [DEVICE]
+    assert catalog.count(device=DEVICE) == 1
+
+
+def test_save_stores_the_full_device_name(tmp_path, catalog):
+    path = tmp_path / saved_name(DEVICE)
+    write_wav(path)
+    catalog.add_file(str(path), device=DEVICE)
+    catalog.sync_folder(str(tmp_path), rescan=True) # Does not overwrite it
+    assert [row["device"] for row in catalog.query()] == [DEVICE]
+
+    other = tmp_path / saved_name(DEVICE, "20260103_120000")
+    write_wav(other)
+    catalog.add_file(str(other)) # e.g. OPEN: resolved from the device saved before
+    assert catalog.count(device=DEVICE) == 2
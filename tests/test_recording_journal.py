@@ -0,0 +1,45 @@
+"""
+Recording journal: a journal interrupted before finalize() is recovered into the output folder
+(created if needed) as a valid WAV, and a finalized journal is saved by hard link.
+"""
+import os
+import wave
+
+from recording_journal import RecordingJournal, recover_journals
+
+CHANNELS, WIDTH, RATE = 2, 3, 48000
+FRAME = CHANNELS * WIDTH
+
+
+def test_interrupted_journal_is_recovered(tmp_path):
+    journal_dir = tmp_path / "journal"
+    journal = RecordingJournal(str(journal_dir), CHANNELS, WIDTH, RATE)
+    audio = bytes(range(256)) * FRAME * 10
+    journal.append(audio)
+    journal.append(b"\1\2") # A frame cut short by the crash
+    journal._stop_writer() # The process dies here: the header still has placeholder sizes
+    journal._file.close()
+
+    output_dir = tmp_path / "recordings" / "today" # Does not exist yet
+    (recovered,) = recover_journals(str(journal_dir), str(output_dir))
+    assert os.path.dirname(recovered) == str(output_dir)
+    assert os.listdir(journal_dir) == []
+    with wave.open(recovered, "rb") as rd:
+        assert (rd.getnchannels(), rd.getsampwidth(), rd.getframerate()) == (CHANNELS, WIDTH, RATE)
+        assert rd.readframes(rd.getnframes()) == audio
+
+
+def test_finalized_journal_is_saved_by_hard_link(tmp_path):
+    journal = RecordingJournal(str(tmp_path / "journal"), CHANNELS, WIDTH, RATE)
+    audio = bytes(FRAME * 1000)
+    journal.append(audio)
+    path = journal.finalize()
+    assert path and path.endswith(".wav")
+
+    saved = str(tmp_path / "saved.wav")
+    assert journal.export(saved)
+    assert os.path.samefile(saved, path)
+    journal.discard() # Removes the journal file but keeps the saved recording
+    assert not os.path.exists(path)
+    with wave.open(saved, "rb") as rd:
+        assert rd.getnframes() == 1000 and rd.readframes(1000) == audio
@@ -0,0 +1,27 @@
+"""
+The replay harness drives the real MainWindow through START -> capture -> analysis -> RESET
+with the virtual device, captured by the capture process as in the default configuration.
+"""
+import audio_with_spectogram as app
+import replay_harness
+
+
+def test_sessions_are_captured_by_the_capture_process(model_workdir, monkeypatch):
+    monkeypatch.chdir(model_workdir)
+    for name in ("AUDIO_BACKEND", "CAPTURE_MODE", "VIRTUAL_AUDIO", "FIXED_RECORDING_DURATION_SECONDS", "TARGET_CHANNELS"):
+        monkeypatch.setattr(app, name, getattr(app, name)) # run_harness() changes them; restored after the test
+    started = []
+
+    class CountingCaptureProcess(app.CaptureProcess):
+        def start(self):
+            started.append(self)
+            super().start()
+    monkeypatch.setattr(app, "CaptureProcess", CountingCaptureProcess)
+
+    report = replay_harness.run_harness(sessions=2, speed=0, source="pulsatile", overflow_rate=0.0, jitter_s=0.0, seed=0,
+                                        duration=5, channels=1, timeout_s=120, capture_mode="process")
+
+    assert report["failed"] == 0, report
+    assert len(started) == 2
+    assert report["capture_mode"] == "process"
+    assert report["verdicts"] == {"Pulsatile": 2}
@@ -0,0 +1,71 @@
+"""
+Similarity index: one row per key, background retraining, and vectors that do not depend on
+the display settings; channels analyzed with a noise profile stay out of it.
+"""
+import time
+
+import numpy as np
+
+import similarity_index
+from similarity_index import SimilarityIndex
+
+
+def test_saving_a_key_again_replaces_its_row(tmp_path):
+    index = SimilarityIndex(str(tmp_path), 3, "test")
+    index.add("a.wav", [1, 2, 3])
+    index.add("b.wav", [0, 0, 1])
+    index.add("a.wav", [4, 5, 6])
+    assert index.keys == ["a.wav", "b.wav"]
+    assert index.vectors[0].tolist() == [4, 5, 6]
+
+    reopened = SimilarityIndex(str(tmp_path), 3, "test")
+    assert reopened.keys == ["a.wav", "b.wav"]
+    assert [key for key, _ in reopened.query([4, 5, 6], k=5)] == ["a.wav", "b.wav"]
+
+
+def test_duplicate_rows_of_older_indexes_are_dropped(tmp_path):
+    with open(tmp_path / similarity_index.KEYS_FILE, "w") as f:
+        f.write("a.wav\nb.wav\na.wav\n")
+    np.array([[1, 1], [2, 2], [3, 3]], np.float32).tofile(str(tmp_path / similarity_index.VECTORS_FILE))
+    index = SimilarityIndex(str(tmp_path), 2, "test")
+    assert index.keys == ["b.wav", "a.wav"]
+    assert index.vectors.tolist() == [[2, 2], [3, 3]]
+
+
+def test_background_training_installs_the_quantizer(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity_index, "EXACT_SEARCH_LIMIT", 50)
+    index = SimilarityIndex(str(tmp_path), 4, "test", background_training=True)
+    rng = np.random.default_rng(0)
+    for i in range(120):
+        index.add(f"{i}.wav", rng.normal(size=4))
+    deadline = time.monotonic() + 10
+    while (index._training or index._ivf is None) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert index._ivf is not None
+    assert len(index._labels) == len(index) == 120
+    assert len(index.query(rng.normal(size=4), k=3)) == 3
+
+
+def test_mel_embedding_ignores_the_display_settings(monkeypatch):
+    import audio_with_spectogram as app
+    import benchmark
+
+    sr = app.TARGET_SAMPLE_RATE
+    y = benchmark.synthesize_signal("pulsatile", sr, duration=5)
+    analysis = [{"features": np.zeros(17, np.float32)}]
+    _, (reference,) = app.similarity_vectors("a.wav", analysis, y, sr)
+    monkeypatch.setattr(app, "ANALYSIS_SAMPLE_RATE", 8000)
+    monkeypatch.setattr(app, "SPEC_N_MELS", 64)
+    _, (vector,) = app.similarity_vectors("a.wav", analysis, y, sr)
+    np.testing.assert_array_equal(vector, reference)
+
+
+def test_denoised_channels_are_not_indexed():
+    import audio_with_spectogram as app
+
+    sr = app.TARGET_SAMPLE_RATE
+    y = np.zeros((2, 5 * sr), np.float32)
+    analysis = [{"features": np.zeros(17, np.float32), "noise_profile": None},
+                {"features": np.zeros(17, np.float32), "noise_profile": "device_48000Hz_2ch_24bit_fft2048"}]
+    keys, vectors = app.similarity_vectors("a.wav", analysis, y, sr)
+    assert keys == ["a.wav [L]"] and len(vectors) == 1
@@ -0,0 +1,109 @@
+"""
+Sync queue: entries survive a restart, failed transfers are retried with back-off, an
+interrupted transfer resumes with the missing chunks only, and copies are deduplicated.
+"""
+import os
+import time
+
+import pytest
+
+import sync_agent
+from sync_agent import DirectoryStore, SyncAgent, SyncQueue
+
+CHUNK_BYTES = 1024
+
+
+class FailingStore(DirectoryStore):
+    """
+    Directory archive whose put_chunk() fails after `fail_after` chunks.
+    """
+    def __init__(self, root, fail_after=None):
+        super().__init__(root)
+        self.fail_after = fail_after
+        self.puts = 0
+
+    def put_chunk(self, digest, data):
+        if self.fail_after is not None and self.puts >= self.fail_after:
+            raise OSError("archive unreachable")
+        self.puts += 1
+        super().put_chunk(digest, data)
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "rec.wav"
+    path.write_bytes(os.urandom(5 * CHUNK_BYTES + 100))
+    return str(path)
+
+
+def test_queue_survives_a_restart_without_duplicates(tmp_path, recording):
+    queue = SyncQueue(str(tmp_path / "state"))
+    queue.add(recording, [{"result": "Pulsatile"}])
+    queue.add(recording) # Saved again before it was shipped
+    reopened = SyncQueue(str(tmp_path / "state"))
+    assert [entry["path"] for entry in reopened.pending()] == [os.path.abspath(recording)]
+    assert reopened.pending()[0]["analysis"] == [{"result": "Pulsatile"}]
+
+
+def test_interrupted_transfer_resumes_with_the_missing_chunks(tmp_path, recording):
+    store = FailingStore(str(tmp_path / "archive"), fail_after=2)
+    agent = SyncAgent(store, str(tmp_path / "state"), chunk_bytes=CHUNK_BYTES)
+    agent.enqueue(recording)
+
+    assert agent.run_once()
+    entry = agent.queue.pending()[0]
+    assert entry["attempts"] == 1 and entry["next_try"] > time.time()
+    assert entry["last_error"] == "archive unreachable"
+    assert agent.queue.next_due() is None # Backing off
+    assert agent.stats["errors"] == 1 and agent.stats["chunks_sent"] == 2
+
+    # After a restart with the archive back, only the chunks it is missing are sent
+    store.fail_after = None
+    agent = SyncAgent(store, str(tmp_path / "state"), chunk_bytes=CHUNK_BYTES)
+    agent.queue.update(agent.queue.pending()[0], next_try=0)
+    assert agent.run_once()
+    assert agent.queue.pending() == []
+    assert agent.queue.entries[0]["result"] == "shipped"
+    assert agent.stats["chunks_skipped"] == 2 and agent.stats["chunks_sent"] == 4
+    assert store.puts == 6
+
+    restored = str(tmp_path / "restored.wav")
+    store.restore(agent.queue.entries[0]["manifest"]["sha256"], restored)
+    with open(restored, "rb") as a, open(recording, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_copies_are_deduplicated(tmp_path, recording):
+    copy = str(tmp_path / "copy.wav")
+    with open(recording, "rb") as src, open(copy, "wb") as dst:
+        dst.write(src.read())
+    store = FailingStore(str(tmp_path / "archive"))
+    agent = SyncAgent(store, str(tmp_path / "state"), chunk_bytes=CHUNK_BYTES)
+    agent.enqueue(recording)
+    agent.enqueue(copy)
+    while agent.run_once():
+        pass
+    assert [entry["result"] for entry in agent.queue.entries] == ["shipped", "deduplicated"]
+    assert store.puts == 6
+    assert (agent.stats["shipped"], agent.stats["deduplicated"], agent.stats["chunks_sent"]) == (1, 1, 6)
+
+
+def test_missing_file_fails_without_retry(tmp_path, recording):
+    agent = SyncAgent(FailingStore(str(tmp_path / "archive")), str(tmp_path / "state"), chunk_bytes=CHUNK_BYTES)
+    agent.enqueue(recording)
+    os.remove(recording)
+    assert agent.run_once()
+    assert agent.queue.entries[0]["state"] == "failed"
+    assert agent.queue.pending() == [] and not agent.run_once()
+
+
+def test_prune_keeps_the_newest_finished_entries(tmp_path):
+    queue = SyncQueue(str(tmp_path / "state"))
+    for i in range(5):
+        queue.add(str(tmp_path / f"{i}.wav"))
+        queue.update(queue.entries[-1], state="done")
+    queue.add(str(tmp_path / "pending.wav"))
+    queue.prune_done(keep=2)
+    names = [os.path.basename(entry["path"]) for entry in SyncQueue(str(tmp_path / "state")).entries]
+    assert names == ["3.wav", "4.wav", "pending.wav"]
+    assert sync_agent.QUEUE_FILE in os.listdir(tmp_path / "state")
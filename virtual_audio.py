@@ -0,0 +1,290 @@
+"""
+Virtual audio backend for headless runs.
+
+`VirtualPyAudio` implements the subset of the `pyaudio.PyAudio` interface used by the
+recorder (device queries, `open()`, `terminate()`), backed by one or more virtual input
+devices that replay a WAV file or a synthetic signal. Streams can run in real time or
+`speed` times faster, and can inject input overflows and scheduling jitter, so the whole
+START -> capture -> analysis flow can be soak- and load-tested on a machine without a Pisound.
+
+Output streams accept and discard audio at the same pace, so playback works too.
+
+This module deliberately imports neither PyAudio nor anything from the GUI script.
+"""
+import time
+import wave
+import numpy as np
+
+# Sample formats (same values as pyaudio.paInt32 / paInt24 / paInt16)
+PA_INT32 = 0x2
+PA_INT24 = 0x4
+PA_INT16 = 0x8
+FORMAT_WIDTHS = {PA_INT32: 4, PA_INT24: 3, PA_INT16: 2}
+PA_INPUT_OVERFLOWED = -9981 # paInputOverflowed error code, raised like PyAudio does
+
+SYNTHETIC_KINDS = ("pulsatile", "non_pulsatile", "noise", "intermittent")
+INTERMITTENT_PERIOD_S = 60 # "intermittent": pulsatile for the first INTERMITTENT_ACTIVE_S of every period, noise floor otherwise
+INTERMITTENT_ACTIVE_S = 10
+
+
+class SyntheticSource:
+    """
+    Endless deterministic test signal in [-1, 1], also the signal of benchmark.synthesize_signal:
+    - "pulsatile": low-frequency heartbeat-like thumps of `beat_amplitude` at `bpm` over a faint
+      noise floor (each period varies by `beat_jitter` of itself, standard deviation)
+    - "non_pulsatile": a continuous, slowly modulated tone over the same noise floor
+    - "noise": the noise floor only
+    - "intermittent": "pulsatile" bursts separated by noise floor (for event-triggered capture)
+    Every channel gets the same signal with its own noise.
+    """
+    def __init__(self, kind, rate, channels, bpm=72, seed=0, beat_amplitude=0.8, beat_jitter=0.0):
+        if kind not in SYNTHETIC_KINDS:
+            raise ValueError(f"Unknown signal kind: {kind}")
+        self.kind = kind
+        self.rate = rate
+        self.channels = channels
+        self.period = int(rate * 60 / bpm)
+        self.beat_amplitude = beat_amplitude
+        self.beat_jitter = beat_jitter
+        self.position = 0 # Frames generated so far
+        noise_seed, beat_seed = np.random.SeedSequence(seed).spawn(2) # Jitter never shifts the noise
+        self._rng = np.random.default_rng(noise_seed)
+        self._beat_rng = np.random.default_rng(beat_seed)
+        bt = np.arange(int(0.12 * rate), dtype=np.float32) / rate # 120ms thump
+        self._beat = (np.sin(2 * np.pi * 60 * bt) * np.exp(-bt / 0.03)).astype(np.float32)
+        self._onsets = [] # Beats that may still reach into the next read
+        self._next_onset = 0
+
+    def _beats_until(self, end):
+        """
+        Schedules the beats starting before frame `end` and drops those that ended before the current position.
+        """
+        while self._next_onset < end:
+            self._onsets.append(self._next_onset)
+            jitter = self.beat_jitter * self._beat_rng.standard_normal() if self.beat_jitter else 0.0
+            self._next_onset += max(len(self._beat), int(self.period * (1 + jitter)))
+        self._onsets = [onset for onset in self._onsets if onset + len(self._beat) > self.position]
+
+    def read(self, n):
+        """
+        Returns the next `n` frames as a float32 array of shape (n, channels).
+        """
+        y = (0.02 * self._rng.standard_normal((n, self.channels))).astype(np.float32)
+        if self.kind in ("pulsatile", "intermittent"):
+            self._beats_until(self.position + n)
+            burst_period, burst_active = int(INTERMITTENT_PERIOD_S * self.rate), int(INTERMITTENT_ACTIVE_S * self.rate)
+            for onset in self._onsets:
+                if self.kind == "intermittent" and onset % burst_period >= burst_active:
+                    continue
+                start, end = max(onset, self.position), min(onset + len(self._beat), self.position + n)
+                if start < end:
+                    y[start - self.position:end - self.position] += (self.beat_amplitude * self._beat[start - onset:end - onset])[:, None]
+        elif self.kind == "non_pulsatile":
+            index = self.position + np.arange(n)
+            t = index / self.rate
+            y += (0.5 * np.sin(2 * np.pi * 1000 * t) * (1 + 0.1 * np.sin(2 * np.pi * 0.2 * t))).astype(np.float32)[:, None]
+        self.position += n
+        return np.clip(y, -1, 1)
+
+
+class WavSource:
+    """
+    Replays a PCM WAV file in a loop. Channels are mixed or duplicated to match `channels`.
+    The file is expected at the stream rate (it is not resampled).
+    """
+    def __init__(self, path, channels):
+        with wave.open(path, 'rb') as rd:
+            self.rate = rd.getframerate()
+            width = rd.getsampwidth()
+            file_channels = rd.getnchannels()
+            raw = rd.readframes(rd.getnframes())
+        if width == 3:
+            u8 = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+            ints = (u8[:, 0].astype(np.int32) | (u8[:, 1].astype(np.int32) << 8) | (u8[:, 2].astype(np.int32) << 16))
+            ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        else:
+            ints = np.frombuffer(raw, dtype={1: np.uint8, 2: '<i2', 4: '<i4'}[width]).astype(np.int32)
+            if width == 1:
+                ints -= 128
+        y = (ints / float(1 << (8 * width - 1))).astype(np.float32).reshape(-1, file_channels)
+        if len(y) == 0:
+            raise ValueError(f"{path} contains no audio")
+        if file_channels != channels:
+            y = np.repeat(y.mean(axis=1, keepdims=True), channels, axis=1)
+        self.samples = y
+        self.channels = channels
+        self.position = 0
+
+    def read(self, n):
+        index = (self.position + np.arange(n)) % len(self.samples)
+        self.position += n
+        return self.samples[index]
+
+
+def encode_pcm(y, width):
+    """
+    Encodes float samples in [-1, 1] (any shape, interleaved in C order) to little-endian PCM bytes.
+    """
+    full_scale = (1 << (8 * width - 1)) - 1
+    ints = np.round(np.clip(y, -1, 1) * full_scale).astype('<i4').ravel()
+    if width == 3:
+        return ints.view(np.uint8).reshape(-1, 4)[:, :3].tobytes() # Drop the top byte
+    if width == 2:
+        return ints.astype('<i2').tobytes()
+    return ints.tobytes()
+
+
+class VirtualStream:
+    """
+    A stream opened by `VirtualPyAudio.open()`. Reads and writes are paced to `rate * speed`
+    frames per second against a deadline, so jitter delays individual buffers without
+    changing the average rate. Each stream has its own random generator, so streams of
+    several devices can be read from different threads.
+    """
+    def __init__(self, backend, rate, channels, format, device_index=0, input=False, output=False):
+        self.backend = backend
+        self.rate = rate
+        self.channels = channels
+        self.width = FORMAT_WIDTHS[format]
+        self.is_input = input
+        seed = (backend.seed, device_index, backend.streams_opened)
+        self.rng = np.random.default_rng(seed)
+        self.source = backend.make_source(rate, channels, seed) if input else None
+        self.frames_read = 0
+        self.frames_written = 0
+        self.overflows = 0 # Buffers lost to injected overflows
+        self.frames_skipped = 0 # Frames of the source lost to them
+        self._clock = None
+        self._active = True
+
+    def _pace(self, frames):
+        """
+        Sleeps until `frames` more frames are due at the simulated rate (plus random jitter).
+        """
+        if self.backend.speed is None: # Unpaced: as fast as possible
+            return
+        now = time.monotonic()
+        if self._clock is None:
+            self._clock = now
+        self._clock += frames / (self.rate * self.backend.speed)
+        delay = self._clock - now
+        if self.backend.jitter_s:
+            delay += self.rng.uniform(0, self.backend.jitter_s)
+        if delay > 0:
+            time.sleep(delay)
+
+    def read(self, num_frames, exception_on_overflow=True):
+        """
+        Returns `num_frames` frames of PCM. An injected overflow drops one buffer of the
+        source (the audio is lost, as on a real device) and raises IOError if
+        `exception_on_overflow` is set.
+        """
+        if not self._active:
+            raise IOError("Stream is not active")
+        self._pace(num_frames)
+        if self.backend.overflow_rate and self.rng.random() < self.backend.overflow_rate:
+            self.overflows += 1
+            self.frames_skipped += num_frames
+            self.source.read(num_frames) # Skipped audio
+            if exception_on_overflow:
+                raise IOError(PA_INPUT_OVERFLOWED, "Input overflowed")
+        self.frames_read += num_frames
+        return encode_pcm(self.source.read(num_frames), self.width)
+
+    def write(self, frames, num_frames=None, exception_on_underflow=False):
+        """
+        Accepts (and discards) PCM for playback at the simulated rate.
+        """
+        n = num_frames or len(frames) // (self.width * self.channels)
+        self._pace(n)
+        self.frames_written += n
+
+    def get_read_available(self):
+        return 0
+
+    def get_time(self):
+        """
+        Stream time in seconds of simulated audio: what the device produced, including the
+        buffers lost to overflows (as PortAudio's clock keeps running through them).
+        """
+        return (self.frames_read + self.frames_skipped) / self.rate
+
+    def get_input_latency(self):
+        return 0.0
+
+    def is_active(self):
+        return self._active
+
+    def stop_stream(self):
+        self._active = False
+
+    def close(self):
+        self._active = False
+        self.backend.streams_closed += 1
+        self.backend.overflows += self.overflows
+
+
+class VirtualPyAudio:
+    """
+    Drop-in stand-in for `pyaudio.PyAudio` exposing `devices` identical virtual input/output
+    devices (one per simulated station).
+
+    `source` is a synthetic kind ("pulsatile", "non_pulsatile", "noise", "intermittent") or the path of a
+    WAV file. `speed` is the replay speed relative to real time (None = unpaced).
+    `overflow_rate` is the probability that a read overflows and `jitter_s` the maximum
+    random extra delay of a buffer.
+    """
+    def __init__(self, source="pulsatile", speed=1.0, overflow_rate=0.0, jitter_s=0.0, seed=0, bpm=72,
+                 rate=48000, max_channels=2, name="Virtual Input", devices=1):
+        self.source = source
+        self.speed = speed
+        self.overflow_rate = overflow_rate
+        self.jitter_s = jitter_s
+        self.seed = seed
+        self.bpm = bpm
+        self.devices = [{"index": i, "name": name if devices == 1 else f"{name} {i + 1}", "maxInputChannels": max_channels,
+                         "maxOutputChannels": max_channels, "defaultSampleRate": float(rate)} for i in range(devices)]
+        self.streams_opened = 0
+        self.streams_closed = 0
+        self.overflows = 0 # Injected overflows of all closed streams
+
+    def make_source(self, rate, channels, seed):
+        """
+        Creates the sample source for a new input stream (each stream gets its own seed).
+        """
+        if self.source in SYNTHETIC_KINDS:
+            return SyntheticSource(self.source, rate, channels, self.bpm, seed)
+        source = WavSource(self.source, channels)
+        if source.rate != rate:
+            raise ValueError(f"{self.source} is {source.rate}Hz, the stream is {rate}Hz")
+        return source
+
+    # --- PyAudio device queries ---
+    def get_default_input_device_info(self):
+        return dict(self.devices[0])
+
+    def get_device_count(self):
+        return len(self.devices)
+
+    def get_device_info_by_index(self, index):
+        if not 0 <= index < len(self.devices):
+            raise IOError(f"Invalid device index: {index}")
+        return dict(self.devices[index])
+
+    def is_format_supported(self, rate, input_device=None, input_channels=None, input_format=None,
+                            output_device=None, output_channels=None, output_format=None):
+        channels = input_channels or output_channels or 1
+        fmt = input_format or output_format or PA_INT16
+        if channels > self.devices[0]["maxInputChannels"] or fmt not in FORMAT_WIDTHS:
+            raise ValueError("Invalid sample format or number of channels")
+        return True
+
+    # --- Streams ---
+    def open(self, rate, channels, format, input=False, output=False, input_device_index=None,
+             output_device_index=None, frames_per_buffer=1024, **kwargs):
+        self.streams_opened += 1
+        device_index = input_device_index if input else output_device_index
+        return VirtualStream(self, rate, channels, format, device_index or 0, input=input, output=output)
+
+    def terminate(self):
+        pass